@@ -6,6 +6,7 @@ import customtkinter as ctk
 import tkinter as tk
 from tkinter import ttk
 from typing import List, Dict, Callable, Optional, Any
+from common.suggestion_index import SuggestionIndex
 from utils.logger import get_logger
 
 logger = get_logger("autocomplete_entry")
@@ -14,6 +15,10 @@ class AutocompleteEntry(ctk.CTkFrame):
     """
     Widget d'autocomplétion avec dropdown pour CustomTkinter
     """
+
+    # Espera tras la última tecla antes de filtrar (ms): escribir una palabra
+    # seguida produce un solo filtrado en lugar de uno por tecla
+    DEBOUNCE_MS = 120
     
     def __init__(self, parent,
                  placeholder_text: str = "Tapez pour rechercher...",
@@ -40,10 +45,14 @@ class AutocompleteEntry(ctk.CTkFrame):
         self.selected_item: Optional[Dict] = None
         self.on_select_callback: Optional[Callable] = None
         self.search_fields: List[str] = ['text']  # Campos por defecto para buscar
+        self._index: Optional[SuggestionIndex] = None  # Se construye en la primera búsqueda
+        self._index_fields = None
         
         # Variables de control
         self.dropdown_visible = False
         self.ignore_focus_out = False
+        self._debounce_id = None
+        self._last_query = None
         
         self.create_widgets()
         self.setup_bindings()
@@ -114,6 +123,8 @@ class AutocompleteEntry(ctk.CTkFrame):
         self.suggestions_data = data
         if search_fields:
             self.search_fields = search_fields
+        self._index = None
+        self._last_query = None
         
         logger.debug(f"Configurados {len(data)} elementos para autocompletado")
     
@@ -121,31 +132,24 @@ class AutocompleteEntry(ctk.CTkFrame):
         """Establece el callback que se ejecuta al seleccionar un elemento"""
         self.on_select_callback = callback
     
+    def get_suggestion_index(self) -> SuggestionIndex:
+        """Índice de las sugerencias actuales (se reconstruye si cambian los datos o los campos)"""
+        fields = tuple(self.search_fields)
+        if self._index is None or self._index_fields != fields:
+            self._index = SuggestionIndex(
+                (item, " ".join(str(item[field]) for field in fields if field in item))
+                for item in self.suggestions_data
+            )
+            self._index_fields = fields
+        return self._index
+
     def filter_suggestions(self, query: str):
-        """Filtra las sugerencias basándose en la consulta"""
+        """Filtra las sugerencias basándose en la consulta (sin distinguir acentos)"""
         if len(query) < self.min_chars:
             self.filtered_suggestions = []
             return
         
-        query_lower = query.lower()
-        self.filtered_suggestions = []
-        
-        for item in self.suggestions_data:
-            # Buscar en todos los campos especificados
-            match_found = False
-            for field in self.search_fields:
-                if field in item:
-                    field_value = str(item[field]).lower()
-                    if query_lower in field_value:
-                        match_found = True
-                        break
-            
-            if match_found:
-                self.filtered_suggestions.append(item)
-                
-                # Limitar número de sugerencias
-                if len(self.filtered_suggestions) >= self.max_suggestions:
-                    break
+        self.filtered_suggestions = self.get_suggestion_index().search(query, self.max_suggestions)
         
         logger.debug(f"Filtradas {len(self.filtered_suggestions)} sugerencias para '{query}'")
     
@@ -214,8 +218,10 @@ class AutocompleteEntry(ctk.CTkFrame):
             
             # Actualizar texto del entry
             display_text = self.get_selected_display_text(selected_item)
+            self.cancel_scheduled_filter()
             self.entry.delete(0, tk.END)
             self.entry.insert(0, display_text)
+            self._last_query = display_text
             
             # Ocultar dropdown
             self.hide_dropdown()
@@ -233,19 +239,38 @@ class AutocompleteEntry(ctk.CTkFrame):
         """
         return self.format_suggestion_display(item)
     
-    # Event handlers
-    def on_key_release(self, event):
-        """Maneja la liberación de teclas en el entry"""
+    def schedule_filter(self):
+        """Programa el filtrado para cuando el usuario deje de escribir"""
+        self.cancel_scheduled_filter()
+        self._debounce_id = self.after(self.DEBOUNCE_MS, self.apply_filter)
+
+    def cancel_scheduled_filter(self):
+        """Anula el filtrado pendiente, si lo hay"""
+        if self._debounce_id is not None:
+            self.after_cancel(self._debounce_id)
+            self._debounce_id = None
+
+    def apply_filter(self):
+        """Filtra con el texto actual y actualiza el dropdown"""
+        self._debounce_id = None
         query = self.entry.get()
+        self._last_query = query
         self.filter_suggestions(query)
         self.update_dropdown()
+
+    # Event handlers
+    def on_key_release(self, event):
+        """Maneja la liberación de teclas en el entry"""
+        # Las teclas que no cambian el texto (flechas, Enter...) no vuelven a filtrar
+        if self.entry.get() == self._last_query and self._debounce_id is None:
+            return
+        self.schedule_filter()
     
     def on_focus_in(self, event):
         """Maneja el foco en el entry"""
-        query = self.entry.get()
-        if query:
-            self.filter_suggestions(query)
-            self.update_dropdown()
+        if self.entry.get():
+            self.cancel_scheduled_filter()
+            self.apply_filter()
     
     def on_focus_out(self, event):
         """Maneja la pérdida de foco del entry"""
@@ -255,10 +280,9 @@ class AutocompleteEntry(ctk.CTkFrame):
     
     def on_entry_click(self, event):
         """Maneja clicks en el entry"""
-        query = self.entry.get()
-        if query:
-            self.filter_suggestions(query)
-            self.update_dropdown()
+        if self.entry.get():
+            self.cancel_scheduled_filter()
+            self.apply_filter()
     
     def on_arrow_down(self, event):
         """Maneja flecha abajo - navegar en sugerencias"""
@@ -290,6 +314,11 @@ class AutocompleteEntry(ctk.CTkFrame):
     
     def on_enter(self, event):
         """Maneja Enter - seleccionar sugerencia actual"""
+        if self._debounce_id is not None:
+            # Filtrado pendiente: mostrar ya las sugerencias del texto escrito
+            self.cancel_scheduled_filter()
+            self.apply_filter()
+            return "break"
         if self.dropdown_visible:
             current = self.suggestions_listbox.curselection()
             if current:
@@ -324,8 +353,10 @@ class AutocompleteEntry(ctk.CTkFrame):
     
     def set_value(self, value: str):
         """Establece el valor del entry"""
+        self.cancel_scheduled_filter()
         self.entry.delete(0, tk.END)
         self.entry.insert(0, value)
+        self._last_query = value
     
     def get_selected_item(self) -> Optional[Dict]:
         """Obtiene el elemento seleccionado"""
@@ -333,8 +364,10 @@ class AutocompleteEntry(ctk.CTkFrame):
     
     def clear(self):
         """Limpia el entry y la selección"""
+        self.cancel_scheduled_filter()
         self.entry.delete(0, tk.END)
         self.selected_item = None
+        self._last_query = None
         self.hide_dropdown()
     
     def focus(self):
@@ -344,3 +377,8 @@ class AutocompleteEntry(ctk.CTkFrame):
     def configure_entry(self, **kwargs):
         """Configura el entry interno"""
         self.entry.configure(**kwargs)
+
+    def destroy(self):
+        """Anula el filtrado pendiente antes de destruir el widget"""
+        self.cancel_scheduled_filter()
+        super().destroy()
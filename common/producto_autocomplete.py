@@ -5,7 +5,9 @@ Composant d'autocomplétion spécialisé pour la sélection de produits
 import customtkinter as ctk
 from typing import List, Dict, Callable, Optional
 from common.autocomplete_entry import AutocompleteEntry
-from database.models import Producto
+from database.models import Producto, Stock
+from database.product_catalog import product_catalog
+from common.suggestion_index import get_producto_index
 from utils.logger import get_logger
 
 logger = get_logger("producto_autocomplete")
@@ -26,6 +28,7 @@ class ProductoAutocomplete(AutocompleteEntry):
 
         self.include_stock_info = include_stock_info
         self.productos_data: List[Producto] = []
+        self.suggestions_by_id: Dict[int, Dict] = {}
 
         # Filtrar kwargs para evitar conflictos
         safe_kwargs = {k: v for k, v in kwargs.items()
@@ -49,30 +52,14 @@ class ProductoAutocomplete(AutocompleteEntry):
     def load_productos_data(self):
         """Carga los datos de productos desde la base de datos"""
         try:
-            self.productos_data = Producto.get_all()
+            self.productos_data = product_catalog.get_all()
+            stock_snapshot = self.load_stock_snapshot()
             
             # Convertir a formato para autocompletado
             suggestions_data = []
             for producto in self.productos_data:
                 # Obtener información de stock si se requiere
-                stock_info = ""
-                if self.include_stock_info:
-                    try:
-                        from database.models import Stock
-                        stock = Stock.get_by_producto_id(producto.id)
-                        if stock:
-                            cantidad = stock.cantidad_disponible
-                            if cantidad <= 0:
-                                stock_info = " (Sin stock)"
-                            elif cantidad <= 5:
-                                stock_info = f" (Stock bajo: {cantidad})"
-                            else:
-                                stock_info = f" (Stock: {cantidad})"
-                        else:
-                            stock_info = " (Sin stock)"
-                    except Exception as e:
-                        logger.warning(f"Error obteniendo stock para producto {producto.id}: {e}")
-                        stock_info = ""
+                stock_info = self.format_stock_info(stock_snapshot, producto.id)
                 
                 # Crear entrada para autocompletado
                 suggestion = {
@@ -102,6 +89,57 @@ class ProductoAutocomplete(AutocompleteEntry):
             logger.error(f"Error cargando datos de productos: {e}")
             self.set_suggestions_data([])
     
+    def set_suggestions_data(self, data: List[Dict], search_fields: List[str] = None):
+        """Establece los datos para autocompletado e indexa las sugerencias por ID de producto"""
+        super().set_suggestions_data(data, search_fields)
+        self.suggestions_by_id = {item['id']: item for item in data}
+
+    def filter_suggestions(self, query: str):
+        """Filtra las sugerencias con el índice compartido de productos"""
+        if len(query) < self.min_chars:
+            self.filtered_suggestions = []
+            return
+
+        # Con un filtro de categoría activo se busca solo entre las sugerencias filtradas
+        if len(self.suggestions_data) < len(self.productos_data):
+            super().filter_suggestions(query)
+            return
+
+        try:
+            producto_ids = get_producto_index().search(query, self.max_suggestions)
+        except Exception as e:
+            logger.warning(f"Error en el índice de productos, usando las sugerencias cargadas: {e}")
+            super().filter_suggestions(query)
+            return
+
+        self.filtered_suggestions = [
+            self.suggestions_by_id[producto_id] for producto_id in producto_ids
+            if producto_id in self.suggestions_by_id
+        ]
+
+        logger.debug(f"Filtradas {len(self.filtered_suggestions)} sugerencias para '{query}'")
+
+    def load_stock_snapshot(self) -> Optional[Dict[int, tuple]]:
+        """Stock de todos los productos en una sola consulta (None si no se muestra o falla)"""
+        if not self.include_stock_info:
+            return None
+        try:
+            return Stock.get_status_snapshot()
+        except Exception as e:
+            logger.warning(f"Error obteniendo el stock de los productos: {e}")
+            return None
+
+    def format_stock_info(self, stock_snapshot: Optional[Dict[int, tuple]], producto_id: int) -> str:
+        """Texto de stock que acompaña a un producto en las sugerencias"""
+        if stock_snapshot is None:
+            return ""
+        cantidad, estado = stock_snapshot.get(producto_id, (0, 'sin_stock'))
+        if estado == 'sin_stock':
+            return " (Sin stock)"
+        if estado == 'bajo':
+            return f" (Stock bajo: {cantidad})"
+        return f" (Stock: {cantidad})"
+
     def create_display_text(self, producto: Producto, stock_info: str = "") -> str:
         """Crea el texto de display para un producto"""
         precio_text = f"€{producto.precio:.2f}" if producto.precio else "€0.00"
@@ -171,27 +209,12 @@ class ProductoAutocomplete(AutocompleteEntry):
         
         try:
             productos_filtrados = [p for p in self.productos_data if p.categoria == categoria]
+            stock_snapshot = self.load_stock_snapshot()
             
             # Convertir a formato para autocompletado
             suggestions_data = []
             for producto in productos_filtrados:
-                stock_info = ""
-                if self.include_stock_info:
-                    try:
-                        from database.models import Stock
-                        stock = Stock.get_by_producto_id(producto.id)
-                        if stock:
-                            cantidad = stock.cantidad_disponible
-                            if cantidad <= 0:
-                                stock_info = " (Sin stock)"
-                            elif cantidad <= 5:
-                                stock_info = f" (Stock bajo: {cantidad})"
-                            else:
-                                stock_info = f" (Stock: {cantidad})"
-                        else:
-                            stock_info = " (Sin stock)"
-                    except Exception:
-                        stock_info = ""
+                stock_info = self.format_stock_info(stock_snapshot, producto.id)
                 
                 suggestion = {
                     'id': producto.id,
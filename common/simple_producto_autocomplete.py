@@ -7,6 +7,8 @@ import customtkinter as ctk
 import tkinter as tk
 from typing import List, Dict, Callable, Optional
 from database.models import Producto, Stock
+from database.product_catalog import product_catalog
+from common.suggestion_index import fold_text, get_producto_index
 from utils.logger import get_logger
 
 logger = get_logger("simple_producto_autocomplete")
@@ -15,6 +17,9 @@ class SimpleProductoAutocomplete(ctk.CTkFrame):
     """
     Widget simple de autocompletado para productos
     """
+
+    # Espera tras la última tecla antes de filtrar (ms)
+    DEBOUNCE_MS = 120
     
     def __init__(self, parent, **kwargs):
         # Solo pasar argumentos seguros al constructor padre
@@ -31,12 +36,15 @@ class SimpleProductoAutocomplete(ctk.CTkFrame):
         # Variables
         self.productos_data: List[Producto] = []
         self.suggestions_data: List[Dict] = []
+        self.suggestions_by_id: Dict[int, Dict] = {}
         self.filtered_suggestions: List[Dict] = []
         self.selected_item: Optional[Dict] = None
         self.on_select_callback: Optional[Callable] = None
         
         # Estado del dropdown
         self.dropdown_visible = False
+        self._debounce_id = None
+        self._last_query = None
         
         self.create_widgets()
         self.load_productos_data()
@@ -85,29 +93,14 @@ class SimpleProductoAutocomplete(ctk.CTkFrame):
     def load_productos_data(self):
         """Carga los datos de productos desde la base de datos"""
         try:
-            self.productos_data = Producto.get_all()
+            self.productos_data = product_catalog.get_all()
+            stock_snapshot = self.load_stock_snapshot()
             
             # Convertir a formato para autocompletado
             self.suggestions_data = []
             for producto in self.productos_data:
                 # Obtener información de stock si se requiere
-                stock_info = ""
-                if self.include_stock_info:
-                    try:
-                        stock = Stock.get_by_producto_id(producto.id)
-                        if stock:
-                            cantidad = stock.cantidad_disponible
-                            if cantidad <= 0:
-                                stock_info = " (Sin stock)"
-                            elif cantidad <= 5:
-                                stock_info = f" (Stock bajo: {cantidad})"
-                            else:
-                                stock_info = f" (Stock: {cantidad})"
-                        else:
-                            stock_info = " (Sin stock)"
-                    except Exception as e:
-                        logger.warning(f"Error obteniendo stock para producto {producto.id}: {e}")
-                        stock_info = ""
+                stock_info = self.format_stock_info(stock_snapshot, producto.id)
                 
                 # Crear entrada para autocompletado
                 suggestion = {
@@ -127,12 +120,34 @@ class SimpleProductoAutocomplete(ctk.CTkFrame):
                 
                 self.suggestions_data.append(suggestion)
             
+            self.suggestions_by_id = {item['id']: item for item in self.suggestions_data}
             logger.info(f"Cargados {len(self.suggestions_data)} productos para autocompletado")
             
         except Exception as e:
             logger.error(f"Error cargando datos de productos: {e}")
             self.suggestions_data = []
     
+    def load_stock_snapshot(self) -> Optional[Dict[int, tuple]]:
+        """Stock de todos los productos en una sola consulta (None si no se muestra o falla)"""
+        if not self.include_stock_info:
+            return None
+        try:
+            return Stock.get_status_snapshot()
+        except Exception as e:
+            logger.warning(f"Error obteniendo el stock de los productos: {e}")
+            return None
+
+    def format_stock_info(self, stock_snapshot: Optional[Dict[int, tuple]], producto_id: int) -> str:
+        """Texto de stock que acompaña a un producto en las sugerencias"""
+        if stock_snapshot is None:
+            return ""
+        cantidad, estado = stock_snapshot.get(producto_id, (0, 'sin_stock'))
+        if estado == 'sin_stock':
+            return " (Sin stock)"
+        if estado == 'bajo':
+            return f" (Stock bajo: {cantidad})"
+        return f" (Stock: {cantidad})"
+
     def create_display_text(self, producto: Producto, stock_info: str = "") -> str:
         """Crea el texto de display para un producto"""
         precio_text = f"€{producto.precio:.2f}" if producto.precio else "€0.00"
@@ -150,16 +165,30 @@ class SimpleProductoAutocomplete(ctk.CTkFrame):
         return " - ".join(display_parts)
     
     def filter_suggestions(self, query: str):
-        """Filtra las sugerencias basándose en la consulta"""
+        """Filtra las sugerencias con el índice compartido de productos"""
         if len(query) < self.min_chars:
             self.filtered_suggestions = []
             return
         
-        query_lower = query.lower()
+        try:
+            producto_ids = get_producto_index().search(query, self.max_suggestions)
+        except Exception as e:
+            logger.warning(f"Error en el índice de productos, usando filtro simple: {e}")
+            producto_ids = None
+        
+        if producto_ids is not None:
+            self.filtered_suggestions = [
+                self.suggestions_by_id[producto_id] for producto_id in producto_ids
+                if producto_id in self.suggestions_by_id
+            ]
+            logger.debug(f"Filtradas {len(self.filtered_suggestions)} sugerencias para '{query}'")
+            return
+        
+        query_folded = fold_text(query)
         self.filtered_suggestions = []
         
         for item in self.suggestions_data:
-            if query_lower in item['search_text']:
+            if query_folded in fold_text(item['search_text']):
                 self.filtered_suggestions.append(item)
                 
                 # Limitar número de sugerencias
@@ -207,8 +236,10 @@ class SimpleProductoAutocomplete(ctk.CTkFrame):
             
             # Actualizar texto del entry
             display_text = f"{selected_item['nombre']} - {selected_item['referencia']}"
+            self.cancel_scheduled_filter()
             self.entry.delete(0, tk.END)
             self.entry.insert(0, display_text)
+            self._last_query = display_text
             
             # Ocultar dropdown
             self.hide_dropdown()
@@ -219,19 +250,38 @@ class SimpleProductoAutocomplete(ctk.CTkFrame):
             
             logger.info(f"Seleccionado: {display_text}")
     
-    # Event handlers
-    def on_key_release(self, event):
-        """Maneja la liberación de teclas en el entry"""
+    def schedule_filter(self):
+        """Programa el filtrado para cuando el usuario deje de escribir"""
+        self.cancel_scheduled_filter()
+        self._debounce_id = self.after(self.DEBOUNCE_MS, self.apply_filter)
+    
+    def cancel_scheduled_filter(self):
+        """Anula el filtrado pendiente, si lo hay"""
+        if self._debounce_id is not None:
+            self.after_cancel(self._debounce_id)
+            self._debounce_id = None
+    
+    def apply_filter(self):
+        """Filtra con el texto actual y actualiza las sugerencias"""
+        self._debounce_id = None
         query = self.entry.get()
+        self._last_query = query
         self.filter_suggestions(query)
         self.update_suggestions_display()
     
+    # Event handlers
+    def on_key_release(self, event):
+        """Maneja la liberación de teclas en el entry"""
+        # Las teclas que no cambian el texto (flechas, Enter...) no vuelven a filtrar
+        if self.entry.get() == self._last_query and self._debounce_id is None:
+            return
+        self.schedule_filter()
+    
     def on_focus_in(self, event):
         """Maneja el foco en el entry"""
-        query = self.entry.get()
-        if query:
-            self.filter_suggestions(query)
-            self.update_suggestions_display()
+        if self.entry.get():
+            self.cancel_scheduled_filter()
+            self.apply_filter()
     
     def on_focus_out(self, event):
         """Maneja la pérdida de foco del entry"""
@@ -240,22 +290,23 @@ class SimpleProductoAutocomplete(ctk.CTkFrame):
     
     def on_entry_click(self, event):
         """Maneja clicks en el entry"""
-        query = self.entry.get()
-        if query:
-            self.filter_suggestions(query)
-            self.update_suggestions_display()
+        if self.entry.get():
+            self.cancel_scheduled_filter()
+            self.apply_filter()
     
     def on_arrow_down(self, event):
         """Maneja flecha abajo - mostrar sugerencias"""
-        if not self.dropdown_visible:
-            query = self.entry.get()
-            if query:
-                self.filter_suggestions(query)
-                self.update_suggestions_display()
+        if not self.dropdown_visible and self.entry.get():
+            self.cancel_scheduled_filter()
+            self.apply_filter()
         return "break"
     
     def on_enter(self, event):
         """Maneja Enter - seleccionar primera sugerencia"""
+        if self._debounce_id is not None:
+            # Filtrado pendiente: filtrar ya para seleccionar sobre el texto escrito
+            self.cancel_scheduled_filter()
+            self.apply_filter()
         if self.dropdown_visible and self.filtered_suggestions:
             self.select_suggestion(0)
         return "break"
@@ -321,13 +372,17 @@ class SimpleProductoAutocomplete(ctk.CTkFrame):
     
     def set_value(self, value: str):
         """Establece el valor del entry"""
+        self.cancel_scheduled_filter()
         self.entry.delete(0, tk.END)
         self.entry.insert(0, value)
+        self._last_query = value
     
     def clear(self):
         """Limpia el entry y la selección"""
+        self.cancel_scheduled_filter()
         self.entry.delete(0, tk.END)
         self.selected_item = None
+        self._last_query = None
         self.hide_dropdown()
     
     def refresh_data(self):
@@ -338,3 +393,8 @@ class SimpleProductoAutocomplete(ctk.CTkFrame):
     def focus(self):
         """Pone el foco en el entry"""
         self.entry.focus()
+    
+    def destroy(self):
+        """Anula el filtrado pendiente antes de destruir el widget"""
+        self.cancel_scheduled_filter()
+        super().destroy()
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+Índice en memoria para los widgets de autocompletado
+
+Sustituye el recorrido de todas las sugerencias en cada tecla por un índice que
+se construye una vez:
+  - los textos se pasan a minúsculas y sin acentos ("Canción" -> "cancion")
+    y se separan en palabras
+  - por cada palabra se guardan sus prefijos de 1 y 2 letras y todos sus
+    trigramas, con la lista ordenada de posiciones que los contienen
+
+Una búsqueda recorre la lista de posiciones más corta de las palabras buscadas
+y comprueba el resto de palabras sobre cada candidato, deteniéndose en cuanto
+tiene suficientes resultados. Primero aparecen las sugerencias en las que todas
+las palabras buscadas son inicio de palabra; después las que solo las
+contienen. Dentro de cada grupo se respeta el orden original de las entradas.
+"""
+
+import re
+import unicodedata
+from array import array
+from collections import defaultdict
+from typing import Any, Iterable, List, Optional, Tuple
+from utils.logger import get_logger
+
+logger = get_logger("suggestion_index")
+
+_TOKEN_RE = re.compile(r"[^\W_]+", re.UNICODE)
+
+
+def fold_text(text) -> str:
+    """Minúsculas y sin acentos, para comparar sin tener en cuenta ninguno de los dos"""
+    text = str(text or "")
+    if text.isascii():
+        return text.lower()
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
+
+
+def tokenize(text) -> List[str]:
+    """Palabras (letras y dígitos) del texto ya normalizado con fold_text"""
+    return _TOKEN_RE.findall(fold_text(text))
+
+
+class SuggestionIndex:
+    """Índice de prefijos y trigramas sobre una lista de (valor, texto)"""
+
+    NGRAM = 3
+
+    def __init__(self, entries: Iterable[Tuple[Any, str]]):
+        """
+        Args:
+            entries: pares (valor, texto); search() devuelve los valores cuyo texto coincide,
+                     en el mismo orden en que se recibieron
+        """
+        self.values: List[Any] = []
+        self._tokens: List[Tuple[str, ...]] = []
+        # Las mismas palabras se repiten en muchas entradas: se normalizan una sola vez
+        folded_by_raw = {}
+        positions_by_token = defaultdict(list)
+
+        for position, (value, text) in enumerate(entries):
+            tokens = []
+            for raw in _TOKEN_RE.findall(str(text or "")):
+                folded = folded_by_raw.get(raw)
+                if folded is None:
+                    folded = folded_by_raw[raw] = tuple(tokenize(raw))
+                tokens.extend(folded)
+            tokens = tuple(dict.fromkeys(tokens))
+            self.values.append(value)
+            self._tokens.append(tokens)
+            for token in tokens:
+                positions_by_token[token].append(position)
+
+        # Cada grama reúne las posiciones de todas las palabras que lo contienen
+        postings = defaultdict(list)
+        for token, positions in positions_by_token.items():
+            for gram in self._grams(token):
+                postings[gram].extend(positions)
+
+        # array('I') ocupa 4 bytes por posición frente a los 8 de una lista
+        self._postings = {gram: array('I', sorted(set(positions)))
+                          for gram, positions in postings.items()}
+        logger.debug(f"Índice de sugerencias: {len(self.values)} entradas, {len(self._postings)} gramas")
+
+    def __len__(self):
+        return len(self.values)
+
+    @classmethod
+    def _grams(cls, token):
+        """Gramas de una palabra: prefijos cortos ("^c", "^ca") y trigramas"""
+        grams = {'^' + token[:1], '^' + token[:2]}
+        for start in range(len(token) - cls.NGRAM + 1):
+            grams.add(token[start:start + cls.NGRAM])
+        return grams
+
+    def _query_grams(self, word):
+        """Gramas que debe contener una entrada para poder coincidir con la palabra"""
+        if len(word) < self.NGRAM:
+            # Palabras cortas: solo como inicio de palabra (como infijo casi todo coincidiría)
+            return ['^' + word]
+        return [word[start:start + self.NGRAM] for start in range(len(word) - self.NGRAM + 1)]
+
+    def _matches(self, words, tokens):
+        """
+        Comprueba una entrada
+
+        Returns:
+            None si alguna palabra no aparece, True si todas son inicio de palabra,
+            False si todas aparecen pero alguna solo como infijo
+        """
+        all_prefix = True
+        for word in words:
+            if any(token.startswith(word) for token in tokens):
+                continue
+            if len(word) >= self.NGRAM and any(word in token for token in tokens):
+                all_prefix = False
+                continue
+            return None
+        return all_prefix
+
+    def search(self, query: str, limit: Optional[int] = 10) -> List[Any]:
+        """
+        Valores que coinciden con todas las palabras de la consulta
+
+        Args:
+            query: texto introducido por el usuario
+            limit: número máximo de resultados (None = todos)
+        """
+        words = list(dict.fromkeys(tokenize(query)))
+        if not words:
+            return []
+
+        # Los resultados "todo inicio de palabra" deben contener además el prefijo de
+        # dos letras de cada palabra: su lista de candidatos suele ser mucho más corta
+        prefix_grams = []
+        infix_grams = []
+        for word in words:
+            grams = self._query_grams(word)
+            infix_grams.extend(grams)
+            prefix_grams.extend(grams)
+            prefix_grams.append('^' + word[:2])
+
+        prefix_driver = self._shortest_postings(prefix_grams)
+        prefix_matches = []
+        found = set()
+        if prefix_driver is not None:
+            for position in prefix_driver:
+                if self._matches(words, self._tokens[position]):
+                    prefix_matches.append(position)
+                    if limit is not None and len(prefix_matches) >= limit:
+                        break
+            found.update(prefix_matches)
+
+        infix_matches = []
+        remaining = None if limit is None else limit - len(prefix_matches)
+        infix_driver = self._shortest_postings(infix_grams)
+        if infix_driver is not None and (remaining is None or remaining > 0):
+            for position in infix_driver:
+                if position in found or self._matches(words, self._tokens[position]) is None:
+                    continue
+                infix_matches.append(position)
+                if remaining is not None and len(infix_matches) >= remaining:
+                    break
+
+        return [self.values[position] for position in prefix_matches + infix_matches]
+
+    def _shortest_postings(self, grams):
+        """Lista de posiciones más corta entre los gramas (None si alguno no existe)"""
+        shortest = None
+        for gram in grams:
+            positions = self._postings.get(gram)
+            if positions is None:
+                return None
+            if shortest is None or len(positions) < len(shortest):
+                shortest = positions
+        return shortest
+
+
+# Índice compartido de productos: se reconstruye solo cuando cambia el catálogo
+_producto_index = None
+_producto_index_version = None
+
+
+def get_producto_index() -> SuggestionIndex:
+    """
+    Índice de IDs de producto por nombre, referencia y categoría
+
+    Lo comparten todos los autocompletados de productos y se construye una vez
+    por versión del catálogo de productos.
+    """
+    global _producto_index, _producto_index_version
+    from database.product_catalog import product_catalog
+
+    version = product_catalog.current_version()
+    if _producto_index is None or _producto_index_version != version:
+        _producto_index = SuggestionIndex(
+            (producto.id, f"{producto.nombre} {producto.referencia} {producto.categoria or ''}")
+            for producto in product_catalog.get_all()
+        )
+        _producto_index_version = version
+        logger.info(f"Índice de autocompletado de productos construido: {len(_producto_index)} productos")
+    return _producto_index
@@ -8,8 +8,9 @@ from tkinter import filedialog, messagebox
 from utils.translations import get_text
 from utils.config import app_config
 from utils.logger import get_logger
+from utils.thumbnail_store import thumbnail_store
+from utils.image_ingestion import image_ingestor
 import os
-from PIL import Image, ImageTk
 
 logger = get_logger("ui_components")
 
@@ -33,6 +34,57 @@ class BaseWindow:
         
         # Variables comunes
         self.imagen_path = ""
+
+        # Trabajos en segundo plano pendientes, por clave
+        self._async_tasks = {}
+        self.window.bind("<Destroy>", self._on_window_destroy, add="+")
+
+    def run_async(self, func, *args, on_success=None, on_error=None, key=None, **kwargs):
+        """
+        Ejecuta func(*args, **kwargs) fuera del hilo de Tk (pool de consultas)
+
+        on_success(resultado) u on_error(excepción) se llaman en el hilo de
+        Tk. Un trabajo nuevo con la misma clave cancela el anterior, cuyo
+        resultado ya no se entrega; al cerrar la ventana se cancelan todos.
+
+        Returns:
+            AsyncTask: permite cancelar el trabajo
+        """
+        from database.query_executor import AsyncTask, call_when_done, query_executor
+
+        tareas = self.__dict__.setdefault('_async_tasks', {})
+        if key is not None and key in tareas:
+            tareas.pop(key).cancel()
+
+        tarea = AsyncTask(query_executor.submit(func, *args, **kwargs), key=key)
+        clave = key if key is not None else tarea
+        tareas[clave] = tarea
+
+        def terminar(callback):
+            def llamar(valor):
+                if tareas.get(clave) is tarea:
+                    del tareas[clave]
+                if callback is not None:
+                    callback(valor)
+            return llamar
+
+        error_callback = on_error or (lambda e: self.logger.error(f"Error en carga en segundo plano: {e}"))
+        call_when_done(tarea.future, self.window, terminar(on_success), terminar(error_callback), task=tarea)
+        return tarea
+
+    def cancel_async(self, key=None):
+        """Cancela el trabajo en segundo plano con esa clave, o todos si no se indica"""
+        tareas = self.__dict__.get('_async_tasks', {})
+        claves = list(tareas) if key is None else [key]
+        for clave in claves:
+            tarea = tareas.pop(clave, None)
+            if tarea is not None:
+                tarea.cancel()
+
+    def _on_window_destroy(self, event):
+        """Al cerrar la ventana se descartan los resultados pendientes"""
+        if event.widget is self.window:
+            self.cancel_async()
     
     def _show_message(self, message_type, title, message):
         """Helper para mostrar mensajes copiables con el parent correcto"""
@@ -225,31 +277,33 @@ class ImageSelector:
             )
 
             if file_path:
-                filename = os.path.basename(file_path)
-                assets_dir = app_config.get_assets_directory()
-                
-                if not os.path.exists(assets_dir):
-                    os.makedirs(assets_dir)
-                
-                dest_path = os.path.join(assets_dir, filename)
+                from database.query_executor import call_when_done
 
-                try:
-                    import shutil
-                    shutil.copy2(file_path, dest_path)
-                    self.imagen_path = dest_path
-                    if self.imagen_label:
-                        self.imagen_label.configure(text=f"Imagen: {filename}")
-                    self.update_image_display()
-                    self.logger.info(f"Imagen seleccionada: {filename}")
-                except Exception as e:
-                    self.logger.error(f"Error al copiar imagen: {e}")
-                    if hasattr(self.parent_window, '_show_message'):
-                        self.parent_window._show_message("error", get_text("error"), 
-                                                       f"Error al copiar imagen: {str(e)}")
+                # Validar, reducir y reencodar la imagen fuera del hilo de la interfaz
+                future = image_ingestor.submit(file_path)
+                call_when_done(future, self.parent_window,
+                               on_success=lambda resultado: self._on_imagen_importada(file_path, resultado),
+                               on_error=self._on_imagen_error)
 
         except Exception as e:
             self.logger.error(f"Error al seleccionar imagen: {e}")
     
+    def _on_imagen_importada(self, file_path, resultado):
+        """Muestra la imagen ya importada (llamado en el hilo de Tk)"""
+        filename = os.path.basename(file_path)
+        self.imagen_path = resultado['path']
+        if self.imagen_label:
+            self.imagen_label.configure(text=f"Imagen: {filename}")
+        self.update_image_display()
+        self.logger.info(f"Imagen seleccionada: {filename}")
+
+    def _on_imagen_error(self, error):
+        """Informa de un error al importar la imagen (llamado en el hilo de Tk)"""
+        self.logger.error(f"Error al importar imagen: {error}")
+        if hasattr(self.parent_window, '_show_message'):
+            self.parent_window._show_message("error", get_text("error"),
+                                           f"Error al importar imagen: {str(error)}")
+
     def update_image_display(self):
         """Actualiza el display de la imagen"""
         if not self.imagen_display:
@@ -258,10 +312,10 @@ class ImageSelector:
         try:
             if self.imagen_path and os.path.exists(self.imagen_path):
                 display_size = app_config.get_image_display_size()
-                image = Image.open(self.imagen_path)
-                image.thumbnail(display_size, Image.Resampling.LANCZOS)
-                photo = ImageTk.PhotoImage(image)
-                
+                photo = thumbnail_store.get_photo(self.imagen_path, display_size)
+                if photo is None:
+                    raise ValueError(f"No se pudo crear la miniatura de {self.imagen_path}")
+
                 self.imagen_display.configure(image=photo, text="")
                 self.imagen_display.image = photo
                 
@@ -4,6 +4,7 @@ Validadores comunes para productos y facturas
 """
 from utils.translations import get_text
 from utils.logger import get_logger
+from utils import money
 import re
 
 logger = get_logger("validators")
@@ -135,48 +136,32 @@ class CalculationHelper:
     
     @staticmethod
     def calculate_iva_amount(precio_base, iva_percentage):
-        """Calcula el importe del IVA"""
+        """Calcula el importe del IVA (exacto al céntimo)"""
         try:
-            precio = float(precio_base)
-            iva = float(iva_percentage)
-            return round(precio * (iva / 100), 2)
+            base = money.to_cents(precio_base)
+            return money.from_cents(money.percentage_of(base, money.rate_units(iva_percentage)))
         except (ValueError, TypeError):
             return 0.0
     
     @staticmethod
     def calculate_precio_con_iva(precio_base, iva_percentage):
-        """Calcula el precio con IVA incluido"""
+        """Calcula el precio con IVA incluido (exacto al céntimo)"""
         try:
-            precio = float(precio_base)
-            iva = float(iva_percentage)
-            return round(precio * (1 + iva / 100), 2)
+            base = money.to_cents(precio_base)
+            return money.from_cents(base + money.percentage_of(base, money.rate_units(iva_percentage)))
         except (ValueError, TypeError):
             return 0.0
     
     @staticmethod
     def calculate_line_total(precio_unitario, cantidad, iva_percentage=0, descuento_percentage=0):
-        """Calcula el total de una línea de factura"""
+        """Calcula el total de una línea de factura (en céntimos enteros, devuelto en euros)"""
         try:
-            precio = float(precio_unitario)
-            cant = int(cantidad)
-            iva = float(iva_percentage)
-            descuento = float(descuento_percentage)
-            
-            # Subtotal sin descuento ni IVA
-            subtotal = precio * cant
-            
-            # Aplicar descuento
-            if descuento > 0:
-                subtotal = subtotal * (1 - descuento / 100)
-            
-            # Aplicar IVA
-            total_con_iva = subtotal * (1 + iva / 100)
-            
+            linea = money.calculate_line(precio_unitario, int(cantidad), iva_percentage, descuento_percentage)
             return {
-                'subtotal': round(subtotal, 2),
-                'descuento_amount': round(precio * cant * (descuento / 100), 2),
-                'iva_amount': round(subtotal * (iva / 100), 2),
-                'total': round(total_con_iva, 2)
+                'subtotal': money.from_cents(linea['base']),
+                'descuento_amount': money.from_cents(linea['descuento']),
+                'iva_amount': money.from_cents(linea['iva']),
+                'total': money.from_cents(linea['total'])
             }
         except (ValueError, TypeError):
             return {
@@ -185,6 +170,34 @@ class CalculationHelper:
                 'iva_amount': 0.0,
                 'total': 0.0
             }
+
+    @staticmethod
+    def calculate_invoice_totals(items):
+        """
+        Calcula los totales de una factura con el IVA por tipo impositivo
+
+        Args:
+            items: objetos con iva_aplicado y subtotal (base de la línea ya calculada)
+
+        Returns:
+            dict: {'subtotal', 'total_iva', 'total'} en euros y
+                  'por_tipo': {porcentaje IVA: {'base', 'iva'}} en euros
+        """
+        totales = money.aggregate_by_rate(
+            (money.rate_units(item.iva_aplicado), money.to_cents(item.subtotal)) for item in items
+        )
+        return {
+            'subtotal': money.from_cents(totales['subtotal']),
+            'total_iva': money.from_cents(totales['total_iva']),
+            'total': money.from_cents(totales['total']),
+            'por_tipo': {
+                tipo / money.ESCALA_PORCENTAJE: {
+                    'base': money.from_cents(desglose['base']),
+                    'iva': money.from_cents(desglose['iva'])
+                }
+                for tipo, desglose in totales['por_tipo'].items()
+            }
+        }
     
     @staticmethod
     def format_currency(amount, currency_symbol="€"):
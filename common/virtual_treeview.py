@@ -0,0 +1,520 @@
+# -*- coding: utf-8 -*-
+"""
+TreeView virtual para listas grandes
+
+En lugar de insertar una fila de Tk por resultado, el TreeView contiene solo
+las filas visibles ("huecos"). Al desplazarse o al cambiar los datos se
+vuelve a calcular qué fila del origen de datos corresponde a cada hueco y
+solo se modifican los huecos cuyo contenido ha cambiado.
+
+Cada fila es una tupla (clave, valores, tags). La clave identifica la fila
+entre recargas: la selección se conserva por clave aunque la fila salga de
+la vista o cambie de posición.
+
+Orígenes de datos:
+  - ListDataSource: lista en memoria (admite ordenación por columna)
+  - QueryDataSource: consulta SQL leída por páginas (por clave o con LIMIT/OFFSET)
+  - ChainedDataSource: varios orígenes mostrados uno detrás de otro
+"""
+
+from collections import OrderedDict
+from tkinter import ttk
+from common.treeview_sorter import TreeViewSorter
+from utils.logger import get_logger
+
+logger = get_logger("virtual_treeview")
+
+
+class ListDataSource:
+    """Filas (clave, valores, tags) en una lista en memoria"""
+
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def get_rows(self, start, stop):
+        return self.rows[start:stop]
+
+    def index_of(self, key):
+        """Posición de la fila con esa clave, o None"""
+        for index, row in enumerate(self.rows):
+            if row[0] == key:
+                return index
+        return None
+
+    def sort(self, key, reverse=False):
+        self.rows.sort(key=key, reverse=reverse)
+
+    def patch(self, rows=(), removed_keys=()):
+        """
+        Sustituye filas por clave sin rehacer la lista
+
+        Las filas con una clave nueva se añaden al final y las de
+        removed_keys se quitan; el resto conserva su posición (y el orden
+        elegido por el usuario).
+        """
+        positions = {row[0]: index for index, row in enumerate(self.rows)}
+        for row in rows:
+            index = positions.get(row[0])
+            if index is None:
+                positions[row[0]] = len(self.rows)
+                self.rows.append(row)
+            else:
+                self.rows[index] = row
+        removed = set(removed_keys) & positions.keys()
+        if removed:
+            self.rows = [row for row in self.rows if row[0] not in removed]
+
+
+class QueryDataSource:
+    """
+    Filas de una consulta SQL leídas por páginas
+
+    El total se obtiene con un COUNT(*) y solo se consultan las páginas que
+    llegan a mostrarse; las últimas páginas leídas se guardan en caché.
+
+    Sin keyset la consulta debe tener un ORDER BY estable y cada página se lee
+    con LIMIT/OFFSET: SQLite recorre y descarta todas las filas anteriores, así
+    que llegar al final de un resultado grande cuesta O(n) por página.
+
+    Con keyset las páginas se leen por clave, como OptimizedFactura.page: la
+    página siguiente empieza después de la clave de la última fila de la
+    anterior, sin saltar filas. Solo un salto directo a una página cuya
+    anterior no se ha leído (arrastrar la barra) usa OFFSET una vez. Con un
+    orden por relevancia bm25 cada página sigue puntuando todas las
+    coincidencias (la puntuación no se puede indexar), pero ya no ordena ni
+    descarta las filas anteriores.
+    """
+
+    def __init__(self, database, query, params=(), row_factory=None, page_size=200, max_pages=8,
+                 keyset=None):
+        """
+        Args:
+            database: instancia de Database
+            query: SELECT con ORDER BY, o sin ORDER BY si se indica keyset
+            row_factory: función(fila SQL) -> (clave, valores, tags); por defecto
+                         la clave es la primera columna y los valores el resto
+            keyset: columnas ((nombre, 'ASC'|'DESC'), ...) que ordenan las filas de
+                    forma única; son las últimas columnas de la consulta, no pueden
+                    ser NULL y no se pasan a row_factory
+        """
+        self.database = database
+        self.query = query
+        self.params = tuple(params)
+        self.row_factory = row_factory or (lambda row: (row[0], tuple(row[1:]), ()))
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.keyset = tuple(keyset or ())
+        self._pages = OrderedDict()
+        self._cursors = {}  # página -> clave de su última fila (keyset)
+        self._count = None
+
+    def __len__(self):
+        if self._count is None:
+            result = self.database.execute_query(f"SELECT COUNT(*) FROM ({self.query})", self.params)
+            self._count = result[0][0] if result else 0
+        return self._count
+
+    def _page(self, number):
+        """Filas de una página (desde la caché si ya se leyó)"""
+        page = self._pages.get(number)
+        if page is not None:
+            self._pages.move_to_end(number)
+            return page
+        if self.keyset:
+            page = self._keyset_page(number)
+        else:
+            rows = self.database.execute_query(
+                f"SELECT * FROM ({self.query}) LIMIT ? OFFSET ?",
+                self.params + (self.page_size, number * self.page_size)
+            )
+            page = [self.row_factory(row) for row in rows]
+        self._pages[number] = page
+        if len(self._pages) > self.max_pages:
+            self._pages.popitem(last=False)
+        return page
+
+    def _keyset_page(self, number):
+        """Filas de una página leídas a partir de la clave de la página anterior"""
+        order = ", ".join(f"{column} {direction}" for column, direction in self.keyset)
+        cursor = self._cursors.get(number - 1)
+        if number == 0:
+            rows = self.database.execute_query(
+                f"SELECT * FROM ({self.query}) ORDER BY {order} LIMIT ?",
+                self.params + (self.page_size,)
+            )
+        elif cursor is not None:
+            where, params = self._after(cursor)
+            rows = self.database.execute_query(
+                f"SELECT * FROM ({self.query}) WHERE {where} ORDER BY {order} LIMIT ?",
+                self.params + params + (self.page_size,)
+            )
+        else:
+            rows = self.database.execute_query(
+                f"SELECT * FROM ({self.query}) ORDER BY {order} LIMIT ? OFFSET ?",
+                self.params + (self.page_size, number * self.page_size)
+            )
+        size = len(self.keyset)
+        if rows:
+            self._cursors[number] = tuple(rows[-1][-size:])
+        return [self.row_factory(row[:-size]) for row in rows]
+
+    def _after(self, cursor):
+        """Condición "fila posterior a cursor" según el orden de keyset: (where, params)"""
+        conditions, params = [], []
+        for index, (column, direction) in enumerate(self.keyset):
+            equal = [f"{previous} = ?" for previous, _ in self.keyset[:index]]
+            operator = "<" if direction.upper() == "DESC" else ">"
+            conditions.append("(" + " AND ".join(equal + [f"{column} {operator} ?"]) + ")")
+            params.extend(cursor[:index + 1])
+        return " OR ".join(conditions), tuple(params)
+
+    def get_rows(self, start, stop):
+        stop = min(stop, len(self))
+        if start >= stop:
+            return []
+        rows = []
+        for number in range(start // self.page_size, (stop - 1) // self.page_size + 1):
+            page_start = number * self.page_size
+            page = self._page(number)
+            rows.extend(page[max(start - page_start, 0):stop - page_start])
+        return rows
+
+    def invalidate(self):
+        """Descarta el total y las páginas en caché (los datos han cambiado)"""
+        self._pages.clear()
+        self._cursors.clear()
+        self._count = None
+
+
+class ChainedDataSource:
+    """
+    Varios orígenes mostrados uno detrás de otro
+
+    La clave de cada fila es (posición del origen, clave en el origen), de
+    modo que dos orígenes pueden repetir claves sin confundir la selección.
+    """
+
+    def __init__(self, sources):
+        self.sources = list(sources)
+
+    def __len__(self):
+        return sum(len(source) for source in self.sources)
+
+    def get_rows(self, start, stop):
+        rows = []
+        offset = 0
+        for position, source in enumerate(self.sources):
+            if offset >= stop:
+                break
+            size = len(source)
+            if start < offset + size:
+                rows.extend(((position, key), values, tags) for key, values, tags
+                            in source.get_rows(max(start - offset, 0), stop - offset))
+            offset += size
+        return rows
+
+    def invalidate(self):
+        """Descarta lo leído de cada origen paginado"""
+        for source in self.sources:
+            if hasattr(source, 'invalidate'):
+                source.invalidate()
+
+
+class VirtualTableModel:
+    """Estado de la vista virtual sin Tk: posición, huecos visibles y selección por clave"""
+
+    def __init__(self, source=None, visible_rows=20):
+        self.source = source if source is not None else ListDataSource()
+        self.visible_rows = max(1, int(visible_rows))
+        self.offset = 0
+        self.slots = []
+        self.selected_keys = set()
+
+    def __len__(self):
+        return len(self.source)
+
+    def set_source(self, source):
+        """Cambia los datos conservando la posición (ajustada al nuevo tamaño) y la selección"""
+        self.source = source
+        self.scroll_to(self.offset)
+
+    def set_visible_rows(self, visible_rows):
+        self.visible_rows = max(1, int(visible_rows))
+        self.scroll_to(self.offset)
+
+    def max_offset(self):
+        return max(0, len(self.source) - self.visible_rows)
+
+    def scroll_to(self, offset):
+        self.offset = min(max(0, int(offset)), self.max_offset())
+        return self.offset
+
+    def scroll_by(self, rows):
+        return self.scroll_to(self.offset + rows)
+
+    def moveto(self, fraction):
+        return self.scroll_to(round(float(fraction) * len(self.source)))
+
+    def fractions(self):
+        """Parte visible para la barra de desplazamiento: (inicio, fin) entre 0 y 1"""
+        total = len(self.source)
+        if not total:
+            return 0.0, 1.0
+        return self.offset / total, min(1.0, (self.offset + self.visible_rows) / total)
+
+    def see(self, index):
+        """Desplaza lo mínimo para que la fila index quede visible"""
+        if index < self.offset:
+            self.scroll_to(index)
+        elif index >= self.offset + self.visible_rows:
+            self.scroll_to(index - self.visible_rows + 1)
+
+    def render(self):
+        """
+        Actualiza los huecos con las filas visibles
+
+        Returns:
+            lista de cambios mínimos: ('update', hueco, fila), ('insert', hueco, fila)
+            o ('delete', hueco, None); las eliminaciones van de la última a la primera
+        """
+        rows = self.source.get_rows(self.offset, self.offset + self.visible_rows)
+        changes = []
+        for slot, row in enumerate(rows):
+            if slot >= len(self.slots):
+                changes.append(('insert', slot, row))
+            elif self.slots[slot] != row:
+                changes.append(('update', slot, row))
+        for slot in range(len(self.slots) - 1, len(rows) - 1, -1):
+            changes.append(('delete', slot, None))
+        self.slots = list(rows)
+        return changes
+
+    def visible_keys(self):
+        return [row[0] for row in self.slots]
+
+    def update_selection(self, visible_selected_keys):
+        """
+        Registra la selección de los huecos visibles
+
+        Una selección visible sustituye a la anterior; si no hay ninguna se
+        conservan las filas seleccionadas que están fuera de la vista.
+
+        Returns:
+            True si el conjunto de claves seleccionadas ha cambiado
+        """
+        visible_selected = set(visible_selected_keys)
+        if visible_selected:
+            selected = visible_selected
+        else:
+            selected = self.selected_keys - set(self.visible_keys())
+        changed = selected != self.selected_keys
+        self.selected_keys = selected
+        return changed
+
+
+class VirtualTreeview:
+    """Convierte un ttk.Treeview en una vista virtual sobre un origen de datos"""
+
+    WHEEL_ROWS = 3
+    DEFAULT_ROW_HEIGHT = 20
+
+    def __init__(self, treeview, scrollbar=None, source=None):
+        """
+        Args:
+            treeview: ttk.Treeview ya creado (con sus columnas)
+            scrollbar: ttk.Scrollbar vertical opcional; pasa a controlar la vista virtual
+        """
+        self.tree = treeview
+        self.scrollbar = scrollbar
+        self.model = VirtualTableModel(source, visible_rows=int(treeview.cget('height') or 10))
+        self._iids = []
+        self._select_callbacks = []
+        self._header_height = None
+
+        if scrollbar is not None:
+            scrollbar.configure(command=self.yview)
+
+        treeview.bind("<<TreeviewSelect>>", self._on_select, add="+")
+        treeview.bind("<Configure>", self._on_configure, add="+")
+        treeview.bind("<MouseWheel>", self._on_mousewheel, add="+")
+        treeview.bind("<Button-4>", lambda e: self._scroll(-self.WHEEL_ROWS), add="+")
+        treeview.bind("<Button-5>", lambda e: self._scroll(self.WHEEL_ROWS), add="+")
+        for key, step in (("<Up>", -1), ("<Down>", 1)):
+            treeview.bind(key, lambda e, step=step: self._on_arrow(step), add="+")
+        for key, pages in (("<Prior>", -1), ("<Next>", 1)):
+            treeview.bind(key, lambda e, pages=pages: self._scroll(pages * self.model.visible_rows), add="+")
+
+    # --- Datos ---
+
+    def set_rows(self, rows):
+        """Muestra una lista de filas (clave, valores, tags)"""
+        self.set_source(ListDataSource(rows))
+
+    def set_source(self, source):
+        """Cambia el origen de datos y actualiza solo los huecos que cambian"""
+        self.model.set_source(source)
+        self.refresh()
+
+    def patch_rows(self, rows=(), removed_keys=()):
+        """Sustituye, añade o quita filas por clave; solo cambian los huecos afectados"""
+        self.source.patch(rows, removed_keys)
+        self.model.scroll_to(self.model.offset)
+        self.refresh()
+
+    @property
+    def source(self):
+        return self.model.source
+
+    def __len__(self):
+        return len(self.model)
+
+    def refresh(self):
+        """Aplica al TreeView los cambios de los huecos visibles"""
+        for action, slot, row in self.model.render():
+            if action == 'insert':
+                _, values, tags = row
+                self._iids.append(self.tree.insert('', 'end', values=values, tags=tags))
+            elif action == 'update':
+                _, values, tags = row
+                self.tree.item(self._iids[slot], values=values, tags=tags)
+            else:
+                self.tree.delete(self._iids.pop(slot))
+        self._sync_selection()
+        if self.scrollbar is not None:
+            self.scrollbar.set(*self.model.fractions())
+
+    # --- Selección ---
+
+    def on_select(self, callback):
+        """Registra callback(event) para cuando el usuario cambia la selección"""
+        self._select_callbacks.append(callback)
+
+    def selected_keys(self):
+        return set(self.model.selected_keys)
+
+    def select_key(self, key):
+        """Selecciona una fila por clave y la hace visible"""
+        index = self.source.index_of(key) if hasattr(self.source, 'index_of') else None
+        self.model.selected_keys = {key}
+        if index is not None:
+            self.model.see(index)
+        self.refresh()
+
+    def _sync_selection(self):
+        """Marca en el TreeView los huecos cuyas filas están seleccionadas"""
+        wanted = [iid for iid, row in zip(self._iids, self.model.slots)
+                  if row[0] in self.model.selected_keys]
+        if set(wanted) != set(self.tree.selection()):
+            self.tree.selection_set(wanted)
+
+    def _on_select(self, event):
+        keys_by_iid = dict(zip(self._iids, self.model.visible_keys()))
+        visible_selected = [keys_by_iid[iid] for iid in self.tree.selection() if iid in keys_by_iid]
+        # Solo se avisa de los cambios reales (no de la re-selección al desplazarse)
+        if self.model.update_selection(visible_selected):
+            for callback in self._select_callbacks:
+                callback(event)
+
+    # --- Desplazamiento ---
+
+    def yview(self, *args):
+        """Comando de la barra de desplazamiento: 'moveto f' o 'scroll n units|pages'"""
+        if not args:
+            return self.model.fractions()
+        if args[0] == 'moveto':
+            self.model.moveto(args[1])
+        elif args[0] == 'scroll':
+            amount = int(args[1])
+            if len(args) > 2 and args[2] == 'pages':
+                amount *= self.model.visible_rows
+            self.model.scroll_by(amount)
+        self.refresh()
+
+    def _scroll(self, rows):
+        self.model.scroll_by(rows)
+        self.refresh()
+        return "break"
+
+    def _on_mousewheel(self, event):
+        # Windows: múltiplos de 120; macOS: valores pequeños
+        notches = event.delta // 120 if abs(event.delta) >= 120 else (1 if event.delta > 0 else -1)
+        return self._scroll(-notches * self.WHEEL_ROWS)
+
+    def _on_arrow(self, step):
+        """Flechas en el borde de la vista: desplaza una fila y mueve la selección"""
+        focus = self.tree.focus()
+        if not self._iids or focus not in self._iids:
+            return None
+        slot = self._iids.index(focus)
+        at_edge = (step < 0 and slot == 0) or (step > 0 and slot == len(self._iids) - 1)
+        previous = self.model.offset
+        if not at_edge or self.model.scroll_by(step) == previous:
+            # Dentro de la vista, o al principio/final de los datos: comportamiento normal
+            return None
+        self.refresh()
+        self.tree.focus(self._iids[slot])
+        self.tree.selection_set([self._iids[slot]])
+        return "break"
+
+    def _on_configure(self, event):
+        """Ajusta el número de huecos a la altura disponible"""
+        row_height = self._row_height()
+        if self._header_height is None and self._iids:
+            bbox = self.tree.bbox(self._iids[0])
+            if bbox:
+                self._header_height = bbox[1]
+        header = self._header_height if self._header_height is not None else row_height + 5
+        visible = max(1, (event.height - header) // row_height)
+        if visible != self.model.visible_rows:
+            self.model.set_visible_rows(visible)
+            self.refresh()
+
+    def _row_height(self):
+        try:
+            height = ttk.Style().lookup(self.tree.cget('style') or 'Treeview', 'rowheight')
+            return int(height) if height else self.DEFAULT_ROW_HEIGHT
+        except (ValueError, TypeError):
+            return self.DEFAULT_ROW_HEIGHT
+
+    def enable_sorting(self):
+        """Ordenación al pulsar en los encabezados, sobre todos los datos y no solo los visibles"""
+        return VirtualTreeViewSorter(self)
+
+
+class VirtualTreeViewSorter(TreeViewSorter):
+    """TreeViewSorter que ordena el origen de datos de una vista virtual"""
+
+    def __init__(self, virtual_treeview):
+        self.virtual = virtual_treeview
+        super().__init__(virtual_treeview.tree)
+
+    def sort_by_column(self, col):
+        """Ordena todas las filas (no solo las visibles) por la columna especificada"""
+        try:
+            source = self.virtual.source
+            if not hasattr(source, 'sort'):
+                logger.debug("El origen de datos no admite ordenación")
+                return
+
+            index = list(self.treeview['columns']).index(col)
+            items = [(row[1][index], row) for row in source.get_rows(0, len(source))]
+            data_type = self.detect_data_type(items, col)
+            self.sort_columns[col]['type'] = data_type
+
+            parsers = {
+                'numeric': self.parse_numeric,
+                'date': self.parse_date,
+                'currency': self.parse_currency,
+            }
+            parse = parsers.get(data_type, lambda value: str(value).lower())
+            source.sort(key=lambda row: parse(row[1][index]), reverse=self.sort_columns[col]['reverse'])
+            self.virtual.refresh()
+
+            self.update_column_indicators(col)
+            self.sort_columns[col]['reverse'] = not self.sort_columns[col]['reverse']
+
+        except Exception as e:
+            logger.error(f"Error ordenando por columna {col}: {e}")
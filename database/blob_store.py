@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+Almacén de imágenes direccionado por contenido con contador de referencias
+
+Las imágenes de producto y los logos se guardan con un nombre derivado del
+hash de su contenido, de modo que la misma imagen ocupa un único fichero
+aunque se use varias veces. Cada fichero registrado tiene una fila en la
+tabla blobs cuyo refcount mantienen los disparadores de productos.imagen_path
+y organizacion.logo_path (migración 10).
+
+El recolector solo consulta las filas con refcount 0 cuyo "liberado" supera
+un margen de gracia (el fichero recién importado que aún no se ha guardado
+en ningún producto también está a cero) y borra un número limitado de
+ficheros en cada pasada: nunca recorre el directorio de imágenes.
+"""
+
+import os
+from . import models
+from .migrations import REFERENCIAS_BLOBS
+from utils.file_manager import FileManager
+from utils.logger import get_logger
+
+logger = get_logger("blob_store")
+
+# Tiempo que un fichero sin referencias se conserva antes de borrarlo
+GRACIA_SEGUNDOS = 24 * 3600
+
+# Ficheros borrados como máximo en cada pasada del recolector
+LIMITE_RECOLECCION = 50
+
+
+class BlobStore:
+    """Registro de los ficheros de imagen y recolección de los que no se usan"""
+
+    @property
+    def db(self):
+        """Base de datos activa (la misma instancia que usan los modelos)"""
+        return models.db
+
+    def register(self, path, digest=None):
+        """
+        Registrar un fichero del almacén (o refrescar su registro)
+
+        El contador inicial se calcula a partir de las filas que ya apuntan
+        a la ruta. Un fichero sin referencias queda liberado desde ahora, lo
+        que da al usuario el margen de gracia para guardar el producto.
+
+        Args:
+            path (str): Ruta del fichero guardado
+            digest (str): SHA-256 del contenido, si ya se conoce
+
+        Returns:
+            int: Número de referencias actuales
+        """
+        digest = digest or FileManager.content_hash(path)
+        tamano = os.path.getsize(path)
+        referencias = " + ".join(
+            f"(SELECT COUNT(*) FROM {tabla} WHERE {columna} = :path)"
+            for tabla, columna in REFERENCIAS_BLOBS
+        )
+        with self.db.transaction() as conn:
+            conn.execute(f'''
+                INSERT INTO blobs (path, hash, bytes, refcount, liberado)
+                SELECT :path, :hash, :bytes, n, CASE WHEN n = 0 THEN CURRENT_TIMESTAMP END
+                FROM (SELECT {referencias} AS n)
+                -- "WHERE true" evita que SQLite lea ON CONFLICT como parte de un JOIN (ambigüedad del UPSERT)
+                WHERE true
+                ON CONFLICT(path) DO UPDATE SET
+                    hash = excluded.hash,
+                    bytes = excluded.bytes,
+                    liberado = CASE WHEN blobs.refcount = 0 THEN CURRENT_TIMESTAMP END
+            ''', {'path': path, 'hash': digest, 'bytes': tamano})
+            refcount = conn.execute("SELECT refcount FROM blobs WHERE path = ?", (path,)).fetchone()[0]
+        logger.debug(f"Blob registrado: {os.path.basename(path)} ({tamano} bytes, {refcount} referencias)")
+        return refcount
+
+    def refcount(self, path):
+        """Referencias de un fichero registrado, o None si no está registrado"""
+        results = self.db.execute_query("SELECT refcount FROM blobs WHERE path = ?", (path,))
+        return results[0][0] if results else None
+
+    def discard(self, path):
+        """
+        Borrar ya un fichero si nada lo referencia
+
+        Un fichero con referencias, o que no está registrado (podría ser
+        compartido), se conserva: el recolector lo reclamará cuando su
+        contador llegue a cero.
+
+        Args:
+            path (str): Ruta del fichero guardado
+
+        Returns:
+            bool: True si el fichero se ha borrado
+        """
+        with self.db.transaction() as conn:
+            borrado = conn.execute("DELETE FROM blobs WHERE path = ? AND refcount = 0", (path,)).rowcount
+        if not borrado:
+            return False
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        logger.debug(f"Blob sin referencias borrado: {os.path.basename(path)}")
+        return True
+
+    def collect_garbage(self, limite=LIMITE_RECOLECCION, gracia=GRACIA_SEGUNDOS, directorio=None):
+        """
+        Borrar ficheros sin referencias liberados hace más de "gracia" segundos
+
+        Args:
+            limite (int): Número máximo de ficheros a borrar en esta pasada
+            gracia (int): Segundos que se conserva un fichero ya liberado
+            directorio (str): Limitar la pasada a los ficheros de este directorio
+
+        Returns:
+            list: Rutas borradas, de la liberada hace más tiempo a la más reciente
+        """
+        filtro, params = "", [f"-{int(gracia)} seconds"]
+        if directorio:
+            filtro = "AND path LIKE ? ESCAPE '\\'"
+            params.append(self._prefijo_like(directorio))
+        params.append(limite)
+
+        with self.db.transaction() as conn:
+            rutas = [fila[0] for fila in conn.execute(f'''
+                SELECT path FROM blobs
+                WHERE refcount = 0 AND liberado <= datetime('now', ?) {filtro}
+                ORDER BY liberado
+                LIMIT ?
+            ''', params)]
+            conn.executemany("DELETE FROM blobs WHERE path = ? AND refcount = 0", [(p,) for p in rutas])
+
+        # Las filas ya no existen: un fallo al borrar solo deja un fichero suelto
+        for path in rutas:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"No se pudo borrar {path}: {e}")
+        if rutas:
+            logger.info(f"Recolección: {len(rutas)} ficheros sin referencias borrados")
+        return rutas
+
+    def get_stats(self):
+        """
+        Estado del almacén
+
+        Returns:
+            dict: {'blobs', 'bytes', 'referencias', 'sin_referencias', 'bytes_sin_referencias'}
+        """
+        blobs, total, referencias, libres, bytes_libres = self.db.execute_query('''
+            SELECT COUNT(*), COALESCE(SUM(bytes), 0), COALESCE(SUM(refcount), 0),
+                   COUNT(*) FILTER (WHERE refcount = 0),
+                   COALESCE(SUM(bytes) FILTER (WHERE refcount = 0), 0)
+            FROM blobs
+        ''')[0]
+        return {
+            'blobs': blobs,
+            'bytes': total,
+            'referencias': referencias,
+            'sin_referencias': libres,
+            'bytes_sin_referencias': bytes_libres,
+        }
+
+    @staticmethod
+    def _prefijo_like(directorio):
+        """Patrón LIKE para las rutas de un directorio"""
+        prefijo = os.path.join(directorio, '')
+        for caracter in ('\\', '%', '_'):
+            prefijo = prefijo.replace(caracter, '\\' + caracter)
+        return prefijo + '%'
+
+
+# Instancia global del servicio
+blob_store = BlobStore()
@@ -1,192 +1,203 @@
 import sqlite3
 import os
-from datetime import datetime
+import threading
+from contextlib import contextmanager
 from utils.logger import get_logger, log_database_operation, log_exception
+from database.migrations import run_migrations, get_schema_version, LATEST_VERSION
 
 class Database:
-    def __init__(self, db_path="facturacion.db"):
+    # Número de sentencias preparadas que sqlite3 conserva por conexión
+    STATEMENT_CACHE_SIZE = 256
+
+    JOURNAL_MODE = "WAL"
+
+    # Perfil de PRAGMAs aplicado a cada conexión nueva
+    CONNECTION_PRAGMAS = {
+        "synchronous": "NORMAL",     # seguro con WAL, un fsync por checkpoint en vez de por commit
+        "cache_size": -20000,        # ~20 MB de caché de páginas
+        "mmap_size": 268435456,      # 256 MB de lectura mapeada en memoria
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    }
+
+    def __init__(self, db_path="facturacion.db", pooled=True, lazy=False):
         self.db_path = db_path
+        # pooled=True: una conexión persistente por hilo (reutiliza sentencias preparadas)
+        # pooled=False: abre y cierra una conexión por consulta (comportamiento histórico)
+        self.pooled = pooled
         self.logger = get_logger("database")
-        self.init_database()
-    
+        self._local = threading.local()
+        # lazy=True: las migraciones se aplican al abrir la primera conexión
+        # (o antes, si alguien llama a ensure_initialized desde otro hilo)
+        self._initialized = False
+        self._init_lock = threading.Lock()
+        if not lazy:
+            self.init_database()
+
+    def ensure_initialized(self):
+        """Aplica las migraciones pendientes una sola vez; los demás hilos esperan a que terminen"""
+        if self._initialized:
+            return
+        with self._init_lock:
+            if not self._initialized:
+                self.init_database()
+
     def get_connection(self):
-        """Obtiene una conexión a la base de datos"""
-        return sqlite3.connect(self.db_path)
-    
-    def init_database(self):
-        """Inicializa la base de datos con las tablas necesarias"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # Tabla productos
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS productos (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                nombre TEXT NOT NULL,
-                referencia TEXT UNIQUE NOT NULL,
-                precio REAL NOT NULL,
-                categoria TEXT,
-                descripcion TEXT,
-                imagen_path TEXT,
-                iva_recomendado REAL DEFAULT 21.0,
-                fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Tabla organización
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS organizacion (
-                id INTEGER PRIMARY KEY,
-                nombre TEXT NOT NULL,
-                direccion TEXT,
-                telefono TEXT,
-                email TEXT,
-                cif TEXT,
-                logo_path TEXT,
-                directorio_imagenes_defecto TEXT,
-                numero_factura_inicial INTEGER DEFAULT 1,
-                fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-
-        # Agregar columnas nuevas si no existen (para compatibilidad con bases de datos existentes)
+        """Obtiene una conexión nueva a la base de datos (el llamante debe cerrarla)"""
+        self.ensure_initialized()
+        conn = sqlite3.connect(self.db_path, cached_statements=self.STATEMENT_CACHE_SIZE)
+        self._apply_pragmas(conn)
+        return conn
+
+    def _connect(self):
+        """Abre una conexión en modo autocommit; las transacciones se gestionan en transaction()"""
+        conn = sqlite3.connect(self.db_path, isolation_level=None,
+                               cached_statements=self.STATEMENT_CACHE_SIZE)
+        self._apply_pragmas(conn)
+        return conn
+
+    def _apply_pragmas(self, conn):
+        """Aplica el perfil de PRAGMAs de producción a una conexión"""
+        for pragma, value in self.CONNECTION_PRAGMAS.items():
+            conn.execute(f"PRAGMA {pragma}={value}")
+
+    def _thread_connection(self):
+        """Obtiene (o crea) la conexión asociada al hilo actual"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            self.ensure_initialized()
+            conn = self._connect()
+            self._local.conn = conn
+        return conn
+
+    @property
+    def connection(self):
+        """Conexión persistente del hilo actual"""
+        return self._thread_connection()
+
+    @contextmanager
+    def _cursor(self):
+        """Cursor sobre la conexión del hilo, o sobre una conexión efímera si no hay pool"""
+        if self.pooled or getattr(self._local, 'depth', 0):
+            yield self._thread_connection().cursor()
+            return
+
+        self.ensure_initialized()
+        conn = self._connect()
         try:
-            cursor.execute('ALTER TABLE organizacion ADD COLUMN directorio_imagenes_defecto TEXT')
-        except sqlite3.OperationalError:
-            pass  # La columna ya existe
+            yield conn.cursor()
+        finally:
+            conn.close()
+
+    @contextmanager
+    def transaction(self):
+        """Agrupa varias sentencias en una única transacción.
+
+        Las llamadas anidadas se convierten en SAVEPOINTs, de modo que un modelo
+        puede abrir su propia transacción dentro de la de otro. Si se produce una
+        excepción se deshace todo lo hecho dentro del bloque.
+        """
+        depth = getattr(self._local, 'depth', 0)
+        conn = self._thread_connection()
+
+        if depth == 0:
+            conn.execute("BEGIN IMMEDIATE")
+        else:
+            conn.execute(f"SAVEPOINT sp_{depth}")
+        self._local.depth = depth + 1
 
         try:
-            cursor.execute('ALTER TABLE organizacion ADD COLUMN numero_factura_inicial INTEGER DEFAULT 1')
-        except sqlite3.OperationalError:
-            pass  # La columna ya existe
+            yield conn
+        except BaseException:
+            if depth == 0:
+                conn.execute("ROLLBACK")
+            else:
+                conn.execute(f"ROLLBACK TO sp_{depth}")
+                conn.execute(f"RELEASE sp_{depth}")
+            # Los avisos registrados dentro del bloque deshecho ya no proceden
+            pendientes = getattr(self._local, 'on_commit', [])
+            self._local.on_commit = [(nivel, cb) for nivel, cb in pendientes if nivel <= depth]
+            raise
+        else:
+            if depth == 0:
+                conn.execute("COMMIT")
+            else:
+                conn.execute(f"RELEASE sp_{depth}")
+        finally:
+            self._local.depth = depth
+            if depth == 0 and not self.pooled:
+                self._local.conn = None
+                conn.close()
+
+        if depth == 0:
+            self._run_on_commit()
+
+    def on_commit(self, callback):
+        """Ejecuta callback cuando se confirme la transacción en curso
+
+        Fuera de una transacción se ejecuta inmediatamente; si la transacción
+        (o el SAVEPOINT donde se registró) se deshace, se descarta.
+        """
+        depth = getattr(self._local, 'depth', 0)
+        if depth == 0:
+            self._call_on_commit(callback)
+            return
+        if not hasattr(self._local, 'on_commit'):
+            self._local.on_commit = []
+        self._local.on_commit.append((depth, callback))
+
+    def _run_on_commit(self):
+        """Ejecuta los avisos pendientes tras el COMMIT de la transacción externa"""
+        pendientes = getattr(self._local, 'on_commit', [])
+        self._local.on_commit = []
+        for _, callback in pendientes:
+            self._call_on_commit(callback)
 
+    def _call_on_commit(self, callback):
+        """Un aviso que falla no debe afectar a unos datos ya confirmados"""
         try:
-            cursor.execute('ALTER TABLE organizacion ADD COLUMN directorio_descargas_pdf TEXT')
-        except sqlite3.OperationalError:
-            pass  # La columna ya existe
+            callback()
+        except Exception as e:
+            log_exception(e, "Database.on_commit")
 
+    def close(self):
+        """Cierra la conexión persistente del hilo actual"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            self._local.conn = None
+            conn.close()
+    
+    def init_database(self):
+        """Inicializa la base de datos aplicando las migraciones pendientes"""
+        conn = self._connect()
         try:
-            cursor.execute('ALTER TABLE organizacion ADD COLUMN visor_pdf_personalizado TEXT')
-        except sqlite3.OperationalError:
-            pass  # La columna ya existe
-        
-        # Tabla stock
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS stock (
-                producto_id INTEGER PRIMARY KEY,
-                cantidad_disponible INTEGER DEFAULT 0,
-                fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (producto_id) REFERENCES productos (id)
-            )
-        ''')
-
-        # Tabla movimientos de stock
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS stock_movements (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                producto_id INTEGER NOT NULL,
-                cantidad INTEGER NOT NULL,
-                tipo TEXT NOT NULL,
-                descripcion TEXT,
-                fecha_movimiento TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (producto_id) REFERENCES productos (id)
-            )
-        ''')
-        
-        # Tabla facturas
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS facturas (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                numero_factura TEXT UNIQUE NOT NULL,
-                fecha_factura DATE NOT NULL,
-                nombre_cliente TEXT NOT NULL,
-                dni_nie_cliente TEXT,
-                direccion_cliente TEXT,
-                email_cliente TEXT,
-                telefono_cliente TEXT,
-                subtotal REAL NOT NULL,
-                total_iva REAL NOT NULL,
-                total_factura REAL NOT NULL,
-                modo_pago TEXT,
-                fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-
-        # Tabla items de factura
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS factura_items (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                factura_id INTEGER NOT NULL,
-                producto_id INTEGER NOT NULL,
-                cantidad INTEGER NOT NULL,
-                precio_unitario REAL NOT NULL,
-                iva_aplicado REAL NOT NULL,
-                descuento REAL DEFAULT 0,
-                subtotal REAL NOT NULL,
-                descuento_amount REAL DEFAULT 0,
-                iva_amount REAL NOT NULL,
-                total REAL NOT NULL,
-                FOREIGN KEY (factura_id) REFERENCES facturas (id),
-                FOREIGN KEY (producto_id) REFERENCES productos (id)
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
+            # WAL es persistente en el fichero: los lectores ya no esperan a los escritores
+            conn.execute(f"PRAGMA journal_mode={self.JOURNAL_MODE}")
+            if get_schema_version(conn) < LATEST_VERSION:
+                run_migrations(conn)
+            self._initialized = True
+        finally:
+            conn.close()
     
     def execute_query(self, query, params=None):
         """Ejecuta una consulta y devuelve los resultados"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        if params:
-            cursor.execute(query, params)
-        else:
-            cursor.execute(query)
-        
-        if query.strip().upper().startswith(('SELECT', 'PRAGMA')):
-            results = cursor.fetchall()
-            conn.close()
-            return results
-        else:
-            conn.commit()
-            lastrowid = cursor.lastrowid
-            conn.close()
-            return lastrowid
+        with self._cursor() as cursor:
+            if params:
+                cursor.execute(query, params)
+            else:
+                cursor.execute(query)
+
+            if query.strip().upper().startswith(('SELECT', 'PRAGMA', 'WITH')):
+                return cursor.fetchall()
+            return cursor.lastrowid
     
-    def get_next_factura_number(self):
-        """Genera el siguiente número de factura con año al final"""
-        year = datetime.now().year
-
-        # Obtener el último número de factura del año actual
-        query = """
-        SELECT numero_factura FROM facturas
-        WHERE numero_factura LIKE ?
-        ORDER BY id DESC LIMIT 1
-        """
-        result = self.execute_query(query, (f"%-{year}",))
-
-        if result:
-            # Extraer el número secuencial del último número
-            ultimo_numero = result[0][0]
-            try:
-                # Buscar el patrón número-año al final
-                if f"-{year}" in ultimo_numero:
-                    parte_antes_año = ultimo_numero.replace(f"-{year}", "")
-                    # Extraer el último número de la parte antes del año
-                    import re
-                    numeros = re.findall(r'\d+', parte_antes_año)
-                    if numeros:
-                        ultimo_seq = int(numeros[-1])
-                        siguiente_seq = ultimo_seq + 1
-                        # Mantener el mismo formato pero incrementar el número
-                        nuevo_numero = re.sub(r'\d+(?!.*\d)', str(siguiente_seq), parte_antes_año)
-                        return f"{nuevo_numero}-{year}"
-            except:
-                pass
-
-        # Si no hay facturas previas o hay error, empezar con 1
-        return f"1-{year}"
-
-# Instancia global de la base de datos
-db = Database()
+    def execute_many(self, query, params_list):
+        """Ejecuta la misma sentencia para cada juego de parámetros y devuelve las filas afectadas"""
+        with self._cursor() as cursor:
+            cursor.executemany(query, params_list)
+            return cursor.rowcount
+
+
+# Instancia global de la base de datos: importar el módulo no toca el fichero,
+# las migraciones se aplican en el primer uso (main.py lo adelanta en segundo plano)
+db = Database(lazy=True)
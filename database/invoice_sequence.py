@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Secuencias de numeración de facturas
+
+La tabla secuencias guarda, por serie (prefijo) y año, el último número
+usado. Un trigger sobre facturas la mantiene al día con cualquier número
+guardado, de modo que consultar o reservar el siguiente número es una sola
+lectura o escritura, sin recorrer el historial de facturas.
+
+Reservar dentro de la transacción que guarda la factura garantiza que dos
+ventanas no obtienen el mismo número y que, si el guardado falla, el
+número vuelve a quedar libre (sin huecos).
+"""
+
+from datetime import datetime
+from . import models
+from utils.logger import get_logger
+
+logger = get_logger("invoice_sequence")
+
+
+class InvoiceSequence:
+    """Consulta y reserva de números de factura por serie y año"""
+
+    def __init__(self, database=None):
+        """
+        Args:
+            database: base de datos a usar (por defecto la de los modelos)
+        """
+        self._database = database
+
+    @property
+    def db(self):
+        """Base de datos activa (la misma instancia que usan los modelos)"""
+        return self._database or models.db
+
+    @staticmethod
+    def current_year():
+        """Año de numeración por defecto"""
+        return datetime.now().year
+
+    @staticmethod
+    def format(serie, numero, anio, ancho=3):
+        """Compone el número de factura "[serie-]N-AAAA" con N relleno a `ancho` cifras"""
+        numero_str = str(numero).zfill(ancho)
+        if serie:
+            return f"{serie}-{numero_str}-{anio}"
+        return f"{numero_str}-{anio}"
+
+    def last(self, serie, anio):
+        """Último número usado en la serie y año, o None si aún no hay ninguno"""
+        results = self.db.execute_query(
+            "SELECT ultimo FROM secuencias WHERE serie = ? AND anio = ?", (serie or "", anio)
+        )
+        return results[0][0] if results else None
+
+    def peek(self, serie, anio, inicial=1):
+        """Siguiente número de la serie sin reservarlo (para proponerlo en el formulario)"""
+        ultimo = self.last(serie, anio)
+        if ultimo is None:
+            return inicial
+        return max(ultimo + 1, inicial)
+
+    def reserve(self, serie, anio, inicial=1):
+        """
+        Reserva el siguiente número de la serie
+
+        Debe llamarse dentro de la transacción que guarda la factura: si esta
+        se deshace, la reserva también.
+        """
+        with self.db.transaction() as conn:
+            numero = conn.execute(
+                """INSERT INTO secuencias (serie, anio, ultimo) VALUES (?, ?, ?)
+                   ON CONFLICT(serie, anio) DO UPDATE SET ultimo = MAX(ultimo + 1, excluded.ultimo)
+                   RETURNING ultimo""",
+                (serie or "", anio, inicial)
+            ).fetchone()[0]
+        logger.debug(f"Número reservado: serie '{serie}', año {anio}, número {numero}")
+        return numero
+
+    def advance_to(self, serie, anio, numero):
+        """Hace que el siguiente número de la serie sea al menos numero + 1"""
+        with self.db.transaction() as conn:
+            conn.execute(
+                """INSERT INTO secuencias (serie, anio, ultimo) VALUES (?, ?, ?)
+                   ON CONFLICT(serie, anio) DO UPDATE SET ultimo = MAX(ultimo, excluded.ultimo)""",
+                (serie or "", anio, numero)
+            )
+
+
+# Instancia global del servicio
+invoice_sequence = InvoiceSequence()
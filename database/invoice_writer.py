@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Servicio de guardado atómico de facturas
+
+Escribe la cabecera, los items, el descuento de stock y los movimientos de stock
+de una factura dentro de una única transacción: o se aplica todo o no se aplica nada.
+"""
+
+from . import models
+from utils.logger import get_logger
+
+logger = get_logger("invoice_writer")
+
+
+class InvoiceWriter:
+    """Guarda facturas y actualiza el stock asociado en una sola transacción"""
+
+    @property
+    def db(self):
+        """Base de datos activa (la misma instancia que usan los modelos)"""
+        return models.db
+
+    def save(self, factura, reservar_numero=None):
+        """
+        Guarda la factura con sus items y descuenta el stock vendido
+
+        Para una factura ya existente solo se aplica la diferencia entre lo que
+        sus movimientos de stock descontaron y las cantidades nuevas, de modo
+        que editar una factura no vuelve a descontar lo ya vendido ni devuelve
+        más de lo que salió (una venta sin stock suficiente descuenta menos
+        que la cantidad de la línea).
+
+        Args:
+            factura: factura a guardar
+            reservar_numero: función sin argumentos que reserva y devuelve el número
+                             de factura; se llama dentro de la transacción, así que
+                             el número solo se consume si el guardado termina bien
+
+        Returns:
+            dict: {'factura_id': int, 'stock_deltas': [dict, ...]} donde cada delta
+            contiene producto_id, cantidad (negativa = salida), stock_antes y stock_despues
+        """
+        original_id, original_cliente_id = factura.id, factura.cliente_id
+        original_numero = factura.numero_factura
+        try:
+            with self.db.transaction():
+                if reservar_numero is not None:
+                    factura.numero_factura = reservar_numero()
+                cantidades_previas = self._get_cantidades_descontadas(factura.id)
+                factura._save()
+                # Sin items, Factura._save conserva los ya guardados: el stock no cambia
+                if factura.items:
+                    cambios = self._calcular_cambios(cantidades_previas, factura.items)
+                else:
+                    cambios = {}
+                stock_deltas = self._aplicar_stock(cambios, factura)
+        except Exception:
+            # La transacción se ha deshecho: la factura no llegó a crearse
+            factura.id, factura.cliente_id = original_id, original_cliente_id
+            factura.numero_factura = original_numero
+            raise
+
+        logger.info(f"Factura {factura.numero_factura} guardada (ID {factura.id}) "
+                    f"con {len(factura.items)} items y {len(stock_deltas)} cambios de stock")
+        return {'factura_id': factura.id, 'stock_deltas': stock_deltas}
+
+    def _get_cantidades_descontadas(self, factura_id):
+        """
+        Unidades por producto que la factura tiene descontadas del stock (vacío si es nueva)
+
+        Salen de los movimientos de stock de la factura, no de sus items. Las
+        facturas sin movimientos enlazados (anteriores al libro de stock) usan
+        las cantidades de sus items.
+        """
+        if not factura_id:
+            return {}
+        results = self.db.execute_query(
+            """SELECT producto_id, -SUM(cantidad) FROM stock_movements
+               WHERE factura_id=? GROUP BY producto_id""",
+            (factura_id,)
+        )
+        if not results:
+            results = self.db.execute_query(
+                """SELECT producto_id, SUM(cantidad) FROM factura_items
+                   WHERE factura_id=? GROUP BY producto_id""",
+                (factura_id,)
+            )
+        return {row[0]: row[1] for row in results}
+
+    @staticmethod
+    def _calcular_cambios(cantidades_previas, items):
+        """Variación de stock por producto (negativa = salida) manteniendo el orden de los items"""
+        cambios = dict(cantidades_previas)
+        nuevas = {}
+        for item in items:
+            nuevas[item.producto_id] = nuevas.get(item.producto_id, 0) + item.cantidad
+
+        deltas = {}
+        for producto_id, cantidad in nuevas.items():
+            deltas[producto_id] = cambios.pop(producto_id, 0) - cantidad
+        # Productos eliminados de la factura al editarla: se devuelven al stock
+        for producto_id, cantidad in cambios.items():
+            deltas[producto_id] = cantidad
+
+        return {producto_id: delta for producto_id, delta in deltas.items() if delta}
+
+    def _aplicar_stock(self, cambios, factura):
+        """Aplica los cambios de stock y registra los movimientos de la factura en bloque"""
+        if not cambios:
+            return []
+
+        numero_factura = factura.numero_factura
+        lote = []
+        for producto_id, delta in cambios.items():
+            if delta < 0:
+                tipo, descripcion = "VENTA", f"Venta de {-delta} unidades (Factura {numero_factura})"
+            else:
+                tipo, descripcion = "AJUSTE", f"Devolución de {delta} unidades (Factura {numero_factura})"
+            lote.append({'producto_id': producto_id, 'delta': delta,
+                         'tipo': tipo, 'descripcion': descripcion, 'factura_id': factura.id})
+
+        return [
+            {'producto_id': resultado['producto_id'],
+             'cantidad': resultado['cantidad'],
+             'stock_antes': resultado['stock_antes'],
+             'stock_despues': resultado['stock_despues']}
+            for resultado in models.Stock.apply_changes(lote)
+        ]
+
+
+# Instancia global del servicio
+invoice_writer = InvoiceWriter()
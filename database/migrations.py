@@ -0,0 +1,675 @@
+# -*- coding: utf-8 -*-
+"""
+Migraciones del esquema de la base de datos
+
+Cada migración se identifica con un número creciente y se aplica una sola vez:
+el número de la última migración aplicada se guarda en PRAGMA user_version.
+Una base de datos ya migrada no ejecuta ninguna sentencia DDL al arrancar.
+
+Para cambiar el esquema, añadir una función nueva al final de MIGRATIONS;
+nunca modificar una migración ya publicada.
+"""
+
+from itertools import groupby
+from utils import money
+from utils.logger import get_logger
+
+logger = get_logger("migrations")
+
+# Índices de las consultas habituales (listados, búsquedas y joins de stock/items)
+INDICES = [
+    "CREATE INDEX IF NOT EXISTS idx_facturas_fecha ON facturas(fecha_factura)",
+    "CREATE INDEX IF NOT EXISTS idx_facturas_numero ON facturas(numero_factura)",
+    "CREATE INDEX IF NOT EXISTS idx_factura_items_factura_id ON factura_items(factura_id)",
+    "CREATE INDEX IF NOT EXISTS idx_stock_producto_id ON stock(producto_id)",
+    "CREATE INDEX IF NOT EXISTS idx_productos_nombre ON productos(nombre)",
+    "CREATE INDEX IF NOT EXISTS idx_productos_referencia ON productos(referencia)",
+    "CREATE INDEX IF NOT EXISTS idx_stock_movements_producto_id ON stock_movements(producto_id)",
+    "CREATE INDEX IF NOT EXISTS idx_stock_movements_fecha ON stock_movements(fecha_movimiento)"
+]
+
+
+def _column_exists(conn, table, column):
+    """Indica si una tabla tiene ya una columna"""
+    return any(row[1] == column for row in conn.execute(f"PRAGMA table_info({table})"))
+
+
+def _add_column_if_missing(conn, table, column, definition):
+    """Añade una columna solo si no existe (bases de datos anteriores al sistema de migraciones)"""
+    if not _column_exists(conn, table, column):
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def _migration_001_esquema_base(conn):
+    """Tablas iniciales y columnas añadidas antes de existir las migraciones"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS productos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nombre TEXT NOT NULL,
+            referencia TEXT UNIQUE NOT NULL,
+            precio REAL NOT NULL,
+            categoria TEXT,
+            descripcion TEXT,
+            imagen_path TEXT,
+            iva_recomendado REAL DEFAULT 21.0,
+            fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS organizacion (
+            id INTEGER PRIMARY KEY,
+            nombre TEXT NOT NULL,
+            direccion TEXT,
+            telefono TEXT,
+            email TEXT,
+            cif TEXT,
+            logo_path TEXT,
+            directorio_imagenes_defecto TEXT,
+            numero_factura_inicial INTEGER DEFAULT 1,
+            fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    _add_column_if_missing(conn, 'organizacion', 'directorio_imagenes_defecto', 'TEXT')
+    _add_column_if_missing(conn, 'organizacion', 'numero_factura_inicial', 'INTEGER DEFAULT 1')
+    _add_column_if_missing(conn, 'organizacion', 'directorio_descargas_pdf', 'TEXT')
+    _add_column_if_missing(conn, 'organizacion', 'visor_pdf_personalizado', 'TEXT')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS stock (
+            producto_id INTEGER PRIMARY KEY,
+            cantidad_disponible INTEGER DEFAULT 0,
+            fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (producto_id) REFERENCES productos (id)
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS stock_movements (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            producto_id INTEGER NOT NULL,
+            cantidad INTEGER NOT NULL,
+            tipo TEXT NOT NULL,
+            descripcion TEXT,
+            fecha_movimiento TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (producto_id) REFERENCES productos (id)
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS facturas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            numero_factura TEXT UNIQUE NOT NULL,
+            fecha_factura DATE NOT NULL,
+            nombre_cliente TEXT NOT NULL,
+            dni_nie_cliente TEXT,
+            direccion_cliente TEXT,
+            email_cliente TEXT,
+            telefono_cliente TEXT,
+            subtotal REAL NOT NULL,
+            total_iva REAL NOT NULL,
+            total_factura REAL NOT NULL,
+            modo_pago TEXT,
+            fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS factura_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            factura_id INTEGER NOT NULL,
+            producto_id INTEGER NOT NULL,
+            cantidad INTEGER NOT NULL,
+            precio_unitario REAL NOT NULL,
+            iva_aplicado REAL NOT NULL,
+            descuento REAL DEFAULT 0,
+            subtotal REAL NOT NULL,
+            descuento_amount REAL DEFAULT 0,
+            iva_amount REAL NOT NULL,
+            total REAL NOT NULL,
+            FOREIGN KEY (factura_id) REFERENCES facturas (id),
+            FOREIGN KEY (producto_id) REFERENCES productos (id)
+        )
+    ''')
+
+
+def _migration_002_indices(conn):
+    """Índices que antes solo creaba utils.performance_optimizer"""
+    for index_sql in INDICES:
+        conn.execute(index_sql)
+
+
+def _migration_003_paginacion_facturas(conn):
+    """Índice para la paginación por clave y contador de facturas mantenido por triggers"""
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_facturas_fecha_numero "
+        "ON facturas(fecha_factura DESC, numero_factura DESC)"
+    )
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS contadores (
+            nombre TEXT PRIMARY KEY,
+            valor INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    conn.execute(
+        "INSERT OR REPLACE INTO contadores (nombre, valor) "
+        "SELECT 'facturas', COUNT(*) FROM facturas"
+    )
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_facturas_contador_insert AFTER INSERT ON facturas
+        BEGIN
+            UPDATE contadores SET valor = valor + 1 WHERE nombre = 'facturas';
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_facturas_contador_delete AFTER DELETE ON facturas
+        BEGIN
+            UPDATE contadores SET valor = valor - 1 WHERE nombre = 'facturas';
+        END
+    ''')
+
+
+# Índices de texto completo: tabla FTS5 -> (tabla de contenido, columnas indexadas)
+FTS_TABLES = {
+    'productos_fts': ('productos', ('nombre', 'referencia', 'categoria', 'descripcion')),
+    'facturas_fts': ('facturas', ('numero_factura', 'nombre_cliente', 'dni_nie_cliente',
+                                  'email_cliente', 'telefono_cliente')),
+    'clientes_fts': ('clientes', ('nombre', 'dni_nie', 'email', 'telefono')),
+    'facturas_numero_fts': ('facturas', ('numero_factura',)),
+}
+
+# remove_diacritics 2 hace que "Garcia" encuentre "García"; prefix acelera las búsquedas
+# por prefijo cortas del autocompletado.
+FTS_OPCIONES = "tokenize='unicode61 remove_diacritics 2', prefix='2 3'"
+
+# Trigramas: cualquier fragmento de 3 o más caracteres ("0123" en "FAC-0123-2025")
+# se resuelve desde el índice, sin recorrer la tabla con LIKE '%...%'
+FTS_OPCIONES_TRIGRAMAS = "tokenize='trigram case_sensitive 0'"
+
+
+def _fts5_disponible(conn):
+    """Indica si el SQLite enlazado incluye el módulo FTS5"""
+    return any(row[0] == 'ENABLE_FTS5' for row in conn.execute("PRAGMA compile_options"))
+
+
+def _crear_indice_fts(conn, fts_table, opciones=FTS_OPCIONES):
+    """Crea un índice FTS5 de FTS_TABLES con sus triggers de sincronización y lo rellena"""
+    content_table, columns = FTS_TABLES[fts_table]
+    column_list = ', '.join(columns)
+    new_values = ', '.join(f"new.{column}" for column in columns)
+    old_values = ', '.join(f"old.{column}" for column in columns)
+
+    # Tabla de contenido externo: el índice no duplica los textos
+    conn.execute(f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5(
+            {column_list},
+            content='{content_table}',
+            content_rowid='id',
+            {opciones}
+        )
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{fts_table}_insert AFTER INSERT ON {content_table}
+        BEGIN
+            INSERT INTO {fts_table} (rowid, {column_list}) VALUES (new.id, {new_values});
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{fts_table}_delete AFTER DELETE ON {content_table}
+        BEGIN
+            INSERT INTO {fts_table} ({fts_table}, rowid, {column_list})
+            VALUES ('delete', old.id, {old_values});
+        END
+    ''')
+    # Solo los cambios en columnas indexadas tocan el índice (no precios, totales...)
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{fts_table}_update AFTER UPDATE OF {column_list}
+        ON {content_table}
+        BEGIN
+            INSERT INTO {fts_table} ({fts_table}, rowid, {column_list})
+            VALUES ('delete', old.id, {old_values});
+            INSERT INTO {fts_table} (rowid, {column_list}) VALUES (new.id, {new_values});
+        END
+    ''')
+    conn.execute(f"INSERT INTO {fts_table} ({fts_table}) VALUES ('rebuild')")
+
+
+def _migration_004_busqueda_texto(conn):
+    """Índices FTS5 sin acentos sobre productos y facturas, sincronizados por triggers"""
+    if not _fts5_disponible(conn):
+        # La búsqueda sigue funcionando con LIKE (ver database.search_index)
+        logger.warning("SQLite sin FTS5: no se crean los índices de búsqueda de texto")
+        return
+
+    for fts_table in ('productos_fts', 'facturas_fts'):
+        _crear_indice_fts(conn, fts_table)
+
+
+def clave_cliente(nombre, dni_nie):
+    """
+    Clave que identifica a un cliente en la tabla clientes
+
+    El DNI/NIE si la factura lo tiene (sin espacios ni guiones), si no el nombre
+    sin diferencias de mayúsculas ni espacios repetidos.
+    """
+    documento = ''.join(ch for ch in (dni_nie or '') if ch.isalnum()).upper()
+    if documento:
+        return f"dni:{documento}"
+    return "nombre:" + ' '.join((nombre or '').split()).casefold()
+
+
+def _migration_005_clientes(conn):
+    """Tabla clientes con totales acumulados, rellenada desde las facturas existentes"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS clientes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            clave TEXT UNIQUE NOT NULL,
+            nombre TEXT NOT NULL,
+            dni_nie TEXT,
+            direccion TEXT,
+            email TEXT,
+            telefono TEXT,
+            num_facturas INTEGER NOT NULL DEFAULT 0,
+            total_facturado REAL NOT NULL DEFAULT 0,
+            ultima_factura DATE,
+            fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    _add_column_if_missing(conn, 'facturas', 'cliente_id', 'INTEGER REFERENCES clientes (id)')
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_facturas_cliente_fecha "
+        "ON facturas(cliente_id, fecha_factura)"
+    )
+
+    # Un cliente por clave; los datos de contacto son los de su factura más reciente
+    clientes = {}
+    asignaciones = []
+    rows = conn.execute('''
+        SELECT id, nombre_cliente, dni_nie_cliente, direccion_cliente, email_cliente, telefono_cliente
+        FROM facturas ORDER BY fecha_factura, id
+    ''')
+    for factura_id, nombre, dni_nie, direccion, email, telefono in rows:
+        clave = clave_cliente(nombre, dni_nie)
+        clientes[clave] = (clave, nombre, dni_nie, direccion, email, telefono)
+        asignaciones.append((clave, factura_id))
+
+    conn.executemany(
+        "INSERT OR IGNORE INTO clientes (clave, nombre, dni_nie, direccion, email, telefono) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        list(clientes.values())
+    )
+    conn.executemany(
+        "UPDATE facturas SET cliente_id = (SELECT id FROM clientes WHERE clave = ?) WHERE id = ?",
+        asignaciones
+    )
+    conn.execute('''
+        UPDATE clientes SET
+            num_facturas = (SELECT COUNT(*) FROM facturas f WHERE f.cliente_id = clientes.id),
+            total_facturado = (SELECT COALESCE(SUM(total_factura), 0) FROM facturas f
+                               WHERE f.cliente_id = clientes.id),
+            ultima_factura = (SELECT MAX(fecha_factura) FROM facturas f WHERE f.cliente_id = clientes.id)
+    ''')
+
+    # Los acumulados se mantienen desde cualquier escritura en facturas
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_facturas_clientes_insert AFTER INSERT ON facturas
+        WHEN new.cliente_id IS NOT NULL
+        BEGIN
+            UPDATE clientes SET num_facturas = num_facturas + 1,
+                                total_facturado = total_facturado + new.total_factura,
+                                ultima_factura = MAX(COALESCE(ultima_factura, new.fecha_factura),
+                                                     new.fecha_factura)
+            WHERE id = new.cliente_id;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_facturas_clientes_delete AFTER DELETE ON facturas
+        WHEN old.cliente_id IS NOT NULL
+        BEGIN
+            UPDATE clientes SET num_facturas = num_facturas - 1,
+                                total_facturado = total_facturado - old.total_factura,
+                                ultima_factura = (SELECT MAX(fecha_factura) FROM facturas
+                                                  WHERE cliente_id = old.cliente_id)
+            WHERE id = old.cliente_id;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_facturas_clientes_update
+        AFTER UPDATE OF cliente_id, total_factura, fecha_factura ON facturas
+        BEGIN
+            UPDATE clientes SET num_facturas = num_facturas - 1,
+                                total_facturado = total_facturado - old.total_factura,
+                                ultima_factura = (SELECT MAX(fecha_factura) FROM facturas
+                                                  WHERE cliente_id = old.cliente_id)
+            WHERE id = old.cliente_id;
+            UPDATE clientes SET num_facturas = num_facturas + 1,
+                                total_facturado = total_facturado + new.total_factura,
+                                ultima_factura = (SELECT MAX(fecha_factura) FROM facturas
+                                                  WHERE cliente_id = new.cliente_id)
+            WHERE id = new.cliente_id;
+        END
+    ''')
+
+    if _fts5_disponible(conn):
+        _crear_indice_fts(conn, 'clientes_fts')
+
+
+# Los movimientos de stock no se modifican una vez anotados
+SQL_SOLO_INSERCION_MOVIMIENTOS = '''
+    CREATE TRIGGER IF NOT EXISTS trg_stock_movements_solo_insercion
+    BEFORE UPDATE ON stock_movements
+    BEGIN
+        SELECT RAISE(ABORT, 'Los movimientos de stock no se pueden modificar');
+    END
+'''
+
+
+def _migration_006_libro_stock(conn):
+    """Saldo tras cada movimiento de stock; el historial pasa a ser de solo inserción"""
+    _add_column_if_missing(conn, 'stock_movements', 'balance_after', 'INTEGER')
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_stock_movements_producto_mov "
+        "ON stock_movements(producto_id, id)"
+    )
+
+    # Saldos históricos reconstruidos hacia atrás desde el stock actual
+    conn.execute('''
+        WITH saldos AS (
+            SELECT m.id,
+                   COALESCE(s.cantidad_disponible, 0) - COALESCE(SUM(m.cantidad) OVER (
+                       PARTITION BY m.producto_id ORDER BY m.id DESC
+                       ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING), 0) AS saldo
+            FROM stock_movements m
+            LEFT JOIN stock s ON s.producto_id = m.producto_id
+        )
+        UPDATE stock_movements SET balance_after = saldos.saldo
+        FROM saldos WHERE saldos.id = stock_movements.id
+    ''')
+
+    conn.execute(SQL_SOLO_INSERCION_MOVIMIENTOS)
+
+
+def sql_partes_numero_factura(expr):
+    """
+    Expresiones SQL que descomponen un número de factura "[serie-]N-AAAA"
+
+    Args:
+        expr: expresión SQL con el número de factura (p. ej. "new.numero_factura")
+
+    Returns:
+        tuple: (condición de formato válido, serie, año, número) como texto SQL
+    """
+    cuerpo = f"substr({expr}, 1, length({expr}) - 5)"
+    digitos = f"substr({cuerpo}, length(rtrim({cuerpo}, '0123456789')) + 1)"
+    condicion = (f"length({expr}) >= 6 AND substr({expr}, -5, 1) = '-' "
+                 f"AND substr({expr}, -4) GLOB '[0-9][0-9][0-9][0-9]' "
+                 f"AND length({digitos}) BETWEEN 1 AND 9")
+    serie = f"rtrim(rtrim({cuerpo}, '0123456789'), '-')"
+    anio = f"CAST(substr({expr}, -4) AS INTEGER)"
+    numero = f"CAST({digitos} AS INTEGER)"
+    return condicion, serie, anio, numero
+
+
+def _migration_007_secuencias(conn):
+    """Último número usado por serie y año, mantenido desde las facturas"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS secuencias (
+            serie TEXT NOT NULL,
+            anio INTEGER NOT NULL,
+            ultimo INTEGER NOT NULL,
+            PRIMARY KEY (serie, anio)
+        ) WITHOUT ROWID
+    ''')
+
+    condicion, serie, anio, numero = sql_partes_numero_factura('numero_factura')
+    conn.execute(f'''
+        INSERT OR REPLACE INTO secuencias (serie, anio, ultimo)
+        SELECT {serie}, {anio}, MAX({numero}) FROM facturas
+        WHERE {condicion}
+        GROUP BY 1, 2
+    ''')
+
+    # Cualquier número guardado (automático o escrito a mano) hace avanzar su serie
+    condicion, serie, anio, numero = sql_partes_numero_factura('new.numero_factura')
+    for evento, nombre in (("INSERT", "insert"), ("UPDATE OF numero_factura", "update")):
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_facturas_secuencias_{nombre}
+            AFTER {evento} ON facturas
+            WHEN {condicion}
+            BEGIN
+                INSERT INTO secuencias (serie, anio, ultimo)
+                VALUES ({serie}, {anio}, {numero})
+                ON CONFLICT(serie, anio) DO UPDATE SET ultimo = MAX(ultimo, excluded.ultimo);
+            END
+        ''')
+
+
+# Anota en stock_cambios una versión nueva para el producto indicado
+SQL_REGISTRAR_CAMBIO_STOCK = """
+    INSERT INTO stock_cambios (producto_id, version)
+    VALUES (?, (SELECT COALESCE(MAX(version), 0) + 1 FROM stock_cambios))
+    ON CONFLICT(producto_id) DO UPDATE SET version = excluded.version
+"""
+
+
+def _migration_008_cambios_stock(conn):
+    """
+    Registro de cambios de stock que no pasan por el libro de movimientos
+
+    Las ventas y ajustes ya quedan en stock_movements; aquí se anota la
+    última versión en la que cambió cada producto por otras vías (alta o
+    baja de stock, datos del producto, Stock.save).
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS stock_cambios (
+            producto_id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+    ''')
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_stock_cambios_version ON stock_cambios(version)")
+
+    # Sin disparador de UPDATE sobre stock: el lote de Stock.apply_changes sigue siendo una sola sentencia
+    disparadores = (
+        ("stock_insert", "AFTER INSERT ON stock", "new.producto_id"),
+        ("stock_delete", "AFTER DELETE ON stock", "old.producto_id"),
+        ("productos_update",
+         "AFTER UPDATE OF nombre, referencia, precio, categoria, descripcion ON productos", "new.id"),
+        ("productos_delete", "AFTER DELETE ON productos", "old.id"),
+    )
+    for nombre, evento, producto_id in disparadores:
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_stock_cambios_{nombre}
+            {evento}
+            BEGIN
+                {SQL_REGISTRAR_CAMBIO_STOCK.replace('?', producto_id)};
+            END
+        ''')
+
+
+SQL_INSERTAR_IMPUESTO = "INSERT INTO factura_impuestos (factura_id, tipo, base, cuota) VALUES (?, ?, ?, ?)"
+
+
+def filas_impuestos(factura_id, lineas):
+    """
+    Filas de factura_impuestos de una factura
+
+    Args:
+        factura_id: ID de la factura
+        lineas: iterable de (iva_aplicado, subtotal) de sus items, en euros
+
+    Returns:
+        list: tuplas (factura_id, tipo, base, cuota) con el tipo en centésimas
+              de punto y los importes en céntimos, una por tipo de IVA
+    """
+    totales = money.aggregate_by_rate(
+        (money.rate_units(iva), money.to_cents(subtotal or 0)) for iva, subtotal in lineas
+    )
+    return [(factura_id, tipo, desglose['base'], desglose['iva'])
+            for tipo, desglose in totales['por_tipo'].items()]
+
+
+def _migration_009_impuestos_factura(conn):
+    """
+    Desglose de cada factura por tipo de IVA (base y cuota)
+
+    Los informes de IVA suman unas pocas filas por factura en lugar de
+    agrupar todos los items. Los importes se guardan en céntimos enteros.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS factura_impuestos (
+            factura_id INTEGER NOT NULL,
+            tipo INTEGER NOT NULL,
+            base INTEGER NOT NULL,
+            cuota INTEGER NOT NULL,
+            PRIMARY KEY (factura_id, tipo),
+            FOREIGN KEY (factura_id) REFERENCES facturas (id)
+        ) WITHOUT ROWID
+    ''')
+
+    # Facturas ya existentes: desglose a partir de las bases guardadas en sus items
+    cursor = conn.execute(
+        "SELECT factura_id, iva_aplicado, subtotal FROM factura_items ORDER BY factura_id"
+    )
+    for factura_id, filas in groupby(cursor, key=lambda fila: fila[0]):
+        conn.executemany(SQL_INSERTAR_IMPUESTO,
+                         filas_impuestos(factura_id, (fila[1:] for fila in filas)))
+
+
+# Columnas que guardan la ruta de un fichero del almacén de imágenes
+REFERENCIAS_BLOBS = (("productos", "imagen_path"), ("organizacion", "logo_path"))
+
+
+def _migration_010_blobs(conn):
+    """
+    Ficheros del almacén de imágenes con su número de referencias
+
+    Los disparadores cuentan cuántas filas de productos y organizacion
+    apuntan a cada fichero registrado. Cuando el contador llega a cero se
+    anota la fecha en "liberado" y el recolector (database.blob_store) borra
+    el fichero pasado un margen, sin recorrer el directorio. Las rutas que
+    no están registradas (ficheros externos o anteriores) no se tocan.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS blobs (
+            path TEXT PRIMARY KEY,
+            hash TEXT NOT NULL,
+            bytes INTEGER NOT NULL DEFAULT 0,
+            refcount INTEGER NOT NULL DEFAULT 0,
+            creado TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            liberado TEXT
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_blobs_hash ON blobs(hash)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_blobs_liberados ON blobs(liberado) WHERE refcount = 0")
+
+    incrementar = "UPDATE blobs SET refcount = refcount + 1, liberado = NULL WHERE path = new.{col};"
+    decrementar = ("UPDATE blobs SET refcount = MAX(refcount - 1, 0), "
+                   "liberado = CASE WHEN refcount <= 1 THEN CURRENT_TIMESTAMP END WHERE path = old.{col};")
+    for tabla, col in REFERENCIAS_BLOBS:
+        disparadores = (
+            ("insert", f"AFTER INSERT ON {tabla}", f"new.{col} <> ''", incrementar),
+            ("update", f"AFTER UPDATE OF {col} ON {tabla}", f"old.{col} IS NOT new.{col}",
+             decrementar + "\n" + incrementar),
+            ("delete", f"AFTER DELETE ON {tabla}", f"old.{col} <> ''", decrementar),
+        )
+        for nombre, evento, condicion, cuerpo in disparadores:
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_blobs_{tabla}_{nombre}
+                {evento}
+                WHEN {condicion}
+                BEGIN
+                    {cuerpo.format(col=col)}
+                END
+            ''')
+
+
+def _migration_011_numeros_trigramas(conn):
+    """Índice de trigramas sobre los números de factura para buscar fragmentos"""
+    if not _fts5_disponible(conn):
+        return
+    _crear_indice_fts(conn, 'facturas_numero_fts', FTS_OPCIONES_TRIGRAMAS)
+
+
+def _migration_012_movimientos_factura(conn):
+    """
+    Factura que originó cada movimiento de stock
+
+    Al editar una factura se devuelve al stock lo que sus movimientos
+    descontaron de verdad (una venta sin stock suficiente descuenta menos
+    que la cantidad de la línea). Los movimientos anteriores se enlazan por
+    la descripción que escribía el guardado de facturas.
+    """
+    _add_column_if_missing(conn, 'stock_movements', 'factura_id', 'INTEGER REFERENCES facturas (id)')
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_stock_movements_factura "
+        "ON stock_movements(factura_id) WHERE factura_id IS NOT NULL"
+    )
+
+    # Única modificación del libro: el disparador se retira mientras se enlazan
+    conn.execute("DROP TRIGGER IF EXISTS trg_stock_movements_solo_insercion")
+    conn.execute('''
+        UPDATE stock_movements SET factura_id = f.id
+        FROM facturas f
+        WHERE stock_movements.factura_id IS NULL
+          AND stock_movements.tipo IN ('VENTA', 'AJUSTE')
+          AND stock_movements.descripcion LIKE '% (Factura ' || f.numero_factura || ')'
+    ''')
+    conn.execute(SQL_SOLO_INSERCION_MOVIMIENTOS)
+
+
+# (número, descripción, función) en orden de aplicación
+MIGRATIONS = [
+    (1, "Esquema base", _migration_001_esquema_base),
+    (2, "Índices de consultas habituales", _migration_002_indices),
+    (3, "Paginación de facturas", _migration_003_paginacion_facturas),
+    (4, "Búsqueda de texto completo", _migration_004_busqueda_texto),
+    (5, "Tabla de clientes", _migration_005_clientes),
+    (6, "Libro de movimientos de stock", _migration_006_libro_stock),
+    (7, "Secuencias de numeración de facturas", _migration_007_secuencias),
+    (8, "Registro de cambios de stock", _migration_008_cambios_stock),
+    (9, "Desglose de IVA por factura", _migration_009_impuestos_factura),
+    (10, "Almacén de imágenes con contador de referencias", _migration_010_blobs),
+    (11, "Búsqueda de fragmentos de número de factura", _migration_011_numeros_trigramas),
+    (12, "Movimientos de stock por factura", _migration_012_movimientos_factura),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn):
+    """Versión del esquema guardada en la base de datos"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def run_migrations(conn):
+    """
+    Aplica las migraciones pendientes, cada una en su propia transacción
+
+    La conexión debe estar en modo autocommit (isolation_level=None).
+
+    Returns:
+        list: números de las migraciones aplicadas (vacía si el esquema estaba al día)
+    """
+    aplicadas = []
+    for numero, descripcion, migrate in MIGRATIONS:
+        if get_schema_version(conn) >= numero:
+            continue
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Otro proceso puede haberla aplicado mientras esperábamos el bloqueo
+            if get_schema_version(conn) >= numero:
+                conn.execute("ROLLBACK")
+                continue
+            migrate(conn)
+            conn.execute(f"PRAGMA user_version = {numero}")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            logger.error(f"Error aplicando migración {numero} ({descripcion})")
+            raise
+
+        logger.info(f"Migración {numero} aplicada: {descripcion}")
+        aplicadas.append(numero)
+
+    return aplicadas
@@ -1,7 +1,14 @@
+import copy
+import json
 from .database import db
+from .migrations import SQL_INSERTAR_IMPUESTO, SQL_REGISTRAR_CAMBIO_STOCK, clave_cliente, filas_impuestos
 from datetime import datetime
 
 class Producto:
+    # Suscriptores a los cambios: callback(evento, producto) con evento "guardado" o
+    # "eliminado". Se avisa tras confirmar la transacción, con una copia del producto.
+    _suscriptores = []
+
     def __init__(self, id=None, nombre="", referencia="", precio=0.0, 
                  categoria="", descripcion="", imagen_path="", iva_recomendado=21.0):
         self.id = id
@@ -24,24 +31,50 @@ class Producto:
                      self.descripcion, self.imagen_path, self.iva_recomendado, self.id)
             db.execute_query(query, params)
         else:
-            # Crear nuevo producto
+            # Crear nuevo producto y su entrada en stock de forma atómica
             query = '''INSERT INTO productos (nombre, referencia, precio, categoria, 
                       descripcion, imagen_path, iva_recomendado) 
                       VALUES (?, ?, ?, ?, ?, ?, ?)'''
             params = (self.nombre, self.referencia, self.precio, self.categoria,
                      self.descripcion, self.imagen_path, self.iva_recomendado)
-            self.id = db.execute_query(query, params)
-            
-            # Crear entrada en stock
-            Stock.create_for_product(self.id)
+            with db.transaction():
+                new_id = db.execute_query(query, params)
+                # Crear entrada en stock
+                Stock.create_for_product(new_id)
+            self.id = new_id
+        self._publicar("guardado")
     
     def delete(self):
         """Elimina el producto de la base de datos"""
         if self.id:
-            # Eliminar stock asociado
-            db.execute_query("DELETE FROM stock WHERE producto_id=?", (self.id,))
-            # Eliminar producto
-            db.execute_query("DELETE FROM productos WHERE id=?", (self.id,))
+            with db.transaction():
+                # Eliminar stock asociado
+                db.execute_query("DELETE FROM stock WHERE producto_id=?", (self.id,))
+                # Eliminar producto
+                db.execute_query("DELETE FROM productos WHERE id=?", (self.id,))
+                self._publicar("eliminado")
+
+    @classmethod
+    def subscribe(cls, callback):
+        """Registra un callback(evento, producto) para los cambios de productos"""
+        if callback not in cls._suscriptores:
+            cls._suscriptores.append(callback)
+
+    @classmethod
+    def unsubscribe(cls, callback):
+        """Elimina un callback registrado con subscribe()"""
+        if callback in cls._suscriptores:
+            cls._suscriptores.remove(callback)
+
+    def _publicar(self, evento):
+        """Avisa a los suscriptores cuando se confirme la transacción en curso"""
+        producto = copy.copy(self)
+
+        def notificar():
+            for callback in list(Producto._suscriptores):
+                callback(evento, producto)
+
+        db.on_commit(notificar)
     
     @staticmethod
     def get_all():
@@ -72,10 +105,95 @@ class Producto:
             )
         return None
 
+class Cliente:
+    def __init__(self, id=None, nombre="", dni_nie="", direccion="", email="", telefono="",
+                 num_facturas=0, total_facturado=0.0, ultima_factura=None):
+        self.id = id
+        self.nombre = nombre
+        self.dni_nie = dni_nie
+        self.direccion = direccion
+        self.email = email
+        self.telefono = telefono
+        self.num_facturas = num_facturas
+        self.total_facturado = total_facturado
+        self.ultima_factura = ultima_factura
+
+    COLUMNS = "id, nombre, dni_nie, direccion, email, telefono, num_facturas, total_facturado, ultima_factura"
+
+    @staticmethod
+    def _from_row(row):
+        """Crea un Cliente a partir de una fila con las columnas de COLUMNS"""
+        return Cliente(
+            id=row[0], nombre=row[1], dni_nie=row[2] or "", direccion=row[3] or "",
+            email=row[4] or "", telefono=row[5] or "", num_facturas=row[6],
+            total_facturado=row[7], ultima_factura=row[8]
+        )
+
+    @staticmethod
+    def registrar(factura):
+        """
+        Crea o actualiza el cliente de una factura y devuelve su ID
+
+        Debe llamarse dentro de la transacción que guarda la factura. Los datos de
+        contacto vacíos no sustituyen a los ya registrados.
+        """
+        clave = clave_cliente(factura.nombre_cliente, factura.dni_nie_cliente)
+        query = '''INSERT INTO clientes (clave, nombre, dni_nie, direccion, email, telefono)
+                  VALUES (?, ?, ?, ?, ?, ?)
+                  ON CONFLICT(clave) DO UPDATE SET
+                      nombre = excluded.nombre,
+                      dni_nie = COALESCE(NULLIF(excluded.dni_nie, ''), dni_nie),
+                      direccion = COALESCE(NULLIF(excluded.direccion, ''), direccion),
+                      email = COALESCE(NULLIF(excluded.email, ''), email),
+                      telefono = COALESCE(NULLIF(excluded.telefono, ''), telefono)'''
+        db.execute_query(query, (clave, factura.nombre_cliente, factura.dni_nie_cliente,
+                                 factura.direccion_cliente, factura.email_cliente,
+                                 factura.telefono_cliente))
+        return db.execute_query("SELECT id FROM clientes WHERE clave=?", (clave,))[0][0]
+
+    @staticmethod
+    def get_all():
+        """Obtiene todos los clientes ordenados por nombre"""
+        results = db.execute_query(f"SELECT {Cliente.COLUMNS} FROM clientes ORDER BY nombre")
+        return [Cliente._from_row(row) for row in results]
+
+    @staticmethod
+    def get_by_id(cliente_id):
+        """Obtiene un cliente por su ID"""
+        results = db.execute_query(f"SELECT {Cliente.COLUMNS} FROM clientes WHERE id=?", (cliente_id,))
+        return Cliente._from_row(results[0]) if results else None
+
+    @staticmethod
+    def search(texto, limit=10):
+        """Clientes que coinciden con el texto, del más al menos relevante (para autocompletado)"""
+        from .search_index import search_index
+
+        cliente_ids = search_index.search_cliente_ids(texto, limit=limit)
+        if cliente_ids is None:
+            # Sin índice FTS5: búsqueda simple por nombre, documento o email
+            patron = f"%{texto.strip()}%"
+            results = db.execute_query(
+                f"""SELECT {Cliente.COLUMNS} FROM clientes
+                    WHERE nombre LIKE ? OR dni_nie LIKE ? OR email LIKE ?
+                    ORDER BY nombre LIMIT ?""",
+                (patron, patron, patron, limit)
+            )
+            return [Cliente._from_row(row) for row in results]
+        if not cliente_ids:
+            return []
+
+        placeholders = ','.join(['?'] * len(cliente_ids))
+        results = db.execute_query(
+            f"SELECT {Cliente.COLUMNS} FROM clientes WHERE id IN ({placeholders})", cliente_ids
+        )
+        clientes = {row[0]: Cliente._from_row(row) for row in results}
+        return [clientes[cliente_id] for cliente_id in cliente_ids if cliente_id in clientes]
+
 class Factura:
     def __init__(self, id=None, numero_factura="", fecha_factura="", nombre_cliente="",
                  dni_nie_cliente="", direccion_cliente="", email_cliente="", telefono_cliente="",
-                 subtotal=0.0, total_iva=0.0, total_factura=0.0, modo_pago="", fecha_creacion=""):
+                 subtotal=0.0, total_iva=0.0, total_factura=0.0, modo_pago="", fecha_creacion="",
+                 cliente_id=None):
         self.id = id
         self.numero_factura = numero_factura
         self.fecha_factura = fecha_factura
@@ -89,49 +207,75 @@ class Factura:
         self.total_factura = total_factura
         self.modo_pago = modo_pago
         self.fecha_creacion = fecha_creacion
+        self.cliente_id = cliente_id
         self.items = []  # Lista de FacturaItem
 
     def save(self):
-        """Guarda la factura en la base de datos"""
+        """Guarda la factura y sus items en una única transacción"""
+        original_id, original_cliente_id = self.id, self.cliente_id
+        try:
+            with db.transaction():
+                self._save()
+        except Exception:
+            # La transacción se ha deshecho: la factura no llegó a crearse
+            self.id, self.cliente_id = original_id, original_cliente_id
+            raise
+
+    def _save(self):
+        """Escribe cliente, cabecera e items; debe llamarse dentro de una transacción"""
+        # Los acumulados del cliente los mantienen los triggers de facturas
+        self.cliente_id = Cliente.registrar(self)
+        self._save_cabecera()
+
+        # Guardar items de la factura
+        if self.items:
+            # Eliminar items existentes
+            db.execute_query("DELETE FROM factura_items WHERE factura_id=?", (self.id,))
+
+            # Insertar nuevos items
+            FacturaItem.insert_many(self.id, self.items)
+            self._save_impuestos()
+
+    def _save_impuestos(self):
+        """Reescribe el desglose por tipo de IVA (factura_impuestos) a partir de los items"""
+        db.execute_query("DELETE FROM factura_impuestos WHERE factura_id=?", (self.id,))
+        db.execute_many(SQL_INSERTAR_IMPUESTO, filas_impuestos(
+            self.id, ((item.iva_aplicado, item.subtotal) for item in self.items)
+        ))
+
+    def _save_cabecera(self):
+        """Inserta o actualiza la fila de la factura"""
         if self.id:
             # Actualizar factura existente
             query = '''UPDATE facturas SET numero_factura=?, fecha_factura=?, nombre_cliente=?,
                       dni_nie_cliente=?, direccion_cliente=?, email_cliente=?, telefono_cliente=?,
-                      subtotal=?, total_iva=?, total_factura=?, modo_pago=? WHERE id=?'''
+                      subtotal=?, total_iva=?, total_factura=?, modo_pago=?, cliente_id=? WHERE id=?'''
             params = (self.numero_factura, self.fecha_factura, self.nombre_cliente,
                      self.dni_nie_cliente, self.direccion_cliente, self.email_cliente,
                      self.telefono_cliente, self.subtotal, self.total_iva, self.total_factura,
-                     self.modo_pago, self.id)
+                     self.modo_pago, self.cliente_id, self.id)
             db.execute_query(query, params)
         else:
             # Crear nueva factura
             query = '''INSERT INTO facturas (numero_factura, fecha_factura, nombre_cliente,
                       dni_nie_cliente, direccion_cliente, email_cliente, telefono_cliente,
-                      subtotal, total_iva, total_factura, modo_pago)
-                      VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'''
+                      subtotal, total_iva, total_factura, modo_pago, cliente_id)
+                      VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'''
             params = (self.numero_factura, self.fecha_factura, self.nombre_cliente,
                      self.dni_nie_cliente, self.direccion_cliente, self.email_cliente,
                      self.telefono_cliente, self.subtotal, self.total_iva, self.total_factura,
-                     self.modo_pago)
+                     self.modo_pago, self.cliente_id)
             self.id = db.execute_query(query, params)
 
-        # Guardar items de la factura
-        if self.items:
-            # Eliminar items existentes
-            db.execute_query("DELETE FROM factura_items WHERE factura_id=?", (self.id,))
-
-            # Insertar nuevos items
-            for item in self.items:
-                item.factura_id = self.id
-                item.save()
-
     def delete(self):
         """Elimina la factura y sus items"""
         if self.id:
-            # Eliminar items primero
-            db.execute_query("DELETE FROM factura_items WHERE factura_id=?", (self.id,))
-            # Eliminar factura
-            db.execute_query("DELETE FROM facturas WHERE id=?", (self.id,))
+            with db.transaction():
+                # Eliminar items y desglose de IVA primero
+                db.execute_query("DELETE FROM factura_items WHERE factura_id=?", (self.id,))
+                db.execute_query("DELETE FROM factura_impuestos WHERE factura_id=?", (self.id,))
+                # Eliminar factura
+                db.execute_query("DELETE FROM facturas WHERE id=?", (self.id,))
 
     def add_item(self, producto_id, cantidad, precio_unitario, iva_aplicado, descuento=0):
         """Añade un item a la factura"""
@@ -147,16 +291,16 @@ class Factura:
         return item
 
     def calculate_totals(self):
-        """Calcula los totales de la factura basándose en los items"""
-        self.subtotal = 0.0
-        self.total_iva = 0.0
+        """Calcula los totales de la factura basándose en los items (céntimos exactos, IVA por tipo)"""
+        from common.validators import CalculationHelper
 
         for item in self.items:
             item.calculate_totals()
-            self.subtotal += item.subtotal
-            self.total_iva += item.iva_amount
 
-        self.total_factura = self.subtotal + self.total_iva
+        totales = CalculationHelper.calculate_invoice_totals(self.items)
+        self.subtotal = totales['subtotal']
+        self.total_iva = totales['total_iva']
+        self.total_factura = totales['total']
 
     @staticmethod
     def get_all():
@@ -169,11 +313,14 @@ class Factura:
                 id=row[0], numero_factura=row[1], fecha_factura=row[2], nombre_cliente=row[3],
                 dni_nie_cliente=row[4], direccion_cliente=row[5], email_cliente=row[6],
                 telefono_cliente=row[7], subtotal=row[8], total_iva=row[9], total_factura=row[10],
-                modo_pago=row[11], fecha_creacion=row[12]
+                modo_pago=row[11], fecha_creacion=row[12], cliente_id=row[13]
             )
-            # Cargar items de la factura
-            factura.items = FacturaItem.get_by_factura_id(factura.id)
             facturas.append(factura)
+
+        # Cargar los items de todas las facturas en una sola consulta
+        items_by_factura = FacturaItem.get_all_by_factura()
+        for factura in facturas:
+            factura.items = items_by_factura.get(factura.id, [])
         return facturas
 
     @staticmethod
@@ -187,7 +334,7 @@ class Factura:
                 id=row[0], numero_factura=row[1], fecha_factura=row[2], nombre_cliente=row[3],
                 dni_nie_cliente=row[4], direccion_cliente=row[5], email_cliente=row[6],
                 telefono_cliente=row[7], subtotal=row[8], total_iva=row[9], total_factura=row[10],
-                modo_pago=row[11], fecha_creacion=row[12]
+                modo_pago=row[11], fecha_creacion=row[12], cliente_id=row[13]
             )
             # Cargar items de la factura
             factura.items = FacturaItem.get_by_factura_id(factura.id)
@@ -205,7 +352,7 @@ class Factura:
                 id=row[0], numero_factura=row[1], fecha_factura=row[2], nombre_cliente=row[3],
                 dni_nie_cliente=row[4], direccion_cliente=row[5], email_cliente=row[6],
                 telefono_cliente=row[7], subtotal=row[8], total_iva=row[9], total_factura=row[10],
-                modo_pago=row[11], fecha_creacion=row[12]
+                modo_pago=row[11], fecha_creacion=row[12], cliente_id=row[13]
             )
             # Cargar items de la factura
             factura.items = FacturaItem.get_by_factura_id(factura.id)
@@ -214,8 +361,10 @@ class Factura:
 
     @staticmethod
     def get_next_numero():
-        """Obtiene el siguiente número de factura"""
-        return db.get_next_factura_number()
+        """Obtiene el siguiente número de factura (serie y formato de la configuración)"""
+        from utils.factura_numbering import factura_numbering_service
+
+        return factura_numbering_service.get_next_numero_factura()
 
 class FacturaItem:
     def __init__(self, id=None, factura_id=None, producto_id=None, cantidad=1,
@@ -257,6 +406,33 @@ class FacturaItem:
                      self.iva_amount, self.total)
             self.id = db.execute_query(query, params)
 
+    @staticmethod
+    def insert_many(factura_id, items):
+        """Inserta varios items nuevos de una factura con una sola sentencia preparada"""
+        if not items:
+            return
+
+        params_list = []
+        for item in items:
+            item.factura_id = factura_id
+            item.calculate_totals()
+            params_list.append((item.factura_id, item.producto_id, item.cantidad,
+                                item.precio_unitario, item.iva_aplicado, item.descuento,
+                                item.subtotal, item.descuento_amount, item.iva_amount, item.total))
+
+        query = '''INSERT INTO factura_items (factura_id, producto_id, cantidad,
+                  precio_unitario, iva_aplicado, descuento, subtotal, descuento_amount,
+                  iva_amount, total) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'''
+        with db.transaction():
+            db.execute_many(query, params_list)
+            # Recuperar los IDs asignados (en el mismo orden de inserción)
+            results = db.execute_query(
+                "SELECT id FROM factura_items WHERE factura_id=? ORDER BY id DESC LIMIT ?",
+                (factura_id, len(items))
+            )
+        for item, row in zip(items, reversed(results)):
+            item.id = row[0]
+
     def calculate_totals(self):
         """Calcula los totales del item"""
         from common.validators import CalculationHelper
@@ -273,29 +449,44 @@ class FacturaItem:
     def get_producto(self):
         """Obtiene el producto asociado al item"""
         if not self.producto and self.producto_id:
-            self.producto = Producto.get_by_id(self.producto_id)
+            from .product_catalog import product_catalog
+            self.producto = product_catalog.get(self.producto_id)
         return self.producto
 
+    @staticmethod
+    def _from_row(row):
+        """Construye un item a partir de una fila de factura_items"""
+        item = FacturaItem(
+            id=row[0], factura_id=row[1], producto_id=row[2], cantidad=row[3],
+            precio_unitario=row[4], iva_aplicado=row[5], descuento=row[6],
+        )
+        # Cargar valores calculados
+        item.subtotal = row[7]
+        item.descuento_amount = row[8]
+        item.iva_amount = row[9]
+        item.total = row[10]
+        return item
+
     @staticmethod
     def get_by_factura_id(factura_id):
         """Obtiene todos los items de una factura"""
         query = "SELECT * FROM factura_items WHERE factura_id=? ORDER BY id"
         results = db.execute_query(query, (factura_id,))
-        items = []
-        for row in results:
-            item = FacturaItem(
-                id=row[0], factura_id=row[1], producto_id=row[2], cantidad=row[3],
-                precio_unitario=row[4], iva_aplicado=row[5], descuento=row[6],
-            )
-            # Cargar valores calculados
-            item.subtotal = row[7]
-            item.descuento_amount = row[8]
-            item.iva_amount = row[9]
-            item.total = row[10]
-            items.append(item)
-        return items
+        return [FacturaItem._from_row(row) for row in results]
+
+    @staticmethod
+    def get_all_by_factura():
+        """Obtiene los items de todas las facturas agrupados por factura_id"""
+        query = "SELECT * FROM factura_items ORDER BY factura_id, id"
+        items_by_factura = {}
+        for row in db.execute_query(query):
+            items_by_factura.setdefault(row[1], []).append(FacturaItem._from_row(row))
+        return items_by_factura
 
 class Organizacion:
+    # Se incrementa en cada guardado: quien guarda una copia de la fila sabe cuándo releerla
+    version = 0
+
     def __init__(self, nombre="", direccion="", telefono="", email="", cif="",
                  logo_path="", directorio_imagenes_defecto="", numero_factura_inicial=1,
                  directorio_descargas_pdf="", visor_pdf_personalizado=""):
@@ -312,6 +503,12 @@ class Organizacion:
     
     def save(self):
         """Guarda los datos de la organización"""
+        with db.transaction():
+            self._save()
+        Organizacion.version += 1
+
+    def _save(self):
+        """Inserta o actualiza la fila única de organización"""
         # Verificar si ya existe una organización
         existing = Organizacion.get()
         if existing and existing.nombre:  # Si existe et n'est pas vide
@@ -359,10 +556,12 @@ class Stock:
         self.cantidad_disponible = cantidad_disponible
     
     def save(self):
-        """Actualiza el stock del producto"""
+        """Actualiza el stock del producto (sin movimiento: se anota en el registro de cambios)"""
         query = '''UPDATE stock SET cantidad_disponible=?, fecha_actualizacion=CURRENT_TIMESTAMP 
                   WHERE producto_id=?'''
-        db.execute_query(query, (self.cantidad_disponible, self.producto_id))
+        with db.transaction() as conn:
+            conn.execute(query, (self.cantidad_disponible, self.producto_id))
+            conn.execute(SQL_REGISTRAR_CAMBIO_STOCK, (self.producto_id,))
     
     @staticmethod
     def create_for_product(producto_id):
@@ -388,15 +587,121 @@ class Stock:
     
     @staticmethod
     def update_stock(producto_id, cantidad_vendida):
-        """Actualiza el stock después de una venta"""
-        current_stock = Stock.get_by_product(producto_id)
-        new_stock = max(0, current_stock - cantidad_vendida)
-        query = '''UPDATE stock SET cantidad_disponible=?, fecha_actualizacion=CURRENT_TIMESTAMP
-                  WHERE producto_id=?'''
-        db.execute_query(query, (new_stock, producto_id))
+        """Actualiza el stock después de una venta (nunca por debajo de 0)"""
+        Stock.apply_changes([{
+            'producto_id': producto_id,
+            'delta': -cantidad_vendida,
+            'tipo': "VENTA",
+            'descripcion': f"Venta de {cantidad_vendida} unidades"
+        }])
+
+    @staticmethod
+    def apply_changes(cambios):
+        """
+        Aplica un lote de cambios de stock y los anota en stock_movements
+
+        El nuevo saldo de cada producto se calcula en SQL a partir del stock
+        actual, dentro de la transacción: dos ventanas que venden el mismo
+        producto a la vez no pueden pisarse. El lote completo cuesta dos
+        sentencias sea cual sea su tamaño.
+
+        Args:
+            cambios: lista de dicts con producto_id y
+                     'delta' (variación, negativa = salida; el stock no baja de 0 y el
+                     movimiento anota solo lo que se descontó de verdad) o
+                     'cantidad' (nuevo stock absoluto), y opcionalmente tipo, descripcion
+                     y factura_id (factura que origina el movimiento).
+                     Cada producto puede aparecer una sola vez.
+
+        Returns:
+            list: un dict por producto con stock o existente (los demás se ignoran),
+                  en el orden recibido, con producto_id,
+                  cantidad (la registrada en el movimiento), stock_antes, stock_despues
+                  y movimiento_id
+        """
+        if not cambios:
+            return []
+
+        lote = []
+        for cambio in cambios:
+            delta, absoluto = cambio.get('delta'), cambio.get('cantidad')
+            if (delta is None) == (absoluto is None):
+                raise ValueError(f"Cada cambio de stock necesita 'delta' o 'cantidad': {cambio}")
+            lote.append([cambio['producto_id'], delta, absoluto,
+                         cambio.get('tipo') or ("AJUSTE" if delta is None else "MANUAL"),
+                         cambio.get('descripcion') or "", cambio.get('factura_id')])
+        if len({fila[0] for fila in lote}) != len(lote):
+            raise ValueError("Un mismo producto aparece varias veces en el lote de stock")
+
+        with db.transaction() as conn:
+            # Primero el libro: el saldo nuevo se calcula con el stock aún sin tocar
+            rows = conn.execute('''
+                WITH lote AS (
+                    SELECT CAST(key AS INTEGER) AS orden,
+                           json_extract(value, '$[0]') AS producto_id,
+                           json_extract(value, '$[1]') AS delta,
+                           json_extract(value, '$[2]') AS absoluto,
+                           json_extract(value, '$[3]') AS tipo,
+                           json_extract(value, '$[4]') AS descripcion,
+                           json_extract(value, '$[5]') AS factura_id
+                    FROM json_each(?)
+                )
+                INSERT INTO stock_movements (producto_id, cantidad, tipo, descripcion, balance_after,
+                                             factura_id)
+                SELECT l.producto_id,
+                       -- el cambio realmente aplicado: stock_antes + cantidad = balance_after
+                       COALESCE(l.absoluto, MAX(0, COALESCE(s.cantidad_disponible, 0) + l.delta))
+                           - COALESCE(s.cantidad_disponible, 0),
+                       l.tipo, l.descripcion,
+                       COALESCE(l.absoluto, MAX(0, COALESCE(s.cantidad_disponible, 0) + l.delta)),
+                       l.factura_id
+                FROM lote l
+                LEFT JOIN stock s ON s.producto_id = l.producto_id
+                WHERE s.producto_id IS NOT NULL
+                   OR EXISTS (SELECT 1 FROM productos p WHERE p.id = l.producto_id)
+                ORDER BY l.orden
+                RETURNING id, producto_id, cantidad, balance_after,
+                          COALESCE((SELECT cantidad_disponible FROM stock
+                                    WHERE stock.producto_id = stock_movements.producto_id), 0)
+            ''', (json.dumps(lote),)).fetchall()
+
+            # Después el stock, copiando los saldos recién anotados
+            conn.execute('''
+                INSERT INTO stock (producto_id, cantidad_disponible, fecha_actualizacion)
+                SELECT producto_id, balance_after, CURRENT_TIMESTAMP FROM stock_movements
+                -- "AND true" evita que SQLite lea ON CONFLICT como parte de un JOIN (ambigüedad del UPSERT)
+                WHERE id IN (SELECT value FROM json_each(?)) AND true
+                ON CONFLICT(producto_id) DO UPDATE SET
+                    cantidad_disponible = excluded.cantidad_disponible,
+                    fecha_actualizacion = excluded.fecha_actualizacion
+            ''', (json.dumps([row[0] for row in rows]),))
+
+        resultados = {
+            row[1]: {'producto_id': row[1], 'cantidad': row[2], 'stock_antes': row[4],
+                     'stock_despues': row[3], 'movimiento_id': row[0]}
+            for row in rows
+        }
+        return [resultados[fila[0]] for fila in lote if fila[0] in resultados]
 
-        # Registrar movimiento en historial
-        StockMovement.create(producto_id, -cantidad_vendida, "VENTA", f"Venta de {cantidad_vendida} unidades")
+    @staticmethod
+    def get_status_snapshot(threshold=5):
+        """
+        Stock y estado de todos los productos en una sola consulta
+
+        Los productos sin fila en stock cuentan como 0 unidades.
+
+        Returns:
+            dict: {producto_id: (cantidad_disponible, estado)} con estado
+                  'sin_stock', 'bajo' (<= threshold) o 'disponible'
+        """
+        query = '''SELECT p.id, COALESCE(s.cantidad_disponible, 0) AS cantidad,
+                         CASE WHEN COALESCE(s.cantidad_disponible, 0) <= 0 THEN 'sin_stock'
+                              WHEN s.cantidad_disponible <= ? THEN 'bajo'
+                              ELSE 'disponible' END
+                  FROM productos p
+                  LEFT JOIN stock s ON s.producto_id = p.id'''
+        return {producto_id: (cantidad, estado)
+                for producto_id, cantidad, estado in db.execute_query(query, (threshold,))}
 
     @staticmethod
     def get_low_stock(threshold=5):
@@ -411,19 +716,23 @@ class Stock:
 class StockMovement:
     """Clase para registrar movimientos de stock"""
     def __init__(self, id=None, producto_id=None, cantidad=0, tipo="MANUAL",
-                 descripcion="", fecha_movimiento=None):
+                 descripcion="", fecha_movimiento=None, balance_after=None):
         self.id = id
         self.producto_id = producto_id
         self.cantidad = cantidad  # Positivo para entrada, negativo para salida
         self.tipo = tipo  # MANUAL, VENTA, AJUSTE, INICIAL
         self.descripcion = descripcion
         self.fecha_movimiento = fecha_movimiento
+        self.balance_after = balance_after  # Stock del producto tras el movimiento
 
     def save(self):
-        """Guarda el movimiento de stock"""
-        query = '''INSERT INTO stock_movements (producto_id, cantidad, tipo, descripcion)
-                  VALUES (?, ?, ?, ?)'''
-        params = (self.producto_id, self.cantidad, self.tipo, self.descripcion)
+        """
+        Anota el movimiento sin modificar el stock (para cambios de stock
+        usar Stock.apply_changes); el saldo es el stock actual del producto
+        """
+        query = '''INSERT INTO stock_movements (producto_id, cantidad, tipo, descripcion, balance_after)
+                  VALUES (?, ?, ?, ?, (SELECT cantidad_disponible FROM stock WHERE producto_id=?))'''
+        params = (self.producto_id, self.cantidad, self.tipo, self.descripcion, self.producto_id)
         self.id = db.execute_query(query, params)
 
     @staticmethod
@@ -441,17 +750,18 @@ class StockMovement:
     @staticmethod
     def get_by_product(producto_id, limit=10):
         """Obtiene los últimos movimientos de un producto"""
-        query = '''SELECT id, producto_id, cantidad, tipo, descripcion, fecha_movimiento
+        query = '''SELECT id, producto_id, cantidad, tipo, descripcion, fecha_movimiento, balance_after
                   FROM stock_movements
                   WHERE producto_id=?
-                  ORDER BY fecha_movimiento DESC
+                  ORDER BY id DESC
                   LIMIT ?'''
         results = db.execute_query(query, (producto_id, limit))
         movements = []
         for row in results:
             movement = StockMovement(
                 id=row[0], producto_id=row[1], cantidad=row[2],
-                tipo=row[3], descripcion=row[4], fecha_movimiento=row[5]
+                tipo=row[3], descripcion=row[4], fecha_movimiento=row[5],
+                balance_after=row[6]
             )
             movements.append(movement)
         return movements
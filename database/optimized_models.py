@@ -4,8 +4,9 @@
 Modèles optimisés pour améliorer les performances
 """
 
-from .database import db
+from . import models
 from .models import Factura, FacturaItem, Producto, Stock
+from utils import money
 from utils.performance_optimizer import performance_monitor, performance_optimizer
 
 
@@ -25,7 +26,7 @@ class OptimizedFactura(Factura):
             ORDER BY f.fecha_factura DESC, f.numero_factura DESC
         """
         
-        facturas_results = db.execute_query(facturas_query)
+        facturas_results = models.db.execute_query(facturas_query)
         
         if not facturas_results:
             return []
@@ -47,7 +48,7 @@ class OptimizedFactura(Factura):
                 ORDER BY fi.factura_id, fi.id
             """
             
-            items_results = db.execute_query(items_query, factura_ids)
+            items_results = models.db.execute_query(items_query, factura_ids)
         else:
             items_results = []
         
@@ -103,7 +104,7 @@ class OptimizedFactura(Factura):
             ORDER BY fecha_factura DESC, numero_factura DESC
         """
         
-        results = db.execute_query(query)
+        results = models.db.execute_query(query)
         facturas_summary = []
         
         for row in results:
@@ -117,38 +118,211 @@ class OptimizedFactura(Factura):
         
         return facturas_summary
 
+    @staticmethod
+    def _build_filters(filters):
+        """Construit la clause WHERE (sans le mot-clé) et ses paramètres à partir des filtres"""
+        conditions = []
+        params = []
+        filters = filters or {}
+
+        texto = (filters.get('texto') or "").strip()
+        if texto:
+            conditions.append("(numero_factura LIKE ? OR nombre_cliente LIKE ?)")
+            params.extend([f"%{texto}%", f"%{texto}%"])
+        if filters.get('fecha_desde'):
+            conditions.append("fecha_factura >= ?")
+            params.append(filters['fecha_desde'])
+        if filters.get('fecha_hasta'):
+            conditions.append("fecha_factura <= ?")
+            params.append(filters['fecha_hasta'])
+
+        return conditions, params
+
+    @staticmethod
+    def count(filters=None):
+        """Nombre de facturas (compteur maintenu par triggers si aucun filtre)"""
+        conditions, params = OptimizedFactura._build_filters(filters)
+        if not conditions:
+            results = models.db.execute_query("SELECT valor FROM contadores WHERE nombre = 'facturas'")
+            if results:
+                return results[0][0]
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return models.db.execute_query(f"SELECT COUNT(*) FROM facturas {where}", params)[0][0]
+
+    @staticmethod
+    @performance_monitor.time_function("page_facturas")
+    def page(after=None, limit=50, filters=None, with_total=True):
+        """
+        Obtient une page de facturas par pagination par clé (keyset)
+
+        Les facturas sont triées par (fecha_factura, numero_factura) décroissants;
+        le coût ne dépend pas de la position de la page, contrairement à OFFSET.
+
+        Args:
+            after: curseur (fecha_factura, numero_factura) de la dernière ligne de la
+                   page précédente, ou None pour la première page
+            limit: nombre de lignes par page
+            filters: dict optionnel avec 'texto', 'fecha_desde', 'fecha_hasta'
+            with_total: calculer aussi le nombre total de facturas
+
+        Returns:
+            dict: {'rows': [...], 'next_cursor': tuple|None, 'total': int|None}
+        """
+        conditions, params = OptimizedFactura._build_filters(filters)
+        if after is not None:
+            conditions.append("(fecha_factura, numero_factura) < (?, ?)")
+            params.extend(after)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        query = f"""
+            SELECT id, numero_factura, fecha_factura, nombre_cliente, total_factura
+            FROM facturas
+            {where}
+            ORDER BY fecha_factura DESC, numero_factura DESC
+            LIMIT ?
+        """
+        # Une ligne de plus pour savoir s'il existe une page suivante
+        results = models.db.execute_query(query, params + [limit + 1])
+
+        rows = [{
+            'id': row[0],
+            'numero_factura': row[1],
+            'fecha_factura': row[2],
+            'nombre_cliente': row[3],
+            'total_factura': row[4]
+        } for row in results[:limit]]
+
+        next_cursor = None
+        if len(results) > limit:
+            last = rows[-1]
+            next_cursor = (last['fecha_factura'], last['numero_factura'])
+
+        return {
+            'rows': rows,
+            'next_cursor': next_cursor,
+            'total': OptimizedFactura.count(filters) if with_total else None
+        }
+
 
 class OptimizedStock:
     """Version optimisée de Stock qui évite les requêtes N+1"""
+
+    STOCK_COLUMNS = """
+        s.producto_id, s.cantidad_disponible, s.fecha_actualizacion,
+        p.nombre, p.referencia, p.precio, p.categoria, p.descripcion
+    """
+
+    @staticmethod
+    def _stock_dict(row):
+        """Dictionnaire d'une ligne de stock (colonnes STOCK_COLUMNS)"""
+        return {
+            'producto_id': row[0],
+            'cantidad': row[1] or 0,
+            'fecha_actualizacion': row[2] or "N/A",
+            'nombre': row[3] or "",
+            'referencia': row[4] or "",
+            'precio': row[5] or 0.0,
+            'categoria': row[6] or "",
+            'descripcion': row[7] or ""
+        }
     
     @staticmethod
     @performance_monitor.time_function("get_all_stock_optimized")
     def get_all_optimized():
         """Obtient tout le stock avec informations complètes en une seule requête"""
-        query = """
-            SELECT s.producto_id, s.cantidad_disponible, s.fecha_actualizacion,
-                   p.nombre, p.referencia, p.precio, p.categoria, p.descripcion
+        query = f"""
+            SELECT {OptimizedStock.STOCK_COLUMNS}
             FROM stock s 
             JOIN productos p ON s.producto_id = p.id 
             ORDER BY p.nombre
         """
         
-        results = db.execute_query(query)
-        stock_data = []
-        
-        for row in results:
-            stock_data.append({
-                'producto_id': row[0],
-                'cantidad': row[1] or 0,
-                'fecha_actualizacion': row[2] or "N/A",
-                'nombre': row[3] or "",
-                'referencia': row[4] or "",
-                'precio': row[5] or 0.0,
-                'categoria': row[6] or "",
-                'descripcion': row[7] or ""
-            })
-        
-        return stock_data
+        results = models.db.execute_query(query)
+        return [OptimizedStock._stock_dict(row) for row in results]
+
+    @staticmethod
+    def change_version():
+        """
+        Marque actuelle des changements de stock: (dernier mouvement, dernière version)
+
+        À lire avant un chargement complet: les changements suivants seront
+        ceux renvoyés par get_changes_since(marque).
+        """
+        results = models.db.execute_query("""
+            SELECT (SELECT COALESCE(MAX(id), 0) FROM stock_movements),
+                   (SELECT COALESCE(MAX(version), 0) FROM stock_cambios)
+        """)
+        return tuple(results[0]) if results else (0, 0)
+
+    @staticmethod
+    @performance_monitor.time_function("get_stock_changes_since")
+    def get_changes_since(marca):
+        """
+        Lignes de stock modifiées depuis une marque de change_version()
+
+        Les ventes et ajustements viennent du livre de mouvements (id > dernier
+        mouvement lu), le reste du registre stock_cambios. Un changement validé
+        pendant la lecture peut être renvoyé deux fois, jamais perdu.
+
+        Returns:
+            dict: {'version': nouvelle marque, 'filas': lignes modifiées ou nouvelles
+                   (même format que get_all_optimized), 'eliminados': ids disparus}
+        """
+        cambios = {'version': OptimizedStock.change_version(), 'filas': [], 'eliminados': []}
+        if cambios['version'] == tuple(marca):
+            return cambios
+
+        query = f"""
+            WITH cambiados AS (
+                SELECT producto_id FROM stock_movements WHERE id > ?
+                UNION
+                SELECT producto_id FROM stock_cambios WHERE version > ?
+            )
+            SELECT c.producto_id, s.producto_id IS NOT NULL AND p.id IS NOT NULL,
+                   {OptimizedStock.STOCK_COLUMNS}
+            FROM cambiados c
+            LEFT JOIN stock s ON s.producto_id = c.producto_id
+            LEFT JOIN productos p ON p.id = c.producto_id
+            ORDER BY c.producto_id
+        """
+        for row in models.db.execute_query(query, tuple(marca)):
+            if row[1]:
+                cambios['filas'].append(OptimizedStock._stock_dict(row[2:]))
+            else:
+                cambios['eliminados'].append(row[0])
+        return cambios
+
+    @staticmethod
+    def merge_changes(stock_data, cambios):
+        """
+        Applique des changements (get_changes_since) à une liste de get_all_optimized
+
+        Les dictionnaires existants sont mis à jour sur place, les nouveaux
+        ajoutés à la fin et les disparus retirés de la liste.
+
+        Returns:
+            dict: {'actualizados': [...], 'nuevos': [...], 'eliminados': [...]} (dictionnaires)
+        """
+        resultado = {'actualizados': [], 'nuevos': [], 'eliminados': []}
+        if not cambios['filas'] and not cambios['eliminados']:
+            return resultado
+
+        por_id = {item['producto_id']: item for item in stock_data}
+        for fila in cambios['filas']:
+            item = por_id.get(fila['producto_id'])
+            if item is None:
+                stock_data.append(fila)
+                resultado['nuevos'].append(fila)
+            else:
+                item.update(fila)
+                resultado['actualizados'].append(item)
+
+        eliminados = {producto_id for producto_id in cambios['eliminados'] if producto_id in por_id}
+        if eliminados:
+            resultado['eliminados'] = [por_id[producto_id] for producto_id in eliminados]
+            stock_data[:] = [item for item in stock_data if item['producto_id'] not in eliminados]
+        return resultado
     
     @staticmethod
     @performance_optimizer.cache_result("low_stock", ttl=300)
@@ -163,7 +337,7 @@ class OptimizedStock:
             ORDER BY s.cantidad_disponible ASC, p.nombre
         """
         
-        results = db.execute_query(query, (threshold,))
+        results = models.db.execute_query(query, (threshold,))
         low_stock_data = []
         
         for row in results:
@@ -195,7 +369,7 @@ class OptimizedProducto:
             ORDER BY p.nombre
         """
         
-        results = db.execute_query(query)
+        results = models.db.execute_query(query)
         productos = []
         
         for row in results:
@@ -223,7 +397,7 @@ class OptimizedProducto:
             ORDER BY p.nombre
         """
         
-        results = db.execute_query(query)
+        results = models.db.execute_query(query)
         productos_summary = []
         
         for row in results:
@@ -243,36 +417,26 @@ class BatchOperations:
     
     @staticmethod
     def update_multiple_stock(updates: list):
-        """Met à jour plusieurs stocks en une seule transaction"""
-        if not updates:
-            return
-        
-        # Préparer la requête batch
-        query = """
-            UPDATE stock 
-            SET cantidad_disponible = ?, fecha_actualizacion = CURRENT_TIMESTAMP
-            WHERE producto_id = ?
         """
+        Point d'entrée unique de l'interface pour modifier le stock
+
+        Chaque mise à jour contient producto_id et soit 'delta' (variation),
+        soit 'cantidad' (nouveau stock absolu), plus 'tipo' et 'descripcion'
+        optionnels. Tout le lot est appliqué et noté dans stock_movements en
+        une seule transaction (voir Stock.apply_changes).
+
+        Returns:
+            list: par produit, producto_id, cantidad, stock_antes, stock_despues et movimiento_id
+        """
+        if not updates:
+            return []
         
-        # Préparer les paramètres
-        params_list = [(update['cantidad'], update['producto_id']) for update in updates]
+        resultados = Stock.apply_changes(updates)
         
-        # Exécuter en transaction
-        try:
-            db.connection.execute("BEGIN TRANSACTION")
-            
-            for params in params_list:
-                db.execute_query(query, params)
-            
-            db.connection.execute("COMMIT")
-            
-            # Vider le cache lié au stock
-            performance_optimizer.clear_cache("stock")
-            performance_optimizer.clear_cache("low_stock")
-            
-        except Exception as e:
-            db.connection.execute("ROLLBACK")
-            raise e
+        # Vider le cache lié au stock
+        performance_optimizer.clear_cache("stock")
+        performance_optimizer.clear_cache("productos_summary")
+        return resultados
     
     @staticmethod
     def create_multiple_stock_movements(movements: list):
@@ -290,17 +454,60 @@ class BatchOperations:
             for mov in movements
         ]
         
-        try:
-            db.connection.execute("BEGIN TRANSACTION")
-            
-            for params in params_list:
-                db.execute_query(query, params)
-            
-            db.connection.execute("COMMIT")
-            
-        except Exception as e:
-            db.connection.execute("ROLLBACK")
-            raise e
+        with models.db.transaction() as conn:
+            conn.executemany(query, params_list)
+
+    @staticmethod
+    @performance_monitor.time_function("revalidate_invoice_totals")
+    def revalidate_invoice_totals(desde=None, hasta=None):
+        """
+        Recalcule au centime près les totaux des facturas d'une période
+
+        Les lignes sont lues en une requête et calculées en lot (money.calculate_many)
+        avec la TVA par taux; le résultat est comparé aux totaux enregistrés.
+
+        Args:
+            desde, hasta: dates 'AAAA-MM-JJ' incluses (optionnelles)
+
+        Returns:
+            list: facturas dont les totaux diffèrent, avec 'factura_id', 'numero_factura',
+                  'guardado' et 'calculado' ({'subtotal', 'total_iva', 'total'} en euros)
+        """
+        conditions, params = [], []
+        if desde:
+            conditions.append("f.fecha_factura >= ?")
+            params.append(desde)
+        if hasta:
+            conditions.append("f.fecha_factura <= ?")
+            params.append(hasta)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        lineas = money.LineColumns.from_rows(models.db.execute_query(f"""
+            SELECT fi.factura_id, fi.precio_unitario, fi.cantidad, fi.iva_aplicado, fi.descuento
+            FROM factura_items fi
+            JOIN facturas f ON f.id = fi.factura_id
+            {where}
+        """, params))
+        calculados = money.invoice_totals_many(lineas)
+        vacia = money.aggregate_by_rate(())
+
+        diferencias = []
+        for factura_id, numero, subtotal, total_iva, total in models.db.execute_query(f"""
+            SELECT f.id, f.numero_factura, f.subtotal, f.total_iva, f.total_factura
+            FROM facturas f {where}
+            ORDER BY f.fecha_factura, f.id
+        """, params):
+            guardado = {'subtotal': money.to_cents(subtotal or 0), 'total_iva': money.to_cents(total_iva or 0),
+                        'total': money.to_cents(total or 0)}
+            calculado = calculados.get(factura_id, vacia)
+            if any(guardado[campo] != calculado[campo] for campo in guardado):
+                diferencias.append({
+                    'factura_id': factura_id,
+                    'numero_factura': numero,
+                    'guardado': {campo: money.from_cents(valor) for campo, valor in guardado.items()},
+                    'calculado': {campo: money.from_cents(calculado[campo]) for campo in guardado},
+                })
+        return diferencias
 
 
 class QueryOptimizer:
@@ -316,10 +523,10 @@ class QueryOptimizer:
         
         # Exécuter EXPLAIN QUERY PLAN
         explain_query = f"EXPLAIN QUERY PLAN {query}"
-        explain_results = db.execute_query(explain_query, params)
+        explain_results = models.db.execute_query(explain_query, params)
         
         # Exécuter la requête réelle
-        results = db.execute_query(query, params)
+        results = models.db.execute_query(query, params)
         
         end_time = time.time()
         execution_time = end_time - start_time
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Catálogo de productos en memoria compartido por todo el proceso
+
+Se carga con una sola consulta la primera vez que se usa y después se mantiene
+al día con los avisos de Producto.save() y Producto.delete(), sin volver a
+leer la tabla. Las ventanas, los autocompletados y los items de factura
+obtienen los productos de aquí en lugar de consultar la base de datos.
+
+Los productos se entregan siempre como copias: las ventanas modifican el
+objeto seleccionado antes de guardarlo y no deben alterar el catálogo.
+"""
+
+import copy
+import threading
+from . import models
+from utils.logger import get_logger
+
+logger = get_logger("product_catalog")
+
+
+class ProductCatalog:
+    """Productos indexados por id, referencia y categoría"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._db = None          # Base de datos desde la que se cargó (None = sin cargar)
+        self._por_id = {}
+        self._por_referencia = {}
+        self._por_categoria = {}
+        self._ordenados = None   # Lista por nombre, se recalcula tras cada cambio
+        # Aumenta con cada cambio: permite saber si una lista derivada está al día
+        self.version = 0
+        models.Producto.subscribe(self._on_producto_event)
+
+    def _ensure_loaded(self):
+        """Carga el catálogo si no está cargado o si ha cambiado la base de datos activa"""
+        if self._db is not models.db:
+            self.load()
+
+    def load(self):
+        """Lee todos los productos de la base de datos y reconstruye los índices"""
+        with self._lock:
+            productos = models.Producto.get_all()
+            self._por_id = {}
+            self._por_referencia = {}
+            self._por_categoria = {}
+            for producto in productos:
+                self._indexar(producto)
+            self._ordenados = productos
+            self._db = models.db
+            self.version += 1
+            logger.info(f"Catálogo de productos cargado: {len(productos)} productos")
+
+    def invalidate(self):
+        """Descarta el catálogo; se volverá a cargar en el próximo acceso"""
+        with self._lock:
+            self._db = None
+
+    def _indexar(self, producto):
+        self._por_id[producto.id] = producto
+        self._por_referencia[producto.referencia] = producto
+        self._por_categoria.setdefault(producto.categoria or "", {})[producto.id] = producto
+
+    def _desindexar(self, producto_id):
+        producto = self._por_id.pop(producto_id, None)
+        if producto is None:
+            return
+        if self._por_referencia.get(producto.referencia) is producto:
+            del self._por_referencia[producto.referencia]
+        categoria = self._por_categoria.get(producto.categoria or "", {})
+        categoria.pop(producto_id, None)
+        if not categoria:
+            self._por_categoria.pop(producto.categoria or "", None)
+
+    def _on_producto_event(self, evento, producto):
+        """Aplica un aviso de Producto.save()/delete() al catálogo ya cargado"""
+        with self._lock:
+            # Sin cargar (o cargado de otra base de datos) no hay nada que parchear
+            if self._db is not models.db:
+                return
+            self._desindexar(producto.id)
+            if evento == "guardado":
+                self._indexar(copy.copy(producto))
+            self._ordenados = None
+            self.version += 1
+            logger.debug(f"Catálogo de productos: producto {producto.id} {evento}")
+
+    def current_version(self):
+        """Versión del catálogo cargado (cambia con cada recarga o modificación)"""
+        with self._lock:
+            self._ensure_loaded()
+            return self.version
+
+    def get_all(self):
+        """Todos los productos ordenados por nombre (como Producto.get_all)"""
+        with self._lock:
+            self._ensure_loaded()
+            if self._ordenados is None:
+                self._ordenados = sorted(self._por_id.values(), key=lambda p: p.nombre)
+            return [copy.copy(producto) for producto in self._ordenados]
+
+    def get(self, producto_id):
+        """Producto por ID, o None"""
+        with self._lock:
+            self._ensure_loaded()
+            producto = self._por_id.get(producto_id)
+            return copy.copy(producto) if producto else None
+
+    def get_by_referencia(self, referencia):
+        """Producto por referencia, o None"""
+        with self._lock:
+            self._ensure_loaded()
+            producto = self._por_referencia.get(referencia)
+            return copy.copy(producto) if producto else None
+
+    def get_by_categoria(self, categoria):
+        """Productos de una categoría ordenados por nombre"""
+        with self._lock:
+            self._ensure_loaded()
+            productos = self._por_categoria.get(categoria or "", {}).values()
+            return [copy.copy(producto) for producto in sorted(productos, key=lambda p: p.nombre)]
+
+    def get_categorias(self):
+        """Categorías con al menos un producto, en orden alfabético"""
+        with self._lock:
+            self._ensure_loaded()
+            return sorted(categoria for categoria in self._por_categoria if categoria)
+
+
+# Instancia global del catálogo
+product_catalog = ProductCatalog()
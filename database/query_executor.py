@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+Ejecución de consultas fuera del hilo de la interfaz
+
+Un pequeño pool de hilos ejecuta el trabajo de base de datos y devuelve
+futures. Cada hilo del pool usa su propia conexión SQLite (la conexión
+persistente por hilo de Database), de modo que las consultas no compiten
+por la conexión del hilo de Tk.
+
+Los resultados vuelven a la interfaz por una cola: el hilo del pool solo
+deja ahí el future terminado y un bucle after() del hilo de Tk la lee, de
+modo que los callbacks de éxito o error (y cualquier llamada a Tk) se
+ejecutan siempre en el hilo de Tk, nunca en el del pool.
+"""
+
+import queue
+import threading
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+from tkinter import TclError
+from . import models
+from utils.logger import get_logger
+
+logger = get_logger("query_executor")
+
+
+class AsyncTask:
+    """Trabajo enviado al pool cuyo resultado puede descartarse (cancelación)"""
+
+    def __init__(self, future, key=None):
+        self.future = future
+        self.key = key
+        # La función puede consultarlo para detenerse antes (opcional)
+        self.cancel_event = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def cancel(self):
+        """Cancela el trabajo si aún no ha empezado y, en todo caso, descarta su resultado"""
+        self.cancel_event.set()
+        self.future.cancel()
+
+    def done(self):
+        return self.future.done()
+
+
+class QueryExecutor:
+    """Pool de hilos para el trabajo de base de datos"""
+
+    MAX_WORKERS = 2
+
+    def __init__(self, database=None, max_workers=None):
+        """
+        Args:
+            database: base de datos a usar (por defecto la de los modelos)
+            max_workers: hilos del pool (por defecto MAX_WORKERS)
+        """
+        self._database = database
+        self.max_workers = max_workers or self.MAX_WORKERS
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @property
+    def db(self):
+        """Base de datos activa (la misma instancia que usan los modelos)"""
+        return self._database or models.db
+
+    def _get_pool(self):
+        """Crea el pool la primera vez que se usa"""
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                thread_name_prefix="db-worker")
+            return self._pool
+
+    def submit(self, func, *args, **kwargs):
+        """Ejecuta func(*args, **kwargs) en un hilo del pool y devuelve su Future"""
+        return self._get_pool().submit(func, *args, **kwargs)
+
+    def run_query(self, query, params=None):
+        """Ejecuta una consulta con la conexión propia de un hilo del pool"""
+        return self.submit(self._execute, query, params)
+
+    def _execute(self, query, params):
+        return self.db.execute_query(query, params)
+
+    def shutdown(self, wait=True):
+        """Detiene el pool descartando el trabajo pendiente (se recrea si se vuelve a usar)"""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=True)
+
+
+# Milisegundos entre dos comprobaciones de un future pendiente desde el hilo de Tk
+POLL_INTERVAL_MS = 50
+
+
+def call_when_done(future, widget, on_success=None, on_error=None, task=None):
+    """
+    Entrega el resultado de un Future en el hilo de Tk
+
+    Debe llamarse desde el hilo de Tk. Cuando el future termina, el hilo que
+    lo completa solo lo deja en una cola (queue.Queue es segura entre hilos);
+    un bucle widget.after(POLL_INTERVAL_MS, ...) que corre en el hilo de Tk
+    la lee y llama a on_success(resultado) u on_error(excepción). El bucle
+    se detiene sin llamar a nada si la tarea se cancela o si el widget ya
+    no existe.
+    """
+    terminados = queue.Queue()
+    future.add_done_callback(terminados.put)
+
+    def revisar():
+        if task is not None and task.cancelled:
+            return
+        try:
+            f = terminados.get_nowait()
+        except queue.Empty:
+            programar()
+            return
+        entregar(f)
+
+    def entregar(f):
+        try:
+            resultado = f.result()
+        except CancelledError:
+            return
+        except Exception as e:
+            if on_error is None:
+                logger.error(f"Error en trabajo en segundo plano: {e}")
+                return
+            on_error(e)
+            return
+        if on_success is not None:
+            on_success(resultado)
+
+    def programar():
+        try:
+            widget.after(POLL_INTERVAL_MS, revisar)
+        except (TclError, RuntimeError) as e:
+            # La ventana (o el intérprete Tcl) ya no existe
+            logger.debug(f"Resultado descartado, ventana cerrada: {e}")
+
+    programar()
+    return future
+
+
+# Instancia global del servicio
+query_executor = QueryExecutor()
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Búsqueda de texto completo sobre productos, facturas y clientes
+
+Usa los índices FTS5 creados por las migraciones 4 y 5 (productos_fts,
+facturas_fts y clientes_fts), que ignoran mayúsculas y acentos ("Garcia"
+encuentra "García") y se mantienen sincronizados mediante triggers.
+Los resultados se ordenan por relevancia (bm25). Los fragmentos de número
+de factura se buscan en el índice de trigramas de la migración 11
+(facturas_numero_fts).
+
+Si el SQLite enlazado no incluye FTS5, match() devuelve None y quien llama
+debe recurrir a su búsqueda LIKE de siempre.
+"""
+
+import re
+from . import models
+from utils.logger import get_logger
+
+logger = get_logger("search_index")
+
+# Secuencias de letras/dígitos, igual que las separa el tokenizador unicode61
+_TOKEN_RE = re.compile(r"[^\W_]+", re.UNICODE)
+
+
+class SearchIndex:
+    """Construye consultas MATCH y resuelve búsquedas rápidas sobre los índices FTS5"""
+
+    PRODUCTOS = 'productos_fts'
+    FACTURAS = 'facturas_fts'
+    CLIENTES = 'clientes_fts'
+    FACTURAS_NUMERO = 'facturas_numero_fts'
+
+    # Los trigramas no encuentran fragmentos más cortos
+    MIN_FRAGMENTO = 3
+
+    # Pesos bm25 en el orden de las columnas de cada índice: una coincidencia en la
+    # referencia o el número de factura pesa más que en la descripción o el email
+    PRODUCTOS_RANK = "bm25(productos_fts, 5.0, 10.0, 2.0, 1.0)"
+    FACTURAS_RANK = "bm25(facturas_fts, 10.0, 5.0, 3.0, 1.0, 1.0)"
+    CLIENTES_RANK = "bm25(clientes_fts, 10.0, 10.0, 3.0, 3.0)"
+
+    @property
+    def db(self):
+        """Base de datos activa (la misma instancia que usan los modelos)"""
+        return models.db
+
+    def is_available(self, fts_table):
+        """Indica si el índice FTS5 existe en la base de datos activa"""
+        results = self.db.execute_query(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (fts_table,)
+        )
+        return bool(results)
+
+    @staticmethod
+    def build_match_query(text, columns=None):
+        """
+        Convierte el texto del usuario en una expresión MATCH de FTS5
+
+        Cada palabra se entrecomilla (los operadores y comillas del usuario no se
+        interpretan) y se busca como prefijo; todas las palabras deben aparecer.
+
+        Args:
+            text: texto introducido por el usuario
+            columns: columnas a las que limitar la búsqueda (None = todas)
+
+        Returns:
+            str o None si el texto no contiene ninguna palabra
+        """
+        tokens = _TOKEN_RE.findall(text or "")
+        if not tokens:
+            return None
+
+        expression = ' '.join(f'"{token}"*' for token in tokens)
+        if columns:
+            return f"{{{' '.join(columns)}}} : ({expression})"
+        return expression
+
+    def match(self, text, fts_table, columns=None):
+        """Expresión MATCH para fts_table, o None si no hay índice o palabras que buscar"""
+        expression = self.build_match_query(text, columns)
+        if expression is None or not self.is_available(fts_table):
+            return None
+        return expression
+
+    def fragment_match(self, text, fts_table=FACTURAS_NUMERO):
+        """
+        Expresión MATCH que busca el texto como fragmento en un índice de trigramas
+
+        Returns:
+            str o None si el texto es demasiado corto o no hay índice
+        """
+        text = (text or "").strip()
+        if len(text) < self.MIN_FRAGMENTO or not self.is_available(fts_table):
+            return None
+        return '"' + text.replace('"', '""') + '"'
+
+    def _ranked_ids(self, fts_table, rank, text, limit):
+        """IDs de las filas que coinciden con el texto ordenados por rank (None sin índice)"""
+        expression = self.match(text, fts_table)
+        if expression is None:
+            return None
+
+        # Se puntúan todas las coincidencias y el LIMIT solo conserva las mejores
+        results = self.db.execute_query(
+            f"SELECT rowid FROM {fts_table} WHERE {fts_table} MATCH ? ORDER BY {rank} LIMIT ?",
+            (expression, limit)
+        )
+        return [row[0] for row in results]
+
+    def search_producto_ids(self, text, limit=20):
+        """
+        IDs de productos que coinciden con el texto, del más al menos relevante
+
+        Con limit=-1 se devuelven todas las coincidencias.
+
+        Returns:
+            list o None si no se puede usar el índice (el llamante filtra por su cuenta)
+        """
+        return self._ranked_ids(self.PRODUCTOS, self.PRODUCTOS_RANK, text, limit)
+
+    def search_cliente_ids(self, text, limit=20):
+        """IDs de clientes que coinciden con el texto, igual que search_producto_ids"""
+        return self._ranked_ids(self.CLIENTES, self.CLIENTES_RANK, text, limit)
+
+
+# Instancia global del servicio
+search_index = SearchIndex()
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Informes de IVA a partir del desglose por tipo de cada factura
+
+Las consultas leen factura_impuestos (una fila por factura y tipo de IVA,
+mantenida al guardar la factura) en lugar de agrupar todos los items, y
+suman los importes en céntimos enteros antes de pasarlos a euros.
+"""
+
+from . import models
+from utils import money
+from utils.logger import get_logger
+
+logger = get_logger("tax_report")
+
+# Primer y último día de cada trimestre (modelo 303)
+TRIMESTRES = {
+    1: ("01-01", "03-31"),
+    2: ("04-01", "06-30"),
+    3: ("07-01", "09-30"),
+    4: ("10-01", "12-31"),
+}
+
+
+class TaxReport:
+    """Resúmenes de bases y cuotas de IVA por tipo impositivo"""
+
+    @property
+    def db(self):
+        """Base de datos activa (la misma instancia que usan los modelos)"""
+        return models.db
+
+    def get_breakdown(self, factura_id):
+        """
+        Desglose por tipo de IVA de una factura
+
+        Returns:
+            list: [{'tipo', 'base', 'cuota'}] ordenado por tipo, en euros y porcentaje
+        """
+        results = self.db.execute_query(
+            "SELECT tipo, base, cuota FROM factura_impuestos WHERE factura_id = ? ORDER BY tipo",
+            (factura_id,)
+        )
+        return [self._fila(tipo, base, cuota) for tipo, base, cuota in results]
+
+    def summary_by_rate(self, desde, hasta):
+        """
+        Bases y cuotas por tipo de IVA de las facturas de un periodo
+
+        Args:
+            desde, hasta: fechas 'AAAA-MM-DD' incluidas
+
+        Returns:
+            dict: {'desde', 'hasta', 'facturas', 'base', 'cuota', 'total',
+                   'por_tipo': [{'tipo', 'base', 'cuota', 'facturas'}]} en euros
+        """
+        results = self.db.execute_query('''
+            SELECT i.tipo, SUM(i.base), SUM(i.cuota), COUNT(*)
+            FROM facturas f
+            JOIN factura_impuestos i ON i.factura_id = f.id
+            WHERE f.fecha_factura BETWEEN ? AND ?
+            GROUP BY i.tipo
+            ORDER BY i.tipo
+        ''', (desde, hasta))
+        num_facturas = self.db.execute_query(
+            "SELECT COUNT(*) FROM facturas WHERE fecha_factura BETWEEN ? AND ?", (desde, hasta)
+        )[0][0]
+
+        por_tipo = []
+        base_total = cuota_total = 0
+        for tipo, base, cuota, facturas in results:
+            fila = self._fila(tipo, base, cuota)
+            fila['facturas'] = facturas
+            por_tipo.append(fila)
+            base_total += base
+            cuota_total += cuota
+
+        return {
+            'desde': desde,
+            'hasta': hasta,
+            'facturas': num_facturas,
+            'base': money.from_cents(base_total),
+            'cuota': money.from_cents(cuota_total),
+            'total': money.from_cents(base_total + cuota_total),
+            'por_tipo': por_tipo,
+        }
+
+    def quarterly_summary(self, anio, trimestre):
+        """
+        Resumen de IVA repercutido de un trimestre (como en el modelo 303)
+
+        Args:
+            anio: año, p. ej. 2025
+            trimestre: 1 a 4
+
+        Returns:
+            dict: como summary_by_rate, con 'anio' y 'trimestre'
+        """
+        if trimestre not in TRIMESTRES:
+            raise ValueError(f"Trimestre no válido: {trimestre}")
+
+        inicio, fin = TRIMESTRES[trimestre]
+        resumen = self.summary_by_rate(f"{anio}-{inicio}", f"{anio}-{fin}")
+        resumen['anio'] = anio
+        resumen['trimestre'] = trimestre
+        logger.debug(f"Resumen de IVA {trimestre}T {anio}: {resumen['facturas']} facturas")
+        return resumen
+
+    @staticmethod
+    def _fila(tipo, base, cuota):
+        """Fila de desglose en euros a partir de las unidades enteras guardadas"""
+        return {
+            'tipo': tipo / money.ESCALA_PORCENTAJE,
+            'base': money.from_cents(base),
+            'cuota': money.from_cents(cuota),
+        }
+
+
+# Instancia global del servicio
+tax_report = TaxReport()
@@ -6,47 +6,106 @@ Facturación Fácil
 Aplicación de facturación simple con gestión de productos, stock y clientes.
 """
 
+import argparse
+import multiprocessing
 import sys
 import os
+import threading
+import time
 from datetime import datetime
 
 # Agregar el directorio actual al path para importar módulos
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from ui.main_window import MainWindow
-from database.database import db
-from utils.logger import app_logger, log_info, log_error, log_exception
+from utils.startup_profile import StartupProfiler
 
-def main():
-    """Función principal de la aplicación"""
+# La ventana principal, la base de datos y el resto de módulos se importan
+# dentro de main() para que --profile-startup pueda medir cada import
+
+def parse_args(argv=None):
+    """Argumentos de línea de comandos"""
+    parser = argparse.ArgumentParser(description="Facturación Fácil")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="mostrar el tiempo de cada fase del arranque y de los imports")
+    return parser.parse_args(argv)
+
+def aplicar_parche_dialogos():
+    """Aplicar el parche FORZADO para asegurar que todos los mensajes tengan botón copiar"""
+    from utils.logger import log_info, log_error
     try:
-        # Inicializar logging
-        app_logger.log_startup_info()
-        log_info("=== Iniciando aplicación Facturación Fácil ===")
+        import utils.force_copyable_dialogs  # Se aplica automáticamente
+        log_info("🔧 Parche FORZADO de mensajes copiables aplicado correctamente")
+        log_info("🎯 GARANTÍA: Todos los messagebox tendrán botón copiar")
+    except Exception as e:
+        log_error(f"❌ Error aplicando parche forzado: {e}")
+        # Fallback al parche normal
+        try:
+            from utils.ensure_copyable_messages import patch_messagebox
+            patch_messagebox()
+            log_info("✅ Parche normal de mensajes copiables aplicado como fallback")
+        except Exception as e2:
+            log_error(f"⚠️  Advertencia: No se pudo aplicar ningún parche de mensajes: {e2}")
+
+def iniciar_base_datos(db, profiler):
+    """
+    Aplicar las migraciones en un hilo mientras se construye la ventana
 
-        # Aplicar parche FORZADO para asegurar que todos los mensajes tengan botón copiar
+    La primera consulta (al abrir cualquier ventana) espera en
+    db.ensure_initialized() si el hilo aún no ha terminado; si el hilo
+    falla, esa consulta vuelve a intentarlo y muestra el error.
+    """
+    from utils.logger import log_info, log_exception
+
+    def inicializar():
+        t0 = time.perf_counter()
         try:
-            import utils.force_copyable_dialogs  # Se aplica automáticamente
-            log_info("🔧 Parche FORZADO de mensajes copiables aplicado correctamente")
-            log_info("🎯 GARANTÍA: Todos los messagebox tendrán botón copiar")
+            db.ensure_initialized()
+            log_info("Base de datos inicializada correctamente")
         except Exception as e:
-            log_error(f"❌ Error aplicando parche forzado: {e}")
-            # Fallback al parche normal
-            try:
-                from utils.ensure_copyable_messages import patch_messagebox
-                patch_messagebox()
-                log_info("✅ Parche normal de mensajes copiables aplicado como fallback")
-            except Exception as e2:
-                log_error(f"⚠️  Advertencia: No se pudo aplicar ningún parche de mensajes: {e2}")
+            log_exception(e, "iniciar_base_datos")
+        finally:
+            profiler.record("base de datos (segundo plano)", t0, time.perf_counter() - t0)
 
-        # Inicializar la base de datos
-        log_info("Inicializando base de datos...")
-        db.init_database()
-        log_info("Base de datos inicializada correctamente")
+    log_info("Inicializando base de datos en segundo plano...")
+    hilo = threading.Thread(target=inicializar, name="db-init", daemon=True)
+    hilo.start()
+    return hilo
+
+def main(argv=None):
+    """Función principal de la aplicación"""
+    args = parse_args(argv)
+    profiler = StartupProfiler(enabled=args.profile_startup)
+    profiler.start_import_tracking()
+    try:
+        with profiler.phase("logging"):
+            from utils.logger import app_logger, log_info
+            app_logger.log_startup_info()
+            log_info("=== Iniciando aplicación Facturación Fácil ===")
+
+        with profiler.phase("base de datos (lanzar hilo)"):
+            from database.database import db
+            hilo_db = iniciar_base_datos(db, profiler)
+
+        with profiler.phase("importar ventana principal"):
+            from ui.main_window import MainWindow
 
         # Crear y ejecutar la aplicación
-        log_info("Creando ventana principal")
-        app = MainWindow()
+        with profiler.phase("crear ventana principal"):
+            log_info("Creando ventana principal")
+            app = MainWindow()
+
+        with profiler.phase("primer pintado"):
+            app.root.update()
+        profiler.mark("ventana principal visible")
+        profiler.stop_import_tracking()
+
+        # Nada puede mostrar un mensaje antes de que la ventana exista
+        app.root.after_idle(aplicar_parche_dialogos)
+        if profiler.enabled:
+            def mostrar_perfil():
+                hilo_db.join()
+                print(profiler.report(), flush=True)
+            app.root.after_idle(mostrar_perfil)
 
         log_info("Iniciando bucle principal de la aplicación")
         app.run()
@@ -54,6 +113,8 @@ def main():
         log_info("Aplicación cerrada normalmente")
 
     except Exception as e:
+        profiler.stop_import_tracking()
+        from utils.logger import log_error, log_exception
         log_exception(e, "main")
         log_error(f"Error crítico al iniciar la aplicación: {str(e)}")
 
@@ -87,4 +148,7 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
+    # En el ejecutable de PyInstaller los procesos de generate_many arrancan
+    # este mismo script: deben ejecutar su tarea y no abrir otra ventana
+    multiprocessing.freeze_support()
     main()
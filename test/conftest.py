@@ -11,6 +11,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from database.database import Database
 from database.models import Producto, Organizacion, Stock
+from utils.thumbnail_store import thumbnail_store
 from test.utils.test_database_manager import test_db_manager, isolated_test_db, isolated_test_environment
 
 # Configurar Faker en español
@@ -88,7 +89,7 @@ def productos_list(faker_instance):
     return productos
 
 @pytest.fixture(autouse=True)
-def setup_test_environment(monkeypatch, temp_db, request):
+def setup_test_environment(monkeypatch, temp_db, request, tmp_path_factory):
     """Configurar entorno de test automáticamente"""
     # Obtenir le nom du test
     test_name = request.node.name if hasattr(request, 'node') else 'unknown'
@@ -101,6 +102,10 @@ def setup_test_environment(monkeypatch, temp_db, request):
     test_assets_dir = test_db_manager.create_test_directory(f"{test_name}_assets")
     monkeypatch.setattr('os.makedirs', lambda path, exist_ok=True: None)
 
+    # Miniaturas en un directorio temporal en lugar de data/thumbnails
+    monkeypatch.setattr(thumbnail_store, '_directory', str(tmp_path_factory.mktemp("thumbnails")))
+    monkeypatch.setattr(thumbnail_store, '_photos', {})
+
     yield
 
     # Le nettoyage est géré automatiquement par le manager
@@ -9,6 +9,7 @@ from datetime import datetime
 from unittest.mock import Mock, patch, MagicMock
 from database.models import Factura, FacturaItem, Producto, Stock
 from database.database import Database
+from utils.config import app_config
 from common.validators import FormValidator, CalculationHelper
 
 class TestFacturasIntegration:
@@ -288,8 +289,11 @@ class TestFacturasIntegration:
             if original_db_item:
                 FacturaItem.db = original_db_item
     
-    def test_factura_number_generation(self, temp_db):
+    def test_factura_number_generation(self, temp_db, monkeypatch):
         """Test generación automática de números de factura"""
+        # Serie sin prefijo que empieza en 1 (la configuración de los tests puede variar)
+        monkeypatch.setattr(app_config, 'get_factura_prefijo', lambda: "")
+        monkeypatch.setattr(app_config, 'get_factura_numero_inicial', lambda: 1)
         original_db = Factura.__dict__.get('db')
         Factura.db = temp_db
         
@@ -297,7 +301,7 @@ class TestFacturasIntegration:
             # Primera factura
             numero1 = Factura.get_next_numero()
             current_year = datetime.now().year
-            assert numero1 == f"1-{current_year}"
+            assert numero1 == f"001-{current_year}"
 
             # Crear la factura
             factura1 = Factura(
@@ -312,7 +316,7 @@ class TestFacturasIntegration:
 
             # Segunda factura debería incrementar
             numero2 = Factura.get_next_numero()
-            assert numero2 == f"2-{current_year}"
+            assert numero2 == f"002-{current_year}"
 
             # Crear segunda factura
             factura2 = Factura(
@@ -327,7 +331,7 @@ class TestFacturasIntegration:
 
             # Tercera factura
             numero3 = Factura.get_next_numero()
-            assert numero3 == f"3-{current_year}"
+            assert numero3 == f"003-{current_year}"
             
         finally:
             if original_db:
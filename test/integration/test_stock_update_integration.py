@@ -11,6 +11,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspa
 
 import unittest
 from database.database import db
+from database.invoice_writer import invoice_writer
 from database.models import Producto, Stock, Factura, FacturaItem, StockMovement
 from ui.facturas_methods import FacturasMethodsMixin
 from utils.logger import get_logger
@@ -135,9 +136,8 @@ class StockUpdateIntegrationTest(unittest.TestCase):
         result = self.test_instance.show_stock_impact_summary()
         self.assertTrue(result, "L'utilisateur devrait confirmer")
         
-        # Simuler la sauvegarde et mise à jour du stock
-        self.factura_test.save()
-        self.test_instance.update_stock_after_save()
+        # Sauvegarde comme guardar_factura : facture et stock dans une seule transaction
+        invoice_writer.save(self.factura_test)
         
         # Vérifier que le stock a été mis à jour
         stock_final = Stock.get_by_product(self.producto_test.id)
@@ -254,9 +254,8 @@ class StockUpdateIntegrationTest(unittest.TestCase):
             result = self.test_instance.show_stock_impact_summary()
             self.assertTrue(result)
             
-            # Simuler sauvegarde et mise à jour
-            self.factura_test.save()
-            self.test_instance.update_stock_after_save()
+            # Sauvegarde comme guardar_factura : facture et stock dans une seule transaction
+            invoice_writer.save(self.factura_test)
             
             # Vérifier les deux stocks
             stock1_final = Stock.get_by_product(self.producto_test.id)
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark: una conexión por consulta frente a conexiones persistentes por hilo
+
+Construye una base de datos temporal con 50.000 facturas y mide, para cada modo
+de Database (pooled=False / pooled=True), el coste de:
+  - abrir facturas (cabecera + items + productos), como hace la pantalla de facturas
+  - guardar items uno a uno dentro de una transacción
+
+Uso:
+    python test/performance/benchmark_connection_pool.py [--facturas 50000]
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import argparse
+import random
+import tempfile
+import time
+from database.database import Database
+
+
+def build_database(db_path, num_facturas, num_productos=500, items_por_factura=4):
+    """Rellena la base de datos con datos sintéticos usando inserciones masivas"""
+    database = Database(db_path)
+    with database.transaction() as conn:
+        conn.executemany(
+            "INSERT INTO productos (id, nombre, referencia, precio, categoria) VALUES (?, ?, ?, ?, ?)",
+            [(i, f"Producto {i}", f"REF{i:05d}", 10.0 + i % 90, f"Cat {i % 10}")
+             for i in range(1, num_productos + 1)]
+        )
+        conn.executemany(
+            "INSERT INTO stock (producto_id, cantidad_disponible) VALUES (?, ?)",
+            [(i, 100) for i in range(1, num_productos + 1)]
+        )
+        conn.executemany(
+            """INSERT INTO facturas (id, numero_factura, fecha_factura, nombre_cliente,
+                   subtotal, total_iva, total_factura, modo_pago)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+            [(i, f"{i}-2024", f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}", f"Cliente {i % 2000}",
+              100.0, 21.0, 121.0, "efectivo")
+             for i in range(1, num_facturas + 1)]
+        )
+        conn.executemany(
+            """INSERT INTO factura_items (factura_id, producto_id, cantidad, precio_unitario,
+                   iva_aplicado, subtotal, iva_amount, total)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+            [(f, (f * items_por_factura + j) % num_productos + 1, 1, 25.0, 21.0, 25.0, 5.25, 30.25)
+             for f in range(1, num_facturas + 1) for j in range(items_por_factura)]
+        )
+    database.close()
+
+
+def open_facturas(database, factura_ids):
+    """Simula la apertura de facturas: cabecera, items y producto de cada item"""
+    for factura_id in factura_ids:
+        database.execute_query("SELECT * FROM facturas WHERE id=?", (factura_id,))
+        items = database.execute_query(
+            "SELECT * FROM factura_items WHERE factura_id=? ORDER BY id", (factura_id,)
+        )
+        for item in items:
+            database.execute_query("SELECT * FROM productos WHERE id=?", (item[2],))
+
+
+def save_items(database, factura_id, num_items):
+    """Simula el guardado de una factura con num_items líneas"""
+    with database.transaction():
+        database.execute_query("DELETE FROM factura_items WHERE factura_id=?", (factura_id,))
+        for i in range(num_items):
+            database.execute_query(
+                """INSERT INTO factura_items (factura_id, producto_id, cantidad, precio_unitario,
+                       iva_aplicado, subtotal, iva_amount, total)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                (factura_id, i % 500 + 1, 1, 25.0, 21.0, 25.0, 5.25, 30.25)
+            )
+
+
+def run_mode(db_path, pooled, factura_ids, repeticiones):
+    """Ejecuta la carga de trabajo en un modo y devuelve los tiempos en segundos"""
+    database = Database(db_path, pooled=pooled)
+
+    start = time.perf_counter()
+    open_facturas(database, factura_ids)
+    lectura = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for factura_id in factura_ids[:repeticiones]:
+        save_items(database, factura_id, 20)
+    escritura = time.perf_counter() - start
+
+    database.close()
+    return lectura, escritura
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--facturas", type=int, default=50000, help="Número de facturas a generar")
+    parser.add_argument("--aperturas", type=int, default=500, help="Facturas abiertas por modo")
+    parser.add_argument("--guardados", type=int, default=50, help="Facturas guardadas por modo")
+    args = parser.parse_args()
+
+    db_fd, db_path = tempfile.mkstemp(suffix=".db", prefix="bench_pool_")
+    os.close(db_fd)
+
+    try:
+        print(f"⚙️  Generando base de datos con {args.facturas} facturas...")
+        start = time.perf_counter()
+        build_database(db_path, args.facturas)
+        print(f"   Generada en {time.perf_counter() - start:.2f}s")
+
+        rng = random.Random(42)
+        factura_ids = [rng.randint(1, args.facturas) for _ in range(args.aperturas)]
+
+        print("\n⚡ BENCHMARK: una conexión por consulta vs. conexión persistente")
+        print("=" * 60)
+        results = {}
+        for label, pooled in (("open-per-query", False), ("pooled", True)):
+            results[label] = run_mode(db_path, pooled, factura_ids, args.guardados)
+            lectura, escritura = results[label]
+            print(f"{label:>15}: apertura {args.aperturas} facturas {lectura * 1000:8.1f} ms | "
+                  f"guardado {args.guardados}x20 items {escritura * 1000:8.1f} ms")
+
+        base_r, base_w = results["open-per-query"]
+        pool_r, pool_w = results["pooled"]
+        print("-" * 60)
+        print(f"Aceleración lectura:   x{base_r / pool_r:.1f}")
+        print(f"Aceleración escritura: x{base_w / pool_w:.1f}")
+    finally:
+        for path in (db_path, db_path + "-wal", db_path + "-shm"):
+            if os.path.exists(path):
+                os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
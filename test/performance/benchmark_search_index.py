@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark: búsqueda LIKE '%texto%' frente al índice FTS5 de productos
+
+Construye una base de datos temporal con 1.000.000 de productos (los triggers
+mantienen productos_fts al insertar) y mide, por término buscado, el tiempo de:
+  - la consulta LIKE sobre nombre, referencia y categoría (la búsqueda anterior)
+  - la consulta FTS5 ordenada por bm25 de todas las coincidencias (SearchWindow)
+  - SearchIndex.search_producto_ids, la misma consulta a través del servicio
+    (el autocompletado usa su índice en memoria, ver common/suggestion_index.py)
+
+Uso:
+    python test/performance/benchmark_search_index.py [--productos 1000000]
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from database.database import Database
+from database import models
+from database.search_index import SearchIndex, search_index
+
+NOMBRES = ["Café", "Té", "Azúcar", "Cuaderno", "Bolígrafo", "Lápiz", "Camión", "Jamón",
+           "Limón", "Canción", "Martillo", "Tornillo", "Alicate", "Pintura", "Señal"]
+ADJETIVOS = ["rápido", "ecológico", "clásico", "económico", "pequeño", "grande", "único",
+             "azul", "rojo", "verde", "térmico", "plástico", "metálico", "básico"]
+CATEGORIAS = ["Alimentación", "Papelería", "Ferretería", "Electrónica", "Jardín", "Música"]
+
+TERMINOS = ["cafe", "limon verde", "boligrafo azul", "REF0123", "ferreteria", "ca", "tornillo metalico"]
+
+
+def build_database(db_path, num_productos, lote=50000):
+    """Rellena la tabla de productos; el índice FTS5 se alimenta desde los triggers"""
+    database = Database(db_path)
+    rng = random.Random(42)
+    for inicio in range(1, num_productos + 1, lote):
+        fin = min(inicio + lote, num_productos + 1)
+        with database.transaction() as conn:
+            conn.executemany(
+                "INSERT INTO productos (id, nombre, referencia, precio, categoria, descripcion) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(i, f"{rng.choice(NOMBRES)} {rng.choice(ADJETIVOS)} {i}", f"REF{i:07d}",
+                  1.0 + i % 100, rng.choice(CATEGORIAS), f"{rng.choice(ADJETIVOS)} y {rng.choice(ADJETIVOS)}")
+                 for i in range(inicio, fin)]
+            )
+    with database.transaction() as conn:
+        conn.execute("INSERT INTO productos_fts (productos_fts) VALUES ('optimize')")
+    return database
+
+
+def time_query(database, query, params, repeticiones):
+    """Mediana en milisegundos de varias ejecuciones de la consulta"""
+    tiempos = []
+    for _ in range(repeticiones):
+        start = time.perf_counter()
+        database.execute_query(query, params)
+        tiempos.append((time.perf_counter() - start) * 1000)
+    return statistics.median(tiempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--productos", type=int, default=1000000, help="Número de productos a generar")
+    parser.add_argument("--limite", type=int, default=15, help="Resultados por búsqueda")
+    parser.add_argument("--repeticiones", type=int, default=5, help="Ejecuciones por término")
+    args = parser.parse_args()
+
+    db_fd, db_path = tempfile.mkstemp(suffix=".db", prefix="bench_fts_")
+    os.close(db_fd)
+
+    try:
+        print(f"⚙️  Generando base de datos con {args.productos} productos...")
+        start = time.perf_counter()
+        database = build_database(db_path, args.productos)
+        models.db = database
+        print(f"   Generada en {time.perf_counter() - start:.2f}s")
+
+        like_query = """SELECT id FROM productos
+                        WHERE nombre LIKE ? OR referencia LIKE ? OR categoria LIKE ?
+                        ORDER BY nombre LIMIT ?"""
+        fts_query = f"""SELECT rowid FROM productos_fts WHERE productos_fts MATCH ?
+                        ORDER BY {SearchIndex.PRODUCTOS_RANK} LIMIT ?"""
+
+        print(f"\n⚡ BENCHMARK: LIKE vs. FTS5 (top {args.limite}, mediana de {args.repeticiones})")
+        print("=" * 60)
+        for termino in TERMINOS:
+            patron = f"%{termino}%"
+            like_ms = time_query(database, like_query, (patron, patron, patron, args.limite),
+                                 args.repeticiones)
+            fts_ms = time_query(database, fts_query,
+                                (SearchIndex.build_match_query(termino), args.limite),
+                                args.repeticiones)
+            tiempos = []
+            for _ in range(args.repeticiones):
+                start = time.perf_counter()
+                search_index.search_producto_ids(termino, limit=args.limite)
+                tiempos.append((time.perf_counter() - start) * 1000)
+            servicio_ms = statistics.median(tiempos)
+            print(f"{termino:>18}: LIKE {like_ms:9.2f} ms | FTS5 {fts_ms:8.2f} ms | "
+                  f"search_producto_ids {servicio_ms:6.2f} ms")
+
+        database.close()
+    finally:
+        for path in (db_path, db_path + "-wal", db_path + "-shm"):
+            if os.path.exists(path):
+                os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -64,6 +64,15 @@ class TestImageSelectionRegression:
 
             return window
     
+    @staticmethod
+    def _finish_import(mock_ingestor, mock_call_when_done, file_path):
+        """Vérifie l'envoi au pipeline d'import et simule sa fin; renvoie le chemin importé"""
+        mock_ingestor.submit.assert_called_once_with(file_path)
+        imported_path = os.path.join("assets/images", "img_0123456789abcdef0123.png")
+        on_success = mock_call_when_done.call_args[1]['on_success']
+        on_success({'path': imported_path, 'source_bytes': 15, 'bytes': 10})
+        return imported_path
+    
     def test_seleccionar_imagen_method_exists(self, productos_window_mock):
         """Test de régression: vérifier que la méthode seleccionar_imagen existe"""
         assert hasattr(productos_window_mock, 'seleccionar_imagen')
@@ -96,14 +105,15 @@ class TestImageSelectionRegression:
         productos_window_mock.imagen_label.configure.assert_not_called()
     
     @patch('tkinter.filedialog.askopenfilename')
-    @patch('os.makedirs')
-    @patch('shutil.copy2')
-    def test_seleccionar_imagen_file_selected_success(self, mock_copy, mock_makedirs, 
+    @patch('ui.productos.call_when_done')
+    @patch('ui.productos.image_ingestor')
+    def test_seleccionar_imagen_file_selected_success(self, mock_ingestor, mock_call_when_done,
                                                      mock_filedialog, productos_window_mock, 
                                                      temp_image_file):
-        """Test de régression: sélection d'image réussie"""
+        """Test de régression: sélection d'image réussie (import en arrière-plan)"""
         # Simuler la sélection d'un fichier
         mock_filedialog.return_value = temp_image_file
+        productos_window_mock.update_image_display = Mock()
         
         # Appeler la méthode
         productos_window_mock.seleccionar_imagen()
@@ -121,18 +131,21 @@ class TestImageSelectionRegression:
         assert any("*.*" in ft[1] for ft in filetypes)
         assert 'initialdir' in call_kwargs  # Nueva funcionalidad
         
-        # Vérifier que le répertoire est créé
-        mock_makedirs.assert_called_once_with("assets/images", exist_ok=True)
+        # Vérifier que l'image est envoyée au pipeline d'import
+        mock_ingestor.submit.assert_called_once_with(temp_image_file)
+        assert productos_window_mock.imagen_path == ""
         
-        # Vérifier que le fichier est copié
-        expected_dest = os.path.join("assets/images", os.path.basename(temp_image_file))
-        mock_copy.assert_called_once_with(temp_image_file, expected_dest)
+        # Simuler la fin de l'import dans le thread de Tk
+        imported_path = os.path.join("assets/images", "img_0123456789abcdef0123.jpg")
+        on_success = mock_call_when_done.call_args[1]['on_success']
+        on_success({'path': imported_path, 'source_bytes': 15, 'bytes': 10})
         
         # Vérifier que l'état est mis à jour
-        assert productos_window_mock.imagen_path == expected_dest
+        assert productos_window_mock.imagen_path == imported_path
         productos_window_mock.imagen_label.configure.assert_called_once_with(
             text=f"Imagen: {os.path.basename(temp_image_file)}"  # Nuevo formato
         )
+        productos_window_mock.update_image_display.assert_called_once()
     
     def test_seleccionar_imagen_copy_error(self, productos_window_mock, temp_image_file):
         """Test de régression: erreur lors de la copie du fichier"""
@@ -199,9 +212,9 @@ class TestImageSelectionRegression:
         assert productos_window_mock.imagen_path == ""
     
     @patch('tkinter.filedialog.askopenfilename')
-    @patch('os.makedirs')
-    @patch('shutil.copy2')
-    def test_seleccionar_imagen_different_file_types(self, mock_copy, mock_makedirs,
+    @patch('ui.productos.call_when_done')
+    @patch('ui.productos.image_ingestor')
+    def test_seleccionar_imagen_different_file_types(self, mock_ingestor, mock_call_when_done,
                                                     mock_filedialog, productos_window_mock):
         """Test de régression: différents types de fichiers image"""
         file_types = ['.png', '.jpg', '.jpeg', '.gif', '.bmp']
@@ -217,7 +230,7 @@ class TestImageSelectionRegression:
                 mock_filedialog.return_value = temp_file.name
                 
                 # Réinitialiser les mocks
-                mock_copy.reset_mock()
+                mock_ingestor.reset_mock()
                 productos_window_mock.imagen_label.configure.reset_mock()
                 productos_window_mock.imagen_path = ""
                 
@@ -225,8 +238,7 @@ class TestImageSelectionRegression:
                 productos_window_mock.seleccionar_imagen()
                 
                 # Vérifications
-                expected_dest = os.path.join("assets/images", os.path.basename(temp_file.name))
-                mock_copy.assert_called_once_with(temp_file.name, expected_dest)
+                expected_dest = self._finish_import(mock_ingestor, mock_call_when_done, temp_file.name)
                 assert productos_window_mock.imagen_path == expected_dest
                 productos_window_mock.imagen_label.configure.assert_called_once_with(
                     text=f"Imagen: {os.path.basename(temp_file.name)}"  # Nuevo formato
@@ -237,19 +249,12 @@ class TestImageSelectionRegression:
                 if os.path.exists(temp_file.name):
                     os.unlink(temp_file.name)
     
-    @patch('tkinter.filedialog.askopenfilename')
-    @patch('os.makedirs')
-    @patch('shutil.copy2')
-    def test_seleccionar_imagen_assets_directory_creation(self, mock_copy, mock_makedirs,
-                                                         mock_filedialog, productos_window_mock,
-                                                         temp_image_file):
-        """Test de régression: création du répertoire assets/images"""
-        mock_filedialog.return_value = temp_image_file
-        
-        productos_window_mock.seleccionar_imagen()
+    def test_seleccionar_imagen_assets_directory_creation(self, productos_window_mock):
+        """Test de régression: les images importées vont dans assets/images"""
+        from utils.image_ingestion import image_ingestor
         
-        # Vérifier que le répertoire est créé avec les bons paramètres
-        mock_makedirs.assert_called_once_with("assets/images", exist_ok=True)
+        # Le pipeline d'import écrit dans le répertoire des assets configuré
+        assert image_ingestor.storage_directory == "assets/images"
     
     def test_integration_with_translation_system(self, productos_window_mock):
         """Test de régression: intégration avec le système de traductions"""
@@ -261,9 +266,9 @@ class TestImageSelectionRegression:
         assert get_text("error") == "Error"
     
     @patch('tkinter.filedialog.askopenfilename')
-    @patch('os.makedirs')
-    @patch('shutil.copy2')
-    def test_seleccionar_imagen_filename_with_spaces(self, mock_copy, mock_makedirs,
+    @patch('ui.productos.call_when_done')
+    @patch('ui.productos.image_ingestor')
+    def test_seleccionar_imagen_filename_with_spaces(self, mock_ingestor, mock_call_when_done,
                                                     mock_filedialog, productos_window_mock):
         """Test de régression: nom de fichier avec espaces"""
         # Créer un fichier avec des espaces dans le nom
@@ -277,8 +282,7 @@ class TestImageSelectionRegression:
             productos_window_mock.seleccionar_imagen()
             
             # Vérifier que le fichier avec espaces est géré correctement
-            expected_dest = os.path.join("assets/images", os.path.basename(temp_file.name))
-            mock_copy.assert_called_once_with(temp_file.name, expected_dest)
+            expected_dest = self._finish_import(mock_ingestor, mock_call_when_done, temp_file.name)
             assert productos_window_mock.imagen_path == expected_dest
             
         finally:
@@ -286,9 +290,9 @@ class TestImageSelectionRegression:
                 os.unlink(temp_file.name)
     
     @patch('tkinter.filedialog.askopenfilename')
-    @patch('os.makedirs')
-    @patch('shutil.copy2')
-    def test_seleccionar_imagen_unicode_filename(self, mock_copy, mock_makedirs,
+    @patch('ui.productos.call_when_done')
+    @patch('ui.productos.image_ingestor')
+    def test_seleccionar_imagen_unicode_filename(self, mock_ingestor, mock_call_when_done,
                                                 mock_filedialog, productos_window_mock):
         """Test de régression: nom de fichier avec caractères Unicode"""
         # Créer un fichier avec des caractères Unicode
@@ -302,8 +306,7 @@ class TestImageSelectionRegression:
             productos_window_mock.seleccionar_imagen()
             
             # Vérifier que les caractères Unicode sont gérés correctement
-            expected_dest = os.path.join("assets/images", os.path.basename(temp_file.name))
-            mock_copy.assert_called_once_with(temp_file.name, expected_dest)
+            expected_dest = self._finish_import(mock_ingestor, mock_call_when_done, temp_file.name)
             assert productos_window_mock.imagen_path == expected_dest
             
         finally:
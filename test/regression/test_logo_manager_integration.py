@@ -169,8 +169,8 @@ class TestLogoManagerIntegration:
                 logos_before = logo_manager.list_logos()
                 print(f"   📊 Logos avant nettoyage: {len(logos_before)}")
                 
-                # Nettoyer (garder seulement le logo actuel)
-                cleaned_count = logo_manager.cleanup_orphaned_logos(org_updated.logo_path)
+                # Nettoyer (le logo actuel est protégé par sa référence)
+                cleaned_count = logo_manager.cleanup_orphaned_logos()
                 print(f"   🗑️  Logos nettoyés: {cleaned_count}")
                 
                 # Lister les logos après nettoyage
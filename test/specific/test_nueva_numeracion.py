@@ -8,7 +8,6 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from database.database import Database
 from database.models import Factura
 from utils.factura_numbering import factura_numbering_service
 from datetime import datetime
@@ -112,13 +111,12 @@ def test_nueva_numeracion():
         print(f"   ❌ Test 4 FALLIDO: {e}")
         return False
     
-    # Test 5: Verificar formato con base de datos
-    print("\n5️⃣ Test: Verificar formato con base de datos")
+    # Test 5: Verificar formato desde el modelo
+    print("\n5️⃣ Test: Verificar formato desde el modelo Factura")
     try:
-        db = Database()
-        numero_db = db.get_next_factura_number()
-        print(f"   📝 Número desde DB: {numero_db}")
-        assert f"-{year}" in numero_db, f"DB debe generar formato con año al final"
+        numero_modelo = Factura.get_next_numero()
+        print(f"   📝 Número desde Factura: {numero_modelo}")
+        assert f"-{year}" in numero_modelo, f"Factura debe generar formato con año al final"
         print("   ✅ Test 5 PASADO")
     except Exception as e:
         print(f"   ❌ Test 5 FALLIDO: {e}")
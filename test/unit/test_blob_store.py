@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Tests para el almacén de imágenes con contador de referencias (tabla blobs)
+"""
+import os
+import pytest
+from PIL import Image
+from database import models
+from database.blob_store import GRACIA_SEGUNDOS, blob_store
+from database.models import Organizacion, Producto
+from utils.file_manager import ImageFileManager
+
+
+def _envejecer(path, segundos=GRACIA_SEGUNDOS + 60):
+    """Simula que el fichero se liberó hace "segundos" segundos"""
+    models.db.execute_query(
+        "UPDATE blobs SET liberado = datetime('now', ?) WHERE path = ?", (f"-{segundos} seconds", path)
+    )
+
+
+class TestBlobStore:
+    """Tests para database.blob_store y los disparadores de la migración 10"""
+
+    @pytest.fixture
+    def manager(self, tmp_path):
+        """Gestor de imágenes en un directorio temporal (os.makedirs está neutralizado en conftest)"""
+        (tmp_path / "imagenes").mkdir()
+        manager = ImageFileManager(subdirectory="imagenes")
+        manager.base_directory = str(tmp_path)
+        return manager
+
+    @pytest.fixture
+    def imagen(self, tmp_path):
+        """Imagen PNG de origen"""
+        path = str(tmp_path / "origen.png")
+        Image.new('RGB', (20, 20), 'red').save(path)
+        return path
+
+    def test_same_content_is_stored_once(self, manager, imagen, tmp_path):
+        """Test que dos copias del mismo contenido dan el mismo fichero y una sola fila"""
+        copia = str(tmp_path / "copia.png")
+        with open(imagen, 'rb') as src, open(copia, 'wb') as dst:
+            dst.write(src.read())
+
+        primera = manager.save_file(imagen, "producto")
+        segunda = manager.save_file(copia, "producto")
+
+        assert primera == segunda
+        assert os.listdir(manager.storage_directory) == [os.path.basename(primera)]
+        assert blob_store.get_stats()['blobs'] == 1
+        assert blob_store.refcount(primera) == 0
+
+    def test_triggers_count_product_and_logo_references(self, manager, imagen):
+        """Test que insertar, cambiar y borrar referencias mantiene refcount"""
+        path = manager.save_file(imagen, "producto")
+
+        a = Producto(nombre="A", referencia="A-1", precio=1.0, imagen_path=path)
+        a.save()
+        b = Producto(nombre="B", referencia="B-1", precio=1.0, imagen_path=path)
+        b.save()
+        Organizacion(nombre="Org", logo_path=path).save()
+        assert blob_store.refcount(path) == 3
+
+        b.imagen_path = ""
+        b.save()
+        a.delete()
+        Organizacion(nombre="Org", logo_path="").save()
+        assert blob_store.refcount(path) == 0
+        assert blob_store.get_stats()['sin_referencias'] == 1
+
+    def test_register_counts_existing_references(self, manager, imagen):
+        """Test que un fichero ya referenciado se registra con su contador"""
+        path = manager.save_file(imagen, "producto")
+        Producto(nombre="A", referencia="A-1", precio=1.0, imagen_path=path).save()
+        models.db.execute_query("DELETE FROM blobs")
+
+        assert blob_store.register(path) == 1
+
+    def test_garbage_collection_respects_grace_and_references(self, manager, imagen, tmp_path):
+        """Test que solo se borran los ficheros sin referencias liberados hace más del margen"""
+        usada = manager.save_file(imagen, "producto")
+        Producto(nombre="A", referencia="A-1", precio=1.0, imagen_path=usada).save()
+        otra = str(tmp_path / "otra.png")
+        Image.new('RGB', (20, 20), 'blue').save(otra)
+        libre = manager.save_file(otra, "producto")
+
+        # Recién importada: aún dentro del margen de gracia
+        assert manager.collect_garbage() == []
+        _envejecer(usada)
+        _envejecer(libre)
+
+        assert manager.collect_garbage() == [libre]
+        assert not os.path.exists(libre) and os.path.exists(usada)
+        assert blob_store.refcount(libre) is None
+
+    def test_garbage_collection_is_bounded_and_scoped(self, manager, tmp_path, monkeypatch):
+        """Test que cada pasada borra como mucho "limite" ficheros y no lista el directorio"""
+        rutas = []
+        for i in range(5):
+            origen = str(tmp_path / f"img_{i}.png")
+            Image.new('RGB', (10, 10), (i * 40, 0, 0)).save(origen)
+            rutas.append(manager.save_file(origen, "producto"))
+            _envejecer(rutas[-1], GRACIA_SEGUNDOS + 60 - i)
+        monkeypatch.setattr(os, "listdir", lambda *a: pytest.fail("directorio recorrido"))
+
+        assert blob_store.collect_garbage(limite=2, gracia=3600, directorio=str(tmp_path / "otro")) == []
+        assert manager.collect_garbage(limit=2) == rutas[:2]
+        assert manager.collect_garbage() == rutas[2:]
+
+    def test_remove_and_update_keep_referenced_files(self, manager, imagen, tmp_path):
+        """Test que quitar o sustituir una imagen compartida no borra el fichero de los demás"""
+        compartida = manager.save_file(imagen, "producto")
+        Producto(nombre="A", referencia="A-1", precio=1.0, imagen_path=compartida).save()
+        nueva = str(tmp_path / "nueva.png")
+        Image.new('RGB', (20, 20), 'green').save(nueva)
+
+        assert manager.remove_file(compartida)
+        assert manager.update_file(compartida, nueva, "producto") != compartida
+        assert os.path.exists(compartida)
+        assert blob_store.refcount(compartida) == 1
+
+        # Sin referencias el fichero se borra en el acto, con su fila
+        huerfana = manager.save_file(nueva, "producto")
+        assert manager.remove_file(huerfana)
+        assert not os.path.exists(huerfana)
+        assert blob_store.refcount(huerfana) is None
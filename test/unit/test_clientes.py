@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Tests para la tabla de clientes y sus acumulados
+"""
+import sqlite3
+import pytest
+from unittest.mock import patch
+from database.database import Database
+from database.migrations import MIGRATIONS, clave_cliente, run_migrations
+from database.models import Cliente, Factura
+from database.invoice_writer import invoice_writer
+
+
+class TestClientes:
+    """Tests para el modelo Cliente y los triggers de facturas"""
+
+    def _factura(self, numero, nombre, dni="", total=100.0, fecha="2025-01-01"):
+        factura = Factura(numero_factura=numero, fecha_factura=fecha, nombre_cliente=nombre,
+                          dni_nie_cliente=dni, total_factura=total)
+        factura.save()
+        return factura
+
+    def test_clave_cliente(self):
+        """Test que el DNI identifica al cliente y, si falta, el nombre normalizado"""
+        assert clave_cliente("José García", "12.345.678-z") == "dni:12345678Z"
+        assert clave_cliente("  JOSÉ   García ", "") == clave_cliente("josé garcía", None)
+
+    def test_save_creates_and_accumulates(self):
+        """Test que guardar facturas crea el cliente y acumula número, total y fecha"""
+        f1 = self._factura("CL-001", "José García", "12345678Z", 100.0, "2025-01-10")
+        f2 = self._factura("CL-002", "Jose Garcia", "12345678-Z", 50.5, "2025-03-01")
+
+        assert f1.cliente_id == f2.cliente_id
+        cliente = Cliente.get_by_id(f1.cliente_id)
+        assert cliente.nombre == "Jose Garcia"
+        assert cliente.num_facturas == 2
+        assert cliente.total_facturado == pytest.approx(150.5)
+        assert cliente.ultima_factura == "2025-03-01"
+        assert Factura.get_by_id(f1.id).cliente_id == cliente.id
+
+    def test_edit_and_delete_update_totals(self):
+        """Test que editar o borrar facturas mantiene los acumulados de ambos clientes"""
+        f1 = self._factura("CL-003", "Ana López", total=100.0, fecha="2025-01-01")
+        f2 = self._factura("CL-004", "Ana López", total=20.0, fecha="2025-02-01")
+        ana_id = f1.cliente_id
+
+        f2.nombre_cliente = "Luis Pérez"
+        f2.total_factura = 30.0
+        f2.save()
+
+        ana = Cliente.get_by_id(ana_id)
+        luis = Cliente.get_by_id(f2.cliente_id)
+        assert (ana.num_facturas, ana.total_facturado, ana.ultima_factura) == (1, 100.0, "2025-01-01")
+        assert (luis.num_facturas, luis.total_facturado) == (1, 30.0)
+
+        f1.delete()
+        ana = Cliente.get_by_id(ana_id)
+        assert (ana.num_facturas, ana.total_facturado, ana.ultima_factura) == (0, 0.0, None)
+
+    def test_failed_save_leaves_no_client(self):
+        """Test que un guardado fallido no deja clientes huérfanos"""
+        self._factura("CL-005", "Cliente Uno")
+        duplicada = Factura(numero_factura="CL-005", fecha_factura="2025-01-01",
+                            nombre_cliente="Cliente Nuevo")
+        with pytest.raises(Exception):
+            invoice_writer.save(duplicada)
+
+        assert duplicada.cliente_id is None
+        assert [c.nombre for c in Cliente.get_all()] == ["Cliente Uno"]
+
+    def test_search_ignores_accents(self):
+        """Test que la búsqueda de clientes usa el índice sin acentos"""
+        self._factura("CL-006", "Begoña Martínez", "11111111H")
+        self._factura("CL-007", "Martín Ruiz", "22222222J")
+
+        assert [c.nombre for c in Cliente.search("martinez")] == ["Begoña Martínez"]
+        assert [c.dni_nie for c in Cliente.search("2222")] == ["22222222J"]
+
+    def test_backfill_from_existing_facturas(self, tmp_path):
+        """Test que la migración crea los clientes de las facturas ya existentes"""
+        db_path = str(tmp_path / "clientes.db")
+        conn = sqlite3.connect(db_path, isolation_level=None)
+        with patch('database.migrations.MIGRATIONS', MIGRATIONS[:4]):
+            run_migrations(conn)
+        conn.executemany(
+            """INSERT INTO facturas (numero_factura, fecha_factura, nombre_cliente, dni_nie_cliente,
+                   email_cliente, subtotal, total_iva, total_factura)
+               VALUES (?, ?, ?, ?, ?, 0, 0, ?)""",
+            [("B-1", "2024-01-01", "Ana", "", "vieja@example.com", 10.0),
+             ("B-2", "2024-05-01", "ANA", "", "nueva@example.com", 5.0),
+             ("B-3", "2024-02-01", "Luis", "33333333P", "", 7.0)]
+        )
+        conn.close()
+
+        database = Database(db_path)
+        clientes = database.execute_query(
+            "SELECT nombre, email, num_facturas, total_facturado, ultima_factura "
+            "FROM clientes ORDER BY nombre"
+        )
+        assert clientes == [("ANA", "nueva@example.com", 2, 15.0, "2024-05-01"),
+                            ("Luis", "", 1, 7.0, "2024-02-01")]
+        sin_cliente = database.execute_query("SELECT COUNT(*) FROM facturas WHERE cliente_id IS NULL")
+        assert sin_cliente[0][0] == 0
+        database.close()
@@ -125,26 +125,100 @@ class TestDatabase:
         results = temp_db.execute_query("SELECT COUNT(*) FROM productos")
         assert results[0][0] == 0
     
-    def test_get_next_factura_number(self, temp_db):
-        """Test la génération du numéro de facture avec nouveau format"""
-        from datetime import datetime
+    def test_pooled_connection_reused_per_thread(self, temp_db):
+        """Test que le mode pool réutilise la même connexion dans un thread"""
+        import threading
 
-        # Premier numéro (nouveau format: numero-año)
-        numero1 = temp_db.get_next_factura_number()
-        year = datetime.now().year
-        expected1 = f"1-{year}"
-        assert numero1 == expected1
+        assert temp_db.connection is temp_db.connection
 
-        # Simuler une facture existante
-        temp_db.execute_query(
-            "INSERT INTO facturas (numero_factura, fecha_factura, nombre_cliente, subtotal, total_iva, total_factura) VALUES (?, ?, ?, ?, ?, ?)",
-            (numero1, f"{year}-01-01", "Test Client", 100.0, 21.0, 121.0)
-        )
+        other = []
+        thread = threading.Thread(target=lambda: other.append(temp_db.connection))
+        thread.start()
+        thread.join()
+        assert other[0] is not temp_db.connection
+
+    def test_transaction_commit(self, temp_db):
+        """Test qu'une transaction valide toutes ses écritures"""
+        with temp_db.transaction():
+            temp_db.execute_query(
+                "INSERT INTO productos (nombre, referencia, precio) VALUES (?, ?, ?)",
+                ("A", "TX001", 1.0)
+            )
+            temp_db.execute_query(
+                "INSERT INTO productos (nombre, referencia, precio) VALUES (?, ?, ?)",
+                ("B", "TX002", 2.0)
+            )
+
+        results = temp_db.execute_query("SELECT COUNT(*) FROM productos")
+        assert results[0][0] == 2
+
+    def test_transaction_rollback_on_error(self, temp_db):
+        """Test qu'une exception annule toute la transaction"""
+        with pytest.raises(sqlite3.IntegrityError):
+            with temp_db.transaction():
+                temp_db.execute_query(
+                    "INSERT INTO productos (nombre, referencia, precio) VALUES (?, ?, ?)",
+                    ("A", "DUP001", 1.0)
+                )
+                temp_db.execute_query(
+                    "INSERT INTO productos (nombre, referencia, precio) VALUES (?, ?, ?)",
+                    ("B", "DUP001", 2.0)
+                )
+
+        results = temp_db.execute_query("SELECT COUNT(*) FROM productos")
+        assert results[0][0] == 0
 
-        # Deuxième numéro
-        numero2 = temp_db.get_next_factura_number()
-        expected2 = f"2-{year}"
-        assert numero2 == expected2
+    def test_nested_transaction_uses_savepoint(self, temp_db):
+        """Test qu'une transaction imbriquée peut échouer sans annuler l'externe"""
+        with temp_db.transaction():
+            temp_db.execute_query(
+                "INSERT INTO productos (nombre, referencia, precio) VALUES (?, ?, ?)",
+                ("Outer", "OUT001", 1.0)
+            )
+            with pytest.raises(RuntimeError):
+                with temp_db.transaction():
+                    temp_db.execute_query(
+                        "INSERT INTO productos (nombre, referencia, precio) VALUES (?, ?, ?)",
+                        ("Inner", "IN001", 2.0)
+                    )
+                    raise RuntimeError("inner failure")
+
+        results = temp_db.execute_query("SELECT referencia FROM productos")
+        assert results == [("OUT001",)]
+
+    def test_on_commit_callbacks(self, temp_db):
+        """Test que les callbacks on_commit attendent le COMMIT et sautent en cas de rollback"""
+        appels = []
+
+        temp_db.on_commit(lambda: appels.append("hors transaction"))
+        with temp_db.transaction():
+            temp_db.on_commit(lambda: appels.append("externe"))
+            with pytest.raises(RuntimeError):
+                with temp_db.transaction():
+                    temp_db.on_commit(lambda: appels.append("savepoint annulé"))
+                    raise RuntimeError("inner failure")
+            assert appels == ["hors transaction"]
+
+        with pytest.raises(RuntimeError):
+            with temp_db.transaction():
+                temp_db.on_commit(lambda: appels.append("transaction annulée"))
+                raise RuntimeError("outer failure")
+
+        assert appels == ["hors transaction", "externe"]
+
+    def test_unpooled_mode(self, temp_db):
+        """Test le mode historique (une connexion par requête)"""
+        unpooled = Database(temp_db.db_path, pooled=False)
+
+        with unpooled.transaction():
+            unpooled.execute_query(
+                "INSERT INTO productos (nombre, referencia, precio) VALUES (?, ?, ?)",
+                ("A", "NP001", 1.0)
+            )
+
+        assert getattr(unpooled._local, 'conn', None) is None
+        results = temp_db.execute_query("SELECT COUNT(*) FROM productos")
+        assert results[0][0] == 1
     
     def test_database_connection_error_handling(self):
         """Test la gestion d'erreurs de connexion"""
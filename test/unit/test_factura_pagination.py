@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+Tests para la paginación por clave de OptimizedFactura.page
+"""
+import pytest
+from database.models import Factura
+from database.optimized_models import OptimizedFactura
+
+
+class TestFacturaPagination:
+    """Tests para OptimizedFactura.page"""
+
+    @pytest.fixture(autouse=True)
+    def facturas(self):
+        """25 facturas repartidas en 5 fechas"""
+        for i in range(25):
+            Factura(
+                numero_factura=f"{i:03d}-2025",
+                fecha_factura=f"2025-01-{i % 5 + 1:02d}",
+                nombre_cliente="García" if i % 2 else "López",
+                subtotal=10.0, total_iva=2.1, total_factura=12.1
+            ).save()
+
+    def test_pages_cover_all_rows_in_order(self):
+        """Test que recorrer todas las páginas devuelve cada factura una vez y en orden"""
+        vistos = []
+        cursor = None
+        while True:
+            page = OptimizedFactura.page(after=cursor, limit=10)
+            vistos.extend((r['fecha_factura'], r['numero_factura']) for r in page['rows'])
+            cursor = page['next_cursor']
+            if cursor is None:
+                break
+
+        assert len(vistos) == 25
+        assert vistos == sorted(vistos, reverse=True)
+
+    def test_total_is_maintained_counter(self):
+        """Test que el total sigue las altas y bajas"""
+        assert OptimizedFactura.page(limit=5)['total'] == 25
+
+        Factura.get_by_numero("000-2025").delete()
+
+        assert OptimizedFactura.count() == 24
+
+    def test_last_page_has_no_cursor(self):
+        """Test que la última página no tiene cursor siguiente"""
+        page = OptimizedFactura.page(limit=25)
+        assert len(page['rows']) == 25
+        assert page['next_cursor'] is None
+
+    def test_filters(self):
+        """Test que los filtros se aplican en SQL, también al total"""
+        page = OptimizedFactura.page(limit=50, filters={'texto': 'garc'})
+        assert page['total'] == 12
+        assert all(r['nombre_cliente'] == "García" for r in page['rows'])
+
+        page = OptimizedFactura.page(limit=50, filters={'fecha_desde': '2025-01-05'})
+        assert page['total'] == 5
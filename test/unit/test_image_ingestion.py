@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Tests pour le pipeline d'import des images produit
+"""
+import os
+import pytest
+from PIL import Image
+from utils.image_ingestion import ImageIngestor
+
+
+class TestImageIngestion:
+    """Tests pour utils.image_ingestion"""
+
+    @pytest.fixture
+    def ingestor(self, tmp_path):
+        """Pipeline écrivant dans un répertoire temporaire (os.makedirs est neutralisé par conftest)"""
+        directory = tmp_path / "images"
+        directory.mkdir()
+        return ImageIngestor(str(directory), max_dimension=800, max_bytes=200 * 1024, thumbnails=None)
+
+    def _photo(self, tmp_path, name="photo.jpg", size=(4000, 3000), **options):
+        """Photo JPEG bruitée (peu compressible), comme celles d'un appareil photo"""
+        path = str(tmp_path / name)
+        Image.effect_noise(size, 60).convert('RGB').save(path, format='JPEG', quality=95, **options)
+        return path
+
+    def test_large_photo_is_downscaled_and_bounded(self, ingestor, tmp_path):
+        """Test qu'une grande photo est réduite et réencodée dans la limite de taille"""
+        source = self._photo(tmp_path)
+        result = ingestor.ingest(source)
+
+        assert result['format'] == 'JPEG' and result['path'].endswith('.jpg')
+        assert os.path.dirname(result['path']) == ingestor.storage_directory
+        assert max(result['size']) <= 800
+        assert result['bytes'] <= 200 * 1024 < result['source_bytes']
+        with Image.open(result['path']) as img:
+            assert img.size == result['size']
+
+    def test_exif_orientation_is_applied(self, ingestor, tmp_path):
+        """Test qu'une photo prise en portrait (EXIF orientation 6) est redressée"""
+        exif = Image.Exif()
+        exif[0x0112] = 6  # rotation de 90°
+        source = self._photo(tmp_path, size=(400, 200), exif=exif.tobytes())
+
+        result = ingestor.ingest(source)
+        assert result['size'] == (200, 400)
+
+    def test_same_content_is_deduplicated(self, ingestor, tmp_path, monkeypatch):
+        """Test qu'une image déjà importée n'est ni redécodée ni réécrite"""
+        first = ingestor.ingest(self._photo(tmp_path, size=(300, 200)))
+        copy = tmp_path / "copie.jpg"
+        copy.write_bytes(open(tmp_path / "photo.jpg", 'rb').read())
+
+        monkeypatch.setattr(ingestor, '_load', lambda *args: pytest.fail("image redécodée"))
+        second = ingestor.ingest(str(copy))
+        assert second['path'] == first['path'] and second['deduplicated']
+        assert len(os.listdir(ingestor.storage_directory)) == 1
+
+    def test_transparency_is_kept_as_png(self, ingestor, tmp_path):
+        """Test qu'un logo avec transparence reste en PNG"""
+        source = str(tmp_path / "logo.png")
+        Image.new('RGBA', (1200, 600), (0, 128, 0, 0)).save(source)
+
+        result = ingestor.ingest(source)
+        assert result['format'] == 'PNG' and result['size'] == (800, 400)
+
+    def test_invalid_files_are_rejected(self, ingestor, tmp_path):
+        """Test qu'un fichier absent ou qui n'est pas une image est refusé"""
+        fake = tmp_path / "fake.png"
+        fake.write_bytes(b"fake_image_data")
+        with pytest.raises(ValueError):
+            ingestor.ingest(str(fake))
+        with pytest.raises(ValueError):
+            ingestor.ingest(str(tmp_path / "absent.jpg"))
+        assert os.listdir(ingestor.storage_directory) == []
+
+    def test_submit_runs_on_worker_thread(self, ingestor, tmp_path):
+        """Test que submit() importe l'image dans le thread d'import"""
+        future = ingestor.submit(self._photo(tmp_path, size=(300, 200)))
+        try:
+            assert future.result(timeout=30)['size'] == (300, 200)
+        finally:
+            ingestor.shutdown()
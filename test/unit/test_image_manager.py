@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Tests pour le cache LRU d'ImageManager
+"""
+import pytest
+from PIL import Image
+from utils.image_manager import ImageManager
+
+
+class TestImageManagerCache:
+    """Tests pour le cache d'images borné en octets"""
+
+    @pytest.fixture
+    def images(self, tmp_path):
+        """Quatre images RGB de 100x100 (30 000 octets décodés chacune)"""
+        paths = []
+        for i in range(4):
+            path = str(tmp_path / f"image_{i}.png")
+            Image.new('RGB', (100, 100), (i * 60, 0, 0)).save(path)
+            paths.append(path)
+        return paths
+
+    def test_hits_misses_and_lru_order(self, images):
+        """Test que le cache compte les accès et évince l'image la moins récente"""
+        manager = ImageManager(cache_bytes=3 * 30000)
+        a, b, c, d = images
+
+        for path in (a, b, c):
+            manager.get_cached_image(path)
+        assert manager.get_cached_image(a) is manager.get_cached_image(a)
+
+        manager.get_cached_image(d)  # évince b, la moins récente
+        stats = manager.get_cache_stats()
+        assert (stats['hits'], stats['misses'], stats['evictions']) == (2, 4, 1)
+        assert (stats['size'], stats['bytes'], stats['max_bytes']) == (3, 90000, 90000)
+
+        manager.get_cached_image(b)
+        assert manager.get_cache_stats()['misses'] == 5
+        assert list(manager._image_cache) == [(a, None), (d, None), (b, None)]  # c évincée
+
+    def test_byte_budget_and_oversized_images(self, images):
+        """Test que le budget porte sur les pixels décodés et non sur le nombre d'entrées"""
+        manager = ImageManager(cache_size=100, cache_bytes=50000)
+
+        manager.get_cached_image(images[0])
+        manager.get_cached_image(images[1], size=(50, 50))
+        assert manager.get_cache_stats()['bytes'] == 30000 + 7500
+
+        manager.get_cached_image(images[2])
+        assert manager.get_cache_stats()['bytes'] <= 50000
+
+        # Une image plus grande que tout le budget est servie sans être gardée
+        tiny = ImageManager(cache_bytes=1000)
+        assert tiny.get_cached_image(images[0]) is not None
+        assert tiny.get_cache_stats()['size'] == 0
+
+    def test_remove_drops_every_size_of_a_path(self, images):
+        """Test que toutes les tailles d'un chemin sont retirées ensemble"""
+        manager = ImageManager()
+        for size in (None, (40, 40), (64, 64)):
+            manager.get_cached_image(images[0], size=size)
+        manager.get_cached_image(images[1])
+
+        manager._remove_from_cache(images[0])
+        assert list(manager._image_cache) == [(images[1], None)]
+        assert manager.get_cache_stats()['bytes'] == 30000
+
+        manager.clear_cache()
+        assert manager.get_cache_stats()['bytes'] == 0
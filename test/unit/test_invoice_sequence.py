@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+Tests para la tabla de secuencias de numeración de facturas
+"""
+import sqlite3
+import threading
+import pytest
+from unittest.mock import patch
+from database.database import Database
+from database.invoice_sequence import invoice_sequence
+from database.invoice_writer import invoice_writer
+from database.migrations import MIGRATIONS, run_migrations
+from database.models import Factura
+from utils.factura_numbering import factura_numbering_service
+
+
+class TestInvoiceSequence:
+    """Tests para InvoiceSequence y su uso desde la numeración y el guardado"""
+
+    @pytest.fixture
+    def serie_fac(self):
+        """Configuración de numeración con prefijo FAC y número inicial 1"""
+        config = factura_numbering_service.config
+        with patch.object(config, 'get_factura_prefijo', return_value="FAC"), \
+                patch.object(config, 'get_factura_numero_inicial', return_value=1), \
+                patch.object(invoice_sequence, 'current_year', return_value=2025):
+            yield
+
+    def _factura(self, numero):
+        return Factura(numero_factura=numero, fecha_factura="2025-01-01", nombre_cliente="Cliente")
+
+    def test_saved_numbers_advance_their_series(self):
+        """Test que cualquier número guardado actualiza el último de su serie y año"""
+        for numero in ("FAC-007-2025", "FAC-003-2025", "12-2025", "FAC2-4-2024", "SIN-FORMATO"):
+            self._factura(numero).save()
+
+        assert invoice_sequence.last("FAC", 2025) == 7
+        assert invoice_sequence.last("", 2025) == 12
+        assert invoice_sequence.last("FAC2", 2024) == 4
+        assert invoice_sequence.peek("FAC", 2025) == 8
+        assert invoice_sequence.peek("NUEVA", 2025, inicial=100) == 100
+
+    def test_service_and_factura_agree(self, serie_fac):
+        """Test que Factura.get_next_numero delega en el servicio de numeración"""
+        assert factura_numbering_service.get_next_numero_factura() == "FAC-001-2025"
+        invoice_writer.save(self._factura(""), reservar_numero=factura_numbering_service.reserve_numero_factura)
+        assert factura_numbering_service.get_next_numero_factura() == "FAC-002-2025"
+
+        self._factura("FAC-005-2025").save()
+        assert Factura.get_next_numero() == factura_numbering_service.get_next_numero_factura() == "FAC-006-2025"
+
+    def test_reservation_is_rolled_back_with_failed_save(self, serie_fac):
+        """Test que un guardado fallido no consume número (sin huecos)"""
+        self._factura("FAC-001-2025").save()
+        duplicada = self._factura("FAC-001-2025")
+
+        with patch.object(Factura, '_save', side_effect=sqlite3.IntegrityError("fallo")):
+            with pytest.raises(sqlite3.IntegrityError):
+                invoice_writer.save(duplicada, reservar_numero=factura_numbering_service.reserve_numero_factura)
+
+        assert duplicada.numero_factura == "FAC-001-2025"
+        nueva = self._factura("FAC-001-2025")
+        invoice_writer.save(nueva, reservar_numero=factura_numbering_service.reserve_numero_factura)
+        assert nueva.numero_factura == "FAC-002-2025"
+
+    def test_guardar_factura_reports_reserved_number(self, serie_fac):
+        """Test que guardar_factura muestra el número realmente guardado y avisa si no es el sugerido"""
+        from types import SimpleNamespace
+        from ui.facturas_methods import FacturasMethodsMixin
+        from utils.logger import get_logger
+
+        class Ventana(FacturasMethodsMixin):
+            """Ventana de facturas sin Tk: el formulario muestra el número sugerido"""
+
+            def __init__(self, numero):
+                self.logger = get_logger("test_invoice_sequence")
+                self.current_factura = None
+                self.factura_items = []
+                self._numero_sugerido = numero
+                campo = lambda valor: SimpleNamespace(get=lambda *args: valor)
+                self.numero_entry = campo(numero)
+                self.fecha_entry = campo("2025-01-01")
+                self.nombre_cliente_entry = campo("Cliente")
+                self.dni_nie_entry = self.email_cliente_entry = self.telefono_cliente_entry = campo("")
+                self.direccion_cliente_text = campo("")
+                self.modo_pago_var = campo("efectivo")
+                self.mensajes = []
+
+            def validate_factura_form(self):
+                return []
+
+            def show_stock_impact_summary(self):
+                return True
+
+            def load_facturas(self):
+                pass
+
+            def nueva_factura(self):
+                self.current_factura = Factura()
+
+            def _show_message(self, tipo, titulo, mensaje):
+                self.mensajes.append((tipo, mensaje))
+
+        sugerido = factura_numbering_service.get_next_numero_factura()
+        ventana = Ventana(sugerido)
+        ventana.guardar_factura()
+        assert ventana.mensajes == [("info", FacturasMethodsMixin._mensaje_factura_guardada(sugerido, sugerido))]
+        assert sugerido in ventana.mensajes[0][1] and "ya estaba en uso" not in ventana.mensajes[0][1]
+
+        # Otra ventana guarda antes con el número que este formulario sigue mostrando
+        sugerido = factura_numbering_service.get_next_numero_factura()
+        self._factura(sugerido).save()
+        ventana = Ventana(sugerido)
+        ventana.guardar_factura()
+        (tipo, mensaje), = ventana.mensajes
+        assert tipo == "info"
+        assert "FAC-003-2025" in mensaje and f"{sugerido} ya estaba en uso" in mensaje
+
+    def test_concurrent_reservations_are_unique(self):
+        """Test que varios hilos reservando a la vez obtienen números distintos y consecutivos"""
+        numeros = []
+        errores = []
+
+        def reservar():
+            try:
+                for _ in range(20):
+                    numeros.append(invoice_sequence.reserve("HILO", 2025))
+            except Exception as e:
+                errores.append(e)
+
+        hilos = [threading.Thread(target=reservar) for _ in range(3)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        assert errores == []
+        assert sorted(numeros) == list(range(1, 61))
+
+    def test_new_series_continues_from_given_number(self, serie_fac):
+        """Test que establecer una nueva serie hace continuar la numeración desde ese número"""
+        with patch.object(factura_numbering_service.config, 'set_factura_prefijo'), \
+                patch.object(factura_numbering_service.config, 'set_factura_numero_inicial'):
+            ok, _ = factura_numbering_service.set_nueva_serie_numeracion("FAC-500")
+
+        assert ok
+        assert factura_numbering_service.get_next_numero_factura() == "FAC-501-2025"
+
+    def test_migration_backfills_sequences(self, tmp_path):
+        """Test que la migración calcula las secuencias desde las facturas existentes"""
+        db_path = str(tmp_path / "secuencias.db")
+        conn = sqlite3.connect(db_path, isolation_level=None)
+        with patch('database.migrations.MIGRATIONS', MIGRATIONS[:6]):
+            run_migrations(conn)
+        conn.executemany(
+            """INSERT INTO facturas (numero_factura, fecha_factura, nombre_cliente, subtotal, total_iva, total_factura)
+               VALUES (?, '2024-01-01', 'Cliente', 0, 0, 0)""",
+            [("FAC-009-2024",), ("FAC-010-2024",), ("3-2024",), ("libre",)]
+        )
+        conn.close()
+
+        database = Database(db_path)
+        secuencias = database.execute_query("SELECT serie, anio, ultimo FROM secuencias ORDER BY serie")
+        assert secuencias == [("", 2024, 3), ("FAC", 2024, 10)]
+        database.close()
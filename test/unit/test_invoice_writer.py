@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Tests para InvoiceWriter (guardado atómico de factura + stock + movimientos)
+"""
+import pytest
+from database.models import Factura, FacturaItem, Producto, Stock, StockMovement
+from database.invoice_writer import invoice_writer
+
+
+class TestInvoiceWriter:
+    """Tests para el servicio InvoiceWriter"""
+
+    @pytest.fixture
+    def productos(self):
+        """Dos productos con stock inicial"""
+        productos = []
+        for i, cantidad in enumerate((10, 5)):
+            producto = Producto(nombre=f"Producto {i}", referencia=f"IW-{i}", precio=10.0)
+            producto.save()
+            Stock(producto.id, cantidad).save()
+            productos.append(producto)
+        return productos
+
+    def _factura(self, numero, lineas):
+        factura = Factura(numero_factura=numero, fecha_factura="2025-01-01",
+                          nombre_cliente="Cliente Test")
+        for producto_id, cantidad in lineas:
+            factura.add_item(producto_id, cantidad, 10.0, 21.0)
+        factura.calculate_totals()
+        return factura
+
+    def test_save_new_factura(self, productos):
+        """Test que cabecera, items, stock y movimientos se guardan juntos"""
+        p1, p2 = productos
+        factura = self._factura("IW-001", [(p1.id, 3), (p2.id, 1), (p1.id, 2)])
+
+        resultado = invoice_writer.save(factura)
+
+        assert resultado['factura_id'] == factura.id
+        assert all(item.id for item in factura.items)
+        assert len(FacturaItem.get_by_factura_id(factura.id)) == 3
+        assert Stock.get_by_product(p1.id) == 5
+        assert Stock.get_by_product(p2.id) == 4
+
+        deltas = {d['producto_id']: d for d in resultado['stock_deltas']}
+        assert deltas[p1.id] == {'producto_id': p1.id, 'cantidad': -5,
+                                 'stock_antes': 10, 'stock_despues': 5}
+        assert deltas[p2.id]['stock_despues'] == 4
+
+        movimiento = StockMovement.get_by_product(p1.id, limit=1)[0]
+        assert movimiento.tipo == "VENTA"
+        assert movimiento.cantidad == -5
+
+    def test_edit_factura_applies_only_difference(self, productos):
+        """Test que editar una factura no vuelve a descontar lo ya vendido"""
+        p1, p2 = productos
+        factura = self._factura("IW-002", [(p1.id, 3), (p2.id, 2)])
+        invoice_writer.save(factura)
+
+        factura.items = []
+        factura.add_item(p1.id, 4, 10.0, 21.0)
+        resultado = invoice_writer.save(factura)
+
+        assert Stock.get_by_product(p1.id) == 6
+        assert Stock.get_by_product(p2.id) == 5
+        deltas = {d['producto_id']: d['cantidad'] for d in resultado['stock_deltas']}
+        assert deltas == {p1.id: -1, p2.id: 2}
+
+    def test_edit_after_oversell_returns_only_what_was_taken(self, productos):
+        """Test que al editar una venta recortada por falta de stock se devuelve solo lo descontado"""
+        _, p2 = productos
+        factura = self._factura("IW-004", [(p2.id, 8)])
+        resultado = invoice_writer.save(factura)
+        assert resultado['stock_deltas'][0]['cantidad'] == -5
+        assert Stock.get_by_product(p2.id) == 0
+
+        # Con 2 unidades la factura deja 3 libres, no las 6 de la diferencia entre líneas
+        factura.items = []
+        factura.add_item(p2.id, 2, 10.0, 21.0)
+        invoice_writer.save(factura)
+        assert Stock.get_by_product(p2.id) == 3
+
+        # Y al quitar el producto vuelven las 2 que quedaban descontadas
+        otro, _ = productos
+        factura.items = []
+        factura.add_item(otro.id, 1, 10.0, 21.0)
+        invoice_writer.save(factura)
+        assert Stock.get_by_product(p2.id) == 5
+
+    def test_failure_rolls_back_everything(self, productos):
+        """Test que un error deja la base de datos intacta"""
+        p1, _ = productos
+        invoice_writer.save(self._factura("IW-003", [(p1.id, 1)]))
+
+        duplicada = self._factura("IW-003", [(p1.id, 2)])
+        with pytest.raises(Exception):
+            invoice_writer.save(duplicada)
+
+        assert duplicada.id is None
+        assert Stock.get_by_product(p1.id) == 9
+        assert len(StockMovement.get_by_product(p1.id)) == 1
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Tests para el sistema de migraciones y el perfil de PRAGMAs
+"""
+import sqlite3
+from unittest.mock import patch
+from database.database import Database
+from database.migrations import LATEST_VERSION, MIGRATIONS, get_schema_version, run_migrations
+
+
+class TestMigrations:
+    """Tests para database.migrations"""
+
+    def test_new_database_is_fully_migrated(self, temp_db):
+        """Test qu'une base neuve est à la dernière version, avec ses index"""
+        conn = temp_db.get_connection()
+        assert get_schema_version(conn) == LATEST_VERSION
+        indices = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='index'")]
+        assert "idx_factura_items_factura_id" in indices
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        conn.close()
+
+    def test_migrated_database_runs_no_ddl(self, temp_db):
+        """Test qu'ouvrir une base déjà migrée n'applique aucune migration"""
+        with patch('database.database.run_migrations') as mock_run:
+            Database(temp_db.db_path)
+        mock_run.assert_not_called()
+
+    def test_run_migrations_is_idempotent(self, temp_db):
+        """Test que relancer le runner ne fait rien"""
+        conn = temp_db._connect()
+        assert run_migrations(conn) == []
+        conn.close()
+
+    def test_legacy_database_is_upgraded(self, tmp_path):
+        """Test qu'une base antérieure aux migrations reçoit les colonnes manquantes"""
+        db_path = str(tmp_path / "legacy.db")
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE organizacion (id INTEGER PRIMARY KEY, nombre TEXT NOT NULL)")
+        conn.execute("INSERT INTO organizacion (id, nombre) VALUES (1, 'Legacy')")
+        conn.commit()
+        conn.close()
+
+        legacy = Database(db_path)
+
+        columns = [row[1] for row in legacy.execute_query("PRAGMA table_info(organizacion)")]
+        assert "directorio_descargas_pdf" in columns
+        assert legacy.execute_query("SELECT nombre FROM organizacion") == [("Legacy",)]
+        assert legacy.execute_query("PRAGMA user_version")[0][0] == LATEST_VERSION
+        legacy.close()
+
+    def test_failed_migration_is_rolled_back(self, tmp_path):
+        """Test qu'une migration en échec ne change pas la version"""
+        def broken(conn):
+            conn.execute("CREATE TABLE temporal (id INTEGER)")
+            raise RuntimeError("boom")
+
+        db_path = str(tmp_path / "broken.db")
+        conn = sqlite3.connect(db_path, isolation_level=None)
+        with patch('database.migrations.MIGRATIONS', MIGRATIONS + [(LATEST_VERSION + 1, "rota", broken)]):
+            try:
+                run_migrations(conn)
+            except RuntimeError:
+                pass
+
+        assert get_schema_version(conn) == LATEST_VERSION
+        tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+        assert "temporal" not in tables
+        conn.close()
+
+    def test_connection_pragmas(self, temp_db):
+        """Test que chaque connexion reçoit le profil de PRAGMAs"""
+        conn = temp_db.connection
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+        assert conn.execute("PRAGMA temp_store").fetchone()[0] == 2   # MEMORY
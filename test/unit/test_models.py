@@ -1,4 +1,5 @@
 import pytest
+from unittest.mock import patch
 import os
 import sys
 
@@ -312,3 +313,26 @@ class TestStock:
         # Le stock devrait être à 0, pas négatif
         cantidad = Stock.get_by_product(1)
         assert cantidad == 0
+
+    def test_stock_get_status_snapshot(self, temp_db):
+        """Test l'état du stock de tous les produits en une seule requête"""
+        ids = [
+            temp_db.execute_query(
+                "INSERT INTO productos (nombre, referencia, precio) VALUES (?, ?, ?)",
+                (nombre, f"SNAP{i}", 1.0)
+            )
+            for i, nombre in enumerate(["Agotado", "Bajo", "Disponible", "Sin fila"])
+        ]
+        temp_db.execute_many(
+            "INSERT OR REPLACE INTO stock (producto_id, cantidad_disponible) VALUES (?, ?)",
+            [(ids[0], 0), (ids[1], 5), (ids[2], 6)]
+        )
+        temp_db.execute_query("DELETE FROM stock WHERE producto_id = ?", (ids[3],))
+
+        with patch.object(temp_db, 'execute_query', wraps=temp_db.execute_query) as execute_query:
+            snapshot = Stock.get_status_snapshot()
+
+        assert execute_query.call_count == 1
+        assert [snapshot[i] for i in ids] == [
+            (0, 'sin_stock'), (5, 'bajo'), (6, 'disponible'), (0, 'sin_stock')
+        ]
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Tests para el cálculo de importes en céntimos enteros
+"""
+import random
+import time
+import pytest
+from array import array
+from database import models
+from database.models import Factura
+from database.optimized_models import BatchOperations
+from common.validators import CalculationHelper
+from utils import money
+
+
+class TestMoney:
+    """Tests para utils.money y su uso en CalculationHelper y Factura"""
+
+    def test_conversions_are_exact(self):
+        """Test que las conversiones usan la representación decimal y redondean mitad hacia arriba"""
+        assert money.to_cents(0.1 + 0.2) == 30
+        assert money.to_cents("19.995") == 2000
+        assert money.to_cents(-0.005) == -1
+        assert money.price_units(1.0005) == 10005
+        assert money.rate_units(10.5) == 1050
+        assert money.div_round(-15, 10) == -2
+        with pytest.raises(ValueError):
+            money.to_cents("invalid")
+
+    def test_line_is_penny_exact(self):
+        """Test que una línea se calcula sin errores de coma flotante"""
+        # 1.005 € en binario es 1.00499999...; en céntimos exactos la base es 1.01 €
+        assert money.calculate_line(1.005, 1, 21) == {'descuento': 0, 'base': 101, 'iva': 21, 'total': 122}
+        assert CalculationHelper.calculate_line_total(1.005, 1, 21, 0)['subtotal'] == 1.01
+        # 3 × 25 € con 15 % de descuento y 10 % de IVA: 6.375 se redondea a 6.38
+        assert money.calculate_line(25, 3, 10, 15) == {'descuento': 1125, 'base': 6375, 'iva': 638, 'total': 7013}
+
+    def test_vat_is_computed_per_rate(self):
+        """Test que el IVA de la factura se calcula sobre la base de cada tipo"""
+        factura = Factura(numero_factura="M-1", fecha_factura="2025-01-01", nombre_cliente="Cliente")
+        for _ in range(3):
+            factura.add_item(1, 1, 0.50, 21)
+        factura.add_item(1, 1, 10.00, 10)
+        factura.calculate_totals()
+
+        # Por línea serían 3 × 0.11 €; por tipo, 21 % de 1.50 € = 0.315 -> 0.32 €
+        assert [item.iva_amount for item in factura.items[:3]] == [0.11] * 3
+        assert (factura.subtotal, factura.total_iva, factura.total_factura) == (11.5, 1.32, 12.82)
+        totales = CalculationHelper.calculate_invoice_totals(factura.items)
+        assert totales['por_tipo'] == {10.0: {'base': 10.0, 'iva': 1.0}, 21.0: {'base': 1.5, 'iva': 0.32}}
+
+    def test_calculate_many_matches_single_lines(self):
+        """Test que el cálculo en lote coincide con el de cada línea"""
+        generador = random.Random(7)
+        filas = [(i // 5, round(generador.uniform(0, 500), 4), generador.randint(1, 50),
+                  generador.choice((0, 4, 10, 21)), generador.choice((0, 5, 12.5)))
+                 for i in range(2000)]
+
+        importes = money.calculate_many(filas)
+        assert all(isinstance(columna, array) for columna in importes.values())
+        for i, (_, precio, cantidad, iva, descuento) in enumerate(filas):
+            linea = money.calculate_line(precio, cantidad, iva, descuento)
+            assert (importes['base'][i], importes['iva'][i], importes['total'][i]) == \
+                (linea['base'], linea['iva'], linea['total'])
+
+        por_factura = money.invoice_totals_many(filas)
+        assert len(por_factura) == 400
+        assert sum(t['subtotal'] for t in por_factura.values()) == sum(importes['base'])
+
+    def test_batch_is_fast(self):
+        """Test que recalcular 200.000 líneas (un año de facturas) es rápido"""
+        columnas = money.LineColumns()
+        for i in range(200000):
+            columnas.append(i // 4, 12.3456, 3, 21, 5)
+
+        inicio = time.perf_counter()
+        por_factura = money.invoice_totals_many(columnas)
+        assert time.perf_counter() - inicio < 5.0
+        base = money.calculate_line(12.3456, 3, 21, 5)['base']
+        assert por_factura[0] == money.aggregate_by_rate([(2100, base)] * 4)
+
+    def test_revalidate_reports_only_wrong_invoices(self):
+        """Test que la revalidación de un periodo detecta los totales guardados incorrectos"""
+        facturas = []
+        for i in range(3):
+            factura = Factura(numero_factura=f"RV-{i}", fecha_factura=f"2024-0{i + 1}-15", nombre_cliente="Cliente")
+            factura.add_item(1, 2, 19.99, 21, 10)
+            factura.add_item(1, 1, 0.50, 4)
+            factura.calculate_totals()
+            factura.save()
+            facturas.append(factura)
+        models.db.execute_query("UPDATE facturas SET total_iva = total_iva + 0.01 WHERE id = ?", (facturas[1].id,))
+
+        diferencias = BatchOperations.revalidate_invoice_totals("2024-01-01", "2024-12-31")
+        assert [d['factura_id'] for d in diferencias] == [facturas[1].id]
+        assert diferencias[0]['calculado']['total_iva'] == facturas[0].total_iva
+        assert BatchOperations.revalidate_invoice_totals("2024-03-01") == []
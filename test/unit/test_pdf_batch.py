@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+Tests para la generación de PDFs en lote
+"""
+import os
+import threading
+from database.models import Organizacion, Factura, FacturaItem, Producto
+from utils import pdf_generator
+from utils.factura_numbering import factura_numbering_service
+from utils.pdf_generator import PDFGenerator
+
+
+class TestPDFBatch:
+    """Tests para PDFGenerator.generate_many"""
+
+    def _crear_facturas(self, cantidad):
+        Organizacion(nombre="Empresa Lote", direccion="Calle 1", telefono="600000000",
+                     email="lote@empresa.com", cif="B12345678").save()
+        producto = Producto(nombre="Producto Lote", referencia="LOTE-001", precio=10.0)
+        producto.save()
+        ids = []
+        for i in range(cantidad):
+            factura = Factura(numero_factura=f"LOTE/{i + 1:03d}-2025", fecha_factura="2025-01-31",
+                              nombre_cliente=f"Cliente {i}", subtotal=10.0, total_iva=2.1,
+                              total_factura=12.1, modo_pago="efectivo")
+            factura.save()
+            FacturaItem(factura_id=factura.id, producto_id=producto.id, cantidad=1,
+                        precio_unitario=10.0, iva_aplicado=21.0).save()
+            ids.append(factura.id)
+        return ids
+
+    def test_process_pool_generates_all_pdfs(self, tmp_path):
+        """Test que varios procesos generan un PDF por factura e informan del progreso"""
+        ids = self._crear_facturas(4)
+        progreso = []
+
+        resultado = PDFGenerator().generate_many(ids + [99999], str(tmp_path), workers=2,
+                                                 progress_callback=lambda hechas, total: progreso.append((hechas, total)))
+
+        assert sorted(resultado['generados']) == sorted(ids)
+        assert list(resultado['errores']) == [99999]
+        assert not resultado['cancelado']
+        for ruta in resultado['generados'].values():
+            assert os.path.dirname(ruta) == str(tmp_path)
+            with open(ruta, 'rb') as f:
+                assert f.read(5) == b"%PDF-"
+        assert os.path.basename(resultado['generados'][ids[0]]) == "Factura_LOTE_001-2025.pdf"
+        assert progreso == [(n, 5) for n in range(1, 6)]
+
+    def test_single_worker_runs_in_process_and_can_be_cancelled(self, tmp_path):
+        """Test que con un proceso se genera aquí mismo y que la cancelación detiene el lote"""
+        ids = self._crear_facturas(3)
+        cancelar = threading.Event()
+
+        resultado = PDFGenerator().generate_many(ids, str(tmp_path), workers=1, chunk_size=1,
+                                                 cancel_event=cancelar,
+                                                 progress_callback=lambda hechas, total: cancelar.set())
+
+        assert list(resultado['generados']) == ids[:1]
+        assert resultado['cancelado']
+
+    def test_empty_batch(self, tmp_path):
+        """Test que un lote vacío no hace nada"""
+        assert PDFGenerator().generate_many([], str(tmp_path)) == {'generados': {}, 'errores': {}, 'cancelado': False}
+
+    def test_worker_swaps_the_shared_database(self, tmp_path, monkeypatch):
+        """Test que el inicializador del pool sustituye models.db y que modelos y servicios la usan"""
+        from database import models
+        from database.optimized_models import OptimizedFactura
+        monkeypatch.setattr(models, 'db', models.db)
+        monkeypatch.setattr(pdf_generator, '_worker_generator', None)
+        self._crear_facturas(1)
+
+        db_path = str(tmp_path / "worker.db")
+        pdf_generator._init_batch_worker(db_path)
+
+        assert models.db.db_path == db_path
+        assert factura_numbering_service.db is models.db
+        assert OptimizedFactura.count() == 0
+        assert pdf_generator._worker_generator is not None
+
+    def test_window_export_reports_through_queue(self, tmp_path, monkeypatch):
+        """Test que el hilo de exportación no llama a Tk: la ventana recoge su progreso con after()"""
+        from ui import facturas_methods
+        from ui.facturas_methods import FacturasMethodsMixin
+
+        hilo_ui = threading.get_ident()
+        programadas = []
+
+        class Ventana:
+            def after(self, ms, funcion, *args):
+                assert threading.get_ident() == hilo_ui
+                programadas.append((ms, funcion, args))
+
+        class Boton:
+            def __init__(self):
+                self.textos = []
+
+            def configure(self, text, state):
+                assert threading.get_ident() == hilo_ui
+                self.textos.append(text)
+
+        class Generador:
+            def get_pdf_dir(self):
+                return str(tmp_path)
+
+            def generate_many(self, factura_ids, pdf_dir, progress_callback, cancel_event):
+                for hechas in range(1, len(factura_ids) + 1):
+                    progress_callback(hechas, len(factura_ids))
+                return {'generados': dict.fromkeys(factura_ids, "f.pdf"), 'errores': {}, 'cancelado': False}
+
+        resumenes = []
+        monkeypatch.setattr(pdf_generator, "PDFGenerator", Generador)
+        monkeypatch.setattr(facturas_methods, "show_copyable_confirm", lambda *args: True)
+        monkeypatch.setattr(facturas_methods, "show_copyable_success",
+                            lambda ventana, titulo, mensaje: resumenes.append(mensaje))
+
+        pantalla = FacturasMethodsMixin()
+        pantalla.window = Ventana()
+        pantalla.pdf_lote_btn = Boton()
+        pantalla.facturas = [Factura(id=1), Factura(id=2)]
+        pantalla.exportar_pdfs_lote()
+
+        # Bucle de eventos simulado: ejecuta lo programado hasta que deja de reprogramarse
+        while programadas:
+            ms, funcion, args = programadas.pop(0)
+            assert ms == FacturasMethodsMixin.INTERVALO_EVENTOS_LOTE
+            funcion(*args)
+
+        assert pantalla._exportacion_lote is None
+        assert pantalla.pdf_lote_btn.textos[-1] == "Exportar Todas (PDF)"
+        assert "Exportando 2/2..." in pantalla.pdf_lote_btn.textos
+        assert len(resumenes) == 1 and "PDFs generados: 2" in resumenes[0]
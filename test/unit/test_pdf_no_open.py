@@ -5,6 +5,7 @@ Test pour vérifier que les PDFs ne s'ouvrent pas pendant les tests
 """
 
 import os
+import shutil
 import tempfile
 import pytest
 from PIL import Image
@@ -116,10 +117,8 @@ class TestPDFNoOpen:
                     print("   ✅ open_pdf_file ignoré en mode test")
                     
                 finally:
-                    # Nettoyer
-                    if os.path.exists(pdf_path):
-                        os.remove(pdf_path)
-                    os.rmdir(temp_dir)
+                    # Nettoyer (le PDF et son fichier .huella)
+                    shutil.rmtree(temp_dir, ignore_errors=True)
                 
             finally:
                 database.db = original_db
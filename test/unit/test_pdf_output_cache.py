@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+Tests para la reutilización de PDFs ya generados (huella de contenido)
+"""
+import os
+import pytest
+from unittest.mock import patch
+from reportlab.platypus import SimpleDocTemplate
+from database.models import Organizacion, Factura, FacturaItem, Producto
+from utils.pdf_generator import PDFGenerator
+
+
+class TestPDFOutputCache:
+    """Tests para PDFGenerator.fingerprint y la regeneración solo si hay cambios"""
+
+    @pytest.fixture
+    def factura(self):
+        """Factura guardada con una línea"""
+        Organizacion(nombre="Empresa Huella", direccion="Calle 3", telefono="600000002",
+                     email="huella@empresa.com", cif="B11111111").save()
+        PDFGenerator.invalidate_render_context()
+        producto = Producto(nombre="Producto Huella", referencia="HUE-001", precio=10.0)
+        producto.save()
+        factura = Factura(numero_factura="HUE-001-2025", fecha_factura="2025-03-01",
+                          nombre_cliente="Cliente", subtotal=10.0, total_iva=2.1,
+                          total_factura=12.1, modo_pago="efectivo")
+        factura.save()
+        FacturaItem(factura_id=factura.id, producto_id=producto.id, cantidad=1,
+                    precio_unitario=10.0, iva_aplicado=21.0).save()
+        yield Factura.get_by_id(factura.id)
+        PDFGenerator.invalidate_render_context()
+
+    def _renders(self, generador, factura, ruta, **kwargs):
+        """Genera el PDF y devuelve cuántas veces se ha renderizado"""
+        with patch.object(SimpleDocTemplate, 'build', autospec=True,
+                          side_effect=SimpleDocTemplate.build) as build:
+            assert generador.generar_factura_pdf(factura, ruta, auto_open=False, **kwargs) == ruta
+        return build.call_count
+
+    def test_unchanged_invoice_is_not_rendered_again(self, factura, tmp_path):
+        """Test que el segundo export de la misma factura reutiliza el archivo"""
+        generador = PDFGenerator()
+        ruta = str(tmp_path / "factura.pdf")
+
+        assert self._renders(generador, factura, ruta) == 1
+        assert generador.read_fingerprint(ruta) == generador.fingerprint(factura)
+        assert self._renders(generador, factura, ruta) == 0
+        assert self._renders(generador, factura, ruta, force=True) == 1
+
+    def test_changes_invalidate_the_pdf(self, factura, tmp_path):
+        """Test que cambiar la factura, la organización o la plantilla vuelve a renderizar"""
+        generador = PDFGenerator()
+        ruta = str(tmp_path / "factura.pdf")
+        self._renders(generador, factura, ruta)
+
+        factura.items[0].cantidad = 2
+        assert self._renders(generador, factura, ruta) == 1
+
+        org = Organizacion.get()
+        org.email = "nuevo@empresa.com"
+        org.save()
+        assert self._renders(generador, factura, ruta) == 1
+
+        with patch.object(PDFGenerator, 'TEMPLATE_VERSION', PDFGenerator.TEMPLATE_VERSION + 1):
+            assert self._renders(generador, factura, ruta) == 1
+
+    def test_missing_or_foreign_pdf_is_rendered(self, factura, tmp_path):
+        """Test que sin PDF, o con un archivo sin huella, se vuelve a generar"""
+        generador = PDFGenerator()
+        ruta = str(tmp_path / "factura.pdf")
+        self._renders(generador, factura, ruta)
+
+        os.remove(ruta)
+        assert self._renders(generador, factura, ruta) == 1
+        with open(ruta, 'wb') as f:
+            f.write(b"%PDF-1.4 truncado")
+        assert generador.read_fingerprint(ruta) is None
+        assert self._renders(generador, factura, ruta) == 1
+        assert sorted(os.listdir(tmp_path)) == ["factura.pdf", "factura.pdf.huella"]
+
+    def test_incrementally_updated_pdf_is_rendered(self, factura, tmp_path):
+        """Test que un PDF modificado con una actualización incremental no se reutiliza"""
+        generador = PDFGenerator()
+        ruta = str(tmp_path / "factura.pdf")
+        self._renders(generador, factura, ruta)
+
+        # Actualización incremental: objetos nuevos, xref y trailer añadidos al final
+        with open(ruta, 'rb') as f:
+            original = f.read()
+        xref_anterior = int(original[original.rindex(b"startxref"):].split()[1])
+        with open(ruta, 'ab') as f:
+            objeto = len(original)
+            f.write(b"99 0 obj\n<< /Keywords (editado) >>\nendobj\n")
+            xref = f.tell()
+            f.write(b"xref\n99 1\n%010d 00000 n \ntrailer\n<< /Size 100 /Info 99 0 R /Prev %d >>\n"
+                    b"startxref\n%d\n%%%%EOF\n" % (objeto, xref_anterior, xref))
+
+        assert generador.read_fingerprint(ruta) is None
+        assert self._renders(generador, factura, ruta) == 1
+        assert self._renders(generador, factura, ruta) == 0
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+Tests para el contexto de renderizado compartido de PDFGenerator
+"""
+import os
+import pytest
+from unittest.mock import patch
+from PIL import Image
+from database.models import Organizacion, Factura
+from utils.pdf_generator import PDFGenerator
+
+
+class TestPDFRenderContext:
+    """Tests para la caché de estilos, encabezado y logo"""
+
+    @pytest.fixture
+    def organizacion(self, tmp_path):
+        """Organización con logo y caché de encabezado vacía"""
+        logo_path = str(tmp_path / "logo.png")
+        Image.new('RGB', (200, 100), 'blue').save(logo_path)
+        org = Organizacion(nombre="Empresa Caché", direccion="Calle 2", telefono="600000001",
+                           email="cache@empresa.com", cif="B87654321", logo_path=logo_path)
+        org.save()
+        PDFGenerator.invalidate_render_context()
+        yield org
+        PDFGenerator.invalidate_render_context()
+
+    def _factura(self, numero):
+        return Factura(numero_factura=numero, fecha_factura="2025-02-01", nombre_cliente="Cliente",
+                       subtotal=0, total_iva=0, total_factura=0, modo_pago="efectivo")
+
+    def test_styles_are_built_once(self):
+        """Test que todas las instancias comparten la misma hoja de estilos"""
+        assert PDFGenerator().styles is PDFGenerator().styles
+        assert 'TituloFactura' in PDFGenerator().styles
+
+    def test_header_is_reused_between_renders(self, organizacion, tmp_path):
+        """Test que el encabezado y el logo se preparan una vez para varias facturas"""
+        with patch.object(PDFGenerator, 'build_header', autospec=True,
+                          side_effect=PDFGenerator.build_header) as build, \
+                patch.object(PDFGenerator, 'create_logo_image', autospec=True,
+                             side_effect=PDFGenerator.create_logo_image) as logo:
+            rutas = [PDFGenerator().generar_factura_pdf(self._factura(f"CTX-{i}"), str(tmp_path / f"{i}.pdf"),
+                                                        auto_open=False)
+                     for i in range(3)]
+
+        assert build.call_count == 1
+        assert logo.call_count == 1
+        tamanos = {os.path.getsize(ruta) for ruta in rutas}
+        assert max(tamanos) - min(tamanos) < 64
+
+    def test_organization_is_read_once_per_process(self, organizacion, tmp_path):
+        """Test que varias facturas no vuelven a consultar la organización hasta que se guarda"""
+        with patch.object(Organizacion, 'get', side_effect=Organizacion.get) as consulta:
+            for i in range(3):
+                PDFGenerator().generar_factura_pdf(self._factura(f"ORG-{i}"), str(tmp_path / f"{i}.pdf"),
+                                                   auto_open=False)
+            assert consulta.call_count == 1
+
+            organizacion.save()
+            assert PDFGenerator.get_organizacion().nombre == "Empresa Caché"
+            assert consulta.call_count == 3  # la de save() y la relectura
+
+    def test_organization_change_invalidates_header(self, organizacion):
+        """Test que cambiar los datos de la organización reconstruye el encabezado"""
+        generador = PDFGenerator()
+        primero = generador.get_render_context()
+        assert generador.get_render_context() is primero
+
+        organizacion.telefono = "699999999"
+        organizacion.save()
+        segundo = generador.get_render_context()
+        assert segundo is not primero
+        assert segundo['organizacion'].telefono == "699999999"
+
+    def test_logo_change_invalidates_header(self, organizacion):
+        """Test que modificar el archivo del logo reconstruye el encabezado"""
+        generador = PDFGenerator()
+        primero = generador.get_render_context()
+
+        Image.new('RGB', (100, 300), 'red').save(organizacion.logo_path)
+        stat = os.stat(organizacion.logo_path)
+        os.utime(organizacion.logo_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+        assert generador.get_render_context() is not primero
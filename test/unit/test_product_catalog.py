@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+Tests para el catálogo de productos en memoria
+"""
+import pytest
+from unittest.mock import patch
+from database import models
+from database.models import FacturaItem, Producto
+from database.product_catalog import product_catalog
+
+
+class TestProductCatalog:
+    """Tests para ProductCatalog y los avisos de Producto"""
+
+    @pytest.fixture
+    def productos(self):
+        """Dos productos guardados antes de cargar el catálogo"""
+        productos = []
+        for nombre, referencia, categoria in (("Tornillo", "CAT-001", "Ferretería"),
+                                              ("Martillo", "CAT-002", "Ferretería")):
+            producto = Producto(nombre=nombre, referencia=referencia, precio=2.0, categoria=categoria)
+            producto.save()
+            productos.append(producto)
+        return productos
+
+    def test_loads_once_and_patches_changes(self, productos):
+        """Test que el catálogo se lee una vez y se actualiza con save/delete"""
+        tornillo, martillo = productos
+        with patch.object(Producto, 'get_all', wraps=Producto.get_all) as get_all:
+            assert [p.nombre for p in product_catalog.get_all()] == ["Martillo", "Tornillo"]
+
+            nuevo = Producto(nombre="Alicate", referencia="CAT-003", precio=5.0, categoria="Ferretería")
+            nuevo.save()
+            tornillo.referencia = "CAT-001B"
+            tornillo.categoria = "Tornillería"
+            tornillo.save()
+            martillo.delete()
+
+            assert [p.nombre for p in product_catalog.get_all()] == ["Alicate", "Tornillo"]
+            assert product_catalog.get_by_referencia("CAT-001") is None
+            assert product_catalog.get_by_referencia("CAT-001B").id == tornillo.id
+            assert [p.id for p in product_catalog.get_by_categoria("Ferretería")] == [nuevo.id]
+            assert product_catalog.get_categorias() == ["Ferretería", "Tornillería"]
+            assert product_catalog.get(martillo.id) is None
+
+        assert get_all.call_count == 1
+
+    def test_returns_copies(self, productos):
+        """Test que modificar un producto entregado no altera el catálogo"""
+        producto = product_catalog.get(productos[0].id)
+        producto.nombre = "Cambiado sin guardar"
+        assert product_catalog.get(productos[0].id).nombre == "Tornillo"
+
+    def test_rolled_back_save_is_not_applied(self, productos):
+        """Test que un guardado dentro de una transacción deshecha no llega al catálogo"""
+        product_catalog.get_all()
+        with pytest.raises(RuntimeError):
+            with models.db.transaction():
+                Producto(nombre="Fantasma", referencia="CAT-999", precio=1.0).save()
+                raise RuntimeError("rollback")
+
+        assert product_catalog.get_by_referencia("CAT-999") is None
+
+    def test_factura_item_uses_catalog(self, productos):
+        """Test que resolver el producto de los items no consulta la base de datos"""
+        product_catalog.get_all()
+        items = [FacturaItem(producto_id=p.id) for p in productos]
+        with patch.object(models.db, 'execute_query', side_effect=AssertionError("consulta")):
+            assert [item.get_producto().nombre for item in items] == ["Tornillo", "Martillo"]
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+Tests para el pool de consultas en segundo plano y los ayudantes de BaseWindow
+"""
+import queue
+import threading
+import time
+from types import SimpleNamespace
+import pytest
+from common.ui_components import BaseWindow
+from database.models import Producto
+from database.query_executor import AsyncTask, QueryExecutor, call_when_done, query_executor
+from ui.optimized_facturas import OptimizedFacturasWindow
+
+
+class _FakeWindow:
+    """Ventana que guarda los after() para ejecutarlos en el hilo del test (como Tk)"""
+
+    def __init__(self):
+        self.pendientes = queue.Queue()
+        self.hilos = set()
+
+    def after(self, ms, callback):
+        self.hilos.add(threading.get_ident())
+        self.pendientes.put(callback)
+
+    def procesar(self, timeout=5):
+        """Ejecuta los callbacks programados hasta que no quede ninguno (bucle de eventos)"""
+        limite = time.monotonic() + timeout
+        while not self.pendientes.empty():
+            assert time.monotonic() < limite, "el bucle after() no termina"
+            self.pendientes.get_nowait()()
+            time.sleep(0.001)
+
+
+def _ventana(cls=BaseWindow):
+    ventana = cls.__new__(cls)
+    ventana.window = _FakeWindow()
+    ventana.logger = SimpleNamespace(error=lambda msg: None, info=lambda msg: None)
+    ventana._async_tasks = {}
+    return ventana
+
+
+class TestQueryExecutor:
+    """Tests para QueryExecutor, call_when_done y BaseWindow.run_async"""
+
+    @pytest.fixture(autouse=True)
+    def pool_limpio(self):
+        yield
+        query_executor.shutdown()
+
+    def test_queries_run_on_worker_threads(self):
+        """Test que las consultas se ejecutan en un hilo del pool con su propia conexión"""
+        Producto(nombre="Libro", referencia="QE-1", precio=2.0).save()
+        executor = QueryExecutor(max_workers=1)
+        try:
+            filas = executor.run_query("SELECT referencia FROM productos WHERE referencia = ?", ("QE-1",))
+            hilo = executor.submit(lambda: threading.current_thread().name)
+            assert filas.result(timeout=5) == [("QE-1",)]
+            assert hilo.result(timeout=5).startswith("db-worker")
+        finally:
+            executor.shutdown()
+
+    def test_results_are_delivered_through_after(self):
+        """Test que resultado y error llegan por after() y no en el hilo del pool"""
+        ventana = _FakeWindow()
+        recibidos = []
+        call_when_done(query_executor.submit(lambda: 42), ventana,
+                       on_success=lambda r: recibidos.append((r, threading.current_thread())))
+        call_when_done(query_executor.submit(lambda: 1 / 0), ventana,
+                       on_error=lambda e: recibidos.append((type(e), threading.current_thread())))
+        ventana.procesar()
+
+        assert {r for r, _ in recibidos} == {42, ZeroDivisionError}
+        assert all(hilo is threading.current_thread() for _, hilo in recibidos)
+        assert ventana.hilos == {threading.get_ident()}
+
+    def test_cancelled_task_is_not_delivered(self):
+        """Test que una tarea cancelada no entrega su resultado aunque termine"""
+        ventana = _FakeWindow()
+        empezar = threading.Event()
+        tarea = AsyncTask(query_executor.submit(empezar.wait, 5))
+        recibidos = []
+        call_when_done(tarea.future, ventana, on_success=recibidos.append, task=tarea)
+
+        tarea.cancel()
+        empezar.set()
+        tarea.future.result(timeout=5)
+        ventana.procesar()
+
+        assert ventana.pendientes.empty()
+        assert recibidos == []
+
+    def test_same_key_supersedes_previous_load(self):
+        """Test que una carga nueva con la misma clave descarta la anterior"""
+        ventana = _ventana()
+        liberar = threading.Event()
+        recibidos = []
+
+        primera = ventana.run_async(lambda: (liberar.wait(5), "vieja")[1], key="detalle",
+                                    on_success=recibidos.append)
+        ventana.run_async(lambda: "nueva", key="detalle", on_success=recibidos.append)
+        liberar.set()
+        ventana.window.procesar()
+
+        assert primera.cancelled
+        assert recibidos == ["nueva"]
+        assert ventana._async_tasks == {}
+
+    def test_destroying_window_cancels_pending_work(self):
+        """Test que al cerrar la ventana se cancelan los trabajos pendientes"""
+        ventana = _ventana()
+        liberar = threading.Event()
+        recibidos = []
+        tarea = ventana.run_async(liberar.wait, 5, on_success=recibidos.append)
+
+        ventana._on_window_destroy(SimpleNamespace(widget=ventana.window))
+        liberar.set()
+        tarea.future.result(timeout=5)
+        ventana.window.procesar()
+
+        assert tarea.cancelled
+        assert ventana._async_tasks == {}
+        assert ventana.window.pendientes.empty()
+        assert recibidos == []
+
+    def test_factura_details_ignore_stale_selection(self):
+        """Test que los detalles de una factura ya no seleccionada no se muestran"""
+        ventana = _ventana(OptimizedFacturasWindow)
+        ventana.facturas_full = {}
+        ventana.loading_label = SimpleNamespace(configure=lambda **kw: None)
+        mostradas = []
+        ventana.display_factura_details = mostradas.append
+        ventana.selected_factura_id = 2
+
+        ventana.on_factura_details_loaded(1, "factura 1")
+        ventana.on_factura_details_loaded(2, "factura 2")
+
+        assert mostradas == ["factura 2"]
+        assert ventana.current_factura == "factura 2"
+        assert set(ventana.facturas_full) == {1, 2}
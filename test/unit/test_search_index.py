@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+Tests para la búsqueda de texto completo (índices FTS5)
+"""
+import re
+import pytest
+from types import SimpleNamespace
+from database.models import Factura, Producto
+from database.search_index import SearchIndex, search_index
+from ui.search_window import SearchWindow
+
+
+class _Var:
+    """Sustituto mínimo de StringVar para llamar a los métodos de SearchWindow"""
+
+    def __init__(self, value=""):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+
+def _filas(origen):
+    """Valores de todas las filas de un origen de datos de la tabla de resultados"""
+    return [values for _, values, _ in origen.get_rows(0, len(origen))]
+
+
+class TestSearchIndex:
+    """Tests para SearchIndex y su uso desde SearchWindow"""
+
+    @pytest.fixture
+    def productos(self):
+        """Productos con acentos en nombre y descripción"""
+        datos = [
+            ("Café molido García", "CAF-001", "Alimentación", "Tueste natural"),
+            ("Té verde", "TE-002", "Alimentación", "Hojas de García"),
+            ("Cuaderno", "CUA-003", "Papelería", "Tapa dura"),
+        ]
+        productos = []
+        for nombre, referencia, categoria, descripcion in datos:
+            producto = Producto(nombre=nombre, referencia=referencia, precio=5.0,
+                                categoria=categoria, descripcion=descripcion)
+            producto.save()
+            productos.append(producto)
+        return productos
+
+    @pytest.fixture
+    def facturas(self):
+        """Facturas de dos clientes, uno de ellos con acentos"""
+        facturas = []
+        for numero, cliente, dni in (("FTS-001", "José García", "12345678Z"),
+                                     ("FTS-002", "José García", "12345678Z"),
+                                     ("FTS-003", "Ana López", "87654321X")):
+            factura = Factura(numero_factura=numero, fecha_factura="2025-01-01",
+                              nombre_cliente=cliente, dni_nie_cliente=dni)
+            factura.save()
+            facturas.append(factura)
+        return facturas
+
+    def _window(self, texto):
+        """Objeto con los filtros que leen los métodos de búsqueda de SearchWindow"""
+        return SimpleNamespace(search_text=_Var(texto), date_from=_Var(), date_to=_Var(),
+                               amount_from=_Var(), amount_to=_Var())
+
+    def test_build_match_query(self):
+        """Test que el texto del usuario se convierte en prefijos entrecomillados"""
+        assert SearchIndex.build_match_query("garc caf") == '"garc"* "caf"*'
+        assert SearchIndex.build_match_query('a" OR NOT "b') == '"a"* "OR"* "NOT"* "b"*'
+        assert SearchIndex.build_match_query("  - ") is None
+        assert SearchIndex.build_match_query("ana", columns=("nombre",)) == \
+            '{nombre} : ("ana"*)'
+
+    def test_diacritics_and_ranking(self, productos):
+        """Test que "Garcia" encuentra "García" y la coincidencia en el nombre va primero"""
+        cafe, te, _ = productos
+        assert search_index.search_producto_ids("garcia") == [cafe.id, te.id]
+        assert search_index.search_producto_ids("CAF-00") == [cafe.id]
+        assert search_index.search_producto_ids("inexistente") == []
+
+    def test_ranking_covers_every_match(self):
+        """Test que la coincidencia más relevante aparece aunque tenga el rowid más alto"""
+        from database import models
+        models.db.execute_many(
+            "INSERT INTO productos (nombre, referencia, precio, descripcion) VALUES (?, ?, ?, ?)",
+            [(f"Artículo {i}", f"ART-{i:04d}", 1.0, "Tornillo de repuesto") for i in range(1200)]
+        )
+        mejor = Producto(nombre="Tornillo", referencia="TOR-0001", precio=1.0)
+        mejor.save()
+
+        assert search_index.search_producto_ids("tornillo", limit=5)[0] == mejor.id
+
+    def test_triggers_keep_index_in_sync(self, productos):
+        """Test que actualizar o borrar productos se refleja en el índice"""
+        _, _, cuaderno = productos
+        cuaderno.nombre = "Libreta espiral"
+        cuaderno.save()
+        assert search_index.search_producto_ids("cuaderno") == []
+        assert search_index.search_producto_ids("libreta") == [cuaderno.id]
+
+        cuaderno.delete()
+        assert search_index.search_producto_ids("libreta") == []
+
+    def test_search_window_uses_index(self, productos, facturas):
+        """Test que SearchWindow encuentra sin acentos en facturas, productos y clientes"""
+        ventana = self._window("jose garcia")
+
+        resultados = _filas(SearchWindow.search_facturas(ventana))
+        assert sorted(row[0] for row in resultados) == ["FTS-001", "FTS-002"]
+
+        clientes = _filas(SearchWindow.search_clientes(ventana))
+        assert len(clientes) == 1
+        assert clientes[0][0] == "José García"
+        assert clientes[0][4] == 2
+
+        ventana.search_text = _Var("te verde")
+        productos_encontrados = _filas(SearchWindow.search_productos(ventana))
+        assert [row[0] for row in productos_encontrados] == ["TE-002"]
+
+    def test_search_window_fallback_without_index(self, productos, monkeypatch):
+        """Test que sin índice FTS5 se mantiene la búsqueda LIKE"""
+        monkeypatch.setattr(search_index, 'is_available', lambda fts_table: False)
+        resultados = _filas(SearchWindow.search_productos(self._window("uaderno")))
+        assert [row[0] for row in resultados] == ["CUA-003"]
+
+    def test_search_all_chains_paged_sources(self, productos, facturas):
+        """Test que la búsqueda global muestra facturas y después productos leídos por páginas"""
+        origen = SearchWindow.search_all(self._window("garcia"))
+
+        filas = _filas(origen)
+        assert len(origen) == 4
+        assert [fila[0] for fila in filas] == ["Factura", "Factura", "Producto", "Producto"]
+        assert sorted(fila[1] for fila in filas[:2]) == ["FTS-001", "FTS-002"]
+        assert [fila[1] for fila in filas[2:]] == ["CAF-001", "TE-002"]
+
+    def test_invoice_number_fragment_matches_inside_number(self):
+        """Test que un fragmento de número ("0123", "123") encuentra "FAC-0123-2025" además de las coincidencias FTS5"""
+        Factura(numero_factura="FAC-0123-2025", fecha_factura="2025-03-01", nombre_cliente="Cliente 0123").save()
+        Factura(numero_factura="FAC-0456-2025", fecha_factura="2025-03-02", nombre_cliente="Otro").save()
+
+        for texto in ("0123", "123", "FAC-0123"):
+            resultados = _filas(SearchWindow.search_facturas(self._window(texto)))
+            assert [row[0] for row in resultados] == ["FAC-0123-2025"], texto
+
+        ventana = self._window("123")
+        ventana.date_to = _Var("2025-02-01")
+        assert _filas(SearchWindow.search_facturas(ventana)) == []
+
+    def test_invoice_number_fragment_uses_indexes_only(self):
+        """Test que la búsqueda de fragmentos de número no recorre la tabla facturas"""
+        from database import models
+        from ui.search_window import facturas_query
+
+        Factura(numero_factura="fac-0789-2025", fecha_factura="2025-03-01", nombre_cliente="Otro").save()
+        filtros = self._window("FAC-0789")
+        query, params = facturas_query(filtros)
+        plan = " ".join(row[3] for row in models.db.connection.execute(f"EXPLAIN QUERY PLAN {query}", params))
+        assert "SEARCH f USING INTEGER PRIMARY KEY" in plan
+        assert not re.search(r"SCAN (f|facturas)\b", plan), plan
+        assert [row[0] for row in models.db.execute_query(query, params)] == ["fac-0789-2025"]
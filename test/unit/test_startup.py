@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Tests para el arranque diferido: Database(lazy=True), imports bajo demanda y --profile-startup
+"""
+import builtins
+import os
+import subprocess
+import sys
+import threading
+from database.database import Database
+from database.migrations import LATEST_VERSION, get_schema_version
+from utils.startup_profile import StartupProfiler
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class TestArranqueDiferido:
+    """Tests para database.Database.ensure_initialized y utils.startup_profile"""
+
+    def test_lazy_database_migrates_on_first_use(self, tmp_path):
+        """Test que una base de datos diferida no toca el fichero hasta la primera consulta"""
+        path = str(tmp_path / "diferida.db")
+        db = Database(path, lazy=True)
+        assert not os.path.exists(path)
+
+        assert db.execute_query("SELECT COUNT(*) FROM productos") == [(0,)]
+        conn = db.get_connection()
+        try:
+            assert get_schema_version(conn) == LATEST_VERSION
+        finally:
+            conn.close()
+            db.close()
+
+    def test_concurrent_first_use_migrates_once(self, tmp_path, monkeypatch):
+        """Test que varios hilos que llegan a la vez esperan a una única migración"""
+        db = Database(str(tmp_path / "concurrente.db"), lazy=True)
+        llamadas = []
+        init_original = db.init_database
+        monkeypatch.setattr(db, "init_database", lambda: llamadas.append(1) or init_original())
+
+        errores = []
+
+        def consultar():
+            try:
+                db.execute_query("SELECT COUNT(*) FROM facturas")
+                db.close()
+            except Exception as e:
+                errores.append(e)
+
+        hilos = [threading.Thread(target=consultar) for _ in range(4)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        assert errores == [] and llamadas == [1]
+
+    def test_main_window_import_defers_heavy_modules(self):
+        """Test que importar la ventana principal no carga ReportLab, las ventanas ni la base de datos"""
+        codigo = ("import sys, ui.main_window; "
+                  "print(sorted(m for m in ('reportlab', 'ui.facturas', 'ui.productos', "
+                  "'database.database') if m in sys.modules))")
+        salida = subprocess.run([sys.executable, "-c", codigo], cwd=RAIZ, capture_output=True,
+                                text=True, timeout=120)
+        assert salida.returncode == 0, salida.stderr
+        assert salida.stdout.strip().splitlines()[-1] == "[]"
+
+    def test_profiler_records_phases_and_import_self_time(self):
+        """Test que el perfil mide fases e imports y restaura __import__"""
+        import_original = builtins.__import__
+        perfil = StartupProfiler(enabled=True)
+        perfil.start_import_tracking()
+        try:
+            with perfil.phase("imports"):
+                sys.modules.pop("colorsys", None)
+                import colorsys  # noqa: F401
+        finally:
+            perfil.stop_import_tracking()
+        perfil.mark("visible")
+
+        assert builtins.__import__ is import_original
+        assert [fase[0] for fase in perfil.fases] == ["imports", "visible"]
+        assert "colorsys" in perfil.imports
+        informe = perfil.report()
+        assert "Perfil de arranque" in informe and "colorsys" in informe
+
+    def test_disabled_profiler_does_nothing(self):
+        """Test que sin --profile-startup no se mide ni se parchea nada"""
+        perfil = StartupProfiler()
+        perfil.start_import_tracking()
+        assert builtins.__import__ is not perfil._timed_import
+        with perfil.phase("fase"):
+            pass
+        assert perfil.fases == []
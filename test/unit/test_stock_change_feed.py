@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+Tests para el registro de cambios de stock y la actualización incremental de las ventanas
+"""
+from types import SimpleNamespace
+import pytest
+from database import models
+from database.models import Producto, Stock
+from database.optimized_models import OptimizedStock
+from ui.optimized_stock import OptimizedStockWindow
+from ui.stock import StockWindow
+
+
+class _FakeView:
+    """Vista de stock que registra las filas enviadas"""
+
+    def __init__(self):
+        self.patches = []
+
+    def patch_rows(self, rows=(), removed_keys=()):
+        self.patches.append(([row[0] for row in rows], set(removed_keys)))
+
+
+class TestStockChangeFeed:
+    """Tests para OptimizedStock.get_changes_since y las ventanas de stock"""
+
+    @pytest.fixture
+    def productos(self):
+        """Tres productos con stock 10, 3 y 8"""
+        productos = []
+        for i, cantidad in enumerate((10, 3, 8)):
+            producto = Producto(nombre=f"Cuaderno {i}", referencia=f"CF-{i}", precio=2.0)
+            producto.save()
+            Stock(producto.id, cantidad).save()
+            productos.append(producto)
+        return productos
+
+    def test_feed_reports_only_changed_products(self, productos):
+        """Test que tras una venta solo se lee el producto vendido"""
+        p1, p2, p3 = productos
+        version = OptimizedStock.change_version()
+        assert OptimizedStock.get_changes_since(version) == {'version': version, 'filas': [], 'eliminados': []}
+
+        Stock.update_stock(p1.id, 4)
+        cambios = OptimizedStock.get_changes_since(version)
+        assert [(f['producto_id'], f['cantidad']) for f in cambios['filas']] == [(p1.id, 6)]
+        assert cambios['version'] > version
+
+        p2.nombre = "Cuaderno renombrado"
+        p2.save()
+        Stock.update_stock(p1.id, 1)
+        models.db.execute_query("DELETE FROM stock WHERE producto_id = ?", (p3.id,))
+        siguientes = OptimizedStock.get_changes_since(cambios['version'])
+        assert [(f['producto_id'], f['nombre'], f['cantidad']) for f in siguientes['filas']] == [
+            (p1.id, "Cuaderno 0", 5), (p2.id, "Cuaderno renombrado", 3)]
+        assert siguientes['eliminados'] == [p3.id]
+
+    def test_stock_save_is_recorded_without_movement(self, productos):
+        """Test que un valor absoluto guardado sin movimiento también aparece en el registro"""
+        p1 = productos[0]
+        version = OptimizedStock.change_version()
+        Stock(p1.id, 42).save()
+
+        cambios = OptimizedStock.get_changes_since(version)
+        assert [(f['producto_id'], f['cantidad']) for f in cambios['filas']] == [(p1.id, 42)]
+        assert cambios['version'][0] == version[0]
+
+    def test_merge_changes_patches_list_in_place(self, productos):
+        """Test que los cambios se aplican sobre los mismos diccionarios de la lista"""
+        p1, _, p3 = productos
+        version = OptimizedStock.change_version()
+        datos = OptimizedStock.get_all_optimized()
+        item_p1 = next(item for item in datos if item['producto_id'] == p1.id)
+
+        Stock.update_stock(p1.id, 2)
+        nuevo = Producto(nombre="Agenda", referencia="CF-N", precio=5.0)
+        nuevo.save()
+        Stock(nuevo.id, 1).save()
+        models.db.execute_query("DELETE FROM stock WHERE producto_id = ?", (p3.id,))
+
+        resultado = OptimizedStock.merge_changes(datos, OptimizedStock.get_changes_since(version))
+        assert resultado['actualizados'] == [item_p1] and item_p1['cantidad'] == 8
+        assert [item['producto_id'] for item in resultado['nuevos']] == [nuevo.id]
+        assert [item['producto_id'] for item in resultado['eliminados']] == [p3.id]
+        assert sorted(item['producto_id'] for item in datos) == sorted([p1.id, productos[1].id, nuevo.id])
+
+    def _stock_window(self):
+        ventana = StockWindow.__new__(StockWindow)
+        ventana.logger = SimpleNamespace(debug=lambda msg: None, error=lambda msg: None)
+        ventana.stock_view = _FakeView()
+        ventana.results_label = SimpleNamespace(configure=lambda **kw: None)
+        ventana.active_search = ""
+        ventana.low_stock_only = False
+        ventana.stock_version = OptimizedStock.change_version()
+        ventana.stock_data = OptimizedStock.get_all_optimized()
+        ventana.filtered_data = ventana.stock_data.copy()
+        return ventana
+
+    def test_stock_window_refresh_touches_one_row(self, productos):
+        """Test que actualizar StockWindow después de una venta solo envía esa fila"""
+        p1, p2, _ = productos
+        ventana = self._stock_window()
+
+        Stock.update_stock(p1.id, 1)
+        ventana.refresh_stock_changes()
+        assert ventana.stock_view.patches == [([p1.id], set())]
+
+        ventana.refresh_stock_changes()
+        assert len(ventana.stock_view.patches) == 1
+
+        # Con el filtro de stock bajo, un producto que sale del filtro se quita de la vista
+        ventana.low_stock_only = True
+        ventana.filtered_data = [item for item in ventana.stock_data if ventana._matches_filter(item)]
+        Stock(p2.id, 20).save()
+        ventana.refresh_stock_changes()
+        assert ventana.stock_view.patches[-1] == ([], {p2.id})
+        assert ventana.filtered_data == []
+
+    def test_optimized_window_pulls_changed_ids(self, productos):
+        """Test que OptimizedStockWindow distingue cambios de fila y cambios del filtro"""
+        p1, p2, _ = productos
+        ventana = OptimizedStockWindow.__new__(OptimizedStockWindow)
+        ventana.active_search = ""
+        ventana.low_stock_only = False
+        ventana._data_revision = 0
+        ventana.stock_version = OptimizedStock.change_version()
+        ventana.stock_data = OptimizedStock.get_all_optimized()
+        ventana.filtered_data = ventana.stock_data.copy()
+
+        Stock.update_stock(p1.id, 1)
+        assert ventana.pull_stock_changes() == {p1.id}
+        assert ventana._data_revision == 0
+
+        ventana.active_search = "cuaderno 1"
+        ventana.filtered_data = [item for item in ventana.stock_data if ventana.matches_filter(item)]
+        p1.nombre = "Cuaderno 1 bis"
+        p1.save()
+        assert ventana.pull_stock_changes() is None
+        assert [item['producto_id'] for item in ventana.filtered_data] == [p1.id, p2.id]
+        assert ventana._data_revision == 1
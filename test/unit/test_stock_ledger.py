@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+Tests para el libro de movimientos de stock (saldos y cambios en lote)
+"""
+import sqlite3
+import threading
+import pytest
+from unittest.mock import patch
+from database import models
+from database.database import Database
+from database.migrations import MIGRATIONS, run_migrations
+from database.models import Producto, Stock, StockMovement
+from database.optimized_models import BatchOperations
+
+
+class TestStockLedger:
+    """Tests para Stock.apply_changes y BatchOperations.update_multiple_stock"""
+
+    @pytest.fixture
+    def productos(self):
+        """Tres productos con stock 10, 3 y 0"""
+        productos = []
+        for i, cantidad in enumerate((10, 3, 0)):
+            producto = Producto(nombre=f"Libro {i}", referencia=f"LED-{i}", precio=1.0)
+            producto.save()
+            Stock(producto.id, cantidad).save()
+            productos.append(producto)
+        return productos
+
+    def test_batch_records_running_balances(self, productos):
+        """Test que un lote actualiza el stock y anota cantidad y saldo de cada producto"""
+        p1, p2, p3 = productos
+        resultados = Stock.apply_changes([
+            {'producto_id': p1.id, 'delta': -4, 'tipo': "VENTA", 'descripcion': "Venta"},
+            {'producto_id': p2.id, 'delta': -5, 'tipo': "VENTA"},
+            {'producto_id': p3.id, 'cantidad': 20, 'tipo': "AJUSTE_POSITIVO"},
+            {'producto_id': 99999, 'delta': 1},
+        ])
+
+        assert [(r['producto_id'], r['cantidad'], r['stock_antes'], r['stock_despues'])
+                for r in resultados] == [(p1.id, -4, 10, 6), (p2.id, -3, 3, 0), (p3.id, 20, 0, 20)]
+        assert [Stock.get_by_product(p.id) for p in productos] == [6, 0, 20]
+
+        movimiento = StockMovement.get_by_product(p3.id, limit=1)[0]
+        assert (movimiento.tipo, movimiento.cantidad, movimiento.balance_after) == ("AJUSTE_POSITIVO", 20, 20)
+        assert StockMovement.get_by_product(99999) == []
+
+    def test_oversell_records_applied_change(self, productos):
+        """Test que una venta mayor que el stock anota lo descontado y el libro cuadra"""
+        p2 = productos[1]
+        Stock.apply_changes([{'producto_id': p2.id, 'delta': -5, 'tipo': "VENTA"}])
+        Stock.apply_changes([{'producto_id': p2.id, 'delta': 4, 'tipo': "DEVOLUCION"}])
+
+        movimientos = list(reversed(StockMovement.get_by_product(p2.id)))
+        assert [(m.cantidad, m.balance_after) for m in movimientos] == [(-3, 0), (4, 4)]
+        saldo = 3  # stock inicial fijado sin movimiento
+        for movimiento in movimientos:
+            saldo += movimiento.cantidad
+            assert saldo == movimiento.balance_after
+        assert Stock.get_by_product(p2.id) == 4
+
+    def test_batch_uses_two_statements(self, productos):
+        """Test que el tamaño del lote no multiplica las sentencias"""
+        sentencias = []
+        conn = models.db.connection
+        conn.set_trace_callback(sentencias.append)
+        try:
+            Stock.apply_changes([{'producto_id': p.id, 'delta': 1} for p in productos])
+        finally:
+            conn.set_trace_callback(None)
+
+        control = ("BEGIN", "COMMIT", "SAVEPOINT", "RELEASE")
+        assert len([s for s in sentencias if not s.strip().startswith(control)]) == 2
+
+    def test_invalid_batches_are_rejected(self, productos):
+        """Test que los lotes mal formados no modifican nada"""
+        p1 = productos[0]
+        with pytest.raises(ValueError):
+            Stock.apply_changes([{'producto_id': p1.id, 'delta': 1}, {'producto_id': p1.id, 'delta': 2}])
+        with pytest.raises(ValueError):
+            Stock.apply_changes([{'producto_id': p1.id}])
+        assert Stock.get_by_product(p1.id) == 10
+
+    def test_movements_are_append_only(self, productos):
+        """Test que los movimientos anotados no se pueden modificar"""
+        Stock.update_stock(productos[0].id, 1)
+        with pytest.raises(sqlite3.DatabaseError):
+            models.db.execute_query("UPDATE stock_movements SET cantidad = 0")
+
+    def test_concurrent_sales_do_not_lose_updates(self, productos):
+        """Test que dos hilos vendiendo el mismo producto no se pisan"""
+        p1 = productos[0]
+        Stock(p1.id, 100).save()
+        errores = []
+
+        def vender():
+            try:
+                for _ in range(25):
+                    Stock.update_stock(p1.id, 1)
+            except Exception as e:
+                errores.append(e)
+
+        hilos = [threading.Thread(target=vender) for _ in range(2)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        assert errores == []
+        assert Stock.get_by_product(p1.id) == 50
+        saldos = [m.balance_after for m in StockMovement.get_by_product(p1.id, limit=100)]
+        assert saldos == list(range(50, 100))
+
+    def test_update_multiple_stock_is_ui_entry_point(self, productos):
+        """Test que el punto de entrada de la interfaz acepta variaciones y valores absolutos"""
+        p1, p2, _ = productos
+        resultados = BatchOperations.update_multiple_stock([
+            {'producto_id': p1.id, 'delta': 5, 'tipo': "ENTRADA"},
+            {'producto_id': p2.id, 'cantidad': 1},
+        ])
+
+        assert [(r['cantidad'], r['stock_despues']) for r in resultados] == [(5, 15), (-2, 1)]
+        assert StockMovement.get_by_product(p2.id, limit=1)[0].tipo == "AJUSTE"
+        assert BatchOperations.update_multiple_stock([]) == []
+
+    def test_migration_backfills_balances(self, tmp_path):
+        """Test que la migración reconstruye los saldos desde el stock actual"""
+        db_path = str(tmp_path / "libro.db")
+        conn = sqlite3.connect(db_path, isolation_level=None)
+        with patch('database.migrations.MIGRATIONS', MIGRATIONS[:5]):
+            run_migrations(conn)
+        conn.execute("INSERT INTO productos (id, nombre, referencia, precio) VALUES (1, 'A', 'A', 1)")
+        conn.execute("INSERT INTO stock (producto_id, cantidad_disponible) VALUES (1, 7)")
+        conn.executemany(
+            "INSERT INTO stock_movements (producto_id, cantidad, tipo) VALUES (1, ?, 'MANUAL')",
+            [(10,), (-5,), (2,)]
+        )
+        conn.close()
+
+        database = Database(db_path)
+        saldos = database.execute_query("SELECT balance_after FROM stock_movements ORDER BY id")
+        assert saldos == [(10,), (5,), (7,)]
+        database.close()
+
+    def test_migration_links_movements_to_invoices(self, tmp_path):
+        """Test que la migración enlaza los movimientos anteriores con la factura de su descripción"""
+        db_path = str(tmp_path / "enlaces.db")
+        conn = sqlite3.connect(db_path, isolation_level=None)
+        with patch('database.migrations.MIGRATIONS', MIGRATIONS[:11]):
+            run_migrations(conn)
+        conn.execute("INSERT INTO productos (id, nombre, referencia, precio) VALUES (1, 'A', 'A', 1)")
+        conn.execute("INSERT INTO facturas (id, numero_factura, fecha_factura, nombre_cliente, "
+                     "subtotal, total_iva, total_factura, modo_pago) "
+                     "VALUES (7, 'F-1', '2025-01-01', 'C', 0, 0, 0, 'efectivo'), "
+                     "(8, 'F-10', '2025-01-01', 'C', 0, 0, 0, 'efectivo')")
+        conn.executemany(
+            "INSERT INTO stock_movements (producto_id, cantidad, tipo, descripcion) VALUES (1, ?, ?, ?)",
+            [(-3, 'VENTA', 'Venta de 3 unidades (Factura F-1)'),
+             (-1, 'VENTA', 'Venta de 1 unidades (Factura F-10)'),
+             (1, 'AJUSTE', 'Devolución de 1 unidades (Factura F-1)'),
+             (5, 'MANUAL', 'Entrada (Factura F-1)')]
+        )
+        conn.close()
+
+        database = Database(db_path)
+        enlaces = database.execute_query("SELECT factura_id FROM stock_movements ORDER BY id")
+        assert enlaces == [(7,), (8,), (7,), (None,)]
+        with pytest.raises(Exception):
+            database.execute_query("UPDATE stock_movements SET cantidad = 0")
+        database.close()
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+Tests para la exportación en streaming a CSV y XLSX
+"""
+import csv
+import os
+import threading
+import zipfile
+import pytest
+import xml.etree.ElementTree as ET
+from types import SimpleNamespace
+from database import models
+from database.models import Factura, Producto
+from ui.search_window import SearchWindow, iter_export_rows
+from utils.streaming_export import iter_query, export_rows, XlsxStreamWriter
+
+NS = {'x': "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+
+
+class _Var:
+    """Sustituto mínimo de StringVar"""
+
+    def __init__(self, value=""):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+
+class TestStreamingExport:
+    """Tests para iter_query, export_rows y la exportación de SearchWindow"""
+
+    def _numeros(self, cantidad):
+        return iter_query(models.db, "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?) "
+                                     "SELECT i, 'fila ' || i FROM n", (cantidad,))
+
+    def test_csv_is_written_in_chunks_with_progress(self, tmp_path):
+        """Test que el CSV se escribe fila a fila e informa del progreso por bloques"""
+        ruta = str(tmp_path / "numeros.csv")
+        progreso = []
+
+        resultado = export_rows(self._numeros(2500), ruta, ["Número", "Texto"],
+                                progress_callback=progreso.append)
+
+        assert resultado == {'filas': 2500, 'cancelado': False}
+        assert progreso == [1000, 2000, 2500]
+        with open(ruta, encoding='utf-8', newline='') as f:
+            filas = list(csv.reader(f))
+        assert filas[0] == ["Número", "Texto"]
+        assert filas[-1] == ["2500", "fila 2500"]
+        assert len(filas) == 2501
+
+    def test_xlsx_is_a_valid_workbook(self, tmp_path):
+        """Test que el XLSX generado con zipfile contiene la hoja con números y textos"""
+        ruta = str(tmp_path / "datos.xlsx")
+        filas = [(1, 2.5, "Café & té"), (None, "<b>", "control\x01")]
+
+        assert export_rows(iter(filas), ruta, ["A", "B", "C"])['filas'] == 2
+
+        with zipfile.ZipFile(ruta) as z:
+            assert z.testzip() is None
+            assert {'[Content_Types].xml', '_rels/.rels', 'xl/workbook.xml',
+                    'xl/_rels/workbook.xml.rels', 'xl/worksheets/sheet1.xml'} <= set(z.namelist())
+            hoja = ET.fromstring(z.read('xl/worksheets/sheet1.xml'))
+
+        def valor(celda):
+            texto = celda.find('x:is/x:t', NS)
+            if texto is not None:
+                return texto.text
+            numero = celda.find('x:v', NS)
+            return float(numero.text) if numero is not None else None
+
+        contenido = [[valor(c) for c in fila.findall('x:c', NS)] for fila in hoja.find('x:sheetData', NS)]
+        assert contenido == [["A", "B", "C"], [1.0, 2.5, "Café & té"], [None, "<b>", "control"]]
+
+    def test_cancel_stops_and_removes_file(self, tmp_path):
+        """Test que cancelar detiene la lectura y no deja un archivo a medias"""
+        ruta = str(tmp_path / "cancelado.xlsx")
+        cancelar = threading.Event()
+
+        resultado = export_rows(self._numeros(5000), ruta, progress_callback=lambda n: cancelar.set(),
+                                cancel_event=cancelar)
+
+        assert resultado == {'filas': 1000, 'cancelado': True}
+        assert not os.path.exists(ruta)
+
+    def test_error_removes_partial_file(self, tmp_path):
+        """Test que un fallo de la consulta a mitad no deja un archivo truncado"""
+        def filas():
+            for i in range(1500):
+                yield (i, f"fila {i}")
+            raise RuntimeError("consulta interrumpida")
+
+        for nombre in ("error.csv", "error.xlsx"):
+            ruta = str(tmp_path / nombre)
+            with pytest.raises(RuntimeError):
+                export_rows(filas(), ruta)
+            assert not os.path.exists(ruta)
+
+    def test_xlsx_writer_flushes_in_buffers(self, tmp_path):
+        """Test que las filas no se acumulan en memoria más allá del búfer"""
+        writer = XlsxStreamWriter(str(tmp_path / "buffer.xlsx"))
+        for i in range(XlsxStreamWriter.BUFFER_ROWS * 2 + 1):
+            writer.writerow((i,))
+        assert len(writer._buffer) == 1
+        writer.close()
+
+    def test_search_window_global_export(self):
+        """Test que la exportación global de SearchWindow recorre facturas y productos"""
+        Factura(numero_factura="EXP-001", fecha_factura="2025-01-01", nombre_cliente="Cliente",
+                total_factura=12.5).save()
+        Producto(nombre="Producto Exportado", referencia="EXP-P", precio=3.0).save()
+        ventana = SimpleNamespace(search_text=_Var(), date_from=_Var(), date_to=_Var(),
+                                  amount_from=_Var(), amount_to=_Var(), low_stock_only=False)
+
+        filas = list(iter_export_rows(models.db, SearchWindow.export_sources(ventana, "todo")))
+
+        assert filas == [("Factura", "EXP-001", "Cliente", "2025-01-01", "12.50€"),
+                         ("Producto", "EXP-P", "Producto Exportado", "", "3.00€")]
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+Tests para el índice en memoria de los autocompletados
+"""
+import time
+from unittest.mock import patch
+from common import suggestion_index
+from common.suggestion_index import SuggestionIndex, fold_text, get_producto_index, tokenize
+from database.models import Producto
+
+
+class TestSuggestionIndex:
+    """Tests para SuggestionIndex y el índice compartido de productos"""
+
+    ENTRIES = [
+        (1, "Canción de cuna CAN-001 Música"),
+        (2, "Tornillo métrico TOR-010 Ferretería"),
+        (3, "Destornillador plano DES-020 Ferretería"),
+        (4, "Tornillo de madera TOR-011 Ferretería"),
+        (5, "Tuerca TUE-5 Ferretería"),
+    ]
+
+    def test_fold_text_and_tokenize(self):
+        """Test que se ignoran mayúsculas, acentos y signos de puntuación"""
+        assert fold_text("Canción ÑANDÚ") == "cancion nandu"
+        assert tokenize("Tornillo_métrico, TOR-010") == ["tornillo", "metrico", "tor", "010"]
+
+    def test_accents_are_ignored(self):
+        """Test que la consulta coincide con o sin acentos"""
+        index = SuggestionIndex(self.ENTRIES)
+        assert index.search("cancion") == [1]
+        assert index.search("MÚSICA") == [1]
+        assert index.search("metrico") == [2]
+
+    def test_prefix_matches_come_before_infix(self):
+        """Test que los inicios de palabra se listan antes que las coincidencias internas"""
+        index = SuggestionIndex(self.ENTRIES)
+        assert index.search("tornill") == [2, 4, 3]
+        assert index.search("nill") == [2, 3, 4]
+
+    def test_all_words_must_match(self):
+        """Test que todas las palabras de la consulta deben aparecer en la entrada"""
+        index = SuggestionIndex(self.ENTRIES)
+        assert index.search("torn mad") == [4]
+        assert index.search("ferr tor-01") == [2, 4]
+        assert index.search("tornillo cuna") == []
+
+    def test_short_words_only_match_word_starts(self):
+        """Test que las palabras de una o dos letras solo coinciden al inicio de palabra"""
+        index = SuggestionIndex(self.ENTRIES)
+        assert index.search("t") == [2, 4, 5]
+        assert index.search("ll") == []
+        assert index.search("") == []
+
+    def test_limit(self):
+        """Test que se respeta el número máximo de resultados"""
+        index = SuggestionIndex(self.ENTRIES)
+        assert index.search("ferreteria", limit=2) == [2, 3]
+        assert index.search("ferreteria", limit=None) == [2, 3, 4, 5]
+
+    def test_large_index_queries_are_fast(self):
+        """Test que las consultas sobre muchas entradas siguen siendo rápidas"""
+        index = SuggestionIndex(
+            (i, f"Producto {i} REF{i:06d} Categoría {i % 50}") for i in range(20000)
+        )
+        start = time.perf_counter()
+        for query in ("prod", "ref0123", "123", "categoria 7", "zzz"):
+            index.search(query, limit=15)
+        assert time.perf_counter() - start < 0.05
+        assert index.search("ref012345") == [12345]
+
+    def test_producto_index_follows_catalog(self):
+        """Test que el índice de productos se construye una vez por versión del catálogo"""
+        tornillo = Producto(nombre="Tornillo", referencia="IDX-001", precio=1.0)
+        tornillo.save()
+
+        with patch.object(suggestion_index, 'SuggestionIndex', wraps=SuggestionIndex) as build:
+            assert get_producto_index().search("torn") == [tornillo.id]
+            assert get_producto_index().search("idx") == [tornillo.id]
+            assert build.call_count == 1
+
+            alicate = Producto(nombre="Alicate", referencia="IDX-002", precio=2.0)
+            alicate.save()
+            assert get_producto_index().search("idx") == [alicate.id, tornillo.id]
+            assert build.call_count == 2
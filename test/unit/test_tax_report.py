@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+Tests para el desglose de IVA por factura (factura_impuestos) y los informes trimestrales
+"""
+import sqlite3
+import pytest
+from database import models
+from database.database import Database
+from database.models import Factura
+from database.tax_report import tax_report
+
+
+def _factura(numero, fecha, lineas):
+    """Factura guardada con líneas (cantidad, precio, iva)"""
+    factura = Factura(numero_factura=numero, fecha_factura=fecha, nombre_cliente="Cliente")
+    for cantidad, precio, iva in lineas:
+        factura.add_item(1, cantidad, precio, iva)
+    factura.calculate_totals()
+    factura.save()
+    return factura
+
+
+class TestTaxReport:
+    """Tests para Factura._save_impuestos y database.tax_report"""
+
+    def test_breakdown_is_saved_with_invoice(self):
+        """Test que guardar una factura escribe una fila por tipo de IVA"""
+        factura = _factura("TX-1", "2025-02-10", [(3, 0.50, 21), (1, 10.00, 10), (2, 1.00, 21)])
+
+        assert models.db.execute_query(
+            "SELECT tipo, base, cuota FROM factura_impuestos WHERE factura_id = ? ORDER BY tipo", (factura.id,)
+        ) == [(1000, 1000, 100), (2100, 350, 74)]
+        desglose = tax_report.get_breakdown(factura.id)
+        assert desglose == [{'tipo': 10.0, 'base': 10.0, 'cuota': 1.0}, {'tipo': 21.0, 'base': 3.5, 'cuota': 0.74}]
+        assert sum(fila['cuota'] for fila in desglose) == factura.total_iva
+
+    def test_breakdown_follows_edits_and_delete(self):
+        """Test que editar o borrar la factura mantiene el desglose al día"""
+        factura = _factura("TX-2", "2025-02-10", [(1, 10.00, 21)])
+
+        factura.items = []
+        factura.add_item(1, 2, 5.00, 4)
+        factura.calculate_totals()
+        factura.save()
+        assert tax_report.get_breakdown(factura.id) == [{'tipo': 4.0, 'base': 10.0, 'cuota': 0.4}]
+
+        factura.delete()
+        assert tax_report.get_breakdown(factura.id) == []
+
+    def test_quarterly_summary(self):
+        """Test que el resumen trimestral agrupa por tipo solo las facturas del trimestre"""
+        _factura("TX-3", "2025-01-01", [(1, 100.00, 21)])
+        _factura("TX-4", "2025-03-31", [(1, 50.00, 21), (1, 20.00, 10)])
+        _factura("TX-5", "2025-04-01", [(1, 999.00, 21)])
+
+        resumen = tax_report.quarterly_summary(2025, 1)
+        assert resumen['facturas'] == 2
+        assert resumen['por_tipo'] == [
+            {'tipo': 10.0, 'base': 20.0, 'cuota': 2.0, 'facturas': 1},
+            {'tipo': 21.0, 'base': 150.0, 'cuota': 31.5, 'facturas': 2},
+        ]
+        assert (resumen['base'], resumen['cuota'], resumen['total']) == (170.0, 33.5, 203.5)
+        assert tax_report.quarterly_summary(2025, 3)['por_tipo'] == []
+        with pytest.raises(ValueError):
+            tax_report.quarterly_summary(2025, 5)
+
+    def test_migration_backfills_existing_invoices(self, tmp_path):
+        """Test que la migración calcula el desglose de las facturas anteriores"""
+        db_path = str(tmp_path / "v8.db")
+        base = Database(db_path)
+        conn = base.get_connection()
+        conn.execute("DROP TABLE factura_impuestos")
+        conn.execute("PRAGMA user_version = 8")
+        conn.execute("INSERT INTO facturas (id, numero_factura, fecha_factura, nombre_cliente, subtotal, total_iva, "
+                     "total_factura) VALUES (1, 'OLD-1', '2024-05-05', 'Cliente', 4.5, 0.44, 4.94)")
+        conn.executemany(
+            "INSERT INTO factura_items (factura_id, producto_id, cantidad, precio_unitario, "
+            "iva_aplicado, descuento, subtotal, descuento_amount, iva_amount, total) "
+            "VALUES (1, 1, 1, ?, ?, 0, ?, 0, ?, ?)",
+            [(0.5, 21.0, 0.5, 0.11, 0.61)] * 3 + [(3.0, 4.0, 3.0, 0.12, 3.12)]
+        )
+        conn.commit()
+        conn.close()
+        base.close()
+
+        migrada = sqlite3.connect(db_path)
+        Database(db_path).close()
+        assert migrada.execute("SELECT tipo, base, cuota FROM factura_impuestos ORDER BY tipo").fetchall() == [
+            (400, 300, 12), (2100, 150, 32)]
+        migrada.close()
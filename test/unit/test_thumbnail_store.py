@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Tests pour le stockage persistant des miniatures
+"""
+import os
+import pytest
+from PIL import Image
+from utils.thumbnail_store import THUMBNAIL_SIZES, ThumbnailStore
+
+
+class TestThumbnailStore:
+    """Tests pour utils.thumbnail_store"""
+
+    @pytest.fixture
+    def store(self, tmp_path):
+        """Stockage dans un répertoire temporaire (os.makedirs est neutralisé par conftest)"""
+        directory = tmp_path / "thumbnails"
+        directory.mkdir()
+        return ThumbnailStore(str(directory))
+
+    @pytest.fixture
+    def source(self, tmp_path):
+        """Image produit RGBA de 800x400"""
+        path = str(tmp_path / "producto.png")
+        Image.new('RGBA', (800, 400), (255, 0, 0, 128)).save(path)
+        return path
+
+    def test_ensure_creates_all_sizes_with_one_decode(self, store, source):
+        """Test que les trois tailles sont créées en décodant la source une seule fois"""
+        paths = store.ensure(source)
+
+        assert set(paths) == set(THUMBNAIL_SIZES)
+        assert store.source_decodes == 1
+        with Image.open(paths[(150, 150)]) as thumb:
+            assert thumb.size == (150, 75)
+            assert thumb.mode == 'RGB'
+        with Image.open(paths[(40, 40)]) as thumb:
+            assert thumb.size == (40, 20)
+
+    def test_rendering_decodes_no_source_image(self, store, source, monkeypatch):
+        """Test que servir 300 lignes ne rouvre jamais l'image d'origine"""
+        store.ensure(source)
+        opened = []
+        original_open = Image.open
+        monkeypatch.setattr(Image, "open", lambda fp, *a, **kw: opened.append(fp) or original_open(fp, *a, **kw))
+
+        for _ in range(300):
+            assert store.get_path(source, (40, 40)) is not None
+        assert opened == []
+        assert store.source_decodes == 1
+
+    def test_alternating_sizes_decode_source_once(self, store, source):
+        """Test qu'alterner les tailles de la ligne de facture et du formulaire ne régénère rien"""
+        for _ in range(3):
+            small = store.get_path(source, (40, 40))
+            large = store.get_path(source, (150, 150))
+
+        assert store.source_decodes == 1
+        assert os.path.exists(small) and os.path.exists(large)
+        assert len(os.listdir(store.directory)) == len(THUMBNAIL_SIZES)
+
+        # Une taille hors des tailles standard s'ajoute sans effacer les autres
+        custom = store.get_path(source, (100, 100))
+        assert store.source_decodes == 2
+        assert os.path.exists(small) and os.path.exists(custom)
+
+    def test_modified_source_replaces_thumbnails(self, store, source):
+        """Test qu'une source modifiée (mtime) donne de nouvelles miniatures et supprime les anciennes"""
+        old_path = store.get_path(source, (64, 64))
+        Image.new('RGB', (64, 640), 'blue').save(source)
+        stat = os.stat(source)
+        os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+        new_path = store.get_path(source, (64, 64))
+        assert new_path != old_path
+        assert not os.path.exists(old_path)
+        with Image.open(new_path) as thumb:
+            assert thumb.size == (6, 64)
+
+        assert store.remove(source) == len(THUMBNAIL_SIZES)
+        assert os.listdir(store.directory) == []
+
+    def test_missing_or_invalid_source(self, store, tmp_path):
+        """Test qu'une source absente ou illisible ne produit pas de miniature"""
+        assert store.get_path(str(tmp_path / "absent.png"), (40, 40)) is None
+        invalid = tmp_path / "invalid.png"
+        invalid.write_bytes(b"not an image")
+        assert store.ensure(str(invalid)) == {}
+        assert os.listdir(store.directory) == []
+
+    def test_default_directory_is_resolved_on_first_use(self, monkeypatch):
+        """Test que le répertoire par défaut n'est pas créé à la construction"""
+        creations = []
+        monkeypatch.setattr(os, "makedirs", lambda path, exist_ok=False: creations.append(path))
+
+        store = ThumbnailStore()
+        assert creations == []
+        assert store.directory.endswith(os.path.join("data", "thumbnails"))
+        assert creations == [store.directory]
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+Tests para la vista virtual de TreeView
+"""
+import time
+from types import SimpleNamespace
+from database import models
+from database.models import Producto
+from common.virtual_treeview import (
+    ChainedDataSource, ListDataSource, QueryDataSource, VirtualTableModel, VirtualTreeview
+)
+
+
+class _FakeTree:
+    """Sustituto mínimo de ttk.Treeview que registra las operaciones"""
+
+    def __init__(self, height=5, columns=('nombre', 'precio')):
+        self.options = {'height': str(height), 'columns': columns, 'show': 'headings'}
+        self.items = {}
+        self.order = []
+        self.operations = []
+        self._selection = []
+        self._headings = {col: {'text': col.title(), 'command': None} for col in columns}
+        self._next = 0
+
+    def __getitem__(self, option):
+        return self.options[option]
+
+    def cget(self, option):
+        return self.options.get(option, '')
+
+    def bind(self, *args, **kwargs):
+        pass
+
+    def heading(self, col, option=None, **kwargs):
+        if option:
+            return self._headings[col][option]
+        self._headings[col].update(kwargs)
+
+    def insert(self, parent, index, values=(), tags=()):
+        self._next += 1
+        iid = f"I{self._next}"
+        self.items[iid] = (tuple(values), tuple(tags))
+        self.order.append(iid)
+        self.operations.append('insert')
+        return iid
+
+    def item(self, iid, values=(), tags=()):
+        self.items[iid] = (tuple(values), tuple(tags))
+        self.operations.append('item')
+
+    def delete(self, iid):
+        del self.items[iid]
+        self.order.remove(iid)
+        self.operations.append('delete')
+
+    def selection(self):
+        return tuple(self._selection)
+
+    def selection_set(self, iids):
+        self._selection = list(iids)
+
+    def visible_values(self):
+        return [self.items[iid][0] for iid in self.order]
+
+
+class TestVirtualTreeview:
+    """Tests para VirtualTableModel, los orígenes de datos y VirtualTreeview"""
+
+    def _rows(self, cantidad):
+        return [(i, (f"Producto {i}", f"€{i % 97}.00"), (str(i),)) for i in range(cantidad)]
+
+    def test_only_visible_rows_are_materialized(self):
+        """Test que con 200.000 filas solo existen en el TreeView las visibles"""
+        tree = _FakeTree(height=5)
+        vista = VirtualTreeview(tree)
+
+        start = time.perf_counter()
+        vista.set_rows(self._rows(200000))
+        vista.yview('moveto', 0.5)
+        for _ in range(100):
+            vista.yview('scroll', 1, 'units')
+        assert time.perf_counter() - start < 1.0
+
+        assert len(tree.items) == 5
+        assert vista.model.offset == 100100
+        assert tree.visible_values()[0] == ("Producto 100100", "€93.00")
+        vista.yview('scroll', 1, 'pages')
+        assert vista.model.offset == 100105
+        vista.yview('moveto', 1.0)
+        assert tree.visible_values()[-1][0] == "Producto 199999"
+
+    def test_updates_are_diff_based(self):
+        """Test que recargar los datos solo modifica los huecos que cambian"""
+        tree = _FakeTree(height=5)
+        vista = VirtualTreeview(tree)
+        filas = self._rows(10)
+        vista.set_rows(filas)
+        assert tree.operations == ['insert'] * 5
+
+        tree.operations.clear()
+        filas[2] = (2, ("Producto 2 renombrado", "€2.00"), ("2",))
+        vista.set_rows(filas)
+        assert tree.operations == ['item']
+        assert tree.visible_values()[2][0] == "Producto 2 renombrado"
+
+        tree.operations.clear()
+        vista.set_rows(filas[:3])
+        assert tree.operations == ['delete', 'delete']
+
+    def test_patch_rows_by_key(self):
+        """Test que sustituir filas por clave conserva las posiciones y solo toca los huecos afectados"""
+        tree = _FakeTree(height=5)
+        vista = VirtualTreeview(tree)
+        vista.set_rows(self._rows(10))
+        tree.operations.clear()
+
+        vista.patch_rows([(3, ("Producto 3 vendido", "€3.00"), ("3",)), (7, ("Producto 7 bis", "€7.00"), ("7",))])
+        assert tree.operations == ['item']
+        assert tree.visible_values()[3][0] == "Producto 3 vendido"
+
+        vista.patch_rows([(10, ("Producto nuevo", "€1.00"), ("10",))], removed_keys=[0, 99])
+        assert [row[0] for row in vista.source.get_rows(0, len(vista))] == [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
+        assert vista.source.get_rows(6, 7)[0][1][0] == "Producto 7 bis"
+
+    def test_selection_follows_keys_while_scrolling(self):
+        """Test que la selección se conserva por clave y el desplazamiento no avisa de cambios"""
+        tree = _FakeTree(height=5)
+        vista = VirtualTreeview(tree)
+        avisos = []
+        vista.on_select(avisos.append)
+        vista.set_rows(self._rows(100))
+
+        tree.selection_set([tree.order[1]])
+        vista._on_select("evento")
+        assert avisos == ["evento"] and vista.selected_keys() == {1}
+
+        vista.yview('scroll', 50, 'units')
+        vista._on_select("desplazamiento")
+        assert tree.selection() == () and vista.selected_keys() == {1}
+
+        vista.yview('moveto', 0)
+        vista._on_select("desplazamiento")
+        assert tree.selection() == (tree.order[1],)
+        assert avisos == ["evento"]
+
+        vista.select_key(80)
+        assert tree.visible_values()[-1][0] == "Producto 80"
+        assert vista.selected_keys() == {80}
+
+    def test_sorting_uses_all_rows(self):
+        """Test que ordenar por columna ordena todos los datos y no solo los visibles"""
+        tree = _FakeTree(height=3)
+        vista = VirtualTreeview(tree)
+        vista.set_rows(self._rows(500))
+        sorter = vista.enable_sorting()
+
+        sorter.sort_by_column('precio')
+        assert [values[1] for values in tree.visible_values()] == ["€0.00"] * 3
+        sorter.sort_by_column('precio')
+        assert [values[1] for values in tree.visible_values()] == ["€96.00"] * 3
+        assert tree.heading('precio', 'text').endswith('↓')
+
+    def test_model_clamps_offset(self):
+        """Test que la posición se ajusta al tamaño de los datos"""
+        modelo = VirtualTableModel(ListDataSource(self._rows(20)), visible_rows=5)
+        assert modelo.scroll_by(100) == 15
+        assert modelo.fractions() == (0.75, 1.0)
+        modelo.set_source(ListDataSource(self._rows(7)))
+        assert modelo.offset == 2
+        modelo.set_source(ListDataSource())
+        assert modelo.offset == 0 and modelo.fractions() == (0.0, 1.0)
+
+    def test_query_source_reads_pages_on_demand(self):
+        """Test que el origen paginado solo consulta las páginas que se muestran"""
+        for i in range(30):
+            Producto(nombre=f"Paginado {i:02d}", referencia=f"PAG-{i:02d}", precio=float(i)).save()
+
+        origen = QueryDataSource(models.db, "SELECT id, nombre, precio FROM productos ORDER BY nombre",
+                                 page_size=10, max_pages=2)
+        assert len(origen) == 30
+        assert [row[1][0] for row in origen.get_rows(8, 12)] == [f"Paginado {i:02d}" for i in range(8, 12)]
+        assert list(origen._pages) == [0, 1]
+        origen.get_rows(25, 40)
+        assert list(origen._pages) == [1, 2]
+        assert origen.get_rows(30, 35) == []
+
+    def test_query_source_pages_by_key(self):
+        """Test que con keyset cada página sigue a la anterior por clave y no con OFFSET"""
+        for i in range(25):
+            Producto(nombre=f"Clave {i % 5}", referencia=f"KEY-{i:02d}", precio=float(i)).save()
+        consultas = []
+        execute_query = models.db.execute_query
+
+        def registrar(query, params=None):
+            consultas.append(query)
+            return execute_query(query, params)
+
+        origen = QueryDataSource(SimpleNamespace(execute_query=registrar),
+                                 "SELECT id, referencia, nombre AS _k0, id AS _k1 FROM productos",
+                                 page_size=10, keyset=(("_k0", "DESC"), ("_k1", "ASC")))
+        esperado = [row[0] for row in execute_query(
+            "SELECT referencia FROM productos ORDER BY nombre DESC, id")]
+
+        assert [values[0] for _, values, _ in origen.get_rows(0, 25)] == esperado
+        assert not any("OFFSET" in query for query in consultas)
+
+        # Un salto sin la página anterior en caché usa OFFSET una sola vez
+        origen.invalidate()
+        assert [values[0] for _, values, _ in origen.get_rows(20, 25)] == esperado[20:]
+        assert sum("OFFSET" in query for query in consultas) == 1
+
+    def test_chained_source_spans_sources(self):
+        """Test que el origen encadenado reparte el rango entre sus orígenes y distingue las claves"""
+        origen = ChainedDataSource([
+            ListDataSource([(i, (f"a{i}",), ()) for i in range(3)]),
+            ListDataSource([]),
+            ListDataSource([(i, (f"b{i}",), ()) for i in range(4)]),
+        ])
+        assert len(origen) == 7
+        assert origen.get_rows(2, 5) == [((0, 2), ("a2",), ()), ((2, 0), ("b0",), ()), ((2, 1), ("b1",), ())]
+        assert [row[1][0] for row in origen.get_rows(5, 20)] == ["b2", "b3"]
+        assert origen.get_rows(7, 9) == []
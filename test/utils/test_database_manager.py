@@ -207,14 +207,24 @@ class DatabaseManager:
             cursor = conn.cursor()
             
             # Obtenir toutes les tables
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-            tables = [row[0] for row in cursor.fetchall()]
+            cursor.execute("SELECT name, sql FROM sqlite_master WHERE type='table'")
+            rows = cursor.fetchall()
+            
+            # Index plein texte (FTS5) : leurs tables internes ne se vident pas à la main
+            fts_tables = [name for name, sql in rows
+                          if sql and sql.upper().startswith('CREATE VIRTUAL TABLE')]
+            tables = [name for name, _ in rows
+                      if name not in fts_tables
+                      and not any(name.startswith(f"{fts}_") for fts in fts_tables)]
             
             # Supprimer toutes les données (mais garder la structure)
             for table in tables:
                 if table != 'sqlite_sequence':  # Table système SQLite
                     cursor.execute(f"DELETE FROM {table}")
             
+            for fts in fts_tables:
+                cursor.execute(f"INSERT INTO {fts} ({fts}) VALUES ('delete-all')")
+            
             # Remettre à zéro les auto-increment
             cursor.execute("DELETE FROM sqlite_sequence")
             
@@ -109,7 +109,6 @@ def validate_solution():
         
         key_methods = [
             "guardar_factura",
-            "update_stock_after_save",
             "show_stock_impact_summary",
             "show_stock_confirmation_dialog_direct",
             "show_simple_confirmation_dialog",
@@ -125,27 +125,6 @@ class TestDatabase:
         results = temp_db.execute_query("SELECT COUNT(*) FROM productos")
         assert results[0][0] == 0
     
-    def test_get_next_factura_number(self, temp_db):
-        """Test la génération du numéro de facture avec nouveau format"""
-        from datetime import datetime
-
-        # Premier numéro (nouveau format: numero-año)
-        numero1 = temp_db.get_next_factura_number()
-        year = datetime.now().year
-        expected1 = f"1-{year}"
-        assert numero1 == expected1
-
-        # Simuler une facture existante
-        temp_db.execute_query(
-            "INSERT INTO facturas (numero_factura, fecha_factura, nombre_cliente, subtotal, total_iva, total_factura) VALUES (?, ?, ?, ?, ?, ?)",
-            (numero1, f"{year}-01-01", "Test Client", 100.0, 21.0, 121.0)
-        )
-
-        # Deuxième numéro
-        numero2 = temp_db.get_next_factura_number()
-        expected2 = f"2-{year}"
-        assert numero2 == expected2
-    
     def test_database_connection_error_handling(self):
         """Test la gestion d'erreurs de connexion"""
         # Tenter de créer une base de données dans un répertoire invalide
@@ -8,6 +8,7 @@ import os
 from datetime import datetime
 from database.models import Factura, FacturaItem, Producto
 from database.database import Database
+from utils.config import app_config
 
 class TestFacturaModel:
     """Tests para el modelo Factura"""
@@ -207,8 +208,11 @@ class TestFacturaModel:
             if original_db_item:
                 FacturaItem.db = original_db_item
     
-    def test_get_next_numero(self, temp_db):
+    def test_get_next_numero(self, temp_db, monkeypatch):
         """Test generación de siguiente número de factura"""
+        # Serie sin prefijo que empieza en 1 (la configuración de los tests puede variar)
+        monkeypatch.setattr(app_config, 'get_factura_prefijo', lambda: "")
+        monkeypatch.setattr(app_config, 'get_factura_numero_inicial', lambda: 1)
         original_db = Factura.__dict__.get('db')
         Factura.db = temp_db
         
@@ -216,7 +220,7 @@ class TestFacturaModel:
             # Sin facturas existentes
             next_numero = Factura.get_next_numero()
             current_year = datetime.now().year
-            assert next_numero == f"1-{current_year}"
+            assert next_numero == f"001-{current_year}"
 
             # Crear una factura
             factura = Factura(
@@ -231,7 +235,7 @@ class TestFacturaModel:
 
             # Siguiente número debería incrementar
             next_numero_2 = Factura.get_next_numero()
-            assert next_numero_2 == f"2-{current_year}"
+            assert next_numero_2 == f"002-{current_year}"
             
         finally:
             if original_db:
@@ -53,6 +53,15 @@ class TestImageSelectionRegression:
             
             return window
     
+    @staticmethod
+    def _finish_import(mock_ingestor, mock_call_when_done, file_path):
+        """Vérifie l'envoi au pipeline d'import et simule sa fin; renvoie le chemin importé"""
+        mock_ingestor.submit.assert_called_once_with(file_path)
+        imported_path = os.path.join("assets/images", "img_0123456789abcdef0123.png")
+        on_success = mock_call_when_done.call_args[1]['on_success']
+        on_success({'path': imported_path, 'source_bytes': 15, 'bytes': 10})
+        return imported_path
+    
     def test_seleccionar_imagen_method_exists(self, productos_window_mock):
         """Test de régression: vérifier que la méthode seleccionar_imagen existe"""
         assert hasattr(productos_window_mock, 'seleccionar_imagen')
@@ -75,14 +84,15 @@ class TestImageSelectionRegression:
         productos_window_mock.imagen_label.configure.assert_not_called()
     
     @patch('tkinter.filedialog.askopenfilename')
-    @patch('os.makedirs')
-    @patch('shutil.copy2')
-    def test_seleccionar_imagen_file_selected_success(self, mock_copy, mock_makedirs, 
+    @patch('ui.productos.call_when_done')
+    @patch('ui.productos.image_ingestor')
+    def test_seleccionar_imagen_file_selected_success(self, mock_ingestor, mock_call_when_done,
                                                      mock_filedialog, productos_window_mock, 
                                                      temp_image_file):
-        """Test de régression: sélection d'image réussie"""
+        """Test de régression: sélection d'image réussie (import en arrière-plan)"""
         # Simuler la sélection d'un fichier
         mock_filedialog.return_value = temp_image_file
+        productos_window_mock.update_image_display = Mock()
         
         # Appeler la méthode
         productos_window_mock.seleccionar_imagen()
@@ -100,35 +110,39 @@ class TestImageSelectionRegression:
         assert any("*.*" in ft[1] for ft in filetypes)
         assert 'initialdir' in call_kwargs  # Nueva funcionalidad
         
-        # Vérifier que le répertoire est créé
-        mock_makedirs.assert_called_once_with("assets/images", exist_ok=True)
+        # Vérifier que l'image est envoyée au pipeline d'import
+        mock_ingestor.submit.assert_called_once_with(temp_image_file)
+        assert productos_window_mock.imagen_path == ""
         
-        # Vérifier que le fichier est copié
-        expected_dest = os.path.join("assets/images", os.path.basename(temp_image_file))
-        mock_copy.assert_called_once_with(temp_image_file, expected_dest)
+        # Simuler la fin de l'import dans le thread de Tk
+        imported_path = os.path.join("assets/images", "img_0123456789abcdef0123.jpg")
+        on_success = mock_call_when_done.call_args[1]['on_success']
+        on_success({'path': imported_path, 'source_bytes': 15, 'bytes': 10})
         
         # Vérifier que l'état est mis à jour
-        assert productos_window_mock.imagen_path == expected_dest
+        assert productos_window_mock.imagen_path == imported_path
         productos_window_mock.imagen_label.configure.assert_called_once_with(
             text=f"Imagen: {os.path.basename(temp_image_file)}"  # Nuevo formato
         )
+        productos_window_mock.update_image_display.assert_called_once()
     
     @patch('tkinter.filedialog.askopenfilename')
-    @patch('os.makedirs')
-    @patch('shutil.copy2')
+    @patch('ui.productos.call_when_done')
+    @patch('ui.productos.image_ingestor')
     @patch('tkinter.messagebox.showerror')
-    def test_seleccionar_imagen_copy_error(self, mock_showerror, mock_copy, mock_makedirs,
+    def test_seleccionar_imagen_copy_error(self, mock_showerror, mock_ingestor, mock_call_when_done,
                                           mock_filedialog, productos_window_mock, temp_image_file):
-        """Test de régression: erreur lors de la copie du fichier"""
+        """Test de régression: erreur lors de l'import du fichier"""
         # Simuler la sélection d'un fichier
         mock_filedialog.return_value = temp_image_file
         
-        # Simuler une erreur lors de la copie
-        mock_copy.side_effect = PermissionError("Permission denied")
-        
         # Appeler la méthode
         productos_window_mock.seleccionar_imagen()
         
+        # Simuler une erreur dans le pipeline d'import
+        on_error = mock_call_when_done.call_args[1]['on_error']
+        on_error(PermissionError("Permission denied"))
+        
         # Vérifier que l'erreur est gérée
         mock_showerror.assert_called_once()
         error_call = mock_showerror.call_args
@@ -165,9 +179,9 @@ class TestImageSelectionRegression:
         assert productos_window_mock.imagen_path == ""
     
     @patch('tkinter.filedialog.askopenfilename')
-    @patch('os.makedirs')
-    @patch('shutil.copy2')
-    def test_seleccionar_imagen_different_file_types(self, mock_copy, mock_makedirs,
+    @patch('ui.productos.call_when_done')
+    @patch('ui.productos.image_ingestor')
+    def test_seleccionar_imagen_different_file_types(self, mock_ingestor, mock_call_when_done,
                                                     mock_filedialog, productos_window_mock):
         """Test de régression: différents types de fichiers image"""
         file_types = ['.png', '.jpg', '.jpeg', '.gif', '.bmp']
@@ -183,7 +197,7 @@ class TestImageSelectionRegression:
                 mock_filedialog.return_value = temp_file.name
                 
                 # Réinitialiser les mocks
-                mock_copy.reset_mock()
+                mock_ingestor.reset_mock()
                 productos_window_mock.imagen_label.configure.reset_mock()
                 productos_window_mock.imagen_path = ""
                 
@@ -191,8 +205,7 @@ class TestImageSelectionRegression:
                 productos_window_mock.seleccionar_imagen()
                 
                 # Vérifications
-                expected_dest = os.path.join("assets/images", os.path.basename(temp_file.name))
-                mock_copy.assert_called_once_with(temp_file.name, expected_dest)
+                expected_dest = self._finish_import(mock_ingestor, mock_call_when_done, temp_file.name)
                 assert productos_window_mock.imagen_path == expected_dest
                 productos_window_mock.imagen_label.configure.assert_called_once_with(
                     text=f"Imagen: {os.path.basename(temp_file.name)}"  # Nuevo formato
@@ -203,19 +216,12 @@ class TestImageSelectionRegression:
                 if os.path.exists(temp_file.name):
                     os.unlink(temp_file.name)
     
-    @patch('tkinter.filedialog.askopenfilename')
-    @patch('os.makedirs')
-    @patch('shutil.copy2')
-    def test_seleccionar_imagen_assets_directory_creation(self, mock_copy, mock_makedirs,
-                                                         mock_filedialog, productos_window_mock,
-                                                         temp_image_file):
-        """Test de régression: création du répertoire assets/images"""
-        mock_filedialog.return_value = temp_image_file
-        
-        productos_window_mock.seleccionar_imagen()
+    def test_seleccionar_imagen_assets_directory_creation(self, productos_window_mock):
+        """Test de régression: les images importées vont dans assets/images"""
+        from utils.image_ingestion import image_ingestor
         
-        # Vérifier que le répertoire est créé avec les bons paramètres
-        mock_makedirs.assert_called_once_with("assets/images", exist_ok=True)
+        # Le pipeline d'import écrit dans le répertoire des assets configuré
+        assert image_ingestor.storage_directory == "assets/images"
     
     def test_integration_with_translation_system(self, productos_window_mock):
         """Test de régression: intégration avec le système de traductions"""
@@ -227,9 +233,9 @@ class TestImageSelectionRegression:
         assert get_text("error") == "Error"
     
     @patch('tkinter.filedialog.askopenfilename')
-    @patch('os.makedirs')
-    @patch('shutil.copy2')
-    def test_seleccionar_imagen_filename_with_spaces(self, mock_copy, mock_makedirs,
+    @patch('ui.productos.call_when_done')
+    @patch('ui.productos.image_ingestor')
+    def test_seleccionar_imagen_filename_with_spaces(self, mock_ingestor, mock_call_when_done,
                                                     mock_filedialog, productos_window_mock):
         """Test de régression: nom de fichier avec espaces"""
         # Créer un fichier avec des espaces dans le nom
@@ -243,8 +249,7 @@ class TestImageSelectionRegression:
             productos_window_mock.seleccionar_imagen()
             
             # Vérifier que le fichier avec espaces est géré correctement
-            expected_dest = os.path.join("assets/images", os.path.basename(temp_file.name))
-            mock_copy.assert_called_once_with(temp_file.name, expected_dest)
+            expected_dest = self._finish_import(mock_ingestor, mock_call_when_done, temp_file.name)
             assert productos_window_mock.imagen_path == expected_dest
             
         finally:
@@ -252,9 +257,9 @@ class TestImageSelectionRegression:
                 os.unlink(temp_file.name)
     
     @patch('tkinter.filedialog.askopenfilename')
-    @patch('os.makedirs')
-    @patch('shutil.copy2')
-    def test_seleccionar_imagen_unicode_filename(self, mock_copy, mock_makedirs,
+    @patch('ui.productos.call_when_done')
+    @patch('ui.productos.image_ingestor')
+    def test_seleccionar_imagen_unicode_filename(self, mock_ingestor, mock_call_when_done,
                                                 mock_filedialog, productos_window_mock):
         """Test de régression: nom de fichier avec caractères Unicode"""
         # Créer un fichier avec des caractères Unicode
@@ -268,8 +273,7 @@ class TestImageSelectionRegression:
             productos_window_mock.seleccionar_imagen()
             
             # Vérifier que les caractères Unicode sont gérés correctement
-            expected_dest = os.path.join("assets/images", os.path.basename(temp_file.name))
-            mock_copy.assert_called_once_with(temp_file.name, expected_dest)
+            expected_dest = self._finish_import(mock_ingestor, mock_call_when_done, temp_file.name)
             assert productos_window_mock.imagen_path == expected_dest
             
         finally:
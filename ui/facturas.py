@@ -5,6 +5,7 @@ from utils.translations import get_text
 from utils.logger import get_logger, log_user_action, log_database_operation, log_exception
 from database.models import Factura, FacturaItem, Producto, Organizacion, Stock
 from database.optimized_models import OptimizedFactura, OptimizedProducto
+from database.product_catalog import product_catalog
 from common.ui_components import BaseWindow, FormHelper
 from common.validators import FormValidator, CalculationHelper
 from common.treeview_sorter import add_sorting_to_treeview
@@ -129,6 +130,11 @@ class FacturasWindow(BaseWindow, FacturasMethodsMixin):
                               command=self.exportar_pdf)
         pdf_btn.pack(side="right", padx=5)
 
+        # Exportación de todas las facturas de la lista en segundo plano
+        self.pdf_lote_btn = ctk.CTkButton(buttons_frame, text="Exportar Todas (PDF)",
+                                          command=self.exportar_pdfs_lote)
+        self.pdf_lote_btn.pack(side="right", padx=5)
+
     def create_factura_form(self, parent):
         """Crea el formulario de factura"""
         # Título del formulario (guardar referencia para actualizaciones)
@@ -413,7 +419,7 @@ class FacturasWindow(BaseWindow, FacturasMethodsMixin):
             except Exception as opt_error:
                 self.logger.warning(f"Error en método optimizado, usando fallback: {opt_error}")
                 # Fallback vers la méthode originale
-                self.productos_disponibles = Producto.get_all()
+                self.productos_disponibles = product_catalog.get_all()
 
                 # Agregar información de stock a cada producto para referencia
                 for producto in self.productos_disponibles:
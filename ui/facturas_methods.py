@@ -2,6 +2,8 @@
 """
 Métodos adicionales para la gestión de facturas
 """
+import queue
+import threading
 import customtkinter as ctk
 import tkinter as tk
 from tkinter import messagebox, simpledialog
@@ -10,12 +12,12 @@ from common.custom_dialogs import (
     show_copyable_info, show_copyable_warning,
     show_copyable_success, show_stock_confirmation_dialog
 )
-from utils.pdf_generator import PDFGenerator
 from utils.translations import get_text
 from utils.logger import log_user_action, log_database_operation, log_exception
 from utils.factura_numbering import factura_numbering_service
 from utils.image_utils import ImageUtils
 from database.models import Producto, Stock, Factura
+from database.invoice_writer import invoice_writer
 from common.validators import FormValidator, CalculationHelper
 from common.ui_components import FormHelper
 from common.custom_dialogs import show_copyable_confirm, show_copyable_error
@@ -24,15 +26,33 @@ from ui.producto_factura_dialog import ProductoFacturaDialog
 class FacturasMethodsMixin:
     """Mixin con métodos adicionales para la gestión de facturas"""
 
+    # Milisegundos entre dos lecturas de la cola de eventos de la exportación en lote
+    INTERVALO_EVENTOS_LOTE = 50
+
     def initialize_numero_factura(self):
         """Inicializa el número de factura con el siguiente número sugerido"""
         try:
             siguiente_numero = factura_numbering_service.get_next_numero_factura()
+            # Solo es una propuesta: el número definitivo se reserva al guardar
+            self._numero_sugerido = siguiente_numero
             FormHelper.set_entry_value(self.numero_entry, siguiente_numero)
             log_user_action("Número de factura inicializado", f"Número: {siguiente_numero}")
         except Exception as e:
             log_exception(e, "initialize_numero_factura")
     
+    def _usa_numero_sugerido(self, numero):
+        """Indica si se está creando una factura con el número propuesto sin modificar"""
+        es_nueva = not (self.current_factura and self.current_factura.id)
+        return es_nueva and numero == getattr(self, '_numero_sugerido', None)
+
+    @staticmethod
+    def _mensaje_factura_guardada(numero_formulario, numero):
+        """Mensaje de éxito con el número guardado, avisando si no es el que mostraba el formulario"""
+        mensaje = f"{get_text('factura_generada')}: {numero}"
+        if numero != numero_formulario:
+            mensaje += "\n\n" + get_text("numero_factura_reasignado").format(sugerido=numero_formulario, numero=numero)
+        return mensaje
+
     def validate_factura_form(self):
         """Valida los datos del formulario de factura"""
         errors = []
@@ -43,10 +63,11 @@ class FacturasMethodsMixin:
         if error:
             errors.append(error)
         else:
-            # Validar que el número no esté duplicado
-            is_valid, validation_message = factura_numbering_service.validate_numero_factura(numero)
-            if not is_valid:
-                errors.append(validation_message)
+            # Validar que el número no esté duplicado (el sugerido se reserva al guardar)
+            if not self._usa_numero_sugerido(numero):
+                is_valid, validation_message = factura_numbering_service.validate_numero_factura(numero)
+                if not is_valid:
+                    errors.append(validation_message)
         
         # Validar fecha
         fecha = FormHelper.get_entry_value(self.fecha_entry)
@@ -479,9 +500,11 @@ class FacturasMethodsMixin:
     def update_totales(self):
         """Actualiza los totales de la factura"""
         try:
-            subtotal = sum(item.subtotal for item in self.factura_items)
-            total_iva = sum(item.iva_amount for item in self.factura_items)
-            total_factura = subtotal + total_iva
+            # Mismo cálculo que Factura.calculate_totals (IVA por tipo, en céntimos)
+            totales = CalculationHelper.calculate_invoice_totals(self.factura_items)
+            subtotal = totales['subtotal']
+            total_iva = totales['total_iva']
+            total_factura = totales['total']
             
             self.subtotal_label.configure(text=CalculationHelper.format_currency(subtotal))
             self.total_iva_label.configure(text=CalculationHelper.format_currency(total_iva))
@@ -521,7 +544,8 @@ class FacturasMethodsMixin:
                 self.current_factura = Factura()
             
             # Asignar datos básicos
-            self.current_factura.numero_factura = FormHelper.get_entry_value(self.numero_entry)
+            numero_formulario = FormHelper.get_entry_value(self.numero_entry)
+            self.current_factura.numero_factura = numero_formulario
             self.current_factura.fecha_factura = FormHelper.get_entry_value(self.fecha_entry)
             self.current_factura.nombre_cliente = FormHelper.get_entry_value(self.nombre_cliente_entry)
             self.current_factura.dni_nie_cliente = FormHelper.get_entry_value(self.dni_nie_entry)
@@ -536,18 +560,20 @@ class FacturasMethodsMixin:
             # Calcular totales
             self.current_factura.calculate_totals()
             
-            # Guardar en base de datos
+            # Guardar factura, items, stock y movimientos en una única transacción
             self.logger.info(f"💾 Guardando factura {self.current_factura.numero_factura} en base de datos...")
-            self.current_factura.save()
-            self.logger.info(f"✅ Factura guardada con ID: {self.current_factura.id}")
-
-            # Actualizar stock
-            self.logger.info(f"📊 Iniciando actualización de stock para factura {self.current_factura.numero_factura}...")
-            self.update_stock_after_save()
-            self.logger.info(f"✅ Actualización de stock completada")
+            reservar_numero = None
+            if self._usa_numero_sugerido(self.current_factura.numero_factura):
+                # Otra ventana puede haber usado ya el número propuesto: se reserva al guardar
+                reservar_numero = factura_numbering_service.reserve_numero_factura
+            resultado = invoice_writer.save(self.current_factura, reservar_numero=reservar_numero)
+            self.logger.info(f"✅ Factura guardada con ID: {resultado['factura_id']}")
+            self.log_stock_deltas(resultado['stock_deltas'])
+            # Número realmente guardado (el reservado): nueva_factura() reinicia current_factura
+            numero_guardado = self.current_factura.numero_factura
 
             # Actualizar servicio de numeración
-            factura_numbering_service.update_next_numero_after_save(self.current_factura.numero_factura)
+            factura_numbering_service.update_next_numero_after_save(numero_guardado)
 
             # Actualizar lista
             self.load_facturas()
@@ -555,71 +581,26 @@ class FacturasMethodsMixin:
             # Limpiar formulario y preparar siguiente factura
             self.nueva_factura()
 
-            self._show_message("info", "Éxito", get_text("factura_generada"))
+            # El número reservado al guardar puede no ser el sugerido si otra ventana lo usó antes
+            self._show_message("info", "Éxito",
+                               self._mensaje_factura_guardada(numero_formulario, numero_guardado))
 
-            log_database_operation("INSERT/UPDATE", "facturas",
-                                 f"Factura {self.current_factura.numero_factura}")
-            log_user_action("Factura guardada",
-                          f"Número: {self.current_factura.numero_factura}")
+            log_database_operation("INSERT/UPDATE", "facturas", f"Factura {numero_guardado}")
+            log_user_action("Factura guardada", f"Número: {numero_guardado}")
             
         except Exception as e:
             log_exception(e, "guardar_factura")
             self._show_message("error", get_text("error"), f"Error al guardar factura: {str(e)}")
     
-    def update_stock_after_save(self):
-        """Actualiza el stock después de guardar la factura"""
-        try:
-            self.logger.info(f"🔄 INICIANDO actualización de stock para factura {self.current_factura.numero_factura}")
-            self.logger.info(f"📦 Número de items a procesar: {len(self.factura_items)}")
-
-            if not self.factura_items:
-                self.logger.warning("⚠️ No hay items en la factura para actualizar stock")
-                return
-
-            for i, item in enumerate(self.factura_items, 1):
-                self.logger.info(f"📊 Procesando item {i}/{len(self.factura_items)}")
-                self.logger.info(f"   - Producto ID: {item.producto_id}")
-                self.logger.info(f"   - Cantidad a descontar: {item.cantidad}")
-
-                # Obtener stock antes de la actualización
-                stock_antes = Stock.get_by_product(item.producto_id)
-                self.logger.info(f"   - Stock antes: {stock_antes}")
-
-                # Usar el método mejorado que registra movimientos automáticamente
-                Stock.update_stock(item.producto_id, item.cantidad)
-
-                # Verificar stock después de la actualización
-                stock_despues = Stock.get_by_product(item.producto_id)
-                self.logger.info(f"   - Stock después: {stock_despues}")
+    def log_stock_deltas(self, stock_deltas):
+        """Registra los cambios de stock devueltos por InvoiceWriter (sin releer la base de datos)"""
+        for delta in stock_deltas:
+            log_database_operation("UPDATE", "stock",
+                                 f"Producto ID:{delta['producto_id']}: {delta['stock_antes']}→{delta['stock_despues']} "
+                                 f"(Factura: {self.current_factura.numero_factura})")
+            self.logger.info(f"Stock actualizado para producto ID:{delta['producto_id']}: "
+                           f"{delta['cantidad']:+d} unidades ({delta['stock_antes']}→{delta['stock_despues']})")
 
-                # Verificar que la actualización fue correcta
-                stock_esperado = max(0, stock_antes - item.cantidad)
-                if stock_despues == stock_esperado:
-                    self.logger.info(f"   ✅ Stock actualizado correctamente")
-                else:
-                    self.logger.error(f"   ❌ Error en actualización: esperado {stock_esperado}, obtenido {stock_despues}")
-
-                # Obtener información del producto para el log
-                producto = item.get_producto()
-                producto_nombre = producto.nombre if producto else f"ID:{item.producto_id}"
-
-                log_database_operation("UPDATE", "stock",
-                                     f"Producto {producto_nombre}: {stock_antes}→{stock_despues} (Factura: {self.current_factura.numero_factura})")
-
-                self.logger.info(f"Stock actualizado para producto {producto_nombre}: -{item.cantidad} unidades ({stock_antes}→{stock_despues})")
-
-            self.logger.info(f"✅ COMPLETADA actualización de stock para factura {self.current_factura.numero_factura}")
-
-        except Exception as e:
-            log_exception(e, "update_stock_after_save")
-            # Mostrar error al usuario para que sea visible
-            self.logger.error(f"❌ Error actualizando stock después de guardar factura: {e}")
-            self._show_message("error", "Error de Stock",
-                             f"Error al actualizar stock después de guardar factura:\n{str(e)}\n\n"
-                             f"La factura se guardó correctamente, pero el stock no se actualizó.")
-            # Re-lanzar la excepción para debugging
-            raise
-    
     def eliminar_factura(self):
         """Elimina la factura seleccionada"""
         try:
@@ -689,6 +670,7 @@ Este mensaje puede ser copiado para referencia."""
 
             # Generar PDF usando el nuevo generador
             try:
+                from utils.pdf_generator import PDFGenerator
                 pdf_generator = PDFGenerator()
                 pdf_path = pdf_generator.generar_factura_pdf(self.selected_factura, auto_open=True)
 
@@ -824,6 +806,99 @@ Si el error persiste, copie este mensaje para soporte técnico."""
 
             show_copyable_error(self.window, get_text("error"), error_message)
     
+    def exportar_pdfs_lote(self):
+        """Exporta a PDF todas las facturas de la lista sin bloquear la ventana"""
+        try:
+            if getattr(self, '_exportacion_lote', None) is not None:
+                show_copyable_warning(self.window, "Exportación en curso",
+                                      "Ya hay una exportación de PDFs en curso.")
+                return
+
+            factura_ids = [factura.id for factura in self.facturas if factura.id]
+            if not factura_ids:
+                show_copyable_warning(self.window, "Advertencia", "No hay facturas para exportar.")
+                return
+
+            from utils.pdf_generator import PDFGenerator
+            pdf_generator = PDFGenerator()
+            pdf_dir = pdf_generator.get_pdf_dir()
+            if not show_copyable_confirm(self.window, "Exportar PDFs",
+                                         f"Se generarán {len(factura_ids)} PDFs en:\n{pdf_dir}\n\n¿Continuar?"):
+                return
+
+            cancelar = threading.Event()
+            self._exportacion_lote = cancelar
+            log_user_action("Exportación de PDFs en lote", f"{len(factura_ids)} facturas")
+
+            # El hilo de trabajo no toca Tk: deja sus eventos en la cola y la ventana los recoge
+            eventos = queue.Queue()
+
+            def progreso(hechas, total):
+                eventos.put(("progreso", (hechas, total)))
+
+            def exportar():
+                try:
+                    resultado = pdf_generator.generate_many(factura_ids, pdf_dir, progress_callback=progreso,
+                                                            cancel_event=cancelar)
+                except Exception as e:
+                    log_exception(e, "exportar_pdfs_lote")
+                    resultado = e
+                eventos.put(("fin", resultado))
+
+            # ReportLab trabaja en procesos aparte; este hilo solo espera y reenvía el progreso
+            threading.Thread(target=exportar, name="exportar_pdfs_lote", daemon=True).start()
+            self.window.after(self.INTERVALO_EVENTOS_LOTE, self._atender_exportacion_lote, eventos, pdf_dir)
+
+        except Exception as e:
+            log_exception(e, "exportar_pdfs_lote")
+            self._exportacion_lote = None
+            show_copyable_error(self.window, get_text("error"), f"Error al exportar PDFs: {str(e)}")
+
+    def _atender_exportacion_lote(self, eventos, pdf_dir):
+        """Aplica en el hilo de Tk los eventos pendientes de la exportación y vuelve a programarse"""
+        try:
+            while True:
+                tipo, datos = eventos.get_nowait()
+                if tipo == "fin":
+                    self._finalizar_exportacion_lote(datos, pdf_dir)
+                    return
+                self._mostrar_progreso_lote(*datos)
+        except queue.Empty:
+            pass
+
+        try:
+            self.window.after(self.INTERVALO_EVENTOS_LOTE, self._atender_exportacion_lote, eventos, pdf_dir)
+        except (tk.TclError, RuntimeError):
+            # La ventana ya se cerró: se cancela lo que quede por exportar
+            if getattr(self, '_exportacion_lote', None) is not None:
+                self._exportacion_lote.set()
+
+    def _mostrar_progreso_lote(self, hechas, total):
+        """Muestra el progreso de la exportación en el botón"""
+        if hasattr(self, 'pdf_lote_btn'):
+            self.pdf_lote_btn.configure(text=f"Exportando {hechas}/{total}...", state="disabled")
+
+    def _finalizar_exportacion_lote(self, resultado, pdf_dir):
+        """Restaura el botón y resume el resultado de la exportación"""
+        self._exportacion_lote = None
+        if hasattr(self, 'pdf_lote_btn'):
+            self.pdf_lote_btn.configure(text="Exportar Todas (PDF)", state="normal")
+
+        if isinstance(resultado, Exception):
+            show_copyable_error(self.window, "Error Exportando PDFs", f"Error al exportar PDFs: {str(resultado)}")
+            return
+
+        mensaje = (f"PDFs generados: {len(resultado['generados'])}\n"
+                   f"Errores: {len(resultado['errores'])}\n"
+                   f"Directorio: {pdf_dir}")
+        if resultado['errores']:
+            detalles = "\n".join(f"- Factura {factura_id}: {error}"
+                                  for factura_id, error in list(resultado['errores'].items())[:20])
+            mensaje += f"\n\nErrores:\n{detalles}"
+            show_copyable_warning(self.window, "Exportación de PDFs", mensaje)
+        else:
+            show_copyable_success(self.window, "Exportación de PDFs", mensaje)
+
     def generar_pdf(self):
         """Genera PDF de la factura actual"""
         try:
@@ -839,6 +914,7 @@ Si el error persiste, copie este mensaje para soporte técnico."""
 
             # Generar PDF de la factura actual
             try:
+                from utils.pdf_generator import PDFGenerator
                 pdf_generator = PDFGenerator()
                 pdf_path = pdf_generator.generar_factura_pdf(self.current_factura, auto_open=True)
 
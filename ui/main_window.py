@@ -1,10 +1,8 @@
 import customtkinter as ctk
 from utils.translations import get_text
-from ui.productos import ProductosWindow
-from ui.organizacion import OrganizacionWindow
-from ui.stock import StockWindow
-from ui.facturas import FacturasWindow
-from ui.search_window import SearchWindow
+
+# Las ventanas secundarias (y con ellas PIL, ReportLab y los modelos) se
+# importan al abrirlas por primera vez para que la principal aparezca antes
 
 class MainWindow:
     def __init__(self):
@@ -144,6 +142,7 @@ class MainWindow:
     
     def open_productos(self):
         """Abre la ventana de gestión de productos"""
+        from ui.productos import ProductosWindow
         if self.productos_window is None or not self.productos_window.window.winfo_exists():
             self.productos_window = ProductosWindow(self.root)
         else:
@@ -155,6 +154,7 @@ class MainWindow:
     
     def open_organizacion(self):
         """Abre la ventana de configuración de organización"""
+        from ui.organizacion import OrganizacionWindow
         if self.organizacion_window is None or not self.organizacion_window.window.winfo_exists():
             self.organizacion_window = OrganizacionWindow(self.root)
         else:
@@ -166,6 +166,7 @@ class MainWindow:
     
     def open_stock(self):
         """Abre la ventana de gestión de stock"""
+        from ui.stock import StockWindow
         if self.stock_window is None or not self.stock_window.window.winfo_exists():
             self.stock_window = StockWindow(self.root)
         else:
@@ -177,6 +178,7 @@ class MainWindow:
     
     def open_facturas(self):
         """Abre la ventana de gestión de facturas"""
+        from ui.facturas import FacturasWindow
         if self.facturas_window is None or not self.facturas_window.window.winfo_exists():
             self.facturas_window = FacturasWindow(self.root)
         else:
@@ -188,6 +190,7 @@ class MainWindow:
     
     def open_search(self):
         """Abre la ventana de búsqueda avanzada"""
+        from ui.search_window import SearchWindow
         if self.search_window is None or not self.search_window.window.winfo_exists():
             self.search_window = SearchWindow(self.root)
         else:
@@ -198,6 +201,7 @@ class MainWindow:
 
     def open_nueva_factura(self):
         """Abre la ventana para crear una nueva factura"""
+        from ui.facturas import FacturasWindow
         if self.facturas_window is None or not self.facturas_window.window.winfo_exists():
             self.facturas_window = FacturasWindow(self.root, nueva_factura=True)
         else:
@@ -33,10 +33,14 @@ class OptimizedFacturasWindow(BaseWindow):
         self.last_search_time = 0
         self.search_delay = 200  # ms
         
-        # Variables de pagination
+        # Variables de pagination (par clé: un curseur de début par page visitée)
         self.page_size = 50
         self.current_page = 0
         self.total_pages = 0
+        self.total_facturas = 0
+        self.page_cursors = [None]
+        self.next_cursor = None
+        self.current_filters = None
         
         self.create_optimized_widgets()
         self.load_facturas_optimized()
@@ -243,41 +247,65 @@ class OptimizedFacturasWindow(BaseWindow):
     def load_facturas_optimized(self):
         """Charger les facturas de manière optimisée (résumé seulement)"""
         try:
-            self.loading_label.configure(text="⏳ Cargando...")
-            self.window.update()
-            
-            # Charger seulement le résumé pour l'affichage rapide
-            self.facturas_summary = OptimizedFactura.get_summary_optimized()
-            
-            # Calculer la pagination
-            self.total_pages = max(1, (len(self.facturas_summary) + self.page_size - 1) // self.page_size)
-            self.current_page = 0
-            
-            self.update_facturas_display()
-            self.update_pagination_controls()
-            
-            self.loading_label.configure(text="")
-            self.logger.info(f"Facturas cargadas (resumen): {len(self.facturas_summary)}")
-            
+            # Charger seulement la première page (le coût ne dépend pas du nombre total)
+            self.reset_pagination()
         except Exception as e:
-            self.loading_label.configure(text="❌ Error")
-            self.logger.error(f"Error cargando facturas optimizado: {e}")
-            self.show_error_message("Error", f"Error cargando facturas: {e}")
+            self.on_page_error(e)
     
+    def reset_pagination(self):
+        """Revenir à la première page (après une recherche ou un rechargement)"""
+        self.page_cursors = [None]
+        self.current_page = 0
+        self.load_current_page(with_total=True)
+
+    def load_current_page(self, with_total=False):
+        """Charger la page courante depuis la base de données (hors du thread de Tk)"""
+        self.loading_label.configure(text="⏳ Cargando...")
+        # Pas de changement de page tant que le curseur suivant n'est pas connu
+        self.prev_btn.configure(state="disabled")
+        self.next_btn.configure(state="disabled")
+        self.run_async(
+            OptimizedFactura.page,
+            after=self.page_cursors[self.current_page],
+            limit=self.page_size,
+            filters=self.current_filters,
+            with_total=with_total,
+            key="facturas_page",
+            on_success=lambda result: self.on_page_loaded(result, with_total),
+            on_error=self.on_page_error
+        )
+
+    def on_page_loaded(self, result, with_total):
+        """Afficher une page chargée en arrière-plan"""
+        self.facturas_summary = result['rows']
+        self.next_cursor = result['next_cursor']
+
+        if with_total:
+            self.total_facturas = result['total']
+            self.total_pages = max(1, (self.total_facturas + self.page_size - 1) // self.page_size)
+            self.logger.info(f"Facturas cargadas: página de {len(self.facturas_summary)} "
+                             f"sobre {self.total_facturas}")
+
+        self.loading_label.configure(text="")
+        self.update_facturas_display()
+        self.update_pagination_controls()
+
+    def on_page_error(self, error):
+        """Erreur lors du chargement d'une page"""
+        self.loading_label.configure(text="❌ Error")
+        self.logger.error(f"Error cargando facturas optimizado: {error}")
+        self.update_pagination_controls()
+        self.show_error_message("Error", f"Error cargando facturas: {error}")
+
     def update_facturas_display(self):
-        """Mettre à jour l'affichage des facturas (pagination)"""
+        """Mettre à jour l'affichage des facturas (page courante)"""
         try:
             # Nettoyer la liste
             for item in self.facturas_tree.get_children():
                 self.facturas_tree.delete(item)
             
-            # Calculer la plage de la page actuelle
-            start_idx = self.current_page * self.page_size
-            end_idx = min(start_idx + self.page_size, len(self.facturas_summary))
-            
             # Ajouter les facturas de la page actuelle
-            for i in range(start_idx, end_idx):
-                factura = self.facturas_summary[i]
+            for factura in self.facturas_summary:
                 self.facturas_tree.insert("", "end", values=(
                     factura['numero_factura'],
                     factura['fecha_factura'],
@@ -311,30 +339,38 @@ class OptimizedFacturasWindow(BaseWindow):
             self.logger.error(f"Error en selección de factura: {e}")
     
     def load_factura_details_async(self, factura_id):
-        """Charger les détails de factura de manière asynchrone"""
-        try:
-            self.loading_label.configure(text="⏳ Cargando detalles...")
-            self.window.update()
-            
-            # Vérifier le cache
-            if factura_id in self.facturas_full:
-                factura = self.facturas_full[factura_id]
-            else:
-                # Charger depuis la base de données
-                from database.models import Factura
-                factura = Factura.get_by_id(factura_id)
-                if factura:
-                    self.facturas_full[factura_id] = factura
-            
-            if factura:
-                self.current_factura = factura
-                self.display_factura_details(factura)
-            
-            self.loading_label.configure(text="")
-            
-        except Exception as e:
-            self.loading_label.configure(text="❌ Error")
-            self.logger.error(f"Error cargando detalles de factura {factura_id}: {e}")
+        """Charger les détails de factura en arrière-plan (le thread de Tk reste libre)"""
+        # Vérifier le cache
+        if factura_id in self.facturas_full:
+            self.on_factura_details_loaded(factura_id, self.facturas_full[factura_id])
+            return
+
+        from database.models import Factura
+        self.loading_label.configure(text="⏳ Cargando detalles...")
+        # Une nouvelle sélection annule le chargement précédent
+        self.run_async(
+            Factura.get_by_id, factura_id,
+            key="factura_details",
+            on_success=lambda factura: self.on_factura_details_loaded(factura_id, factura),
+            on_error=lambda e: self.on_factura_details_error(factura_id, e)
+        )
+
+    def on_factura_details_loaded(self, factura_id, factura):
+        """Afficher les détails chargés si la factura est toujours sélectionnée"""
+        if factura:
+            self.facturas_full[factura_id] = factura
+        if factura_id != self.selected_factura_id:
+            return
+
+        self.loading_label.configure(text="")
+        if factura:
+            self.current_factura = factura
+            self.display_factura_details(factura)
+
+    def on_factura_details_error(self, factura_id, error):
+        """Erreur lors du chargement des détails"""
+        self.loading_label.configure(text="❌ Error")
+        self.logger.error(f"Error cargando detalles de factura {factura_id}: {error}")
     
     def display_factura_details(self, factura):
         """Afficher les détails de la factura"""
@@ -480,13 +516,18 @@ class OptimizedFacturasWindow(BaseWindow):
             self.logger.error(f"Error mostrando detalles de factura: {e}")
     
     def load_productos_cache(self):
-        """Charger le cache des productos pour éviter les requêtes répétées"""
-        try:
-            productos_summary = OptimizedProducto.get_summary_optimized()
-            self.productos_cache = {p['id']: p for p in productos_summary}
-            self.logger.info(f"Cache de productos cargado: {len(self.productos_cache)} productos")
-        except Exception as e:
-            self.logger.error(f"Error cargando cache de productos: {e}")
+        """Charger le cache des productos pour éviter les requêtes répétées (en arrière-plan)"""
+        self.run_async(
+            OptimizedProducto.get_summary_optimized,
+            key="productos_cache",
+            on_success=self.on_productos_cache_loaded,
+            on_error=lambda e: self.logger.error(f"Error cargando cache de productos: {e}")
+        )
+
+    def on_productos_cache_loaded(self, productos_summary):
+        """Remplir le cache des productos"""
+        self.productos_cache = {p['id']: p for p in productos_summary}
+        self.logger.info(f"Cache de productos cargado: {len(self.productos_cache)} productos")
     
     def on_search_change(self, *args):
         """Gérer les changements de recherche avec debouncing"""
@@ -502,26 +543,11 @@ class OptimizedFacturasWindow(BaseWindow):
     def perform_search(self):
         """Effectuer la recherche"""
         try:
-            search_text = self.search_var.get().lower().strip()
-            
-            if not search_text:
-                # Restaurer toutes les facturas
-                self.facturas_summary = OptimizedFactura.get_summary_optimized()
-            else:
-                # Filtrer les facturas
-                all_facturas = OptimizedFactura.get_summary_optimized()
-                self.facturas_summary = [
-                    f for f in all_facturas
-                    if (search_text in f['numero_factura'].lower() or
-                        search_text in f['nombre_cliente'].lower())
-                ]
-            
-            # Réinitialiser la pagination
-            self.total_pages = max(1, (len(self.facturas_summary) + self.page_size - 1) // self.page_size)
-            self.current_page = 0
+            search_text = self.search_var.get().strip()
             
-            self.update_facturas_display()
-            self.update_pagination_controls()
+            # Le filtrage se fait en SQL; on repart de la première page
+            self.current_filters = {'texto': search_text} if search_text else None
+            self.reset_pagination()
             
         except Exception as e:
             self.logger.error(f"Error en búsqueda: {e}")
@@ -535,25 +561,25 @@ class OptimizedFacturasWindow(BaseWindow):
         """Page précédente"""
         if self.current_page > 0:
             self.current_page -= 1
-            self.update_facturas_display()
-            self.update_pagination_controls()
+            self.load_current_page()
     
     def next_page(self):
         """Page suivante"""
-        if self.current_page < self.total_pages - 1:
+        if self.next_cursor is not None:
             self.current_page += 1
-            self.update_facturas_display()
-            self.update_pagination_controls()
+            if self.current_page == len(self.page_cursors):
+                self.page_cursors.append(self.next_cursor)
+            self.load_current_page()
     
     def update_pagination_controls(self):
         """Mettre à jour les contrôles de pagination"""
         self.page_label.configure(text=f"Página {self.current_page + 1} de {self.total_pages}")
         
         self.prev_btn.configure(state="normal" if self.current_page > 0 else "disabled")
-        self.next_btn.configure(state="normal" if self.current_page < self.total_pages - 1 else "disabled")
+        self.next_btn.configure(state="normal" if self.next_cursor is not None else "disabled")
     
     def sort_facturas(self, column):
-        """Trier les facturas par colonne"""
+        """Trier les facturas de la page courante par colonne"""
         try:
             reverse = getattr(self, f'_sort_{column}_reverse', False)
             
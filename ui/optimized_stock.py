@@ -34,6 +34,14 @@ class OptimizedStockWindow(BaseWindow):
         # Variables de tri
         self.sort_column = "nombre"
         self.sort_reverse = False
+
+        # Filtre appliqué et version du registre de changements déjà lue
+        self.active_search = ""
+        self.low_stock_only = False
+        self.stock_version = (0, 0)
+        # Révision des données filtrées: l'affichage est reconstruit quand elle change
+        self._data_revision = 0
+        self._rendered_revision = None
         
         self.create_optimized_widgets()
         self.load_stock_data_optimized()
@@ -186,9 +194,11 @@ class OptimizedStockWindow(BaseWindow):
     def load_stock_data_optimized(self):
         """Charger les données de stock de manière optimisée"""
         try:
-            # Utiliser la requête optimisée
+            # Utiliser la requête optimisée (version lue avant: aucun changement n'est perdu)
+            self.stock_version = OptimizedStock.change_version()
             self.stock_data = OptimizedStock.get_all_optimized()
-            self.filtered_data = self.stock_data.copy()
+            self.filtered_data = [item for item in self.stock_data if self.matches_filter(item)]
+            self._data_revision += 1
             
             # Mettre à jour l'affichage
             self.update_display_optimized()
@@ -203,10 +213,10 @@ class OptimizedStockWindow(BaseWindow):
     def update_display_optimized(self):
         """Mettre à jour l'affichage de manière optimisée (virtualisation)"""
         try:
-            # Nettoyer seulement si nécessaire
-            if not hasattr(self, '_last_data_hash') or self._last_data_hash != hash(str(self.filtered_data)):
+            # Nettoyer seulement si la liste filtrée ou son ordre ont changé
+            if self._rendered_revision != self._data_revision:
                 self.clear_display()
-                self._last_data_hash = hash(str(self.filtered_data))
+                self._rendered_revision = self._data_revision
             
             if not self.filtered_data:
                 self.show_no_data_message()
@@ -233,6 +243,16 @@ class OptimizedStockWindow(BaseWindow):
         except Exception as e:
             self.logger.error(f"Error actualizando display optimizado: {e}")
     
+    def rerender_rows(self, producto_ids):
+        """Recréer seulement les lignes affichées de ces produits, à leur place"""
+        for index, widget in list(self.displayed_items.items()):
+            item = self.filtered_data[index]
+            if item['producto_id'] in producto_ids:
+                nuevo = self.create_optimized_stock_row(item, index)
+                nuevo.pack_configure(before=widget)
+                widget.destroy()
+                self.displayed_items[index] = nuevo
+
     def create_optimized_stock_row(self, item, index):
         """Créer une ligne de stock optimisée"""
         # Frame principal avec couleur alternée
@@ -298,18 +318,12 @@ class OptimizedStockWindow(BaseWindow):
     def perform_search_optimized(self):
         """Effectuer une recherche optimisée"""
         try:
-            search_text = self.search_var.get().lower().strip()
+            self.active_search = self.search_var.get().lower().strip()
+            self.low_stock_only = False
             
-            if not search_text:
-                self.filtered_data = self.stock_data.copy()
-            else:
-                # Recherche optimisée avec compréhension de liste
-                self.filtered_data = [
-                    item for item in self.stock_data
-                    if (search_text in item.get('nombre', '').lower() or
-                        search_text in item.get('referencia', '').lower() or
-                        search_text in item.get('categoria', '').lower())
-                ]
+            # Recherche optimisée avec compréhension de liste
+            self.filtered_data = [item for item in self.stock_data if self.matches_filter(item)]
+            self._data_revision += 1
             
             # Réinitialiser la plage visible
             self.visible_range = (0, min(50, len(self.filtered_data)))
@@ -320,6 +334,16 @@ class OptimizedStockWindow(BaseWindow):
         except Exception as e:
             self.logger.error(f"Error en búsqueda optimizada: {e}")
     
+    def matches_filter(self, item):
+        """Indique si un produit passe le filtre appliqué (recherche ou stock bas)"""
+        if self.low_stock_only:
+            return item['cantidad'] <= 5
+        search_text = self.active_search
+        return (not search_text or
+                search_text in item.get('nombre', '').lower() or
+                search_text in item.get('referencia', '').lower() or
+                search_text in item.get('categoria', '').lower())
+
     def sort_by_column(self, column):
         """Trier par colonne"""
         if self.sort_column == column:
@@ -334,6 +358,7 @@ class OptimizedStockWindow(BaseWindow):
                 key=lambda x: x.get(column, ''),
                 reverse=self.sort_reverse
             )
+            self._data_revision += 1
             
             # Mettre à jour l'indicateur de tri dans l'en-tête
             for col, btn in self.header_buttons.items():
@@ -348,14 +373,16 @@ class OptimizedStockWindow(BaseWindow):
         except Exception as e:
             self.logger.error(f"Error ordenando por {column}: {e}")
     
-    @performance_optimizer.cache_result("low_stock_display", ttl=60)
     def show_low_stock_optimized(self):
-        """Afficher le stock bas de manière optimisée"""
+        """Afficher le stock bas (données en mémoire tenues à jour par le registre de changements)"""
         try:
-            low_stock_data = OptimizedStock.get_low_stock_optimized()
+            self.pull_stock_changes()
             
             self.search_var.set("")
-            self.filtered_data = low_stock_data
+            self.active_search = ""
+            self.low_stock_only = True
+            self.filtered_data = [item for item in self.stock_data if self.matches_filter(item)]
+            self._data_revision += 1
             self.visible_range = (0, min(50, len(self.filtered_data)))
             
             self.update_display_optimized()
@@ -383,17 +410,15 @@ class OptimizedStockWindow(BaseWindow):
                     # Mettre à jour en lot pour de meilleures performances
                     updates = [{
                         'producto_id': item['producto_id'],
-                        'cantidad': item['cantidad'] + cantidad
+                        'delta': cantidad,
+                        'tipo': "ENTRADA",
+                        'descripcion': f"Entrada manual de {cantidad} unidades"
                     }]
                     
                     BatchOperations.update_multiple_stock(updates)
                     
-                    # Mettre à jour localement
-                    item['cantidad'] += cantidad
-                    
-                    # Rafraîchir l'affichage
-                    self.update_display_optimized()
-                    self.update_stats()
+                    # Rafraîchir seulement la ligne modifiée
+                    self.refresh_data()
                     
                     self.show_success_message(
                         "Éxito", 
@@ -454,19 +479,55 @@ class OptimizedStockWindow(BaseWindow):
     def clear_search(self):
         """Nettoyer la recherche"""
         self.search_var.set("")
+        self.active_search = ""
+        self.low_stock_only = False
         self.filtered_data = self.stock_data.copy()
+        self._data_revision += 1
         self.visible_range = (0, min(50, len(self.filtered_data)))
         self.update_display_optimized()
         self.update_stats()
     
+    def pull_stock_changes(self):
+        """
+        Appliquer aux données en mémoire les changements depuis la dernière lecture
+
+        Returns:
+            set: ids des produits modifiés, None si la liste filtrée a changé
+            (produits ajoutés, supprimés, entrés ou sortis du filtre)
+        """
+        cambios = OptimizedStock.get_changes_since(self.stock_version)
+        self.stock_version = cambios['version']
+        resultado = OptimizedStock.merge_changes(self.stock_data, cambios)
+
+        filtrados = {item['producto_id'] for item in self.filtered_data}
+        modificados = set()
+        membresia_cambiada = bool(resultado['eliminados'])
+        for item in resultado['actualizados'] + resultado['nuevos']:
+            modificados.add(item['producto_id'])
+            if self.matches_filter(item) != (item['producto_id'] in filtrados):
+                membresia_cambiada = True
+
+        if membresia_cambiada:
+            self.filtered_data = [item for item in self.stock_data if self.matches_filter(item)]
+            self._data_revision += 1
+            return None
+        return modificados
+
     def refresh_data(self):
-        """Actualiser les données"""
-        # Vider le cache
-        performance_optimizer.clear_cache("stock")
-        performance_optimizer.clear_cache("low_stock")
-        
-        # Recharger
-        self.load_stock_data_optimized()
+        """Actualiser seulement les lignes des produits modifiés depuis la dernière lecture"""
+        try:
+            performance_optimizer.clear_cache("low_stock")
+            modificados = self.pull_stock_changes()
+            if modificados is None:
+                self.update_display_optimized()
+            elif modificados:
+                self.rerender_rows(modificados)
+            else:
+                return
+            self.update_stats()
+        except Exception as e:
+            self.logger.error(f"Error actualizando cambios de stock: {e}")
+            self.load_stock_data_optimized()
     
     def optimize_performance(self):
         """Optimiser les performances"""
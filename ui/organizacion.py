@@ -522,10 +522,7 @@ class OrganizacionWindow:
                 permanent_logo_path = self.logo_manager.save_logo(filename, organization_name)
 
                 if permanent_logo_path:
-                    # Supprimer l'ancien logo s'il existe
-                    if self.logo_path and self.logo_path != permanent_logo_path:
-                        self.logo_manager.remove_logo(self.logo_path)
-
+                    # El logo anterior sigue referenciado hasta guardar: lo borra la recolección
                     self.logo_path = permanent_logo_path
                     self.load_logo_image(permanent_logo_path)
                     self.logger.info(f"Logo seleccionado y copiado: {filename} -> {permanent_logo_path}")
@@ -903,9 +900,8 @@ class OrganizacionWindow:
             # Guardar en base de datos
             organizacion.save()
 
-            # Nettoyer les logos orphelins (garder seulement le logo actuel)
-            if self.logo_path:
-                self.logo_manager.cleanup_orphaned_logos(self.logo_path)
+            # Borrar los logos que ya no están referenciados (pasado el margen de gracia)
+            self.logo_manager.cleanup_orphaned_logos()
 
             # Actualizar configuración global si es necesario
             if organizacion.directorio_imagenes_defecto:
@@ -10,6 +10,7 @@ from common.validators import FormValidator, CalculationHelper
 from common.ui_components import FormHelper
 from common.simple_producto_autocomplete import SimpleProductoAutocomplete
 from database.models import Stock
+from database.product_catalog import product_catalog
 
 class ProductoFacturaDialog:
     """Diálogo para seleccionar y configurar un producto para la factura"""
@@ -224,6 +225,8 @@ class ProductoFacturaDialog:
     def refresh_productos_data(self):
         """Refresca los datos de productos en el autocompletado"""
         try:
+            # Releer de la base de datos por si otro proceso ha cambiado los productos
+            product_catalog.invalidate()
             self.producto_autocomplete.refresh_data()
             self.logger.info("Datos de productos actualizados")
         except Exception as e:
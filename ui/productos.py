@@ -5,10 +5,12 @@ from utils.translations import get_text
 from utils.config import app_config
 from utils.logger import get_logger, log_user_action, log_file_operation, log_exception, log_database_operation
 from database.models import Producto
-from common.treeview_sorter import add_sorting_to_treeview
+from database.product_catalog import product_catalog
+from common.virtual_treeview import VirtualTreeview
+from utils.thumbnail_store import thumbnail_store
+from utils.image_ingestion import image_ingestor
+from database.query_executor import call_when_done
 import os
-import shutil
-from PIL import Image, ImageTk
 
 class ProductosWindow:
     def __init__(self, parent):
@@ -235,18 +237,18 @@ class ProductosWindow:
         self.productos_tree.column('precio', width=80, minwidth=70)
         self.productos_tree.column('categoria', width=150, minwidth=100)
 
-        # Scrollbar para TreeView
-        scrollbar = ttk.Scrollbar(tree_container, orient="vertical", command=self.productos_tree.yview)
-        self.productos_tree.configure(yscrollcommand=scrollbar.set)
+        # Scrollbar para TreeView (controlada por la vista virtual: solo existen las filas visibles)
+        scrollbar = ttk.Scrollbar(tree_container, orient="vertical")
+        self.productos_view = VirtualTreeview(self.productos_tree, scrollbar)
 
         self.productos_tree.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
 
         # Configurar ordenación por columnas
-        self.tree_sorter = add_sorting_to_treeview(self.productos_tree)
+        self.tree_sorter = self.productos_view.enable_sorting()
 
         # Bind para selección
-        self.productos_tree.bind("<<TreeviewSelect>>", self.on_producto_select)
+        self.productos_view.on_select(self.on_producto_select)
         
         # Botones de lista
         buttons_frame = ctk.CTkFrame(left_frame)
@@ -410,21 +412,19 @@ class ProductosWindow:
                 self.logger.warning("productos_tree no existe, cancelando carga")
                 return
 
-            self.productos = Producto.get_all()
+            self.productos = product_catalog.get_all()
             log_database_operation("SELECT", "productos", f"Cargados {len(self.productos)} productos")
 
-            # Limpiar TreeView
-            for item in self.productos_tree.get_children():
-                self.productos_tree.delete(item)
-
-            # Insertar productos en TreeView
-            for producto in self.productos:
-                self.productos_tree.insert('', 'end', values=(
+            # Actualizar solo las filas visibles que cambian
+            self.productos_view.set_rows(
+                (producto.id, (
                     producto.nombre,
                     producto.referencia,
                     f"€{producto.precio:.2f}",
                     producto.categoria or "Sin categoría"
-                ), tags=(str(producto.id),))
+                ), (str(producto.id),))
+                for producto in self.productos
+            )
 
             self.logger.info(f"Lista de productos actualizada: {len(self.productos)} productos")
         except Exception as e:
@@ -584,27 +584,11 @@ class ProductosWindow:
             self.logger.debug(f"Resultado del diálogo: {file_path if file_path else 'Cancelado'}")
 
             if file_path:
-                # Crear directorio de imágenes si no existe
-                images_dir = app_config.get_assets_directory()
-                os.makedirs(images_dir, exist_ok=True)
-
-                # Copiar imagen al directorio de la aplicación
-                filename = os.path.basename(file_path)
-                dest_path = os.path.join(images_dir, filename)
-
-                try:
-                    shutil.copy2(file_path, dest_path)
-                    self.imagen_path = dest_path
-                    self.imagen_label.configure(text=f"Imagen: {filename}")
-                    self.update_image_display()
-
-                    log_file_operation("COPY", file_path, f"Copiado a {dest_path}")
-                    log_user_action("Imagen seleccionada", f"Archivo: {filename}")
-                    self.logger.info(f"Imagen seleccionada y copiada: {filename}")
-                except Exception as e:
-                    error_msg = f"Error al copiar imagen: {str(e)}"
-                    log_exception(e, "seleccionar_imagen - copy")
-                    self._show_message("error", get_text("error"), error_msg)
+                # Validar, reducir y reencodar la imagen fuera del hilo de la interfaz
+                future = image_ingestor.submit(file_path)
+                call_when_done(future, self.window,
+                               on_success=lambda resultado: self._on_imagen_importada(file_path, resultado),
+                               on_error=self._on_imagen_error)
             else:
                 self.logger.debug("Usuario canceló la selección de imagen")
 
@@ -614,6 +598,23 @@ class ProductosWindow:
             log_exception(e, "seleccionar_imagen")
             self._show_message("error", get_text("error"), error_msg)
 
+    def _on_imagen_importada(self, file_path, resultado):
+        """Muestra la imagen ya importada (llamado en el hilo de Tk)"""
+        filename = os.path.basename(file_path)
+        self.imagen_path = resultado['path']
+        self.imagen_label.configure(text=f"Imagen: {filename}")
+        self.update_image_display()
+
+        log_file_operation("INGEST", file_path, f"Importado a {resultado['path']}")
+        log_user_action("Imagen seleccionada", f"Archivo: {filename}")
+        self.logger.info(f"Imagen seleccionada e importada: {filename} "
+                         f"({resultado['source_bytes']} -> {resultado['bytes']} bytes)")
+
+    def _on_imagen_error(self, error):
+        """Informa de un error al importar la imagen (llamado en el hilo de Tk)"""
+        log_exception(error, "seleccionar_imagen - import")
+        self._show_message("error", get_text("error"), f"Error al importar imagen: {str(error)}")
+
     def update_image_display(self):
         """Actualiza el display de la imagen"""
         # Verificar que la ventana y widgets existen antes de usarlos
@@ -635,15 +636,10 @@ class ProductosWindow:
                 display_size = app_config.get_image_display_size()
                 self.logger.debug(f"Tamaño de display: {display_size}")
 
-                image = Image.open(self.imagen_path)
-                original_size = image.size
-                image.thumbnail(display_size, Image.Resampling.LANCZOS)
-                new_size = image.size
-
-                self.logger.debug(f"Imagen redimensionada de {original_size} a {new_size}")
-
-                # Convertir para tkinter
-                photo = ImageTk.PhotoImage(image)
+                # Miniatura pre-generada: no se decodifica la imagen original
+                photo = thumbnail_store.get_photo(self.imagen_path, display_size)
+                if photo is None:
+                    raise ValueError(f"No se pudo crear la miniatura de {self.imagen_path}")
 
                 # Actualizar el display
                 self.imagen_display.configure(image=photo, text="")
@@ -787,6 +783,8 @@ class ProductosWindow:
             producto.imagen_path = self.imagen_path
 
             producto.save()
+            # Las imágenes que ya no usa ningún producto se borran en segundo plano
+            image_ingestor.schedule_garbage_collection()
 
             operation = "UPDATE" if is_update else "INSERT"
             log_database_operation(operation, "productos", f"Producto {producto.referencia}")
@@ -810,6 +808,7 @@ class ProductosWindow:
         if self._show_message("yesno", get_text("confirmar"), get_text("confirmar_eliminacion")):
             try:
                 self.selected_producto.delete()
+                image_ingestor.schedule_garbage_collection()
                 self._show_message("info", get_text("confirmar"), get_text("producto_eliminado"))
                 self.load_productos()
                 self.limpiar_formulario()
@@ -5,13 +5,224 @@ Ventana de búsqueda avanzada
 
 import customtkinter as ctk
 import tkinter as tk
-from tkinter import ttk
+from tkinter import ttk, filedialog
 import os
+import re
+import threading
 from datetime import datetime, timedelta
 from utils.translations import get_text
 from utils.logger import get_logger
 from database.models import Factura, Producto, Stock
+from database.search_index import search_index
 from common.custom_dialogs import show_copyable_info, show_copyable_error
+from common.virtual_treeview import VirtualTreeview, QueryDataSource, ChainedDataSource
+from utils.streaming_export import iter_query, export_rows
+
+# Encabezados de columna de cada tipo de búsqueda al exportar
+EXPORT_HEADERS = {
+    "facturas": ["Número", "Fecha", "Cliente", "Total", "Estado"],
+    "productos": ["Referencia", "Nombre", "Precio", "Categoría", "Stock"],
+    "clientes": ["Nombre", "DNI/NIE", "Email", "Teléfono", "Facturas"],
+    "todo": ["Tipo", "Referencia", "Nombre/Cliente", "Fecha", "Valor"],
+}
+
+# Texto con algún dígito y sin espacios: puede ser parte de un número de factura
+# ("0123" en "FAC-0123-2025"), que el índice FTS5 solo encuentra por prefijo de palabra;
+# se busca además en el índice de trigramas de números
+NUMERO_FACTURA_RE = re.compile(r"^\S*\d\S*$")
+
+
+def ordered_query(columns, body, params, order, keyset=False):
+    """
+    Consulta completa a partir de sus partes
+
+    Args:
+        columns: columnas del SELECT
+        body: FROM ... WHERE ... (sin ORDER BY)
+        order: ((expresión, 'ASC'|'DESC'), ...) que ordenan las filas de forma única
+        keyset: devolver la consulta para QueryDataSource(keyset=...): las expresiones
+                de orden se añaden como últimas columnas y no hay ORDER BY
+
+    Returns:
+        (query, params), o (query, params, keyset) si keyset es True
+    """
+    if not keyset:
+        order_by = ", ".join(f"{expression} {direction}" for expression, direction in order)
+        return f"SELECT {columns} {body} ORDER BY {order_by}", params
+    keys = ", ".join(f"{expression} AS _k{index}" for index, (expression, _) in enumerate(order))
+    return (f"SELECT {columns}, {keys} {body}", params,
+            tuple((f"_k{index}", direction) for index, (_, direction) in enumerate(order)))
+
+
+def facturas_query(filters, keyset=False):
+    """Consulta de facturas según los filtros (el texto, por relevancia en el índice FTS5), ver ordered_query"""
+    search_text = filters.search_text.get().strip()
+    match = search_index.match(search_text, search_index.FACTURAS) if search_text else None
+    columns = "f.numero_factura, f.fecha_factura, f.nombre_cliente, f.total_factura, 'Guardada' as estado"
+
+    fragment = search_index.fragment_match(search_text) if match and NUMERO_FACTURA_RE.match(search_text) else None
+
+    # Construir query base
+    if fragment:
+        # Coincidencias FTS5 por relevancia y después las del índice de trigramas
+        # (rango NULL): las dos se leen de sus índices, sin recorrer facturas
+        query = f"""
+        FROM (
+            SELECT id, MIN(rango) AS rango FROM (
+                SELECT rowid AS id, {search_index.FACTURAS_RANK} AS rango
+                FROM facturas_fts WHERE facturas_fts MATCH ?
+                UNION ALL
+                SELECT rowid, NULL FROM facturas_numero_fts WHERE facturas_numero_fts MATCH ?
+            ) GROUP BY id
+        ) fts
+        JOIN facturas f ON f.id = fts.id
+        WHERE 1=1
+        """
+        params = [match, fragment]
+        order = [("fts.rango IS NULL", "ASC"), ("COALESCE(fts.rango, 0)", "ASC"),
+                 ("f.fecha_factura", "DESC"), ("f.id", "DESC")]
+    elif match:
+        query = """
+        FROM facturas_fts
+        JOIN facturas f ON f.id = facturas_fts.rowid
+        WHERE facturas_fts MATCH ?
+        """
+        params = [match]
+        order = [(search_index.FACTURAS_RANK, "ASC"), ("f.fecha_factura", "DESC"), ("f.id", "DESC")]
+    else:
+        query = """
+        FROM facturas f
+        WHERE 1=1
+        """
+        params = []
+
+        # Filtro de texto sin índice FTS5
+        if search_text:
+            query += " AND (f.numero_factura LIKE ? OR f.nombre_cliente LIKE ?)"
+            params.extend([f"%{search_text}%", f"%{search_text}%"])
+        order = [("f.fecha_factura", "DESC"), ("f.numero_factura", "DESC")]
+
+    # Filtro de fechas
+    date_from = filters.date_from.get().strip()
+    if date_from:
+        query += " AND f.fecha_factura >= ?"
+        params.append(date_from)
+
+    date_to = filters.date_to.get().strip()
+    if date_to:
+        query += " AND f.fecha_factura <= ?"
+        params.append(date_to)
+
+    # Filtro de montos
+    amount_from = filters.amount_from.get().strip()
+    if amount_from:
+        try:
+            params.append(float(amount_from))
+            query += " AND f.total_factura >= ?"
+        except ValueError:
+            pass
+
+    amount_to = filters.amount_to.get().strip()
+    if amount_to:
+        try:
+            params.append(float(amount_to))
+            query += " AND f.total_factura <= ?"
+        except ValueError:
+            pass
+
+    return ordered_query(columns, query, params, order, keyset)
+
+
+def productos_query(filters, low_stock_only=False, keyset=False):
+    """Consulta de productos según los filtros (el texto, por relevancia en el índice FTS5), ver ordered_query"""
+    search_text = filters.search_text.get().strip()
+    match = search_index.match(search_text, search_index.PRODUCTOS) if search_text else None
+
+    # Query con JOIN para obtener stock
+    columns = """p.referencia, p.nombre, p.precio, p.categoria,
+               COALESCE(s.cantidad_disponible, 0) as stock"""
+    if match:
+        query = """
+        FROM productos_fts
+        JOIN productos p ON p.id = productos_fts.rowid
+        LEFT JOIN stock s ON p.id = s.producto_id
+        WHERE productos_fts MATCH ?
+        """
+        params = [match]
+    else:
+        query = """
+        FROM productos p
+        LEFT JOIN stock s ON p.id = s.producto_id
+        WHERE 1=1
+        """
+        params = []
+
+        # Filtro de texto sin índice FTS5
+        if search_text:
+            query += " AND (p.nombre LIKE ? OR p.referencia LIKE ? OR p.categoria LIKE ?)"
+            params.extend([f"%{search_text}%", f"%{search_text}%", f"%{search_text}%"])
+
+    # Filtro de stock bajo
+    if low_stock_only:
+        query += " AND COALESCE(s.cantidad_disponible, 0) <= 5"
+
+    order = [("p.nombre", "ASC"), ("p.id", "ASC")]
+    if match:
+        order.insert(0, (search_index.PRODUCTOS_RANK, "ASC"))
+
+    return ordered_query(columns, query, params, order, keyset)
+
+
+def clientes_query(filters, keyset=False):
+    """Consulta de clientes de la tabla de clientes (el texto, por relevancia en el índice FTS5), ver ordered_query"""
+    search_text = filters.search_text.get().strip()
+    match = search_index.match(search_text, search_index.CLIENTES) if search_text else None
+    columns = "c.nombre, c.dni_nie, c.email, c.telefono, c.num_facturas"
+
+    if match:
+        query = """
+        FROM clientes_fts
+        JOIN clientes c ON c.id = clientes_fts.rowid
+        WHERE clientes_fts MATCH ? AND c.num_facturas > 0
+        """
+        order = [(search_index.CLIENTES_RANK, "ASC"), ("c.nombre", "ASC"), ("c.id", "ASC")]
+        return ordered_query(columns, query, [match], order, keyset)
+
+    query = """
+    FROM clientes c
+    WHERE c.num_facturas > 0
+    """
+    params = []
+
+    # Filtro de texto sin índice FTS5
+    if search_text:
+        query += " AND (c.nombre LIKE ? OR c.dni_nie LIKE ? OR c.email LIKE ?)"
+        params.extend([f"%{search_text}%", f"%{search_text}%", f"%{search_text}%"])
+
+    return ordered_query(columns, query, params, [("c.nombre", "ASC"), ("c.id", "ASC")], keyset)
+
+
+def global_factura_row(f):
+    """Fila de factura en la búsqueda global"""
+    return ("Factura", f[0], f[2], f[1], f"{f[3]:.2f}€")
+
+
+def global_producto_row(p):
+    """Fila de producto en la búsqueda global"""
+    return ("Producto", p[0], p[1], "", f"{p[2]:.2f}€")
+
+
+def result_row(row):
+    """Fila de la tabla de resultados: la fila completa sirve de clave"""
+    return (tuple(row), tuple(row), ())
+
+
+def iter_export_rows(database, sources):
+    """Filas de varias consultas (query, params, transformación) leídas por bloques"""
+    for query, params, transform in sources:
+        for row in iter_query(database, query, params):
+            yield transform(row) if transform else row
+
 
 class SearchWindow:
     """Ventana de búsqueda avanzada"""
@@ -34,7 +245,10 @@ class SearchWindow:
         self.status_filter = tk.StringVar(value="todos")
         
         # Resultados
-        self.search_results = []
+        self.low_stock_only = False
+
+        # Exportación en segundo plano (threading.Event para cancelarla)
+        self._export_cancel = None
         
         # Configurar ventana
         self.setup_window_focus()
@@ -291,11 +505,12 @@ class SearchWindow:
         # Crear Treeview
         self.results_tree = ttk.Treeview(tree_frame)
         
-        # Scrollbars
-        v_scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=self.results_tree.yview)
+        # Scrollbars (la vertical la controla la vista virtual: solo existen las filas visibles)
+        v_scrollbar = ttk.Scrollbar(tree_frame, orient="vertical")
         h_scrollbar = ttk.Scrollbar(tree_frame, orient="horizontal", command=self.results_tree.xview)
+        self.results_view = VirtualTreeview(self.results_tree, v_scrollbar)
         
-        self.results_tree.configure(yscrollcommand=v_scrollbar.set, xscrollcommand=h_scrollbar.set)
+        self.results_tree.configure(xscrollcommand=h_scrollbar.set)
         
         # Posicionar elementos
         self.results_tree.pack(side="left", fill="both", expand=True)
@@ -450,17 +665,18 @@ class SearchWindow:
         """Realiza la búsqueda según los filtros"""
         try:
             search_type = self.search_type.get()
+            self.low_stock_only = low_stock_only
 
             if search_type == "facturas":
-                results = self.search_facturas()
+                source = self.search_facturas()
             elif search_type == "productos":
-                results = self.search_productos(low_stock_only)
+                source = self.search_productos(low_stock_only)
             elif search_type == "clientes":
-                results = self.search_clientes()
+                source = self.search_clientes()
             else:  # todo
-                results = self.search_all()
+                source = self.search_all()
 
-            self.display_results(results, search_type)
+            self.display_results(source, search_type)
 
         except Exception as e:
             self.logger.error(f"Error en búsqueda: {e}")
@@ -471,137 +687,45 @@ class SearchWindow:
             )
 
     def search_facturas(self):
-        """Busca facturas según los filtros"""
+        """Busca facturas según los filtros (el texto, por relevancia en el índice FTS5)"""
         from database.database import db
 
-        # Construir query base
-        query = """
-        SELECT numero_factura, fecha_factura, nombre_cliente, total_factura, 'Guardada' as estado
-        FROM facturas
-        WHERE 1=1
-        """
-        params = []
-
-        # Filtro de texto
-        search_text = self.search_text.get().strip()
-        if search_text:
-            query += " AND (numero_factura LIKE ? OR nombre_cliente LIKE ?)"
-            params.extend([f"%{search_text}%", f"%{search_text}%"])
-
-        # Filtro de fechas
-        date_from = self.date_from.get().strip()
-        if date_from:
-            query += " AND fecha_factura >= ?"
-            params.append(date_from)
-
-        date_to = self.date_to.get().strip()
-        if date_to:
-            query += " AND fecha_factura <= ?"
-            params.append(date_to)
-
-        # Filtro de montos
-        amount_from = self.amount_from.get().strip()
-        if amount_from:
-            try:
-                query += " AND total_factura >= ?"
-                params.append(float(amount_from))
-            except ValueError:
-                pass
-
-        amount_to = self.amount_to.get().strip()
-        if amount_to:
-            try:
-                query += " AND total_factura <= ?"
-                params.append(float(amount_to))
-            except ValueError:
-                pass
-
-        query += " ORDER BY fecha_factura DESC, numero_factura DESC"
-
-        return db.execute_query(query, params)
+        query, params, keyset = facturas_query(self, keyset=True)
+        return QueryDataSource(db, query, params, row_factory=result_row, keyset=keyset)
 
     def search_productos(self, low_stock_only=False):
-        """Busca productos según los filtros"""
+        """Busca productos según los filtros (el texto, por relevancia en el índice FTS5)"""
         from database.database import db
 
-        # Query con JOIN para obtener stock
-        query = """
-        SELECT p.referencia, p.nombre, p.precio, p.categoria,
-               COALESCE(s.cantidad_disponible, 0) as stock
-        FROM productos p
-        LEFT JOIN stock s ON p.id = s.producto_id
-        WHERE 1=1
-        """
-        params = []
-
-        # Filtro de stock bajo
-        if low_stock_only:
-            query += " AND COALESCE(s.cantidad_disponible, 0) <= 5"
-
-        # Filtro de texto
-        search_text = self.search_text.get().strip()
-        if search_text:
-            query += " AND (p.nombre LIKE ? OR p.referencia LIKE ? OR p.categoria LIKE ?)"
-            params.extend([f"%{search_text}%", f"%{search_text}%", f"%{search_text}%"])
-
-        query += " ORDER BY p.nombre"
-
-        return db.execute_query(query, params)
+        query, params, keyset = productos_query(self, low_stock_only, keyset=True)
+        return QueryDataSource(db, query, params, row_factory=result_row, keyset=keyset)
 
     def search_clientes(self):
-        """Busca clientes únicos de las facturas"""
+        """Busca clientes en la tabla de clientes (el texto, por relevancia en el índice FTS5)"""
         from database.database import db
 
-        query = """
-        SELECT nombre_cliente, dni_nie_cliente, email_cliente, telefono_cliente,
-               COUNT(*) as num_facturas
-        FROM facturas
-        WHERE 1=1
-        """
-        params = []
-
-        # Filtro de texto
-        search_text = self.search_text.get().strip()
-        if search_text:
-            query += " AND (nombre_cliente LIKE ? OR dni_nie_cliente LIKE ? OR email_cliente LIKE ?)"
-            params.extend([f"%{search_text}%", f"%{search_text}%", f"%{search_text}%"])
-
-        query += " GROUP BY nombre_cliente, dni_nie_cliente, email_cliente, telefono_cliente"
-        query += " ORDER BY nombre_cliente"
-
-        return db.execute_query(query, params)
+        query, params, keyset = clientes_query(self, keyset=True)
+        return QueryDataSource(db, query, params, row_factory=result_row, keyset=keyset)
 
     def search_all(self):
-        """Búsqueda global en todos los tipos"""
-        results = []
-
-        # Buscar en facturas
-        facturas = self.search_facturas()
-        for f in facturas:
-            results.append(("Factura", f[0], f[2], f[1], f"{f[3]:.2f}€"))
-
-        # Buscar en productos
-        productos = self.search_productos()
-        for p in productos:
-            results.append(("Producto", p[0], p[1], "", f"{p[2]:.2f}€"))
-
-        return results
-
-    def display_results(self, results, search_type):
-        """Muestra los resultados en la tabla"""
-        # Limpiar resultados anteriores
-        for item in self.results_tree.get_children():
-            self.results_tree.delete(item)
+        """Búsqueda global en todos los tipos: facturas y después productos"""
+        from database.database import db
 
-        # Guardar resultados
-        self.search_results = results
+        facturas, facturas_params, facturas_keyset = facturas_query(self, keyset=True)
+        productos, productos_params, productos_keyset = productos_query(self, keyset=True)
+        return ChainedDataSource([
+            QueryDataSource(db, facturas, facturas_params, keyset=facturas_keyset,
+                            row_factory=lambda f: (f[0], global_factura_row(f), ())),
+            QueryDataSource(db, productos, productos_params, keyset=productos_keyset,
+                            row_factory=lambda p: (p[0], global_producto_row(p), ())),
+        ])
 
-        # Insertar nuevos resultados
-        for result in results:
-            self.results_tree.insert("", "end", values=result)
+    def display_results(self, source, search_type):
+        """Muestra los resultados en la tabla (solo se leen las páginas que llegan a verse)"""
+        self.results_view.set_source(source)
 
         # Actualizar información de resultados
-        count = len(results)
+        count = len(source)
         if count == 0:
             self.results_info.configure(text="No se encontraron resultados")
         elif count == 1:
@@ -761,9 +885,20 @@ Esta información puede ser copiada para análisis."""
         event = type('Event', (), {})()
         self.on_result_double_click(event)
 
+    def export_sources(self, search_type):
+        """Consultas de la búsqueda actual para exportar: lista de (query, params, transformación)"""
+        if search_type == "facturas":
+            return [(*facturas_query(self), None)]
+        if search_type == "productos":
+            return [(*productos_query(self, self.low_stock_only), None)]
+        if search_type == "clientes":
+            return [(*clientes_query(self), None)]
+        return [(*facturas_query(self), global_factura_row),
+                (*productos_query(self), global_producto_row)]
+
     def export_results(self):
-        """Exporta los resultados a un archivo"""
-        if not self.search_results:
+        """Exporta los resultados a un archivo CSV o XLSX sin bloquear la ventana"""
+        if not len(self.results_view):
             show_copyable_info(
                 self.window,
                 "Sin Resultados",
@@ -771,29 +906,84 @@ Esta información puede ser copiada para análisis."""
             )
             return
 
+        if self._export_cancel is not None:
+            show_copyable_info(self.window, "Exportación en Curso",
+                               "Ya hay una exportación en curso. Espere a que termine.")
+            return
+
+        search_type = self.search_type.get()
         try:
-            # Crear contenido para exportar
-            search_type = self.search_type.get()
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            filepath = filedialog.asksaveasfilename(
+                parent=self.window,
+                title="Exportar resultados",
+                initialdir=os.getcwd(),
+                initialfile=f"busqueda_{search_type}_{timestamp}.csv",
+                defaultextension=".csv",
+                filetypes=[("CSV", "*.csv"), ("Excel", "*.xlsx")]
+            )
+            if not filepath:
+                return
+
+            # Las consultas se preparan aquí: los filtros (StringVar) solo se leen en el hilo de Tk
+            from database.database import db
+            rows = iter_export_rows(db, self.export_sources(search_type))
+            headers = EXPORT_HEADERS.get(search_type, EXPORT_HEADERS["todo"])
+            cancel_event = threading.Event()
+            self._export_cancel = cancel_event
+
+            def progress(count):
+                self._call_in_ui(lambda: self.results_info.configure(text=f"Exportando... {count} filas"))
+
+            def export():
+                try:
+                    result = export_rows(rows, filepath, headers, progress_callback=progress,
+                                         cancel_event=cancel_event)
+                except Exception as e:
+                    self.logger.error(f"Error exportando resultados: {e}")
+                    result = e
+                self._call_in_ui(lambda: self._finish_export(result, filepath, search_type))
+
+            threading.Thread(target=export, name="export_results", daemon=True).start()
 
-            # Generar contenido CSV
-            csv_content = self.generate_csv_content()
+        except Exception as e:
+            self._export_cancel = None
+            self._show_export_error(e, search_type)
+
+    def _call_in_ui(self, func):
+        """Ejecuta func en el hilo de Tk desde el hilo de exportación"""
+        try:
+            self.window.after(0, func)
+        except (tk.TclError, RuntimeError):
+            # La ventana se ha cerrado: se cancela la exportación
+            if self._export_cancel is not None:
+                self._export_cancel.set()
+
+    def _finish_export(self, result, filepath, search_type):
+        """Muestra el resultado de la exportación en segundo plano"""
+        self._export_cancel = None
+        count = len(self.results_view)
+        self.results_info.configure(
+            text="1 resultado encontrado" if count == 1 else f"{count} resultados encontrados"
+        )
 
-            # Guardar archivo
-            filename = f"busqueda_{search_type}_{timestamp}.csv"
-            filepath = os.path.join(os.getcwd(), filename)
+        if isinstance(result, Exception):
+            self._show_export_error(result, search_type)
+            return
+        if result['cancelado']:
+            return
 
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(csv_content)
+        filename = os.path.basename(filepath)
+        file_format = "XLSX (Excel)" if filepath.lower().endswith(".xlsx") else "CSV (compatible con Excel)"
 
-            # Mensaje de éxito
-            success_msg = f"""✅ Resultados exportados exitosamente
+        # Mensaje de éxito
+        success_msg = f"""✅ Resultados exportados exitosamente
 
 Detalles de la exportación:
 - Archivo: {filename}
 - Ubicación: {filepath}
-- Formato: CSV (compatible con Excel)
-- Registros: {len(self.search_results)}
+- Formato: {file_format}
+- Registros: {result['filas']}
 - Tipo de búsqueda: {search_type.title()}
 - Generado: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
 
@@ -811,10 +1001,11 @@ El archivo está listo para:
 
 Esta información puede ser copiada para documentación."""
 
-            show_copyable_info(self.window, "Exportación Exitosa", success_msg)
+        show_copyable_info(self.window, "Exportación Exitosa", success_msg)
 
-        except Exception as e:
-            error_msg = f"""❌ Error exportando resultados
+    def _show_export_error(self, e, search_type):
+        """Muestra el error de una exportación"""
+        error_msg = f"""❌ Error exportando resultados
 
 Se produjo un error durante la exportación:
 
@@ -825,7 +1016,7 @@ Detalles del error:
 - Timestamp: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
 
 Información del contexto:
-- Resultados a exportar: {len(self.search_results)}
+- Resultados a exportar: {len(self.results_view)}
 - Tipo de búsqueda: {search_type}
 
 Posibles causas:
@@ -843,30 +1034,4 @@ Acciones recomendadas:
 Los resultados de búsqueda siguen disponibles en la aplicación.
 Copie este mensaje para soporte técnico."""
 
-            show_copyable_error(self.window, "Error de Exportación", error_msg)
-
-    def generate_csv_content(self):
-        """Genera el contenido CSV para exportar"""
-        import csv
-        import io
-
-        output = io.StringIO()
-        writer = csv.writer(output)
-
-        # Escribir encabezados según el tipo de búsqueda
-        search_type = self.search_type.get()
-
-        if search_type == "facturas":
-            writer.writerow(["Número", "Fecha", "Cliente", "Total", "Estado"])
-        elif search_type == "productos":
-            writer.writerow(["Referencia", "Nombre", "Precio", "Categoría", "Stock"])
-        elif search_type == "clientes":
-            writer.writerow(["Nombre", "DNI/NIE", "Email", "Teléfono", "Facturas"])
-        else:  # todo
-            writer.writerow(["Tipo", "Referencia", "Nombre/Cliente", "Fecha", "Valor"])
-
-        # Escribir datos
-        for result in self.search_results:
-            writer.writerow(result)
-
-        return output.getvalue()
+        show_copyable_error(self.window, "Error de Exportación", error_msg)
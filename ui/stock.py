@@ -3,9 +3,9 @@ import tkinter as tk
 from tkinter import messagebox, simpledialog, ttk
 from utils.translations import get_text
 from database.models import Stock, Producto, StockMovement
-from database.optimized_models import OptimizedStock
+from database.optimized_models import OptimizedStock, BatchOperations
 from common.ui_components import BaseWindow
-from common.treeview_sorter import add_sorting_to_treeview
+from common.virtual_treeview import VirtualTreeview
 from common.custom_dialogs import (
     show_copyable_info, show_copyable_success,
     show_copyable_warning, show_copyable_error,
@@ -30,6 +30,11 @@ class StockWindow:
         self.search_var = tk.StringVar()
         # Nota: No usar trace para búsqueda automática, esperar Enter
 
+        # Filtro aplicado y versión del registro de cambios ya leída
+        self.active_search = ""
+        self.low_stock_only = False
+        self.stock_version = (0, 0)
+
         self.create_widgets()
         self.load_stock_data()
 
@@ -242,7 +247,7 @@ class StockWindow:
         refresh_btn = ctk.CTkButton(
             buttons_frame,
             text="🔄 Actualizar",
-            command=self.load_stock_data,
+            command=self.refresh_stock_changes,
             width=120
         )
         refresh_btn.pack(side="left", padx=5)
@@ -299,18 +304,18 @@ class StockWindow:
         self.stock_tree.column('estado', width=120, minwidth=100)
         self.stock_tree.column('ultima_actualizacion', width=160, minwidth=140)
 
-        # Scrollbar para TreeView
-        scrollbar = ttk.Scrollbar(tree_container, orient="vertical", command=self.stock_tree.yview)
-        self.stock_tree.configure(yscrollcommand=scrollbar.set)
+        # Scrollbar para TreeView (controlada por la vista virtual: solo existen las filas visibles)
+        scrollbar = ttk.Scrollbar(tree_container, orient="vertical")
+        self.stock_view = VirtualTreeview(self.stock_tree, scrollbar)
 
         self.stock_tree.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
 
         # Configurar ordenación por columnas
-        self.stock_tree_sorter = add_sorting_to_treeview(self.stock_tree)
+        self.stock_tree_sorter = self.stock_view.enable_sorting()
 
         # Bind para selección y doble click
-        self.stock_tree.bind("<<TreeviewSelect>>", self.on_stock_select)
+        self.stock_view.on_select(self.on_stock_select)
         self.stock_tree.bind("<Double-1>", self.on_stock_double_click)
 
         # Frame para botones de acción
@@ -338,6 +343,8 @@ class StockWindow:
         """Carga los datos de stock desde la base de datos (OPTIMIZADO)"""
         try:
             # 🚀 OPTIMIZACIÓN: Usar requête optimisée qui évite le problème N+1
+            # La versión se lee antes: un cambio simultáneo se volverá a leer, no se pierde
+            self.stock_version = OptimizedStock.change_version()
             self.stock_data = OptimizedStock.get_all_optimized()
 
             self.filtered_data = self.stock_data.copy()
@@ -379,62 +386,107 @@ class StockWindow:
                 self.logger.error(f"Error en fallback: {fallback_error}")
                 self.show_error_message("Error", f"Error cargando datos de stock: {e}")
 
+    def _matches_filter(self, item):
+        """Indica si un producto pasa el filtro aplicado (búsqueda o stock bajo)"""
+        if self.low_stock_only:
+            return item['cantidad'] <= 5
+        if not self.active_search:
+            return True
+        nombre = item.get('nombre', '') or ''
+        referencia = item.get('referencia', '') or ''
+        return self.active_search in nombre.lower() or self.active_search in referencia.lower()
+
+    def _pull_stock_changes(self):
+        """
+        Aplica a los datos en memoria los cambios de stock desde la última lectura
+
+        Returns:
+            (filas a mostrar o actualizar, claves a quitar de la vista)
+        """
+        cambios = OptimizedStock.get_changes_since(self.stock_version)
+        self.stock_version = cambios['version']
+        resultado = OptimizedStock.merge_changes(self.stock_data, cambios)
+
+        visibles = {item['producto_id'] for item in self.filtered_data}
+        quitar = {item['producto_id'] for item in resultado['eliminados']}
+        mostrar = []
+        for item in resultado['actualizados'] + resultado['nuevos']:
+            if self._matches_filter(item):
+                if item['producto_id'] not in visibles:
+                    self.filtered_data.append(item)
+                mostrar.append(item)
+            elif item['producto_id'] in visibles:
+                quitar.add(item['producto_id'])
+        if quitar:
+            self.filtered_data = [item for item in self.filtered_data if item['producto_id'] not in quitar]
+        return mostrar, quitar
+
+    def refresh_stock_changes(self):
+        """Actualiza solo las filas de los productos que han cambiado desde la última lectura"""
+        try:
+            mostrar, quitar = self._pull_stock_changes()
+            if mostrar or quitar:
+                self.stock_view.patch_rows([self._stock_row(item) for item in mostrar], quitar)
+                self.update_results_indicator(self.active_search)
+                self.logger.debug(f"Stock actualizado: {len(mostrar)} filas, {len(quitar)} quitadas")
+        except Exception as e:
+            self.logger.error(f"Error actualizando cambios de stock: {e}")
+            self.load_stock_data()
+
     def update_stock_display(self):
         """Actualiza la visualización del TreeView de stock"""
         try:
             self.logger.debug(f"Actualizando display stock: {len(self.filtered_data)} elementos")
 
-            # Limpiar TreeView
-            for item in self.stock_tree.get_children():
-                self.stock_tree.delete(item)
-
             if not self.filtered_data:
                 self.logger.debug("No hay datos filtrados")
-                return
-
-            # Insertar datos en TreeView
-            for item in self.filtered_data:
-                # Determinar estado del stock
-                stock_actual = item.get('cantidad_disponible', 0)
-                if stock_actual <= 0:
-                    estado = "Sin stock"
-                    estado_color = "red"
-                elif stock_actual <= 5:
-                    estado = "Stock bajo"
-                    estado_color = "orange"
-                else:
-                    estado = "Disponible"
-                    estado_color = "green"
-
-                # Formatear fecha
-                fecha_actualizacion = item.get('fecha_actualizacion', 'N/A')
-                if fecha_actualizacion and fecha_actualizacion != 'N/A':
-                    try:
-                        from datetime import datetime
-                        if isinstance(fecha_actualizacion, str):
-                            fecha_obj = datetime.strptime(fecha_actualizacion, '%Y-%m-%d %H:%M:%S')
-                        else:
-                            fecha_obj = fecha_actualizacion
-                        fecha_display = fecha_obj.strftime('%d/%m/%Y %H:%M')
-                    except:
-                        fecha_display = str(fecha_actualizacion)
-                else:
-                    fecha_display = 'N/A'
 
-                # Insertar en TreeView
-                tree_item = self.stock_tree.insert('', 'end', values=(
-                    item.get('producto_nombre', 'N/A'),
-                    item.get('referencia', 'N/A'),
-                    str(stock_actual),
-                    estado,
-                    fecha_display
-                ), tags=(str(item.get('producto_id', 0)), estado_color))
+            # Vista virtual: solo se crean o modifican las filas visibles que cambian
+            self.stock_view.set_rows(self._stock_row(item) for item in self.filtered_data)
 
             self.logger.debug("Display stock actualizado correctamente")
 
         except Exception as e:
             self.logger.error(f"Error actualizando display stock: {e}")
 
+    def _stock_row(self, item):
+        """Fila (clave, valores, tags) de un producto para la vista de stock"""
+        # Determinar estado del stock
+        stock_actual = item.get('cantidad', item.get('cantidad_disponible', 0))
+        if stock_actual <= 0:
+            estado = "Sin stock"
+            estado_color = "red"
+        elif stock_actual <= 5:
+            estado = "Stock bajo"
+            estado_color = "orange"
+        else:
+            estado = "Disponible"
+            estado_color = "green"
+
+        # Formatear fecha
+        fecha_actualizacion = item.get('fecha_actualizacion', 'N/A')
+        if fecha_actualizacion and fecha_actualizacion != 'N/A':
+            try:
+                from datetime import datetime
+                if isinstance(fecha_actualizacion, str):
+                    fecha_obj = datetime.strptime(fecha_actualizacion, '%Y-%m-%d %H:%M:%S')
+                else:
+                    fecha_obj = fecha_actualizacion
+                fecha_display = fecha_obj.strftime('%d/%m/%Y %H:%M')
+            except:
+                fecha_display = str(fecha_actualizacion)
+        else:
+            fecha_display = 'N/A'
+
+        producto_id = item.get('producto_id', 0)
+        return producto_id, (
+            item.get('nombre', item.get('producto_nombre', 'N/A')),
+            item.get('referencia', 'N/A'),
+            str(stock_actual),
+            estado,
+            fecha_display
+        ), (str(producto_id), estado_color)
+
     def on_stock_select(self, event):
         """Maneja la selección de un item en el TreeView de stock"""
         try:
@@ -742,19 +794,13 @@ class StockWindow:
         """Filtra los datos de stock según el texto de búsqueda"""
         try:
             search_text = self.search_var.get().lower().strip()
+            self.active_search = search_text
+            self.low_stock_only = False
 
             if not search_text:
                 self.filtered_data = self.stock_data.copy()
             else:
-                self.filtered_data = []
-                for item in self.stock_data:
-                    # Gestion robuste des valeurs None ou vides
-                    nombre = item.get('nombre', '') or ''
-                    referencia = item.get('referencia', '') or ''
-
-                    if (search_text in nombre.lower() or
-                        search_text in referencia.lower()):
-                        self.filtered_data.append(item)
+                self.filtered_data = [item for item in self.stock_data if self._matches_filter(item)]
 
             self.update_stock_display()
             self.logger.debug(f"Filtrado stock: '{search_text}' -> {len(self.filtered_data)} resultados")
@@ -786,6 +832,8 @@ class StockWindow:
             search_text = self.search_var.get().lower().strip()
 
             self.logger.debug(f"Realizando búsqueda: '{search_text}'")
+            self.active_search = search_text
+            self.low_stock_only = False
 
             if not search_text:
                 # Si no hay texto, mostrar todos los productos
@@ -793,15 +841,7 @@ class StockWindow:
                 self.logger.debug("Búsqueda vacía, mostrando todos los productos")
             else:
                 # Filtrar productos
-                self.filtered_data = []
-                for item in self.stock_data:
-                    # Gestion robuste des valeurs None ou vides
-                    nombre = item.get('nombre', '') or ''
-                    referencia = item.get('referencia', '') or ''
-
-                    if (search_text in nombre.lower() or
-                        search_text in referencia.lower()):
-                        self.filtered_data.append(item)
+                self.filtered_data = [item for item in self.stock_data if self._matches_filter(item)]
 
                 self.logger.debug(f"Búsqueda '{search_text}': {len(self.filtered_data)} resultados encontrados")
 
@@ -831,6 +871,8 @@ class StockWindow:
         """Limpia el campo de búsqueda y muestra todos los productos"""
         try:
             self.search_var.set("")
+            self.active_search = ""
+            self.low_stock_only = False
             self.filtered_data = self.stock_data.copy()
             self.update_stock_display()
             self.update_results_indicator()  # Actualizar indicador
@@ -882,19 +924,15 @@ class StockWindow:
             # Limpiar campo de búsqueda para evitar confusión
             self.search_var.set("")
 
-            # 🚀 OPTIMIZACIÓN: Usar requête optimisée pour le stock bas
+            # Los datos en memoria se ponen al día con el registro de cambios: no hace falta otra consulta
+            self.active_search = ""
+            self.low_stock_only = True
             try:
-                low_stock_data = OptimizedStock.get_low_stock_optimized(threshold=5)
-                self.filtered_data = low_stock_data
-                self.logger.debug(f"Filtro stock bajo optimizado: {len(self.filtered_data)} productos encontrados")
-            except Exception as opt_error:
-                self.logger.warning(f"Error en método optimizado, usando fallback: {opt_error}")
-                # Fallback vers la méthode originale
-                self.filtered_data = [
-                    item for item in self.stock_data
-                    if item['cantidad'] <= 5
-                ]
-                self.logger.debug(f"Filtro stock bajo (fallback): {len(self.filtered_data)} productos encontrados")
+                self._pull_stock_changes()
+            except Exception as e:
+                self.logger.warning(f"No se pudieron leer los cambios de stock: {e}")
+            self.filtered_data = [item for item in self.stock_data if self._matches_filter(item)]
+            self.logger.debug(f"Filtro stock bajo: {len(self.filtered_data)} productos encontrados")
 
             self.update_stock_display()
             self.update_results_indicator()  # Actualizar indicador
@@ -1037,21 +1075,21 @@ class StockWindow:
             )
 
             if new_stock is not None and new_stock != current_stock:
-                # Actualizar en base de datos
-                stock_obj = Stock(item['producto_id'], new_stock)
-                stock_obj.save()
-
-                # Registrar movimiento
+                # Actualizar en base de datos y registrar movimiento
                 diferencia = new_stock - current_stock
                 tipo_movimiento = "AJUSTE_POSITIVO" if diferencia > 0 else "AJUSTE_NEGATIVO"
-                descripcion = f"Ajuste manual: {current_stock} -> {new_stock}"
-                StockMovement.create(item['producto_id'], diferencia, tipo_movimiento, descripcion)
+                resultado = BatchOperations.update_multiple_stock([{
+                    'producto_id': item['producto_id'],
+                    'cantidad': new_stock,
+                    'tipo': tipo_movimiento,
+                    'descripcion': f"Ajuste manual: {current_stock} -> {new_stock}"
+                }])
 
                 # Actualizar en memoria
-                item['cantidad'] = new_stock
+                item['cantidad'] = resultado[0]['stock_despues'] if resultado else new_stock
 
-                # Refrescar display
-                self.update_stock_display()
+                # Refrescar solo la fila modificada
+                self.refresh_stock_changes()
 
                 self.logger.info(f"Stock modificado para producto {item['producto_id']}: {current_stock} -> {new_stock}")
                 self.show_success_message("Éxito", f"Stock actualizado correctamente.\nAnterior: {current_stock}\nNuevo: {new_stock}")
@@ -1074,22 +1112,21 @@ class StockWindow:
             )
 
             if cantidad_agregar:
-                new_stock = item['cantidad'] + cantidad_agregar
-
-                # Actualizar en base de datos
-                stock_obj = Stock(item['producto_id'], new_stock)
-                stock_obj.save()
-
-                # Registrar movimiento
-                descripcion = f"Entrada manual de {cantidad_agregar} unidades"
-                StockMovement.create(item['producto_id'], cantidad_agregar, "ENTRADA", descripcion)
+                # Actualizar en base de datos y registrar movimiento
+                resultado = BatchOperations.update_multiple_stock([{
+                    'producto_id': item['producto_id'],
+                    'delta': cantidad_agregar,
+                    'tipo': "ENTRADA",
+                    'descripcion': f"Entrada manual de {cantidad_agregar} unidades"
+                }])
+                new_stock = resultado[0]['stock_despues'] if resultado else item['cantidad'] + cantidad_agregar
 
                 # Actualizar en memoria
                 old_stock = item['cantidad']
                 item['cantidad'] = new_stock
 
-                # Refrescar display
-                self.update_stock_display()
+                # Refrescar solo la fila modificada
+                self.refresh_stock_changes()
 
                 self.logger.info(f"Stock agregado para producto {item['producto_id']}: +{cantidad_agregar} (total: {new_stock})")
                 self.show_success_message("Éxito", f"Stock agregado correctamente.\nAnterior: {old_stock}\nAgregado: +{cantidad_agregar}\nNuevo total: {new_stock}")
@@ -1118,21 +1155,20 @@ class StockWindow:
             )
 
             if cantidad_quitar:
-                new_stock = current_stock - cantidad_quitar
-
-                # Actualizar en base de datos
-                stock_obj = Stock(item['producto_id'], new_stock)
-                stock_obj.save()
-
-                # Registrar movimiento
-                descripcion = f"Salida manual de {cantidad_quitar} unidades"
-                StockMovement.create(item['producto_id'], -cantidad_quitar, "SALIDA", descripcion)
+                # Actualizar en base de datos y registrar movimiento
+                resultado = BatchOperations.update_multiple_stock([{
+                    'producto_id': item['producto_id'],
+                    'delta': -cantidad_quitar,
+                    'tipo': "SALIDA",
+                    'descripcion': f"Salida manual de {cantidad_quitar} unidades"
+                }])
+                new_stock = resultado[0]['stock_despues'] if resultado else current_stock - cantidad_quitar
 
                 # Actualizar en memoria
                 item['cantidad'] = new_stock
 
-                # Refrescar display
-                self.update_stock_display()
+                # Refrescar solo la fila modificada
+                self.refresh_stock_changes()
 
                 self.logger.info(f"Stock removido para producto {item['producto_id']}: -{cantidad_quitar} (total: {new_stock})")
                 self.show_success_message("Éxito", f"Stock removido correctamente.\nAnterior: {current_stock}\nRemovido: -{cantidad_quitar}\nNuevo total: {new_stock}")
@@ -1181,7 +1217,7 @@ class StockWindow:
             headers_frame = ctk.CTkFrame(table_frame)
             headers_frame.pack(fill="x", padx=10, pady=(10, 0))
 
-            headers = ["Fecha", "Tipo", "Cantidad", "Descripción"]
+            headers = ["Fecha", "Tipo", "Cantidad", "Saldo", "Descripción"]
             for header in headers:
                 label = ctk.CTkLabel(
                     headers_frame,
@@ -1276,6 +1312,14 @@ class StockWindow:
         )
         cantidad_label.pack(side="left", fill="x", expand=True, padx=5)
 
+        # Saldo tras el movimiento
+        saldo_label = ctk.CTkLabel(
+            row_frame,
+            text=str(movement.balance_after) if movement.balance_after is not None else "-",
+            anchor="center"
+        )
+        saldo_label.pack(side="left", fill="x", expand=True, padx=5)
+
         # Descripción
         descripcion_text = movement.descripcion[:40] + "..." if len(movement.descripcion) > 40 else movement.descripcion
         descripcion_label = ctk.CTkLabel(
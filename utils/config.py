@@ -14,6 +14,7 @@ class Config:
             "default_image_directory": str(Path.home() / "Pictures"),
             "assets_directory": "assets/images",
             "max_image_size": 1024 * 1024,  # 1MB
+            "max_image_dimension": 1024,  # píxeles del lado mayor al importar
             "supported_image_formats": [".png", ".jpg", ".jpeg", ".gif", ".bmp"],
             "image_display_size": (150, 150),
             # Configuración de numeración de facturas
@@ -81,6 +82,14 @@ class Config:
         """Obtient la taille d'affichage des images"""
         return tuple(self.get("image_display_size", (150, 150)))
     
+    def get_max_image_size(self):
+        """Obtient la taille maximale (octets) d'une image importée"""
+        return int(self.get("max_image_size", 1024 * 1024))
+    
+    def get_max_image_dimension(self):
+        """Obtient le côté maximal (pixels) d'une image importée"""
+        return int(self.get("max_image_dimension", 1024))
+    
     def get_supported_formats(self):
         """Obtient les formats d'image supportés"""
         return self.get("supported_image_formats", [".png", ".jpg", ".jpeg", ".gif", ".bmp"])
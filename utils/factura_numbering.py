@@ -4,7 +4,8 @@ Servicio para manejar la numeración de facturas
 """
 
 import re
-from database.database import Database
+from database import models
+from database.invoice_sequence import invoice_sequence
 from utils.config import app_config
 from utils.logger import get_logger
 
@@ -14,26 +15,22 @@ class FacturaNumberingService:
     """Servicio para generar y gestionar números de factura"""
     
     def __init__(self):
-        self.db = Database()
         self.config = app_config
+        self.secuencia = invoice_sequence
+
+    @property
+    def db(self):
+        """Base de datos activa (la misma instancia que usan los modelos)"""
+        return models.db
     
     def get_next_numero_factura(self):
         """
-        Obtiene el siguiente número de factura sugerido
+        Obtiene el siguiente número de factura sugerido (sin reservarlo)
         Nuevo formato: número-año (ej: FAC-001-2025)
         """
         try:
-            # Obtener el último número de factura de la base de datos
-            ultimo_numero = self._get_ultimo_numero_factura()
-
-            if ultimo_numero is not None:
-                # Si hay facturas existentes, incrementar desde el último número
-                siguiente_numero = ultimo_numero + 1
-            else:
-                # Si no hay facturas, usar el número inicial configurado
-                siguiente_numero = self.config.get_factura_numero_inicial()
-
-            # Formatear el número con prefijo y año al final
+            serie, year = self._serie_actual()
+            siguiente_numero = self.secuencia.peek(serie, year, self.config.get_factura_numero_inicial())
             numero_formateado = self._format_numero_factura(siguiente_numero)
 
             logger.info(f"Siguiente número de factura sugerido: {numero_formateado}")
@@ -42,80 +39,35 @@ class FacturaNumberingService:
         except Exception as e:
             logger.error(f"Error obteniendo siguiente número de factura: {e}")
             # Fallback al formato básico
-            from datetime import datetime
-            year = datetime.now().year
-            numero_inicial = self.config.get_factura_numero_inicial()
-            prefijo = self.config.get_factura_prefijo()
-            if prefijo:
-                return f"{prefijo}-{numero_inicial:03d}-{year}"
-            else:
-                return f"{numero_inicial:03d}-{year}"
-    
-    def _get_ultimo_numero_factura(self):
+            return self._format_numero_factura(self.config.get_factura_numero_inicial())
+
+    def reserve_numero_factura(self):
         """
-        Obtiene el último número de factura usado (solo la parte numérica)
+        Reserva el siguiente número de factura de la serie configurada
+
+        Pensado para InvoiceWriter.save(factura, reservar_numero=...): se ejecuta
+        dentro de la transacción de guardado, por lo que dos ventanas nunca
+        obtienen el mismo número y un guardado fallido no deja huecos.
         """
-        try:
-            # Obtener todas las facturas ordenadas por número de factura descendente
-            query = "SELECT numero_factura FROM facturas ORDER BY id DESC LIMIT 50"
-            facturas = self.db.execute_query(query)
-            
-            if not facturas:
-                return None
-            
-            # Extraer números de todas las facturas y encontrar el máximo
-            numeros = []
-            for factura in facturas:
-                numero_str = factura[0]  # numero_factura
-                numero_numerico = self._extract_numero_from_string(numero_str)
-                if numero_numerico is not None:
-                    numeros.append(numero_numerico)
-            
-            if numeros:
-                return max(numeros)
-            else:
-                return None
-                
-        except Exception as e:
-            logger.error(f"Error obteniendo último número de factura: {e}")
-            return None
-    
-    def _extract_numero_from_string(self, numero_str):
+        serie, year = self._serie_actual()
+        numero = self.secuencia.reserve(serie, year, self.config.get_factura_numero_inicial())
+        numero_formateado = self._format_numero_factura(numero)
+        logger.info(f"Número de factura reservado: {numero_formateado}")
+        return numero_formateado
+
+    def _serie_actual(self):
+        """Serie (prefijo configurado) y año de numeración actuales"""
+        return self.config.get_factura_prefijo() or "", self.secuencia.current_year()
+
+    def _get_ultimo_numero_factura(self):
         """
-        Extrae la parte numérica de un número de factura
-        Nuevo formato: prefijo-número-año (ej: FAC-001-2025)
+        Obtiene el último número de factura usado en la serie actual (solo la parte numérica)
         """
         try:
-            if not numero_str:
-                return None
-
-            import re
-            from datetime import datetime
-            current_year = datetime.now().year
-
-            # Buscar patrón específico: algo-número-año
-            match = re.search(r'-(\d+)-(\d{4})$', str(numero_str))
-            if match:
-                numero_secuencial = int(match.group(1))
-                año = int(match.group(2))
-                # Si el año coincide con el actual, devolver el número secuencial
-                if año == current_year:
-                    return numero_secuencial
-
-            # Fallback: buscar todos los números y excluir años
-            numeros = re.findall(r'\d+', str(numero_str))
-            if numeros:
-                numeros_int = [int(n) for n in numeros]
-                # Excluir años (números de 4 dígitos >= 2000)
-                numeros_no_año = [n for n in numeros_int if not (n >= 2000 and n <= 3000)]
-
-                if numeros_no_año:
-                    return max(numeros_no_año)
-
-            return None
-
+            serie, year = self._serie_actual()
+            return self.secuencia.last(serie, year)
         except Exception as e:
-            logger.debug(f"Error extrayendo número de '{numero_str}': {e}")
+            logger.error(f"Error obteniendo último número de factura: {e}")
             return None
     
     def _format_numero_factura(self, numero):
@@ -123,26 +75,9 @@ class FacturaNumberingService:
         Formatea un número de factura con prefijo, número y año al final
         Nuevo formato: prefijo-número-año (ej: FAC-001-2025)
         """
-        try:
-            from datetime import datetime
-
-            prefijo = self.config.get_factura_prefijo()
-            year = datetime.now().year
-
-            # Formatear el número con ceros a la izquierda si es necesario
-            numero_str = str(numero).zfill(3)  # Mínimo 3 dígitos para el nuevo formato
-
-            # Construir el número completo con año al final
-            if prefijo:
-                numero_completo = f"{prefijo}-{numero_str}-{year}"
-            else:
-                numero_completo = f"{numero_str}-{year}"
-
-            return numero_completo
-
-        except Exception as e:
-            logger.error(f"Error formateando número de factura: {e}")
-            return f"{numero}-{datetime.now().year}"
+        serie, year = self._serie_actual()
+        # Mínimo 3 dígitos para el nuevo formato
+        return self.secuencia.format(serie, numero, year, ancho=3)
     
     def validate_numero_factura(self, numero_factura):
         """
@@ -179,21 +114,12 @@ class FacturaNumberingService:
     
     def update_next_numero_after_save(self, numero_factura_usado):
         """
-        Actualiza la lógica interna después de guardar una factura
-        Si el usuario usó un número personalizado, el siguiente se basará en ese
+        Registra en el log el número usado al guardar una factura
+
+        La tabla de secuencias ya avanza sola al guardar: si el usuario usó un
+        número personalizado, el siguiente se basará en ese.
         """
-        try:
-            # Extraer la parte numérica del número usado
-            numero_numerico = self._extract_numero_from_string(numero_factura_usado)
-            
-            if numero_numerico is not None:
-                logger.info(f"Número de factura usado: {numero_factura_usado} (número: {numero_numerico})")
-                # El siguiente número se calculará automáticamente basado en este
-                # No necesitamos hacer nada especial aquí, ya que get_next_numero_factura()
-                # siempre busca el último número usado
-            
-        except Exception as e:
-            logger.error(f"Error actualizando numeración después de guardar: {e}")
+        logger.info(f"Número de factura usado: {numero_factura_usado}")
     
     def get_configuracion_numeracion(self):
         """
@@ -233,8 +159,7 @@ class FacturaNumberingService:
         La próxima factura seguirá esta numeración
         """
         try:
-            from datetime import datetime
-            year = datetime.now().year
+            year = self.secuencia.current_year()
 
             # Validar que el número no esté ya en uso
             if self._numero_factura_exists(numero_inicial_personalizado):
@@ -261,6 +186,9 @@ class FacturaNumberingService:
                 if prefijo_extraido:
                     self.config.set_factura_prefijo(prefijo_extraido)
                 self.config.set_factura_numero_inicial(numero_extraido)
+                # La serie continúa a partir del número indicado
+                serie = prefijo_extraido or self.config.get_factura_prefijo() or ""
+                self.secuencia.advance_to(serie, year, numero_extraido)
 
                 logger.info(f"Nueva serie de numeración establecida: {numero_base}")
                 return True, f"Nueva serie establecida. Próximo número: {self._format_numero_factura(numero_extraido + 1)}"
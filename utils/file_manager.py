@@ -4,8 +4,8 @@ Fournit des fonctionnalités communes de gestion de fichiers
 """
 
 import os
+import hashlib
 import shutil
-import uuid
 import re
 from pathlib import Path
 from PIL import Image
@@ -46,6 +46,9 @@ class FileManager:
         """
         Copier un fichier vers le répertoire de stockage
         
+        Le nom du fichier dérive du hash de son contenu : copier deux fois le
+        même fichier renvoie le chemin déjà stocké au lieu d'un doublon.
+        
         Args:
             source_path (str): Chemin vers le fichier source
             name_prefix (str): Préfixe pour le nom de fichier
@@ -67,12 +70,16 @@ class FileManager:
                 if not extension:
                     extension = '.dat'  # Extension par défaut
             
-            # Générer nom de fichier unique
+            # Nom dérivé du contenu
             clean_prefix = self.clean_filename(name_prefix)
-            unique_id = uuid.uuid4().hex[:8]
-            filename = f"{clean_prefix}_{unique_id}{extension}"
+            digest = self.content_hash(source_path)
+            filename = f"{clean_prefix}_{digest[:16]}{extension}"
             destination_path = os.path.join(self.storage_directory, filename)
             
+            if self.file_exists(destination_path):
+                self.logger.info(f"Fichier déjà stocké: {os.path.basename(source_path)} -> {filename}")
+                return destination_path
+            
             # Copier le fichier
             shutil.copy2(source_path, destination_path)
             
@@ -119,7 +126,7 @@ class FileManager:
     
     def update_file(self, old_file_path, new_source_path, name_prefix="file"):
         """
-        Mettre à jour un fichier (supprimer l'ancien, copier le nouveau)
+        Mettre à jour un fichier (copier le nouveau, libérer l'ancien via remove_file)
         
         Args:
             old_file_path (str): Chemin vers l'ancien fichier
@@ -135,7 +142,9 @@ class FileManager:
             
             if new_file_path:
                 # Supprimer l'ancien fichier seulement si le nouveau est sauvegardé
-                self.remove_file(old_file_path)
+                # (même contenu : c'est le même fichier)
+                if old_file_path != new_file_path:
+                    self.remove_file(old_file_path)
                 return new_file_path
             else:
                 self.logger.error("Échec sauvegarde nouveau fichier")
@@ -172,51 +181,6 @@ class FileManager:
             self.logger.error(f"Erreur listage fichiers: {e}")
             return []
     
-    def cleanup_orphaned_files(self, current_file_path=None, keep_count=1):
-        """
-        Nettoyer les fichiers orphelins
-        
-        Args:
-            current_file_path (str): Fichier actuellement utilisé
-            keep_count (int): Nombre de fichiers à conserver
-            
-        Returns:
-            int: Nombre de fichiers supprimés
-        """
-        try:
-            all_files = self.list_files()
-            cleaned = 0
-            
-            # Trier par date de modification (plus récents en premier)
-            all_files.sort(key=lambda x: os.path.getmtime(x), reverse=True)
-            
-            # Garder le fichier actuel et les plus récents
-            files_to_keep = set()
-            if current_file_path:
-                files_to_keep.add(current_file_path)
-            
-            # Ajouter les fichiers les plus récents
-            for i, file_path in enumerate(all_files):
-                if len(files_to_keep) < keep_count:
-                    files_to_keep.add(file_path)
-                else:
-                    break
-            
-            # Supprimer les autres fichiers
-            for file_path in all_files:
-                if file_path not in files_to_keep:
-                    if self.remove_file(file_path):
-                        cleaned += 1
-            
-            if cleaned > 0:
-                self.logger.info(f"Nettoyage: {cleaned} fichiers orphelins supprimés")
-            
-            return cleaned
-            
-        except Exception as e:
-            self.logger.error(f"Erreur nettoyage fichiers: {e}")
-            return 0
-    
     def get_file_info(self, file_path):
         """
         Obtenir des informations sur un fichier
@@ -250,6 +214,15 @@ class FileManager:
         
         return info
     
+    @staticmethod
+    def content_hash(file_path):
+        """Hash SHA-256 du contenu d'un fichier"""
+        sha = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                sha.update(chunk)
+        return sha.hexdigest()
+    
     @staticmethod
     def file_exists(file_path):
         """Vérifier qu'un fichier existe"""
@@ -278,19 +251,86 @@ class ImageFileManager(FileManager):
         self.supported_formats = {'.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff', '.webp'}
     
     def save_file(self, source_path, name_prefix="image", file_extension=None):
-        """Sauvegarder une image avec validation"""
+        """Sauvegarder une image avec validation et l'enregistrer dans le magasin de blobs"""
         try:
             # Valider que c'est bien une image
             if not self.is_valid_image(source_path):
                 self.logger.warning(f"Fichier non valide comme image: {source_path}")
                 return None
             
-            return super().save_file(source_path, name_prefix, file_extension)
+            saved_path = super().save_file(source_path, name_prefix, file_extension)
+            if saved_path:
+                self.register_blob(saved_path)
+            return saved_path
             
         except Exception as e:
             self.logger.error(f"Erreur sauvegarde image: {e}")
             return None
     
+    def register_blob(self, file_path, digest=None):
+        """
+        Enregistrer une image stockée pour le comptage de références
+        
+        Sans enregistrement l'image n'est simplement jamais collectée :
+        une erreur ici ne doit pas faire échouer la sauvegarde.
+        """
+        try:
+            from database.blob_store import blob_store
+            blob_store.register(file_path, digest)
+        except Exception as e:
+            self.logger.warning(f"Image non enregistrée dans le magasin de blobs: {e}")
+    
+    def remove_file(self, file_path):
+        """
+        Libérer une image stockée
+        
+        Les images sont partagées entre produits et logos (nom dérivé du
+        contenu) : le fichier n'est supprimé que si aucune ligne ne le
+        référence plus. Sinon il est conservé et collect_garbage le
+        reprendra une fois son compteur à zéro.
+        
+        Args:
+            file_path (str): Chemin vers l'image à libérer
+            
+        Returns:
+            bool: True si l'image est libérée (supprimée ou laissée au collecteur)
+        """
+        try:
+            if not file_path:
+                return True
+            
+            if not file_path.startswith(self.storage_directory):
+                self.logger.warning(f"Fichier hors répertoire géré: {file_path}")
+                return True
+            
+            from database.blob_store import blob_store
+            if blob_store.discard(file_path):
+                self.logger.info(f"Image supprimée: {os.path.basename(file_path)}")
+            else:
+                self.logger.info(f"Image conservée (encore référencée ou non enregistrée): {os.path.basename(file_path)}")
+            return True
+            
+        except Exception as e:
+            self.logger.error(f"Erreur libération image: {e}")
+            return False
+    
+    def collect_garbage(self, limit=None):
+        """
+        Supprimer les images de ce répertoire qui ne sont plus référencées
+        
+        Args:
+            limit (int): Nombre maximal de fichiers supprimés (par défaut celui du magasin)
+            
+        Returns:
+            list: Chemins des fichiers supprimés
+        """
+        try:
+            from database.blob_store import blob_store, LIMITE_RECOLECCION
+            return blob_store.collect_garbage(limit or LIMITE_RECOLECCION, directorio=self.storage_directory)
+        except Exception as e:
+            self.logger.error(f"Erreur collecte des images: {e}")
+            return []
+    
     def is_valid_image(self, file_path):
         """Vérifier qu'un fichier est une image valide"""
         try:
@@ -0,0 +1,250 @@
+"""
+Import des images produit en arrière-plan
+
+Au lieu de copier tel quel le fichier choisi (parfois une photo de 20 Mo),
+chaque image est validée, redressée selon son orientation EXIF, réduite à
+la dimension maximale configurée et réencodée (JPEG, ou PNG si elle a de la
+transparence) dans la limite de max_image_size octets. Le fichier résultant
+est nommé d'après le hash du contenu source : importer deux fois la même
+image réutilise le fichier déjà produit sans la redécoder.
+
+Le travail se fait dans un thread dédié ; submit() renvoie un Future que
+l'interface peut suivre avec query_executor.call_when_done.
+
+Chaque fichier produit est enregistré dans le magasin de blobs
+(database.blob_store) : ceux que plus aucun produit ne référence sont
+supprimés par collect_garbage(), par lots, sans parcourir le répertoire.
+"""
+
+import glob
+import hashlib
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageOps
+from utils.config import app_config
+from utils.logger import get_logger, log_file_operation
+from utils.thumbnail_store import thumbnail_store
+
+# Qualités JPEG essayées successivement pour respecter la taille maximale
+JPEG_QUALITIES = (85, 75, 65, 50)
+
+
+class ImageIngestor:
+    """Validation, normalisation et déduplication des images importées"""
+
+    def __init__(self, directory=None, max_dimension=None, max_bytes=None, thumbnails=thumbnail_store):
+        """
+        Initialiser le pipeline d'import
+
+        Args:
+            directory (str): Répertoire de destination (par défaut celui des assets)
+            max_dimension (int): Côté maximal en pixels (par défaut max_image_dimension)
+            max_bytes (int): Taille maximale du fichier produit (par défaut max_image_size)
+            thumbnails (ThumbnailStore): Stockage des miniatures à préparer, ou None
+        """
+        self.logger = get_logger("image_ingestion")
+        self._directory = directory
+        self._max_dimension = max_dimension
+        self._max_bytes = max_bytes
+        self.thumbnails = thumbnails
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @property
+    def storage_directory(self):
+        """Répertoire où sont écrites les images importées"""
+        return self._directory or app_config.get_assets_directory()
+
+    @property
+    def max_dimension(self):
+        """Côté maximal d'une image importée, jamais inférieur à la taille d'affichage"""
+        limit = self._max_dimension or app_config.get_max_image_dimension()
+        return max(limit, *app_config.get_image_display_size())
+
+    @property
+    def max_bytes(self):
+        """Taille maximale du fichier produit"""
+        return self._max_bytes or app_config.get_max_image_size()
+
+    def submit(self, source_path):
+        """Importer une image dans le thread d'import et renvoyer son Future"""
+        return self._get_pool().submit(self.ingest, source_path)
+
+    def _get_pool(self):
+        """Thread d'import, créé au premier usage"""
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="image-ingest")
+            return self._pool
+
+    def shutdown(self, wait=True):
+        """Arrêter le thread d'import (il est recréé au prochain submit)"""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=True)
+
+    def ingest(self, source_path):
+        """
+        Importer une image de façon synchrone
+
+        Args:
+            source_path (str): Chemin vers l'image choisie par l'utilisateur
+
+        Returns:
+            dict: {'path', 'hash', 'format', 'size', 'bytes', 'source_bytes', 'deduplicated'}
+
+        Raises:
+            ValueError: Si le fichier n'existe pas ou n'est pas une image valide
+        """
+        if not source_path or not os.path.isfile(source_path):
+            raise ValueError(f"Fichier image inexistant: {source_path}")
+
+        with open(source_path, 'rb') as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+
+        existing = self._find_existing(digest)
+        if existing:
+            with Image.open(existing) as img:
+                size = img.size
+                image_format = img.format
+            result = self._result(existing, digest, image_format, size, len(data), deduplicated=True)
+            # Ré-enregistrer relance le délai de grâce d'une image qui n'était plus utilisée
+            self._register_blob(existing)
+            self.logger.debug(f"Image déjà importée: {os.path.basename(source_path)} -> {existing}")
+            return result
+
+        image = self._load(source_path, data)
+        encoded, image_format, extension, size = self._encode(image)
+
+        os.makedirs(self.storage_directory, exist_ok=True)
+        path = os.path.join(self.storage_directory, f"img_{digest[:20]}{extension}")
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(encoded.getvalue())
+        os.replace(temp_path, path)
+
+        if self.thumbnails is not None:
+            self.thumbnails.ensure(path)
+        self._register_blob(path)
+
+        result = self._result(path, digest, image_format, size, len(data), deduplicated=False)
+        log_file_operation("INGEST", source_path,
+                           f"{len(data)} -> {result['bytes']} octets, {size[0]}x{size[1]} {image_format}")
+        return result
+
+    def schedule_garbage_collection(self):
+        """Lancer collect_garbage() dans le thread d'import et renvoyer son Future"""
+        return self._get_pool().submit(self.collect_garbage)
+
+    def collect_garbage(self, limit=None):
+        """
+        Supprimer les images importées qui ne sont plus référencées par aucun produit
+
+        Args:
+            limit (int): Nombre maximal de fichiers supprimés (par défaut celui du magasin)
+
+        Returns:
+            list: Chemins des images supprimées
+        """
+        from database.blob_store import blob_store, LIMITE_RECOLECCION
+        removed = blob_store.collect_garbage(limit or LIMITE_RECOLECCION, directorio=self.storage_directory)
+        if self.thumbnails is not None:
+            for path in removed:
+                self.thumbnails.remove(path)
+        return removed
+
+    def _register_blob(self, path):
+        """Enregistrer le fichier produit pour le comptage de références"""
+        try:
+            from database.blob_store import blob_store
+            blob_store.register(path)
+        except Exception as e:
+            self.logger.warning(f"Image non enregistrée dans le magasin de blobs: {e}")
+
+    def _find_existing(self, digest):
+        """Fichier déjà produit pour ce contenu source, s'il existe"""
+        pattern = os.path.join(glob.escape(self.storage_directory), f"img_{digest[:20]}.*")
+        matches = [path for path in glob.glob(pattern) if not path.endswith('.tmp')]
+        return matches[0] if matches else None
+
+    def _load(self, source_path, data):
+        """Valider, décoder et redresser l'image, puis la réduire à la dimension maximale"""
+        try:
+            with Image.open(io.BytesIO(data)) as img:
+                img.verify()
+            img = Image.open(io.BytesIO(data))
+            # Décodage JPEG réduit quand l'image est bien plus grande que nécessaire
+            img.draft('RGB', (self.max_dimension, self.max_dimension))
+            img = ImageOps.exif_transpose(img)
+        except Exception as e:
+            raise ValueError(f"Image non valide: {source_path} ({e})") from e
+
+        if img.mode in ('LA', 'PA') or (img.mode == 'P' and 'transparency' in img.info):
+            img = img.convert('RGBA')
+        elif img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGB')
+
+        if max(img.size) > self.max_dimension:
+            img.thumbnail((self.max_dimension, self.max_dimension), Image.Resampling.LANCZOS)
+        return img
+
+    def _encode(self, image):
+        """
+        Réencoder l'image dans la limite de max_bytes
+
+        Returns:
+            tuple: (io.BytesIO, format, extension, (largeur, hauteur))
+        """
+        has_alpha = image.mode == 'RGBA' and image.getextrema()[3][0] < 255
+        if not has_alpha and image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        while True:
+            encoded = self._encode_once(image, has_alpha)
+            # Toujours trop grand à la qualité minimale : réduire encore les dimensions
+            if encoded.tell() <= self.max_bytes or max(image.size) <= 64:
+                break
+            image = image.resize((max(1, image.width * 3 // 4), max(1, image.height * 3 // 4)),
+                                 Image.Resampling.LANCZOS)
+
+        if has_alpha:
+            return encoded, 'PNG', '.png', image.size
+        return encoded, 'JPEG', '.jpg', image.size
+
+    def _encode_once(self, image, has_alpha):
+        """Encoder en PNG (transparence) ou en JPEG à la meilleure qualité qui tient dans max_bytes"""
+        if has_alpha:
+            return self._save(image, 'PNG', optimize=True)
+        for quality in JPEG_QUALITIES:
+            encoded = self._save(image, 'JPEG', quality=quality, optimize=True, progressive=True)
+            if encoded.tell() <= self.max_bytes:
+                break
+        return encoded
+
+    @staticmethod
+    def _save(image, image_format, **options):
+        """Encoder une image en mémoire"""
+        buffer = io.BytesIO()
+        image.save(buffer, format=image_format, **options)
+        return buffer
+
+    @staticmethod
+    def _result(path, digest, image_format, size, source_bytes, deduplicated):
+        """Résultat d'un import"""
+        return {
+            'path': path,
+            'hash': digest,
+            'format': image_format,
+            'size': size,
+            'bytes': os.path.getsize(path),
+            'source_bytes': source_bytes,
+            'deduplicated': deduplicated,
+        }
+
+
+# Instance globale pour utilisation dans l'application
+image_ingestor = ImageIngestor()
@@ -3,27 +3,38 @@ Gestionnaire d'images générique pour l'application
 Fournit des fonctionnalités communes pour la gestion d'images
 """
 
+from collections import OrderedDict
 from utils.file_manager import ImageFileManager
 from utils.logger import get_logger
 from PIL import Image, ImageTk
-import os
 
 class ImageManager:
     """Gestionnaire d'images générique avec cache et optimisation"""
     
-    def __init__(self, subdirectory="images", cache_size=100):
+    # Budget mémoire par défaut du cache (pixels décodés)
+    DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+
+    def __init__(self, subdirectory="images", cache_size=100, cache_bytes=DEFAULT_CACHE_BYTES):
         """
         Initialiser le gestionnaire d'images
         
         Args:
             subdirectory (str): Sous-répertoire pour stocker les images
-            cache_size (int): Taille maximale du cache d'images
+            cache_size (int): Nombre maximal d'images dans le cache
+            cache_bytes (int): Taille maximale du cache en octets de pixels décodés
         """
         self.logger = get_logger(f"image_manager_{subdirectory}")
         self.file_manager = ImageFileManager(subdirectory=subdirectory)
         self.cache_size = cache_size
-        self._image_cache = {}
-        self._cache_order = []
+        self.cache_bytes = cache_bytes
+        # LRU : (chemin, taille) -> image, de la moins récente à la plus récente
+        self._image_cache = OrderedDict()
+        self._cache_sizes = {}  # clé -> octets de l'image en cache
+        self._keys_by_path = {}  # chemin -> clés en cache pour ce chemin
+        self._cache_used_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
     
     @property
     def storage_directory(self):
@@ -45,7 +56,7 @@ class ImageManager:
     
     def remove_image(self, image_path):
         """
-        Supprimer une image
+        Supprimer une image (conservée tant qu'elle est référencée)
         
         Args:
             image_path (str): Chemin vers l'image à supprimer
@@ -94,50 +105,21 @@ class ImageManager:
         """
         return self.file_manager.list_images()
     
-    def cleanup_orphaned_images(self, current_images=None, keep_count=10):
+    def cleanup_orphaned_images(self):
         """
         Nettoyer les images orphelines
         
-        Args:
-            current_images (list): Liste des images actuellement utilisées
-            keep_count (int): Nombre d'images récentes à conserver
-            
+        Seules les images dont le compteur de références est à zéro depuis le
+        délai de grâce sont supprimées, par lots bornés ; le répertoire n'est
+        pas parcouru. Les images utilisées sont protégées par leurs références.
+        
         Returns:
             int: Nombre d'images supprimées
         """
-        try:
-            all_images = self.list_images()
-            cleaned = 0
-            
-            # Créer un set des images à conserver
-            images_to_keep = set()
-            if current_images:
-                images_to_keep.update(current_images)
-            
-            # Trier par date de modification (plus récentes en premier)
-            all_images.sort(key=lambda x: os.path.getmtime(x), reverse=True)
-            
-            # Ajouter les images les plus récentes
-            for i, image_path in enumerate(all_images):
-                if len(images_to_keep) < keep_count:
-                    images_to_keep.add(image_path)
-                else:
-                    break
-            
-            # Supprimer les autres images
-            for image_path in all_images:
-                if image_path not in images_to_keep:
-                    if self.remove_image(image_path):
-                        cleaned += 1
-            
-            if cleaned > 0:
-                self.logger.info(f"Nettoyage: {cleaned} images orphelines supprimées")
-            
-            return cleaned
-            
-        except Exception as e:
-            self.logger.error(f"Erreur nettoyage images: {e}")
-            return 0
+        removed = self.file_manager.collect_garbage()
+        for image_path in removed:
+            self._remove_from_cache(image_path)
+        return len(removed)
     
     def create_thumbnail(self, image_path, size=(64, 64)):
         """
@@ -179,15 +161,14 @@ class ImageManager:
             if not self.file_manager.file_exists(image_path):
                 return None
             
-            # Créer clé de cache
-            cache_key = f"{image_path}_{size}" if size else image_path
-            
             # Vérifier le cache
-            if cache_key in self._image_cache:
-                # Mettre à jour l'ordre d'utilisation
-                self._cache_order.remove(cache_key)
-                self._cache_order.append(cache_key)
-                return self._image_cache[cache_key]
+            cache_key = (image_path, tuple(size) if size else None)
+            cached = self._image_cache.get(cache_key)
+            if cached is not None:
+                self._image_cache.move_to_end(cache_key)
+                self._hits += 1
+                return cached
+            self._misses += 1
             
             # Charger l'image
             with Image.open(image_path) as img:
@@ -274,29 +255,53 @@ class ImageManager:
             # Retourner une image simple en cas d'erreur
             return Image.new('RGB', size, color='lightgray')
     
+    @staticmethod
+    def _image_bytes(image):
+        """Octets occupés par les pixels décodés d'une image"""
+        return image.width * image.height * len(image.getbands())
+    
     def _add_to_cache(self, cache_key, image):
-        """Ajouter une image au cache"""
+        """Ajouter une image au cache en respectant le nombre d'entrées et le budget mémoire"""
         try:
-            # Supprimer les anciennes entrées si le cache est plein
-            while len(self._image_cache) >= self.cache_size:
-                oldest_key = self._cache_order.pop(0)
-                del self._image_cache[oldest_key]
+            nbytes = self._image_bytes(image)
+            if nbytes > self.cache_bytes:
+                # Une image plus grande que tout le budget n'est pas mise en cache
+                return
+
+            if cache_key in self._image_cache:
+                self._discard(cache_key)
+
+            # Supprimer les entrées les moins récentes jusqu'à faire de la place
+            while self._image_cache and (len(self._image_cache) >= self.cache_size or
+                                         self._cache_used_bytes + nbytes > self.cache_bytes):
+                oldest_key = next(iter(self._image_cache))
+                self._discard(oldest_key)
+                self._evictions += 1
             
             # Ajouter la nouvelle image
             self._image_cache[cache_key] = image
-            self._cache_order.append(cache_key)
+            self._cache_sizes[cache_key] = nbytes
+            self._cache_used_bytes += nbytes
+            self._keys_by_path.setdefault(cache_key[0], set()).add(cache_key)
             
         except Exception as e:
             self.logger.error(f"Erreur ajout cache: {e}")
     
+    def _discard(self, cache_key):
+        """Retirer une entrée du cache et des index"""
+        del self._image_cache[cache_key]
+        self._cache_used_bytes -= self._cache_sizes.pop(cache_key)
+        keys = self._keys_by_path.get(cache_key[0])
+        if keys is not None:
+            keys.discard(cache_key)
+            if not keys:
+                del self._keys_by_path[cache_key[0]]
+    
     def _remove_from_cache(self, image_path):
-        """Supprimer une image du cache"""
+        """Supprimer d'un coup toutes les tailles en cache d'une image"""
         try:
-            keys_to_remove = [key for key in self._image_cache.keys() if key.startswith(image_path)]
-            for key in keys_to_remove:
-                del self._image_cache[key]
-                if key in self._cache_order:
-                    self._cache_order.remove(key)
+            for key in list(self._keys_by_path.get(image_path, ())):
+                self._discard(key)
                     
         except Exception as e:
             self.logger.error(f"Erreur suppression cache: {e}")
@@ -304,13 +309,22 @@ class ImageManager:
     def clear_cache(self):
         """Vider le cache d'images"""
         self._image_cache.clear()
-        self._cache_order.clear()
+        self._cache_sizes.clear()
+        self._keys_by_path.clear()
+        self._cache_used_bytes = 0
         self.logger.info("Cache d'images vidé")
     
     def get_cache_stats(self):
         """Obtenir des statistiques sur le cache"""
+        lookups = self._hits + self._misses
         return {
             'size': len(self._image_cache),
             'max_size': self.cache_size,
-            'usage': f"{len(self._image_cache)}/{self.cache_size}"
+            'usage': f"{len(self._image_cache)}/{self.cache_size}",
+            'bytes': self._cache_used_bytes,
+            'max_bytes': self.cache_bytes,
+            'hits': self._hits,
+            'misses': self._misses,
+            'evictions': self._evictions,
+            'hit_rate': self._hits / lookups if lookups else 0.0
         }
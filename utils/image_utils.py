@@ -5,6 +5,7 @@ import os
 from PIL import Image, ImageTk
 import tkinter as tk
 from utils.logger import get_logger
+from utils.thumbnail_store import thumbnail_store
 
 class ImageUtils:
     """Classe utilitaire pour la gestion des images"""
@@ -18,12 +19,14 @@ class ImageUtils:
         """
         Crée une mini image redimensionnée pour affichage dans les listes
 
+        L'image est servie depuis le stockage de miniatures (thumbnail_store).
+
         Args:
             image_path (str): Chemin vers l'image source
             size (tuple): Taille désirée (largeur, hauteur)
 
         Returns:
-            ImageTk.PhotoImage: Image redimensionnée prête pour tkinter
+            tk.PhotoImage: Image redimensionnée prête pour tkinter
             None: Si erreur ou image inexistante
         """
         logger = get_logger("image_utils")
@@ -45,36 +48,11 @@ class ImageUtils:
                 logger.debug("Pas de fenêtre tkinter disponible")
                 return None
 
-            # Ouvrir et redimensionner l'image
-            with Image.open(image_path) as img:
-                # Convertir en RGB si nécessaire (pour éviter les problèmes avec certains formats)
-                if img.mode in ('RGBA', 'LA', 'P'):
-                    # Créer un fond blanc pour les images avec transparence
-                    background = Image.new('RGB', img.size, (255, 255, 255))
-                    if img.mode == 'P':
-                        img = img.convert('RGBA')
-                    background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-                    img = background
-                elif img.mode != 'RGB':
-                    img = img.convert('RGB')
-
-                # Redimensionner en gardant les proportions
-                img.thumbnail(size, Image.Resampling.LANCZOS)
-
-                # Créer une nouvelle image avec la taille exacte demandée (centrer l'image)
-                final_img = Image.new('RGB', size, (255, 255, 255))
-
-                # Calculer la position pour centrer l'image
-                x = (size[0] - img.width) // 2
-                y = (size[1] - img.height) // 2
-
-                final_img.paste(img, (x, y))
-
-                # Convertir pour tkinter
-                photo = ImageTk.PhotoImage(final_img)
-
+            # Miniature pré-générée sur disque : l'image d'origine n'est décodée qu'une fois
+            photo = thumbnail_store.get_photo(image_path, size)
+            if photo is not None:
                 logger.debug(f"Mini image créée: {os.path.basename(image_path)} -> {size}")
-                return photo
+            return photo
 
         except Exception as e:
             logger.warning(f"Erreur lors de la création de mini image pour {image_path}: {e}")
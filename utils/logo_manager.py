@@ -34,7 +34,7 @@ class LogoManager:
 
     def remove_logo(self, logo_path):
         """
-        Supprimer un logo du répertoire permanent
+        Supprimer un logo du répertoire permanent (conservé tant qu'il est référencé)
 
         Args:
             logo_path (str): Chemin vers le logo à supprimer
@@ -46,7 +46,7 @@ class LogoManager:
     
     def update_logo(self, old_logo_path, new_source_path, organization_name="organization"):
         """
-        Mettre à jour un logo (supprimer l'ancien, copier le nouveau)
+        Mettre à jour un logo (copier le nouveau, libérer l'ancien)
 
         Args:
             old_logo_path (str): Chemin vers l'ancien logo
@@ -80,14 +80,15 @@ class LogoManager:
         """
         return self.file_manager.list_images()
     
-    def cleanup_orphaned_logos(self, current_logo_path=None):
+    def cleanup_orphaned_logos(self):
         """
         Nettoyer les logos orphelins (non utilisés)
 
-        Args:
-            current_logo_path (str): Chemin du logo actuellement utilisé
+        Seuls les logos dont le compteur de références est à zéro depuis le
+        délai de grâce sont supprimés ; le répertoire n'est pas parcouru. Le
+        logo actuel est protégé par sa référence dans organizacion.logo_path.
 
         Returns:
             int: Nombre de logos supprimés
         """
-        return self.file_manager.cleanup_orphaned_files(current_logo_path, keep_count=1)
+        return len(self.file_manager.collect_garbage())
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+Cálculo de importes en céntimos enteros
+
+Los importes se convierten una sola vez a enteros y todas las operaciones
+(descuento, base, IVA, totales) se hacen con aritmética entera y redondeo
+"mitad hacia arriba" explícito, de modo que los resultados son exactos al
+céntimo y no dependen del orden de las sumas.
+
+Unidades:
+  - importes: céntimos (int)
+  - precios unitarios: diezmilésimas de euro (admiten 4 decimales)
+  - porcentajes (IVA, descuento): centésimas de punto (21 % -> 2100)
+
+El IVA de una factura se calcula por tipo, sobre la suma de las bases de
+cada tipo (desglose por tipo impositivo), no sumando el IVA redondeado de
+cada línea.
+
+calculate_many() procesa lotes grandes (por ejemplo, las líneas de un año)
+sobre columnas array('q') sin crear objetos por línea.
+"""
+
+from array import array
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+# Escalas de las unidades enteras
+CENTIMOS = 100
+ESCALA_PRECIO = 10000
+ESCALA_PORCENTAJE = 100
+
+_CIEN_POR_CIEN = 100 * ESCALA_PORCENTAJE
+
+
+def _to_scaled(value, scale):
+    """Convierte un número (int, float, str, Decimal) a entero en la escala dada"""
+    try:
+        # str() de un float da su representación decimal más corta: 0.1 -> "0.1"
+        decimal = value if isinstance(value, Decimal) else Decimal(str(value).strip())
+        return int((decimal * scale).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    except (InvalidOperation, TypeError) as e:
+        raise ValueError(f"Importe no válido: {value!r}") from e
+
+
+def to_cents(amount):
+    """Importe en euros -> céntimos enteros (redondeo mitad hacia arriba)"""
+    return _to_scaled(amount, CENTIMOS)
+
+
+def price_units(precio):
+    """Precio unitario -> diezmilésimas de euro"""
+    return _to_scaled(precio, ESCALA_PRECIO)
+
+
+def rate_units(percentage):
+    """Porcentaje -> centésimas de punto (21 -> 2100, 10.5 -> 1050)"""
+    return _to_scaled(percentage, ESCALA_PORCENTAJE)
+
+
+def from_cents(cents):
+    """Céntimos -> euros como float (para mostrar o guardar en columnas REAL)"""
+    return cents / CENTIMOS
+
+
+def div_round(numerator, denominator):
+    """División entera con redondeo mitad hacia arriba (simétrico para negativos)"""
+    if numerator < 0:
+        return -((-numerator * 2 + denominator) // (denominator * 2))
+    return (numerator * 2 + denominator) // (denominator * 2)
+
+
+def percentage_of(cents, rate):
+    """Porcentaje (en centésimas de punto) de un importe en céntimos, redondeado al céntimo"""
+    return div_round(cents * rate, _CIEN_POR_CIEN)
+
+
+def line_cents(precio, cantidad, iva=0, descuento=0):
+    """
+    Importes de una línea en céntimos a partir de unidades enteras
+
+    Args:
+        precio: precio unitario en diezmilésimas (price_units)
+        cantidad: unidades (int)
+        iva, descuento: porcentajes en centésimas de punto (rate_units)
+
+    Returns:
+        tuple: (descuento, base, iva, total) en céntimos
+    """
+    bruto = div_round(precio * cantidad, ESCALA_PRECIO // CENTIMOS)
+    importe_descuento = percentage_of(bruto, descuento)
+    base = bruto - importe_descuento
+    importe_iva = percentage_of(base, iva)
+    return importe_descuento, base, importe_iva, base + importe_iva
+
+
+def calculate_line(precio_unitario, cantidad, iva_percentage=0, descuento_percentage=0):
+    """
+    Importes de una línea de factura en céntimos
+
+    Returns:
+        dict: {'descuento', 'base', 'iva', 'total'} en céntimos
+    """
+    descuento, base, iva, total = line_cents(
+        price_units(precio_unitario), int(cantidad),
+        rate_units(iva_percentage), rate_units(descuento_percentage)
+    )
+    return {'descuento': descuento, 'base': base, 'iva': iva, 'total': total}
+
+
+def aggregate_by_rate(lineas):
+    """
+    Totales de una factura con el IVA calculado por tipo
+
+    Args:
+        lineas: iterable de (tipo de IVA en centésimas de punto, base en céntimos)
+
+    Returns:
+        dict: {'subtotal', 'total_iva', 'total'} en céntimos y
+              'por_tipo': {tipo: {'base', 'iva'}} ordenado por tipo
+    """
+    bases = {}
+    for tipo, base in lineas:
+        bases[tipo] = bases.get(tipo, 0) + base
+
+    por_tipo = {}
+    for tipo in sorted(bases):
+        base = bases[tipo]
+        por_tipo[tipo] = {'base': base, 'iva': percentage_of(base, tipo)}
+
+    subtotal = sum(bases.values())
+    total_iva = sum(desglose['iva'] for desglose in por_tipo.values())
+    return {'subtotal': subtotal, 'total_iva': total_iva, 'total': subtotal + total_iva, 'por_tipo': por_tipo}
+
+
+class LineColumns:
+    """Lote de líneas de factura como columnas de enteros (array('q'))"""
+
+    def __init__(self):
+        self.factura_id = array('q')
+        self.precio = array('q')
+        self.cantidad = array('q')
+        self.iva = array('q')
+        self.descuento = array('q')
+
+    def __len__(self):
+        return len(self.precio)
+
+    def append(self, factura_id, precio_unitario, cantidad, iva_percentage=0, descuento_percentage=0):
+        """Añade una línea con los valores tal como se guardan (euros y porcentajes)"""
+        self.factura_id.append(factura_id)
+        self.precio.append(price_units(precio_unitario))
+        self.cantidad.append(int(cantidad))
+        self.iva.append(rate_units(iva_percentage))
+        self.descuento.append(rate_units(descuento_percentage or 0))
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Columnas a partir de filas (factura_id, precio_unitario, cantidad, iva, descuento)"""
+        columnas = cls()
+        for row in rows:
+            columnas.append(*row)
+        return columnas
+
+
+def calculate_many(lineas):
+    """
+    Importes de un lote de líneas
+
+    Args:
+        lineas: LineColumns (o iterable de filas para LineColumns.from_rows)
+
+    Returns:
+        dict: columnas array('q') en céntimos 'descuento', 'base', 'iva', 'total'
+              (una posición por línea, en el mismo orden)
+    """
+    if not isinstance(lineas, LineColumns):
+        lineas = LineColumns.from_rows(lineas)
+
+    # Mismo cálculo que line_cents, sin una llamada a función por línea
+    escala = ESCALA_PRECIO // CENTIMOS
+    descuentos, bases, ivas, totales = array('q'), array('q'), array('q'), array('q')
+    for precio, cantidad, iva, descuento in zip(lineas.precio, lineas.cantidad, lineas.iva, lineas.descuento):
+        bruto = div_round(precio * cantidad, escala)
+        importe_descuento = div_round(bruto * descuento, _CIEN_POR_CIEN)
+        base = bruto - importe_descuento
+        importe_iva = div_round(base * iva, _CIEN_POR_CIEN)
+        descuentos.append(importe_descuento)
+        bases.append(base)
+        ivas.append(importe_iva)
+        totales.append(base + importe_iva)
+    return {'descuento': descuentos, 'base': bases, 'iva': ivas, 'total': totales}
+
+
+def invoice_totals_many(lineas):
+    """
+    Totales por factura de un lote de líneas (IVA por tipo en cada factura)
+
+    Returns:
+        dict: {factura_id: resultado de aggregate_by_rate}
+    """
+    if not isinstance(lineas, LineColumns):
+        lineas = LineColumns.from_rows(lineas)
+    importes = calculate_many(lineas)
+
+    por_factura = {}
+    for factura_id, tipo, base in zip(lineas.factura_id, lineas.iva, importes['base']):
+        por_factura.setdefault(factura_id, []).append((tipo, base))
+    return {factura_id: aggregate_by_rate(lineas_factura) for factura_id, lineas_factura in por_factura.items()}
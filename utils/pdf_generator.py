@@ -3,7 +3,11 @@
 Generador de PDF para facturas
 """
 
+import hashlib
+import json
 import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -11,23 +15,70 @@ from reportlab.lib.units import cm
 from reportlab.lib import colors
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
 from reportlab.lib.enums import TA_LEFT, TA_RIGHT, TA_CENTER
-from database.models import Organizacion
+from database import models
+from database.models import Organizacion, Factura
 from utils.logger import get_logger
 
+
+# Generador reutilizado por cada proceso del pool de generate_many
+_worker_generator = None
+
+# Contexto de renderizado compartido: estilos (por proceso) y encabezado (por hilo,
+# porque ReportLab guarda el estado de maquetación en los propios flowables)
+_render_context_lock = threading.Lock()
+_shared_styles = None
+_header_cache = threading.local()
+# Fila de organización del proceso: ((base de datos, Organizacion.version), Organizacion)
+_organizacion_cache = None
+
+
+def _init_batch_worker(db_path):
+    """Prepara un proceso del pool: conexión propia a la base de datos y un generador"""
+    global _worker_generator
+    from database.database import Database
+
+    # Modelos y servicios leen la base de datos activa en models.db: basta con sustituirla ahí
+    models.db = Database(db_path)
+    _worker_generator = PDFGenerator()
+
+
+def _render_batch_chunk(factura_ids, out_dir, generator=None):
+    """Genera los PDFs de un bloque de facturas: lista de (factura_id, ruta, error)"""
+    generator = generator or _worker_generator or PDFGenerator()
+    return [generator._render_by_id(factura_id, out_dir) for factura_id in factura_ids]
+
+
 class PDFGenerator:
     """Generador de PDF para facturas"""
+
+    # Versión de la plantilla: incrementarla al cambiar el diseño invalida los PDFs ya generados
+    TEMPLATE_VERSION = 1
+
+    # Extensión del archivo que acompaña a cada PDF con su huella de contenido
+    FINGERPRINT_SUFFIX = ".huella"
     
     def __init__(self):
         self.logger = get_logger("pdf_generator")
-        self.styles = getSampleStyleSheet()
-        self.setup_custom_styles()
-        
-    def setup_custom_styles(self):
+        self.styles = self.get_shared_styles()
+
+    @staticmethod
+    def get_shared_styles():
+        """Hoja de estilos de las facturas, construida una sola vez por proceso"""
+        global _shared_styles
+        with _render_context_lock:
+            if _shared_styles is None:
+                styles = getSampleStyleSheet()
+                PDFGenerator.setup_custom_styles(styles)
+                _shared_styles = styles
+        return _shared_styles
+
+    @staticmethod
+    def setup_custom_styles(styles):
         """Configura estilos personalizados para el PDF"""
         # Estilo para el título principal
-        self.styles.add(ParagraphStyle(
+        styles.add(ParagraphStyle(
             name='TituloFactura',
-            parent=self.styles['Heading1'],
+            parent=styles['Heading1'],
             fontSize=24,
             textColor=colors.darkblue,
             alignment=TA_CENTER,
@@ -35,73 +86,85 @@ class PDFGenerator:
         ))
         
         # Estilo para información de empresa
-        self.styles.add(ParagraphStyle(
+        styles.add(ParagraphStyle(
             name='InfoEmpresa',
-            parent=self.styles['Normal'],
+            parent=styles['Normal'],
             fontSize=10,
             alignment=TA_LEFT,
             spaceAfter=6
         ))
         
         # Estilo para información de cliente
-        self.styles.add(ParagraphStyle(
+        styles.add(ParagraphStyle(
             name='InfoCliente',
-            parent=self.styles['Normal'],
+            parent=styles['Normal'],
             fontSize=10,
             alignment=TA_LEFT,
             spaceAfter=6
         ))
         
         # Estilo para totales
-        self.styles.add(ParagraphStyle(
+        styles.add(ParagraphStyle(
             name='Totales',
-            parent=self.styles['Normal'],
+            parent=styles['Normal'],
             fontSize=12,
             alignment=TA_RIGHT,
             fontName='Helvetica-Bold'
         ))
         
         # Estilo para observaciones
-        self.styles.add(ParagraphStyle(
+        styles.add(ParagraphStyle(
             name='Observaciones',
-            parent=self.styles['Normal'],
+            parent=styles['Normal'],
             fontSize=9,
             alignment=TA_LEFT,
             textColor=colors.grey
         ))
     
-    def generar_factura_pdf(self, factura, output_path=None, auto_open=True):
+    def generar_factura_pdf(self, factura, output_path=None, auto_open=True, force=False):
         """
         Genera un PDF de la factura
 
+        Si ya existe un PDF generado a partir del mismo contenido (misma huella,
+        ver fingerprint()), se devuelve sin volver a renderizarlo.
+
         Args:
             factura: Objeto Factura con todos los datos
             output_path: Ruta donde guardar el PDF (opcional)
             auto_open: Si True, abre automáticamente el PDF generado
+            force: Si True, renderiza aunque el PDF existente esté al día
 
         Returns:
             str: Ruta del archivo PDF generado
         """
         try:
+            # Encabezado, estilos y logo comunes (en caché mientras no cambie la organización)
+            try:
+                context = self.get_render_context()
+            except Exception as e:
+                self.logger.error(f"Error obteniendo datos de la organización: {e}")
+                context = None
+
             # Determinar ruta de salida
             if not output_path:
-                # Obtener directorio configurado de la organización
-                from database.models import Organizacion
-                org = Organizacion.get()
-
-                if org.directorio_descargas_pdf and os.path.exists(org.directorio_descargas_pdf):
-                    pdf_dir = org.directorio_descargas_pdf
-                else:
-                    # Fallback al directorio por defecto
-                    pdf_dir = os.path.join(os.getcwd(), "pdfs")
+                pdf_dir = self.get_pdf_dir(context['organizacion'] if context else None)
 
                 # Crear directorio si no existe
                 os.makedirs(pdf_dir, exist_ok=True)
 
-                # Nombre del archivo
-                filename = f"Factura_{factura.numero_factura.replace('/', '_')}.pdf"
-                output_path = os.path.join(pdf_dir, filename)
-            
+                output_path = os.path.join(pdf_dir, self.nombre_archivo_pdf(factura))
+
+            filas = self.filas_productos(factura)
+            huella = self.fingerprint(factura, context, filas) if context else None
+            if huella and not force and self._pdf_actualizado(output_path, huella):
+                self.logger.info(f"PDF sin cambios, se reutiliza: {output_path}")
+                if auto_open:
+                    self.open_pdf_file(output_path)
+                return output_path
+
+            # La huella anterior deja de valer en cuanto se reescribe el PDF
+            self._remove_fingerprint(output_path)
+
             # Crear documento PDF
             doc = SimpleDocTemplate(
                 output_path,
@@ -116,7 +179,7 @@ class PDFGenerator:
             story = []
             
             # Encabezado con información de empresa
-            self.add_header(story, factura)
+            self.add_header(story, factura, context)
             
             # Información de la factura
             self.add_factura_info(story, factura)
@@ -125,7 +188,7 @@ class PDFGenerator:
             self.add_cliente_info(story, factura)
             
             # Tabla de productos
-            self.add_productos_table(story, factura)
+            self.add_productos_table(story, factura, filas)
             
             # Totales
             self.add_totales(story, factura)
@@ -135,6 +198,8 @@ class PDFGenerator:
             
             # Generar PDF
             doc.build(story)
+            if huella:
+                self._write_fingerprint(output_path, huella)
 
             self.logger.info(f"PDF generado exitosamente: {output_path}")
 
@@ -148,6 +213,112 @@ class PDFGenerator:
             self.logger.error(f"Error generando PDF: {e}")
             raise
 
+    def get_pdf_dir(self, org=None):
+        """Directorio de descarga de PDFs configurado en la organización (o ./pdfs por defecto)"""
+        org = org or self.get_organizacion()
+        if org.directorio_descargas_pdf and os.path.exists(org.directorio_descargas_pdf):
+            return org.directorio_descargas_pdf
+        # Fallback al directorio por defecto
+        return os.path.join(os.getcwd(), "pdfs")
+
+    @staticmethod
+    def nombre_archivo_pdf(factura):
+        """Nombre del archivo PDF de una factura"""
+        return f"Factura_{factura.numero_factura.replace('/', '_')}.pdf"
+
+    def generate_many(self, factura_ids, out_dir=None, workers=None, progress_callback=None,
+                      cancel_event=None, chunk_size=None):
+        """
+        Genera los PDFs de varias facturas repartiendo el trabajo entre varios procesos
+
+        ReportLab es CPU puro: con un proceso por núcleo la exportación de fin de mes
+        escala con el número de núcleos. Cada proceso abre su propia conexión a la
+        base de datos, carga las facturas por ID y reutiliza un único generador. Los
+        PDFs no se abren al terminar.
+
+        Args:
+            factura_ids: IDs de las facturas a exportar
+            out_dir: directorio de salida (por defecto el directorio de descargas configurado)
+            workers: número de procesos (por defecto uno por núcleo; 1 = en este proceso)
+            progress_callback: función(hechas, total) llamada tras cada factura, desde el
+                               hilo que llama a generate_many
+            cancel_event: threading.Event opcional; si se activa no se lanzan más bloques
+            chunk_size: facturas por tarea enviada a cada proceso
+
+        Returns:
+            dict: {'generados': {factura_id: ruta}, 'errores': {factura_id: mensaje},
+                   'cancelado': bool}
+        """
+        factura_ids = list(dict.fromkeys(factura_ids))
+        total = len(factura_ids)
+        resultado = {'generados': {}, 'errores': {}, 'cancelado': False}
+        if not total:
+            return resultado
+
+        out_dir = out_dir or self.get_pdf_dir()
+        os.makedirs(out_dir, exist_ok=True)
+
+        workers = max(1, min(workers or os.cpu_count() or 1, total))
+        if not chunk_size:
+            # Bloques pequeños para repartir bien la carga y avisar del progreso a menudo
+            chunk_size = max(1, min(25, total // (workers * 4)))
+        bloques = [factura_ids[i:i + chunk_size] for i in range(0, total, chunk_size)]
+        cancel_event = cancel_event or threading.Event()
+
+        hechas = 0
+
+        def registrar(resultados_bloque):
+            nonlocal hechas
+            for factura_id, ruta, error in resultados_bloque:
+                if error:
+                    resultado['errores'][factura_id] = error
+                else:
+                    resultado['generados'][factura_id] = ruta
+                hechas += 1
+                if progress_callback:
+                    progress_callback(hechas, total)
+
+        self.logger.info(f"Generando {total} PDFs en {out_dir} con {workers} proceso(s)")
+
+        if workers == 1:
+            for bloque in bloques:
+                if cancel_event.is_set():
+                    resultado['cancelado'] = True
+                    break
+                registrar(_render_batch_chunk(bloque, out_dir, self))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker,
+                                     initargs=(models.db.db_path,)) as executor:
+                futuros = {executor.submit(_render_batch_chunk, bloque, out_dir): bloque
+                           for bloque in bloques}
+                for futuro in as_completed(futuros):
+                    if cancel_event.is_set() and not resultado['cancelado']:
+                        resultado['cancelado'] = True
+                        for pendiente in futuros:
+                            pendiente.cancel()
+                    if futuro.cancelled():
+                        continue
+                    try:
+                        registrar(futuro.result())
+                    except Exception as e:
+                        # Un proceso caído invalida su bloque, no toda la exportación
+                        registrar([(factura_id, None, str(e)) for factura_id in futuros[futuro]])
+
+        self.logger.info(f"Exportación en lote terminada: {len(resultado['generados'])} generados, "
+                         f"{len(resultado['errores'])} errores")
+        return resultado
+
+    def _render_by_id(self, factura_id, out_dir):
+        """Genera el PDF de una factura a partir de su ID: (factura_id, ruta, error)"""
+        try:
+            factura = Factura.get_by_id(factura_id)
+            if factura is None:
+                return factura_id, None, "Factura no encontrada"
+            output_path = os.path.join(out_dir, self.nombre_archivo_pdf(factura))
+            return factura_id, self.generar_factura_pdf(factura, output_path, auto_open=False), None
+        except Exception as e:
+            return factura_id, None, str(e)
+
     def open_pdf_file(self, pdf_path):
         """Abre el archivo PDF con el visor configurado o el predeterminado del sistema"""
         try:
@@ -160,8 +331,7 @@ class PDFGenerator:
             import subprocess
 
             # Obtener visor personalizado de la organización
-            from database.models import Organizacion
-            org = Organizacion.get()
+            org = self.get_organizacion()
 
             # Si hay un visor personalizado configurado y existe
             if org.visor_pdf_personalizado and os.path.exists(org.visor_pdf_personalizado):
@@ -190,68 +360,193 @@ class PDFGenerator:
             self.logger.warning(f"No se pudo abrir automáticamente el PDF: {e}")
             # No lanzar excepción, es una funcionalidad opcional
     
-    def add_header(self, story, factura):
-        """Añade el encabezado con información de la empresa y logo"""
+    def get_render_context(self):
+        """
+        Encabezado común a todas las facturas (organización y logo)
+
+        Se reconstruye solo cuando cambian los datos de la organización o el
+        archivo del logo (fecha de modificación o tamaño); el resto de
+        facturas reutilizan los mismos flowables.
+
+        Returns:
+            dict: {'organizacion': Organizacion, 'header': lista de flowables}
+        """
+        org = self.get_organizacion()
+        clave = (tuple(vars(org).items()), self._logo_signature(org.logo_path))
+        context = getattr(_header_cache, 'context', None)
+        if context is None or context['clave'] != clave:
+            context = {'clave': clave, 'organizacion': org, 'header': self.build_header(org),
+                       'logo_hash': self._logo_hash(org.logo_path)}
+            _header_cache.context = context
+            self.logger.debug("Contexto de renderizado de PDF reconstruido")
+        return context
+
+    @staticmethod
+    def get_organizacion():
+        """
+        Datos de la organización, leídos una vez por proceso
+
+        Se vuelven a leer cuando se guarda la organización (Organizacion.version)
+        o cambia la base de datos activa, como al arrancar un proceso del lote.
+        """
+        global _organizacion_cache
+        clave = (models.db, Organizacion.version)
+        with _render_context_lock:
+            cache = _organizacion_cache
+            if cache is None or cache[0][0] is not clave[0] or cache[0][1] != clave[1]:
+                cache = _organizacion_cache = (clave, Organizacion.get())
+        return cache[1]
+
+    @staticmethod
+    def invalidate_render_context():
+        """Descarta el encabezado en caché del hilo actual y la organización leída"""
+        global _organizacion_cache
+        _header_cache.context = None
+        _organizacion_cache = None
+
+    @staticmethod
+    def _logo_signature(logo_path):
+        """Firma del archivo de logo (mtime y tamaño), o None si no existe"""
+        if not logo_path:
+            return None
         try:
-            # Obtener información de la organización
-            org = Organizacion.get()
-
-            if org:
-                # Crear tabla para logo y información de empresa
-                header_data = []
-
-                # Verificar si hay logo
-                logo_cell = self.create_logo_image(org.logo_path)
-
-                # Información de la empresa
-                empresa_info = f"""
-                <b>{org.nombre}</b><br/>
-                <b>Dirección:</b> {org.direccion}<br/>
-                <b>Teléfono:</b> {org.telefono}<br/>
-                <b>Email:</b> {org.email}<br/>
-                <b>CIF:</b> {org.cif}
-                """
-
-                empresa_paragraph = Paragraph(empresa_info, self.styles['InfoEmpresa'])
-
-                # Si hay logo, crear tabla con logo a la izquierda y info a la derecha
-                if logo_cell:
-                    header_data = [[logo_cell, empresa_paragraph]]
-                    header_table = Table(header_data, colWidths=[4*cm, 12*cm])
-                    header_table.setStyle(TableStyle([
-                        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                        ('ALIGN', (0, 0), (0, 0), 'LEFT'),   # Logo a la izquierda
-                        ('ALIGN', (1, 0), (1, 0), 'LEFT'),   # Info a la izquierda
-                        ('LEFTPADDING', (0, 0), (-1, -1), 0),
-                        ('RIGHTPADDING', (0, 0), (-1, -1), 0),
-                        ('TOPPADDING', (0, 0), (-1, -1), 0),
-                        ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
-                    ]))
-                    story.append(header_table)
-                else:
-                    # Sin logo, solo información de empresa
-                    story.append(empresa_paragraph)
+            stat = os.stat(logo_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
 
-                # Título FACTURA centrado
-                factura_title = Paragraph(
-                    "<b>FACTURA</b>",
-                    self.styles['TituloFactura']
-                )
-                story.append(factura_title)
+    @staticmethod
+    def _logo_hash(logo_path):
+        """Hash SHA-256 del contenido del logo, o None si no hay logo"""
+        if not logo_path or not os.path.exists(logo_path):
+            return None
+        sha = hashlib.sha256()
+        with open(logo_path, 'rb') as f:
+            for bloque in iter(lambda: f.read(65536), b""):
+                sha.update(bloque)
+        return sha.hexdigest()
 
-            else:
-                # Información por defecto si no hay organización configurada
-                default_title = Paragraph("<b>FACTURA</b>", self.styles['TituloFactura'])
-                story.append(default_title)
+    def fingerprint(self, factura, context=None, filas=None):
+        """
+        Huella del contenido de un PDF de factura
 
-            story.append(Spacer(1, 0.5*cm))
+        Cubre los datos de la factura y sus líneas (tal como se imprimen), los de
+        la organización, el contenido del logo y la versión de la plantilla. Si la
+        huella no cambia, el PDF ya generado es idéntico salvo la fecha de
+        generación del pie.
+        """
+        context = context or self.get_render_context()
+        org = context['organizacion']
+        contenido = {
+            'plantilla': self.TEMPLATE_VERSION,
+            'factura': [factura.numero_factura, factura.fecha_factura, factura.modo_pago,
+                        factura.nombre_cliente, factura.dni_nie_cliente, factura.direccion_cliente,
+                        factura.telefono_cliente, factura.email_cliente, factura.subtotal,
+                        factura.total_iva, factura.total_factura, getattr(factura, 'observaciones', None)],
+            'lineas': filas if filas is not None else self.filas_productos(factura),
+            'organizacion': [org.nombre, org.direccion, org.telefono, org.email, org.cif],
+            'logo': context['logo_hash'],
+        }
+        datos = json.dumps(contenido, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(datos.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def fingerprint_path(cls, output_path):
+        """Ruta del archivo con la huella de un PDF ("<pdf>.huella")"""
+        return output_path + cls.FINGERPRINT_SUFFIX
+
+    @classmethod
+    def read_fingerprint(cls, output_path):
+        """
+        Huella con la que se generó un PDF, o None
+
+        El archivo .huella contiene una línea "<huella> <bytes> <mtime_ns>" con el
+        tamaño y la fecha de modificación del PDF recién escrito: si el PDF se ha
+        modificado después (otra aplicación, una actualización incremental), ya
+        no coinciden y se considera sin huella.
+        """
+        try:
+            with open(cls.fingerprint_path(output_path), encoding='ascii') as f:
+                huella, tamano, mtime = f.read().split()
+            stat = os.stat(output_path)
+            if (stat.st_size, stat.st_mtime_ns) != (int(tamano), int(mtime)):
+                return None
+            return huella
+        except (OSError, ValueError):
+            return None
 
+    def _write_fingerprint(self, output_path, huella):
+        """Guarda la huella de un PDF recién generado (sin ella solo se pierde la reutilización)"""
+        try:
+            stat = os.stat(output_path)
+            temporal = f"{self.fingerprint_path(output_path)}.{os.getpid()}.tmp"
+            with open(temporal, 'w', encoding='ascii') as f:
+                f.write(f"{huella} {stat.st_size} {stat.st_mtime_ns}\n")
+            os.replace(temporal, self.fingerprint_path(output_path))
+        except OSError as e:
+            self.logger.warning(f"No se pudo guardar la huella de {output_path}: {e}")
+
+    def _remove_fingerprint(self, output_path):
+        """Borra la huella de un PDF que se va a reescribir"""
+        try:
+            os.remove(self.fingerprint_path(output_path))
+        except FileNotFoundError:
+            pass
+
+    def _pdf_actualizado(self, output_path, huella):
+        """True si el PDF existe y se generó con la misma huella"""
+        return os.path.exists(output_path) and self.read_fingerprint(output_path) == huella
+
+    def add_header(self, story, factura, context=None):
+        """Añade el encabezado con información de la empresa y logo"""
+        try:
+            story.extend((context or self.get_render_context())['header'])
         except Exception as e:
             self.logger.error(f"Error añadiendo encabezado: {e}")
             # Añadir título básico en caso de error
             story.append(Paragraph("<b>FACTURA</b>", self.styles['TituloFactura']))
             story.append(Spacer(1, 1*cm))
 
+    def build_header(self, org):
+        """Construye los flowables del encabezado con información de la empresa y logo"""
+        header = []
+        if org:
+            # Verificar si hay logo
+            logo_cell = self.create_logo_image(org.logo_path)
+
+            # Información de la empresa
+            empresa_info = f"""
+            <b>{org.nombre}</b><br/>
+            <b>Dirección:</b> {org.direccion}<br/>
+            <b>Teléfono:</b> {org.telefono}<br/>
+            <b>Email:</b> {org.email}<br/>
+            <b>CIF:</b> {org.cif}
+            """
+
+            empresa_paragraph = Paragraph(empresa_info, self.styles['InfoEmpresa'])
+
+            # Si hay logo, crear tabla con logo a la izquierda y info a la derecha
+            if logo_cell:
+                header_table = Table([[logo_cell, empresa_paragraph]], colWidths=[4*cm, 12*cm])
+                header_table.setStyle(TableStyle([
+                    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+                    ('ALIGN', (0, 0), (0, 0), 'LEFT'),   # Logo a la izquierda
+                    ('ALIGN', (1, 0), (1, 0), 'LEFT'),   # Info a la izquierda
+                    ('LEFTPADDING', (0, 0), (-1, -1), 0),
+                    ('RIGHTPADDING', (0, 0), (-1, -1), 0),
+                    ('TOPPADDING', (0, 0), (-1, -1), 0),
+                    ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
+                ]))
+                header.append(header_table)
+            else:
+                # Sin logo, solo información de empresa
+                header.append(empresa_paragraph)
+
+        # Título FACTURA centrado
+        header.append(Paragraph("<b>FACTURA</b>", self.styles['TituloFactura']))
+        header.append(Spacer(1, 0.5*cm))
+        return header
+
     def create_logo_image(self, logo_path, max_width=3*cm, max_height=3*cm):
         """Crea una imagen del logo con redimensionamiento proporcional"""
         if not logo_path or not os.path.exists(logo_path):
@@ -331,18 +626,9 @@ class PDFGenerator:
         story.append(cliente_paragraph)
         story.append(Spacer(1, 0.5*cm))
     
-    def add_productos_table(self, story, factura):
-        """Añade la tabla de productos"""
-        productos_title = Paragraph("<b>DETALLE DE PRODUCTOS</b>", self.styles['Heading2'])
-        story.append(productos_title)
-        story.append(Spacer(1, 0.3*cm))
-        
-        # Encabezados de la tabla
-        headers = ['Producto', 'Cantidad', 'Precio Unit.', 'IVA %', 'Subtotal', 'Total']
-        
-        # Datos de productos
-        productos_data = [headers]
-        
+    def filas_productos(self, factura):
+        """Filas de la tabla de productos, tal como se imprimen"""
+        filas = []
         for item in factura.items:
             producto = item.get_producto()
             producto_nombre = producto.nombre if producto else f"Producto ID: {item.producto_id}"
@@ -359,7 +645,21 @@ class PDFGenerator:
                 f"{subtotal:.2f}€",
                 f"{total_item:.2f}€"
             ]
-            productos_data.append(row)
+            filas.append(row)
+        return filas
+
+    def add_productos_table(self, story, factura, filas=None):
+        """Añade la tabla de productos"""
+        productos_title = Paragraph("<b>DETALLE DE PRODUCTOS</b>", self.styles['Heading2'])
+        story.append(productos_title)
+        story.append(Spacer(1, 0.3*cm))
+        
+        # Encabezados de la tabla
+        headers = ['Producto', 'Cantidad', 'Precio Unit.', 'IVA %', 'Subtotal', 'Total']
+        
+        # Datos de productos
+        productos_data = [headers]
+        productos_data.extend(filas if filas is not None else self.filas_productos(factura))
         
         # Crear tabla
         productos_table = Table(productos_data, colWidths=[6*cm, 2*cm, 2.5*cm, 2*cm, 2.5*cm, 2.5*cm])
@@ -7,7 +7,7 @@ Optimiseur de performance pour l'application
 import time
 import functools
 from typing import List, Dict, Any, Optional
-from database.database import db
+from database import models
 
 
 class PerformanceOptimizer:
@@ -79,8 +79,8 @@ class OptimizedQueries:
             ORDER BY fi.factura_id, fi.id
         """
         
-        facturas_results = db.execute_query(facturas_query)
-        items_results = db.execute_query(items_query)
+        facturas_results = models.db.execute_query(facturas_query)
+        items_results = models.db.execute_query(items_query)
         
         # Organizar items por factura_id
         items_by_factura = {}
@@ -137,7 +137,7 @@ class OptimizedQueries:
             ORDER BY p.nombre
         """
         
-        results = db.execute_query(query)
+        results = models.db.execute_query(query)
         stock_data = []
         
         for row in results:
@@ -165,7 +165,7 @@ class OptimizedQueries:
             ORDER BY p.nombre
         """
         
-        results = db.execute_query(query)
+        results = models.db.execute_query(query)
         productos = []
         
         for row in results:
@@ -322,21 +322,13 @@ performance_optimizer = PerformanceOptimizer()
 
 def optimize_database_queries():
     """Optimiser les requêtes de base de données"""
-    # Créer des index pour améliorer les performances
-    indexes = [
-        "CREATE INDEX IF NOT EXISTS idx_facturas_fecha ON facturas(fecha_factura)",
-        "CREATE INDEX IF NOT EXISTS idx_facturas_numero ON facturas(numero_factura)",
-        "CREATE INDEX IF NOT EXISTS idx_factura_items_factura_id ON factura_items(factura_id)",
-        "CREATE INDEX IF NOT EXISTS idx_stock_producto_id ON stock(producto_id)",
-        "CREATE INDEX IF NOT EXISTS idx_productos_nombre ON productos(nombre)",
-        "CREATE INDEX IF NOT EXISTS idx_productos_referencia ON productos(referencia)",
-        "CREATE INDEX IF NOT EXISTS idx_stock_movements_producto_id ON stock_movements(producto_id)",
-        "CREATE INDEX IF NOT EXISTS idx_stock_movements_fecha ON stock_movements(fecha_movimiento)"
-    ]
-    
-    for index_sql in indexes:
+    # Les index sont créés par les migrations; on les réapplique au cas où
+    # une base externe aurait été copiée sans eux
+    from database.migrations import INDICES
+
+    for index_sql in INDICES:
         try:
-            db.execute_query(index_sql)
+            models.db.execute_query(index_sql)
         except Exception as e:
             print(f"⚠️ Error creando índice: {e}")
     
@@ -355,11 +347,11 @@ def analyze_database_performance():
         try:
             # Compter les enregistrements
             count_query = f"SELECT COUNT(*) FROM {table}"
-            count = db.execute_query(count_query)[0][0]
+            count = models.db.execute_query(count_query)[0][0]
             
             # Analyser la table
             analyze_query = f"ANALYZE {table}"
-            db.execute_query(analyze_query)
+            models.db.execute_query(analyze_query)
             
             print(f"{table}: {count} registros")
             
@@ -0,0 +1,104 @@
+"""
+Medición del arranque de la aplicación (python main.py --profile-startup)
+
+Registra la duración de cada fase del arranque y el tiempo propio de cada
+import hecho en el hilo principal mientras está activo, y al final imprime
+un resumen agrupado por paquete. Desactivado no hace nada: las fases se
+ejecutan sin medir y no se toca builtins.__import__.
+"""
+
+import builtins
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StartupProfiler:
+    """Cronómetro de fases del arranque con desglose de imports"""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.inicio = time.perf_counter()
+        self.fases = []  # (nombre, inicio relativo, duración) en segundos
+        self.imports = {}  # módulo -> tiempo propio en segundos
+        self._import_original = None
+        self._pila = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, nombre):
+        """Medir un bloque del arranque"""
+        if not self.enabled:
+            yield
+            return
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(nombre, t0, time.perf_counter() - t0)
+
+    def record(self, nombre, t0, duracion):
+        """Anotar una fase medida por otro medio (p. ej. en otro hilo)"""
+        if self.enabled:
+            with self._lock:
+                self.fases.append((nombre, t0 - self.inicio, duracion))
+
+    def mark(self, nombre):
+        """Anotar un instante del arranque (duración cero)"""
+        self.record(nombre, time.perf_counter(), 0.0)
+
+    def start_import_tracking(self):
+        """Empezar a medir los imports del hilo principal"""
+        if not self.enabled or self._import_original is not None:
+            return
+        self._import_original = builtins.__import__
+        builtins.__import__ = self._timed_import
+
+    def stop_import_tracking(self):
+        """Dejar de medir imports y restaurar builtins.__import__"""
+        if self._import_original is not None:
+            builtins.__import__ = self._import_original
+            self._import_original = None
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        """__import__ que acumula el tiempo propio de cada módulo cargado por primera vez"""
+        original = self._import_original or builtins.__import__
+        if (level or name in sys.modules
+                or threading.current_thread() is not threading.main_thread()):
+            return original(name, globals, locals, fromlist, level)
+
+        self._pila.append(0.0)
+        t0 = time.perf_counter()
+        try:
+            return original(name, globals, locals, fromlist, level)
+        finally:
+            total = time.perf_counter() - t0
+            hijos = self._pila.pop()
+            if self._pila:
+                self._pila[-1] += total
+            self.imports[name] = self.imports.get(name, 0.0) + total - hijos
+
+    def imports_by_package(self):
+        """Tiempo propio de import acumulado por paquete de primer nivel, de mayor a menor"""
+        paquetes = {}
+        for modulo, segundos in self.imports.items():
+            paquete = modulo.split('.')[0]
+            paquetes[paquete] = paquetes.get(paquete, 0.0) + segundos
+        return sorted(paquetes.items(), key=lambda item: item[1], reverse=True)
+
+    def report(self, top=15):
+        """Resumen legible de fases e imports"""
+        lineas = ["", "=== Perfil de arranque ===", f"{'inicio':>10} {'duración':>10}  fase"]
+        with self._lock:
+            fases = sorted(self.fases, key=lambda fase: fase[1])
+        for nombre, inicio, duracion in fases:
+            lineas.append(f"{inicio * 1000:8.1f}ms {duracion * 1000:8.1f}ms  {nombre}")
+
+        paquetes = self.imports_by_package()
+        total = sum(segundos for _, segundos in paquetes)
+        lineas.append("")
+        lineas.append(f"Imports: {len(self.imports)} módulos, {total * 1000:.1f}ms")
+        for paquete, segundos in paquetes[:top]:
+            lineas.append(f"{segundos * 1000:8.1f}ms  {paquete}")
+        return "\n".join(lineas)
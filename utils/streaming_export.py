@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""
+Exportación en streaming de resultados de consultas a CSV y XLSX
+
+Las filas se leen de la base de datos por bloques (fetchmany sobre una
+conexión propia) y se escriben al archivo según llegan, de modo que la
+memoria usada no depende del número de filas exportadas.
+
+El XLSX se genera con zipfile de la biblioteca estándar: una hoja con
+cadenas en línea (inlineStr), sin tabla de cadenas compartidas que habría
+que mantener en memoria hasta el final.
+"""
+
+import csv
+import os
+import re
+import threading
+import zipfile
+from xml.sax.saxutils import escape
+from utils.logger import get_logger
+
+logger = get_logger("streaming_export")
+
+# Filas leídas de la base de datos en cada fetchmany
+CHUNK_SIZE = 1000
+
+# Caracteres de control que no admite XML 1.0
+_XML_INVALID_RE = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def iter_query(database, query, params=(), chunk_size=CHUNK_SIZE):
+    """
+    Filas de una consulta leídas por bloques
+
+    Usa una conexión propia (válida en cualquier hilo) que se cierra al
+    agotar o cerrar el generador.
+    """
+    conn = database.get_connection()
+    try:
+        cursor = conn.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        conn.close()
+
+
+class CsvStreamWriter:
+    """Escritor CSV fila a fila (UTF-8)"""
+
+    def __init__(self, path):
+        self._file = open(path, 'w', encoding='utf-8', newline='')
+        self._writer = csv.writer(self._file)
+
+    def writerow(self, row):
+        self._writer.writerow(row)
+
+    def close(self):
+        self._file.close()
+
+
+class XlsxStreamWriter:
+    """Escritor XLSX fila a fila con una sola hoja, sin dependencias externas"""
+
+    # Filas acumuladas antes de escribir en el zip
+    BUFFER_ROWS = 500
+
+    CONTENT_TYPES = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    )
+    ROOT_RELS = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    )
+    WORKBOOK = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="{nombre}" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    )
+    WORKBOOK_RELS = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    )
+    SHEET_START = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+    )
+    SHEET_END = '</sheetData></worksheet>'
+
+    def __init__(self, path, sheet_name="Resultados"):
+        self._zip = zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED)
+        self._zip.writestr('[Content_Types].xml', self.CONTENT_TYPES)
+        self._zip.writestr('_rels/.rels', self.ROOT_RELS)
+        self._zip.writestr('xl/workbook.xml', self.WORKBOOK.format(nombre=escape(sheet_name[:31], {'"': '&quot;'})))
+        self._zip.writestr('xl/_rels/workbook.xml.rels', self.WORKBOOK_RELS)
+        # La hoja se escribe en streaming dentro del zip (force_zip64: puede superar 2 GB)
+        self._sheet = self._zip.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True)
+        self._sheet.write(self.SHEET_START.encode('utf-8'))
+        self._buffer = []
+
+    @staticmethod
+    def _cell(value):
+        """XML de una celda: número, vacía o cadena en línea"""
+        if value is None:
+            return '<c/>'
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return f'<c><v>{value!r}</v></c>'
+        texto = escape(_XML_INVALID_RE.sub('', str(value)))
+        return f'<c t="inlineStr"><is><t xml:space="preserve">{texto}</t></is></c>'
+
+    def writerow(self, row):
+        self._buffer.append('<row>' + ''.join(self._cell(value) for value in row) + '</row>')
+        if len(self._buffer) >= self.BUFFER_ROWS:
+            self._flush()
+
+    def _flush(self):
+        if self._buffer:
+            self._sheet.write(''.join(self._buffer).encode('utf-8'))
+            self._buffer = []
+
+    def close(self):
+        self._flush()
+        self._sheet.write(self.SHEET_END.encode('utf-8'))
+        self._sheet.close()
+        self._zip.close()
+
+
+def open_writer(path):
+    """Escritor adecuado a la extensión del archivo (.xlsx o CSV)"""
+    if path.lower().endswith('.xlsx'):
+        return XlsxStreamWriter(path)
+    return CsvStreamWriter(path)
+
+
+def _remove_partial(path):
+    """Borra el archivo de una exportación que no se completó"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def export_rows(rows, path, headers=None, progress_callback=None, cancel_event=None,
+                progress_every=CHUNK_SIZE):
+    """
+    Escribe filas en un archivo CSV o XLSX a medida que se van leyendo
+
+    Args:
+        rows: iterable de filas (por ejemplo, iter_query)
+        path: archivo de destino; la extensión .xlsx elige el formato XLSX
+        headers: fila de encabezados opcional
+        progress_callback: función(filas_escritas) llamada cada progress_every filas y al final
+        cancel_event: threading.Event opcional; si se activa se detiene y se borra el archivo
+                      (también se borra si la consulta o el escritor fallan)
+
+    Returns:
+        dict: {'filas': número de filas escritas, 'cancelado': bool}
+    """
+    cancel_event = cancel_event or threading.Event()
+    resultado = {'filas': 0, 'cancelado': False}
+    writer = open_writer(path)
+    try:
+        try:
+            if headers:
+                writer.writerow(headers)
+            for row in rows:
+                writer.writerow(row)
+                resultado['filas'] += 1
+                if resultado['filas'] % progress_every == 0:
+                    if progress_callback:
+                        progress_callback(resultado['filas'])
+                    if cancel_event.is_set():
+                        resultado['cancelado'] = True
+                        break
+        finally:
+            writer.close()
+            # Cierra la consulta si se detuvo antes de agotarla
+            if hasattr(rows, 'close'):
+                rows.close()
+    except BaseException:
+        # Un error a mitad de la exportación no debe dejar un archivo truncado
+        _remove_partial(path)
+        logger.warning(f"Exportación interrumpida por un error tras {resultado['filas']} filas: {path}")
+        raise
+
+    if resultado['cancelado']:
+        _remove_partial(path)
+        logger.info(f"Exportación cancelada tras {resultado['filas']} filas: {path}")
+    else:
+        if progress_callback:
+            progress_callback(resultado['filas'])
+        logger.info(f"Exportadas {resultado['filas']} filas a {path}")
+    return resultado
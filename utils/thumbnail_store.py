@@ -0,0 +1,203 @@
+"""
+Stockage persistant des miniatures d'images produit
+
+Les miniatures sont générées une seule fois (à l'import ou à l'enregistrement
+de l'image) dans un répertoire à côté de celui d'ImageFileManager, puis
+servies directement à Tk sans redécoder l'image d'origine.
+
+Chaque fichier est identifié par le hash du chemin source, sa date de
+modification (mtime) et la taille demandée : modifier l'image source
+produit de nouvelles clés, et les anciennes miniatures sont supprimées.
+"""
+
+import glob
+import hashlib
+import os
+import tkinter as tk
+from PIL import Image
+from utils.file_manager import FileManager
+from utils.logger import get_logger
+
+# Tailles pré-générées : lignes de facture, listes, aperçu du produit
+THUMBNAIL_SIZES = ((40, 40), (64, 64), (150, 150))
+
+
+class ThumbnailStore:
+    """Miniatures PNG sur disque, indexées par source, mtime et taille"""
+
+    def __init__(self, directory=None):
+        """
+        Initialiser le stockage des miniatures
+
+        Args:
+            directory (str): Répertoire des miniatures (par défaut data/thumbnails,
+                créé à la première utilisation et non à l'import du module)
+        """
+        self.logger = get_logger("thumbnail_store")
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+        self._directory = directory
+        self._photos = {}  # Images Tk déjà chargées, par chemin de miniature
+        self.source_decodes = 0  # Nombre d'images d'origine décodées
+
+    @property
+    def directory(self):
+        """Répertoire des miniatures"""
+        if self._directory is None:
+            self._directory = FileManager(subdirectory="thumbnails").storage_directory
+        return self._directory
+
+    @staticmethod
+    def _source_key(image_path):
+        """Hash du chemin absolu de l'image source"""
+        return hashlib.sha1(os.path.abspath(image_path).encode("utf-8")).hexdigest()[:16]
+
+    def thumbnail_path(self, image_path, size):
+        """
+        Chemin de la miniature d'une image (sans la créer)
+
+        Returns:
+            str: Chemin de la miniature, ou None si la source n'existe pas
+        """
+        try:
+            mtime = os.stat(image_path).st_mtime_ns
+        except (OSError, TypeError, ValueError):
+            return None
+        filename = f"{self._source_key(image_path)}_{mtime}_{size[0]}x{size[1]}.png"
+        return os.path.join(self.directory, filename)
+
+    def ensure(self, image_path, sizes=THUMBNAIL_SIZES):
+        """
+        Générer les miniatures manquantes d'une image (un seul décodage de la source)
+
+        Args:
+            image_path (str): Chemin vers l'image source
+            sizes (iterable): Tailles (largeur, hauteur) à garantir
+
+        Returns:
+            dict: {taille: chemin de la miniature}, vide si la source est illisible
+        """
+        paths = {tuple(size): self.thumbnail_path(image_path, size) for size in sizes}
+        if not paths or None in paths.values():
+            return {}
+
+        missing = [size for size, path in paths.items() if not os.path.exists(path)]
+        if not missing:
+            return paths
+
+        try:
+            with Image.open(image_path) as img:
+                self.source_decodes += 1
+                img = self._to_rgb(img)
+                # Supprimer les miniatures d'une version précédente de la source
+                self._remove_stale(image_path, self._mtime_part(next(iter(paths.values()))))
+                for size in missing:
+                    thumbnail = img.copy()
+                    thumbnail.thumbnail(size, Image.Resampling.LANCZOS)
+                    self._write(thumbnail, paths[size])
+            self.logger.debug(f"Miniatures créées: {os.path.basename(image_path)} -> {missing}")
+            return paths
+        except Exception as e:
+            self.logger.warning(f"Erreur création miniatures pour {image_path}: {e}")
+            return {}
+
+    def get_path(self, image_path, size):
+        """
+        Chemin de la miniature d'une taille, générée si elle n'existe pas encore
+
+        Une miniature manquante déclenche la génération de toutes les tailles
+        standard : la source n'est décodée qu'une fois, quelle que soit la
+        taille demandée ensuite.
+
+        Returns:
+            str: Chemin de la miniature, ou None si erreur
+        """
+        size = tuple(size)
+        path = self.thumbnail_path(image_path, size)
+        if path and os.path.exists(path):
+            return path
+        sizes = THUMBNAIL_SIZES if size in THUMBNAIL_SIZES else THUMBNAIL_SIZES + (size,)
+        return self.ensure(image_path, sizes).get(size)
+
+    def get_photo(self, image_path, size):
+        """
+        Miniature prête pour Tk (chargée directement depuis le PNG)
+
+        Nécessite une fenêtre Tk existante.
+
+        Returns:
+            tk.PhotoImage: Miniature, ou None si erreur
+        """
+        path = self.get_path(image_path, size)
+        if not path:
+            return None
+        photo = self._photos.get(path)
+        if photo is None:
+            try:
+                photo = tk.PhotoImage(file=path)
+            except tk.TclError as e:
+                self.logger.warning(f"Erreur chargement miniature {path}: {e}")
+                return None
+            self._photos[path] = photo
+        return photo
+
+    def remove(self, image_path):
+        """
+        Supprimer toutes les miniatures d'une image source
+
+        Returns:
+            int: Nombre de fichiers supprimés
+        """
+        return self._remove_stale(image_path, None)
+
+    def clear_memory(self):
+        """Oublier les images Tk chargées (les fichiers restent sur disque)"""
+        self._photos.clear()
+
+    @staticmethod
+    def _to_rgb(img):
+        """Convertir en RGB sur fond blanc (transparence, palette)"""
+        if img.mode in ('RGBA', 'LA', 'P'):
+            img = img.convert('RGBA')
+            background = Image.new('RGB', img.size, (255, 255, 255))
+            background.paste(img, mask=img.split()[-1])
+            return background
+        if img.mode != 'RGB':
+            return img.convert('RGB')
+        img.load()
+        return img
+
+    @staticmethod
+    def _write(image, path):
+        """Écrire une miniature de façon atomique"""
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        image.save(temp_path, format="PNG", optimize=True)
+        os.replace(temp_path, path)
+
+    @staticmethod
+    def _mtime_part(path):
+        """Partie mtime du nom d'une miniature ("<source>_<mtime>_<taille>.png")"""
+        return os.path.basename(path).split("_")[1]
+
+    def _remove_stale(self, image_path, current_mtime):
+        """
+        Supprimer les miniatures d'une source dont le mtime diffère de current_mtime
+
+        Les autres tailles de la version courante sont conservées ; avec
+        current_mtime=None, toutes les miniatures de la source sont supprimées.
+        """
+        pattern = os.path.join(glob.escape(self.directory), f"{self._source_key(image_path)}_*")
+        removed = 0
+        try:
+            for path in glob.glob(pattern):
+                if current_mtime is None or self._mtime_part(path) != current_mtime:
+                    os.remove(path)
+                    self._photos.pop(path, None)
+                    removed += 1
+        except OSError as e:
+            self.logger.warning(f"Erreur suppression miniatures: {e}")
+        return removed
+
+
+# Instance globale pour utilisation dans l'application
+thumbnail_store = ThumbnailStore()
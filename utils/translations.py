@@ -82,6 +82,7 @@ TEXTS = {
     "organizacion_guardada": "Datos de organización guardados",
     "stock_actualizado": "Stock actualizado correctamente",
     "factura_generada": "Factura generada correctamente",
+    "numero_factura_reasignado": "El número {sugerido} ya estaba en uso: la factura se ha guardado con el número {numero}",
     "error": "Error",
     "confirmar": "Confirmar",
     "confirmar_eliminacion": "¿Está seguro de que desea eliminar este producto?",